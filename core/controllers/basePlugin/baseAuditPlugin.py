@@ -22,6 +22,8 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from core.controllers.w3afException import w3afException
 from core.controllers.basePlugin.basePlugin import basePlugin
+from core.controllers.coreHelpers.baseline_responses import baseline_key
+from core.data.request.fuzzableRequest import fuzzableRequest
 import core.controllers.outputManager as om
 import core.data.kb.knowledgeBase as kb
 
@@ -53,30 +55,15 @@ class baseAuditPlugin(basePlugin):
         
         # These lines were added because we need to return the new vulnerabilities found by this
         # audit plugin, and I don't want to change the code of EVERY plugin!
-        before_vuln_dict = kb.kb.getData( self )
+        before_count = kb.kb.getAppendCount( self )
         
         self.audit( fuzzable_request_copy )
         
         # The join is here just in case, because the audit method of each plugin should call it
         self._tm.join( self )
         
-        after_vuln_dict = kb.kb.getData( self )
-        
-        # Now I get the difference between them:
-        before_list = []
-        after_list = []
-        for var_name in before_vuln_dict:
-            for item in before_vuln_dict[var_name]:
-                before_list.append(item)
-        
-        for var_name in after_vuln_dict:
-            for item in after_vuln_dict[var_name]:
-                after_list.append(item)
-        
-        new_ones = after_list[len(before_list)-1:]
-        
-        # And return it,
-        return new_ones
+        # And return the ones that were added by this call
+        return kb.kb.getAppendedSince( self, before_count )
         
     def audit( self, freq ):
         '''
@@ -88,6 +75,39 @@ class baseAuditPlugin(basePlugin):
         '''
         raise w3afException('Plugin is not implementing required method audit' )
     
+    def _sendMutant(self, mutant, analyze=True, grepResult=True,
+                    analyze_callback=None, useCache=True):
+        '''
+        Sends a mutant to the remote web server, see basePlugin._sendMutant.
+        
+        When the plugin asks for the original response of a fuzzable request
+        (analyze=False and it's not a mutant) it's shared with the rest of the
+        audit plugins, see _get_original_response(). The requests that are not
+        sent to the grep plugins are used to measure the response time, those
+        are always sent.
+        '''
+        if not analyze and grepResult and useCache and \
+        isinstance(mutant, fuzzableRequest):
+            return self._get_original_response( mutant )
+        
+        return basePlugin._sendMutant( self, mutant, analyze=analyze,
+                                       grepResult=grepResult,
+                                       analyze_callback=analyze_callback,
+                                       useCache=useCache )
+    
+    def _get_original_response( self, freq ):
+        '''
+        @parameter freq: A fuzzable request.
+        @return: The response to the unmodified fuzzable request, it's only
+        sent once during the scan for all the audit plugins.
+        '''
+        send = lambda: basePlugin._sendMutant( self, freq, analyze=False )
+        
+        store = getattr( self._urlOpener, 'baseline_responses', None )
+        if store is None:
+            return send()
+        return store.get( baseline_key( freq ), send )
+    
     def _analyzeResult( self, mutant, res ):
         '''
         This method analyzes the result of _sendMutant().
@@ -111,14 +131,7 @@ class baseAuditPlugin(basePlugin):
         
         @return: True if the (uri, variable) has NO vulnerabilities reported.
         '''
-        vuln_list = kb.kb.getData( plugin_name , kb_name )
-        url = uri.uri2url()
-        
-        for vuln in vuln_list:
-            if vuln.getVar() == variable and vuln.getURL().uri2url() == url:
-                return False
-                
-        return True
+        return not kb.kb.isReported( plugin_name, kb_name, uri, variable )
         
     def getType( self ):
         return 'audit'
@@ -62,6 +62,17 @@ class baseOutputPlugin(basePlugin):
         '''
         raise w3afException('Plugin is not implementing required method logEnabledPlugins' )
         
+    def isEnabled(self, level):
+        '''
+        This method is called from the output manager object, to know if it has
+        to send the messages of a level (debug, information, error, vulnerability
+        or console) to this plugin. The plugins that ignore some of them should
+        return False, so the callers don't even format those messages.
+        
+        @return: True if the plugin takes an action for the messages of level.
+        '''
+        return True
+        
     def debug(self, message, newLine = True ):
         '''
         This method is called from the output managerobject. The OM object was called from a plugin
@@ -0,0 +1,175 @@
+'''
+baseline_responses.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import copy
+import threading
+import time
+import zlib
+
+from core.controllers.misc.sharded_lru import sharded_lru
+
+# The maximum size of the compressed bodies (in bytes)
+BASELINE_CACHE_SIZE = 16 * 1024 * 1024
+# The responses are fetched again after this many seconds, None means that
+# they never expire
+BASELINE_MAX_AGE = None
+
+# Fixed weight for the response object, headers, etc.
+ENTRY_OVERHEAD = 512
+
+
+def baseline_key( fuzzable_request ):
+    '''
+    @return: The key for the fuzzable request: the method, URI, post-data,
+    headers and cookie, which are the things that _sendMutant() sends.
+    '''
+    # _sendMutant() adds the Cookie header to the request headers
+    headers = [ h for h in fuzzable_request.getHeaders().items()
+                if h[0].lower() != 'cookie' ]
+    return ( fuzzable_request.getMethod(),
+             fuzzable_request.getURI().url_string,
+             str( fuzzable_request.getData() ),
+             tuple( sorted( headers ) ),
+             str( fuzzable_request.getCookie() ) )
+
+
+class baseline_responses(object):
+    '''
+    Store for the original (unmodified) responses of the fuzzable requests,
+    which most audit plugins fetch before sending the mutants. The first
+    plugin fetches it and the rest get it from here.
+
+    The bodies are compressed with zlib and the size of the store is bounded
+    with a sharded_lru. When the same response is requested by many threads
+    at the same time only one of them sends the request.
+
+    >>> calls = []
+    >>> def fetch():
+    ...     calls.append(1)
+    ...     return 'response'
+    >>> br = baseline_responses()
+    >>> br.get( 'key', fetch ), br.get( 'key', fetch ), len(calls)
+    ('response', 'response', 1)
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, max_size=BASELINE_CACHE_SIZE, max_age=BASELINE_MAX_AGE):
+        '''
+        @parameter max_size: The maximum size (in bytes) of the stored bodies.
+        @parameter max_age: The amount of seconds after which the response is
+        fetched again (for targets with dynamic content), None to keep it for
+        the whole scan.
+        '''
+        self._max_age = max_age
+        self._cache = sharded_lru( max_size )
+        self._lock = threading.Lock()
+        # key -> threading.Event for the requests that are being sent
+        self._in_flight = {}
+        self._expired = 0
+
+    def get(self, key, fetch):
+        '''
+        @parameter key: The key for the response, see baseline_key()
+        @parameter fetch: A callable without parameters that sends the request
+        and returns the httpResponse.
+
+        @return: A copy of the stored response, or the result of fetch().
+        '''
+        while True:
+            res = self._get_stored( key )
+            if res is not None:
+                return res
+
+            with self._lock:
+                event = self._in_flight.get( key )
+                if event is None:
+                    event = self._in_flight[ key ] = threading.Event()
+                    break
+            # Another thread is fetching it, wait and read it from the cache.
+            # If that thread failed, it will be fetched by this one
+            event.wait()
+
+        try:
+            res = fetch()
+            self._store( key, res )
+            return res
+        finally:
+            with self._lock:
+                del self._in_flight[ key ]
+            event.set()
+
+    def _get_stored(self, key):
+        entry = self._cache.get( key )
+        if entry is None:
+            return None
+
+        template, body, timestamp = entry
+        if self._max_age is not None and time.time() - timestamp > self._max_age:
+            self._cache.pop( key, None )
+            self._expired += 1
+            return None
+
+        if not hasattr( template, 'getBody' ):
+            return template
+
+        # A shallow copy is enough, the plugins don't modify the responses
+        res = copy.copy( template )
+        res._body = zlib.decompress( body )
+        res.setFromCache( True )
+        return res
+
+    def _store(self, key, res):
+        if not hasattr( res, 'getBody' ):
+            self._cache.set( key, (res, '', time.time()), ENTRY_OVERHEAD )
+            return
+
+        body = zlib.compress( res.getBody(), 1 )
+        # Only the decoded body is kept, the DOM and text are rebuilt from it
+        template = copy.copy( res )
+        template._body = None
+        template._dom = None
+        template._clear_text_body = None
+        self._cache.set( key, (template, body, time.time()),
+                         len(body) + ENTRY_OVERHEAD )
+
+    def set_max_age(self, max_age):
+        '''
+        @parameter max_age: See __init__(), 0 is the same as None.
+        '''
+        self._max_age = max_age or None
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len( self._cache )
+
+    def get_stats(self):
+        '''
+        @return: A dict with the hits, misses, evictions, expired entries,
+        amount of entries and the size of the stored bodies.
+        '''
+        stats = self._cache.get_stats()
+        stats['expired'] = self._expired
+        return stats
@@ -26,21 +26,130 @@ from core.data.fuzzer.fuzzer import createRandAlNum
 
 import core.controllers.outputManager as om
 from core.controllers.w3afException import w3afException, w3afMustStopException
-from core.controllers.misc.levenshtein import relative_distance_ge
-from core.controllers.misc.lru import LRU
-from core.controllers.threads.threadManager import threadManagerObj as tm
+from core.controllers.misc.similarity import similarity_profile
+from core.controllers.misc.sharded_lru import sharded_lru
 
-import urllib
-import thread
 import cgi
+import hashlib
+import threading
+import urllib
 
 IS_EQUAL_RATIO = 0.90
 
+# The amount of 404 signatures that are learnt from the responses with a 404
+# code, for each (directory, extension)
+MAX_SIGNATURES_PER_PATH = 3
+
+
+class signature_404(similarity_profile):
+    '''
+    The similarity_profile of a (clean) 404 body, compared with IS_EQUAL_RATIO.
+    
+    >>> s = signature_404( '<html>The page you requested (/abc) was not found</html>' )
+    >>> s.matches( signature_404( '<html>The page you requested (/def) was not found</html>' ) )
+    True
+    >>> s.matches( signature_404( '<html>Welcome to my site</html>' ) )
+    False
+    >>> s.may_match( 1000 )
+    False
+    '''
+    
+    __slots__ = ()
+    
+    def may_match(self, length, threshold=IS_EQUAL_RATIO):
+        return similarity_profile.may_match( self, length, threshold )
+    
+    def matches(self, other, threshold=IS_EQUAL_RATIO):
+        return similarity_profile.matches( self, other, threshold )
+
+
+class host_404_knowledge(object):
+    '''
+    The 404 signatures of one host, for each (directory, extension). The
+    signatures that are generated by fingerprint_404 are also compared with
+    the responses from the other directories of the host.
+    
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (directory, extension) -> [ signature_404, ... ]
+        self._signatures = {}
+        # All the different shared signatures, in the order they were found
+        self._unique_signatures = []
+        
+        # Set when the 404 pages of the host were requested and analyzed
+        self.ready = threading.Event()
+        self.started = False
+    
+    def add_signature( self, url, signature, shared=True ):
+        '''
+        Save the 404 signature for the directory and extension of url.
+        
+        @parameter shared: True if the signature should also be compared with
+        the responses from other directories.
+        @return: False if there were already MAX_SIGNATURES_PER_PATH signatures
+        for them.
+        '''
+        key = ( url.getDomainPath().url_string, url.getExtension() )
+        
+        with self._lock:
+            signatures = self._signatures.setdefault( key, [] )
+            if len( signatures ) >= MAX_SIGNATURES_PER_PATH:
+                return False
+            
+            # Reuse the signature if it looks like one that we already have
+            for known in self._unique_signatures + signatures:
+                if known.matches( signature ):
+                    signature = known
+                    break
+            else:
+                if shared:
+                    self._unique_signatures.append( signature )
+            
+            if signature not in signatures:
+                signatures.append( signature )
+            return True
+    
+    def is_full( self, url ):
+        '''
+        @return: True if no more signatures are saved for the directory and
+        extension of url.
+        '''
+        key = ( url.getDomainPath().url_string, url.getExtension() )
+        with self._lock:
+            return len( self._signatures.get( key, [] ) ) >= MAX_SIGNATURES_PER_PATH
+    
+    def get_signatures( self, url ):
+        '''
+        @return: The 404 signatures to compare with a response for url, the
+        ones for the same directory and extension first.
+        '''
+        domain_path = url.getDomainPath().url_string
+        extension = url.getExtension()
+        
+        with self._lock:
+            result = list( self._signatures.get( (domain_path, extension), [] ) )
+            for (path, _), signatures in self._signatures.iteritems():
+                if path == domain_path:
+                    result.extend( s for s in signatures if s not in result )
+            result.extend( s for s in self._unique_signatures if s not in result )
+        
+        return result
+    
+    def __len__( self ):
+        return len( self._unique_signatures )
+
 
 class fingerprint_404:
     '''
     Read the 404 page(s) returned by the server.
     
+    The 404 pages of each host are requested in a background thread the first
+    time that is_404 is called for a response from that host, and only the
+    callers that need that host wait for them.
+    
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
@@ -56,40 +165,73 @@ class fingerprint_404:
         #
         #   Internal variables
         #
-        self._already_analyzed = False
-        self._404_bodies = []
-        self._lock = thread.allocate_lock()
+        # host (base URL) -> host_404_knowledge
+        self._hosts = {}
+        self._lock = threading.Lock()
         
-        # it is OK to store 500 here, I'm only storing int as the key, and bool as the value.
-        self.is_404_LRU = LRU(500)
+        # (host, directory, extension, body hash) -> bool, the key is small so it's
+        # OK to store 2000 here.
+        self.is_404_LRU = sharded_lru(2000)
         
         self._test_db = test_db
         self._test_db_index = 0
 
     def set_urlopener(self, urlopener):
         self._urlOpener = urlopener
+    
+    def _get_knowledge( self, url, learn=True ):
+        '''
+        @parameter learn: Start learning the 404 pages of the host, if it
+        wasn't started before.
+        @return: The host_404_knowledge for the host of url.
+        '''
+        host = url.baseUrl().url_string
+        
+        with self._lock:
+            knowledge = self._hosts.get( host )
+            if knowledge is None:
+                knowledge = self._hosts[ host ] = host_404_knowledge()
+            
+            if not learn or knowledge.started:
+                return knowledge
+            
+            #
+            #    This is the case when nobody has properly configured
+            #    the object in order to use it.
+            #
+            if self._urlOpener is None:
+                raise w3afException('404 fingerprint database was incorrectly initialized.')
+            
+            knowledge.started = True
+        
+        learner = threading.Thread( target=self._learn, args=(knowledge, url),
+                                    name='404Learner' )
+        learner.setDaemon( True )
+        learner.start()
+        return knowledge
             
     def generate_404_knowledge( self, url ):
         '''
         Based on a URL, request something that we know is going to be a 404.
         Afterwards analyze the 404's and summarise them.
         
-        @return: A list with 404 bodies.
+        This waits until the host of url was analyzed, it's started if
+        needed.
         '''
-        #
-        #    This is the case when nobody has properly configured
-        #    the object in order to use it.
-        #
-        if self._urlOpener is None:
-            raise w3afException('404 fingerprint database was incorrectly initialized.')
-        
-        with self._lock:        
+        self._get_knowledge( url ).ready.wait()
+    
+    def _learn( self, knowledge, url ):
+        '''
+        Request the 404 pages for the most common handlers in the directory of
+        url, and save their signatures to knowledge. Runs in its own thread.
+        '''
+        try:
             # Get the filename extension and create a 404 for it
             extension = url.getExtension()
             domain_path = url.getDomainPath()
             
             # the result
-            self._response_body_list = []
+            response_body_list = []
             
             #
             #   This is a list of the most common handlers, in some configurations, the 404
@@ -99,51 +241,57 @@ class fingerprint_404:
             handlers += ['pl', 'cgi', 'xhtml', 'htmls']
             handlers = list(set(handlers))
             
+            #   Send the requests using threads. These are not sent with the thread
+            #   pool, the threads of the pool might be waiting for this analysis.
+            threads = []
             for extension in handlers:
     
                 rand_alnum_file = createRandAlNum( 8 ) + '.' + extension
                     
                 url404 = domain_path.urlJoin( rand_alnum_file )
-    
-                #   Send the requests using threads:
-                targs = ( url404,  )
-                tm.startFunction( target=self._send_404, args=targs , ownerObj=self )
+                
+                t = threading.Thread( target=self._send_404, args=(url404, response_body_list) )
+                t.setDaemon( True )
+                t.start()
+                threads.append( t )
                 
             # Wait for all threads to finish sending the requests.
-            tm.join( self )
+            for t in threads:
+                t.join()
             
             #
-            #   I have the bodies in self._response_body_list , but maybe they all look the same, so I'll
-            #   filter the ones that look alike.
+            #   I have the bodies in response_body_list , they are saved for the
+            #   directory and extension of the URL that was requested, and the ones that
+            #   look alike are only compared once.
             #
-            result = [ self._response_body_list[0], ]
-            for i in self._response_body_list:
-                for j in self._response_body_list:
-                    
-                    if relative_distance_ge(i, j, IS_EQUAL_RATIO):
-                        # They are equal, we are ok with that
-                        continue
-                    else:
-                        # They are no equal, this means that we'll have to add this to the list
-                        result.append(j)
+            for url404, response_body in response_body_list:
+                knowledge.add_signature( url404, signature_404( response_body ) )
             
-            # I don't need these anymore
-            self._response_body_list = None
-            
-            # And I return the ones I need
-            result = list(set(result))
-            om.out.debug('The 404 body result database has a length of ' + str(len(result)) +'.')
+            om.out.debug('The 404 body result database for "%s" has a length of %s.'
+                         % (url.baseUrl(), len(knowledge)) )
         
-        self._404_bodies = result 
-        self._already_analyzed = True
+        except Exception, e:
+            om.out.error('Failed to analyze the 404 pages of "%s", error: %s'
+                         % (url.baseUrl(), e) )
         
+        # Verdicts that were calculated without these signatures are not valid
+        self.is_404_LRU.clear()
+        knowledge.ready.set()
         
-    def need_analysis(self):
-        return not self._already_analyzed
+    def need_analysis(self, url=None):
+        '''
+        @return: True if the host of url (or any host, if url is None) wasn't
+        analyzed yet.
+        '''
+        with self._lock:
+            if url is None:
+                return not [ k for k in self._hosts.itervalues() if k.ready.isSet() ]
+            knowledge = self._hosts.get( url.baseUrl().url_string )
+        return knowledge is None or not knowledge.ready.isSet()
     
-    def _send_404(self, url404):
+    def _send_404(self, url404, response_body_list):
         '''
-        Sends a GET request to url404 and saves the response in self._response_body_list .
+        Sends a GET request to url404 and saves the response in response_body_list .
         @return: None.
         '''
         try:
@@ -151,21 +299,20 @@ class fingerprint_404:
             # useCache does is to fill up disk space
             response = self._urlOpener.GET(url404, useCache=False, grepResult=False)
         except w3afException, w3:
-            raise w3afException('Exception while fetching a 404 page, error: ' + str(w3))
+            om.out.debug('Exception while fetching a 404 page, error: ' + str(w3))
         except w3afMustStopException, mse:
             # Someone else will raise this exception and handle it as expected
             # whenever the next call to GET is done
-            raise w3afException('w3afMustStopException <%s> found by _send_404,' \
-                                ' someone else will handle it.' % mse)
+            om.out.debug('w3afMustStopException <%s> found by _send_404,' \
+                         ' someone else will handle it.' % mse)
         except Exception, e:
             om.out.error('Unhandled exception while fetching a 404 page, error: ' + str(e))
-            raise
 
         else:
             # I don't want the random file name to affect the 404, so I replace it with a blank space
             response_body = get_clean_body(response)
 
-            self._response_body_list.append(response_body)
+            response_body_list.append( (url404, response_body) )
 
     def is_404(self, http_response):
         '''
@@ -211,7 +358,12 @@ class fingerprint_404:
         #   screwed, but this is open source, and the pentester working on that site can modify
         #   these lines.
         #
+        url = http_response.getURL()
+        
         if http_response.getCode() == 404:
+            # Some sites have a different 404 page for each directory or handler, this
+            # one is learnt for the next responses from the same place.
+            self._learn_404( http_response )
             return True
             
         #
@@ -219,46 +371,73 @@ class fingerprint_404:
         #
         if cf.cf.getData('404string') and cf.cf.getData('404string') in http_response:
             return True
-            
-        #
-        #   Before actually working, I'll check if this response is in the LRU, if it is I just return
-        #   the value stored there.
-        #
-        if http_response.id in self.is_404_LRU:
-            return self.is_404_LRU[ http_response.id ]
         
-        if self.need_analysis():
-            self.generate_404_knowledge( http_response.getURL() )
-        
-        # self._404_body was already cleaned inside generate_404_knowledge
+        # The 404 signatures were calculated from clean bodies
         # so we need to clean this one.
         html_body = get_clean_body( http_response )
         
         #
-        #   Compare this response to all the 404's I have in my DB
+        #   Before actually working, I'll check if this body was already analyzed, if it
+        #   was I just return the value stored there. Many responses have the same body,
+        #   the 404 pages for example.
+        #
+        key = ( url.baseUrl().url_string, domain_path.url_string, url.getExtension(),
+                hashlib.md5( html_body ).digest() )
+        is_404 = self.is_404_LRU.get( key )
+        if is_404 is not None:
+            return is_404
+        
+        # Only wait for the analysis of this host
+        knowledge = self._get_knowledge( url )
+        knowledge.ready.wait()
+        
+        #
+        #   Compare this response to the 404's I have in my DB. The length is enough to
+        #   discard most of them, the histogram is only calculated when it's needed.
         #
-        for body_404_db in self._404_bodies:
+        signature = None
+        for signature_404_db in knowledge.get_signatures( url ):
+            
+            if not signature_404_db.may_match( len(html_body) ):
+                continue
+            
+            if signature is None:
+                if len(html_body) == len(http_response.getBody()):
+                    # Nothing was removed, use the profile of the response
+                    signature = http_response.getSimilarityProfile()
+                else:
+                    signature = signature_404( html_body )
             
-            if relative_distance_ge(body_404_db, html_body, IS_EQUAL_RATIO):
+            if signature_404_db.matches( signature ):
                 msg = '"%s" is a 404. [similarity_index > %s]' % \
-                    (http_response.getURL(), IS_EQUAL_RATIO)
+                    (url, IS_EQUAL_RATIO)
                 om.out.debug(msg)
-                self.is_404_LRU[ http_response.id ] = True
+                self.is_404_LRU[ key ] = True
                 return True
-            else:
-                # If it is not eq to one of the 404 responses I have in my DB, that does not means
-                # that it won't match the next one, so I simply do nothing
-                pass
         
-        else:
-            #
-            #   I get here when the for ends and no 404 is matched.
-            #
-            msg = '"%s" is NOT a 404. [similarity_index < %s]' % \
-            (http_response.getURL(), IS_EQUAL_RATIO)
-            om.out.debug(msg)
-            self.is_404_LRU[ http_response.id ] = False
-            return False
+        #
+        #   I get here when the for ends and no 404 is matched.
+        #
+        msg = '"%s" is NOT a 404. [similarity_index < %s]' % \
+        (url, IS_EQUAL_RATIO)
+        om.out.debug(msg)
+        self.is_404_LRU[ key ] = False
+        return False
+    
+    def _learn_404( self, http_response ):
+        '''
+        Save the signature of a response with a 404 code, if there are not too
+        many for its directory and extension. These are only compared with the
+        responses from the same directory.
+        '''
+        url = http_response.getURL()
+        knowledge = self._get_knowledge( url, learn=False )
+        if knowledge.is_full( url ):
+            return
+        
+        signature = signature_404( get_clean_body( http_response ) )
+        if knowledge.add_signature( url, signature, shared=False ):
+            self.is_404_LRU.clear()
 
 def fingerprint_404_singleton( test_db=[] ):
     if not fingerprint_404._instance:
@@ -0,0 +1,144 @@
+'''
+grep_matcher.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import threading
+import weakref
+
+from core.controllers.misc.multi_in import multi_in
+
+
+class grep_matcher(object):
+    '''
+    Finds the strings that all the grep plugins are looking for in one go.
+
+    Each grep plugin creates a needle_set with its strings. The first time
+    a needle_set is queried for an HTTP response, the response body is
+    searched for the needles of ALL the needle_sets that are in use, and the
+    result is kept until the same thread asks about a different response.
+    Since the grep plugins analyze one response after the other in the same
+    thread, only one search is performed for each response.
+
+    Only plain strings are shared. The plugins that use regular expressions
+    (getMails, codeDisclosure, hashFind, ssn, creditCards,
+    user_defined_regex) keep their own pass over the body, they need the
+    match itself and validate it (Luhn check, hash length, etc).
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self):
+        # Reentrant: the weakref callbacks may run while the lock is held
+        self._lock = threading.RLock()
+        # id(needle_set) -> weakref to the needle_set
+        self._needle_sets = {}
+        self._multi_in = None
+        self._version = 0
+
+        # (weakref to the response, version, set with the needles found) for
+        # each thread, the response is not kept alive after the grep plugins
+        # analyzed it
+        self._last = threading.local()
+
+    def query(self, needle_set, response):
+        '''
+        @return: A list with the needles in needle_set that are inside the
+        response body, in the same order they were given to the needle_set.
+        '''
+        if id( needle_set ) not in self._needle_sets:
+            self._add( needle_set )
+
+        last = getattr( self._last, 'value', None )
+        if last is None or last[0]() is not response or last[1] != self._version:
+            version, mi = self._get_multi_in()
+            found = set( mi.query( response.getBody() ) )
+            last = self._last.value = (weakref.ref( response ), version, found)
+
+        found = last[2]
+        return [ needle for needle in needle_set.needles if needle in found ]
+
+    def _add(self, needle_set):
+        with self._lock:
+            key = id( needle_set )
+
+            def remove(ref):
+                with self._lock:
+                    if self._needle_sets.get( key ) is ref:
+                        del self._needle_sets[ key ]
+                        self._changed()
+
+            self._needle_sets[ key ] = weakref.ref( needle_set, remove )
+            self._changed()
+
+    def _changed(self):
+        self._multi_in = None
+        self._version += 1
+
+    def _get_multi_in(self):
+        with self._lock:
+            if self._multi_in is None:
+                needles = []
+                for ref in self._needle_sets.values():
+                    needle_set = ref()
+                    if needle_set is not None:
+                        needles.extend( needle_set.needles )
+                self._multi_in = multi_in( needles )
+            return self._version, self._multi_in
+
+
+matcher = grep_matcher()
+
+
+class needle_set(object):
+    '''
+    The strings that one grep plugin is looking for.
+
+    >>> from core.data.url.httpResponse import httpResponse
+    >>> from core.data.parsers.urlParser import url_object
+    >>> u = url_object('http://www.w3af.com/')
+    >>> res = httpResponse(200, 'An error: Stack trace: ...', {}, u, u)
+    >>> errors = needle_set( ['Fatal error', 'Stack trace:'] )
+    >>> java = needle_set( ['java.lang.'] )
+    >>> errors.query( res )
+    ['Stack trace:']
+    >>> java.query( res )
+    []
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, needles, shared_matcher=matcher):
+        self.needles = tuple( needles )
+        self._matcher = shared_matcher
+
+    def query(self, response):
+        '''
+        @return: A list with the needles that are inside the body of the
+        httpResponse.
+        '''
+        return self._matcher.query( self, response )
+
+    def __contains__(self, needle):
+        return needle in self.needles
+
+    def __iter__(self):
+        return iter( self.needles )
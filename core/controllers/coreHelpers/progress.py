@@ -45,6 +45,13 @@ class progress:
         self._current_value = 0.1
         self._first_amount_change_time = None
         
+    def add_total_amount(self, value):
+        '''
+        Increase the max value that the progress "bar" will have, used when the
+        total amount isn't known beforehand.
+        '''
+        self._max_value += value
+        
     def inc(self):
         '''
         Add 1 unit to the current value.
@@ -0,0 +1,167 @@
+'''
+seen_requests.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+import hashlib
+
+
+def _normalize( value ):
+    '''
+    Unicode and utf-8 strings with the same characters are equal for
+    request_digest(), like '1' == u'1'.
+    '''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def request_digest( fuzzable_request ):
+    '''
+    @return: A canonical hash for the fuzzable request. Two requests that are
+    equal (fuzzableRequest.__eq__: same method, same URI and same parameter
+    names and values) have the same digest, the order of the parameters is
+    not relevant. To compare the values, unicode strings are encoded to utf-8
+    and single values are wrapped in a list, like the values that the
+    data containers usually have.
+
+    >>> from core.data.request.fuzzableRequest import fuzzableRequest
+    >>> from core.data.parsers.urlParser import url_object
+    >>> from core.data.dc.dataContainer import dataContainer as dc
+    >>> fr1 = fuzzableRequest()
+    >>> fr1.setURL( url_object('http://www.w3af.com/') )
+    >>> fr1.setDc( dc( [('a', ['1']), ('b', ['2'])] ) )
+    >>> fr2 = fuzzableRequest()
+    >>> fr2.setURL( url_object('http://www.w3af.com/') )
+    >>> fr2.setDc( dc( [('b', [u'2']), (u'a', ['1'])] ) )
+    >>> fr1 == fr2, request_digest( fr1 ) == request_digest( fr2 )
+    (True, True)
+    >>> fr2.setMethod( 'POST' )
+    >>> request_digest( fr1 ) == request_digest( fr2 )
+    False
+    '''
+    # Not getDc(), it copies the data container of the requests that share it
+    dc = fuzzable_request._dc
+    params = []
+    for name in dc.keys():
+        values = dc[ name ]
+        if not isinstance(values, (list, tuple)):
+            values = [ values ]
+        params.append( (_normalize( name ),
+                        tuple( [ _normalize( v ) for v in values ] )) )
+    params.sort()
+
+    canonical = repr( (fuzzable_request.getMethod(),
+                       fuzzable_request.getURI().url_string,
+                       tuple(params)) )
+    return hashlib.md5( canonical ).digest()
+
+
+class seen_requests(object):
+    '''
+    An index of the fuzzable requests and URLs that were already found during
+    the discovery phase.
+
+    Membership checks are O(1) (a set of request digests and a set of URLs is
+    kept) and the insertion order is preserved, so the requests and URLs can
+    be reported/saved to the kb in the same order they were found.
+
+    >>> from core.data.request.fuzzableRequest import fuzzableRequest
+    >>> from core.data.parsers.urlParser import url_object
+    >>> fr = fuzzableRequest()
+    >>> fr.setURL( url_object('http://www.w3af.com/') )
+    >>> sr = seen_requests()
+    >>> sr.add( fr )
+    True
+    >>> sr.add( fr.copy() )
+    False
+    >>> fr in sr
+    True
+    >>> len( sr )
+    1
+    >>> sr.add_url( fr.getURL() )
+    True
+    >>> sr.add_url( fr.getURL() )
+    False
+    >>> sr.get_urls()
+    [<url_object for "http://www.w3af.com/">]
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__( self, fuzzable_request_list=() ):
+        self._digests = set()
+        self._requests = []
+
+        self._url_set = set()
+        self._urls = []
+
+        for fr in fuzzable_request_list:
+            self.add( fr )
+
+    def add( self, fuzzable_request ):
+        '''
+        Add a fuzzable request to the index. Please note that the URL of the
+        request is NOT added, use add_url() for that.
+
+        @return: True if the fuzzable request wasn't in the index.
+        '''
+        digest = request_digest( fuzzable_request )
+        if digest in self._digests:
+            return False
+
+        self._digests.add( digest )
+        self._requests.append( fuzzable_request )
+        return True
+
+    def add_url( self, url ):
+        '''
+        @return: True if the URL wasn't in the index.
+        '''
+        if url in self._url_set:
+            return False
+
+        self._url_set.add( url )
+        self._urls.append( url )
+        return True
+
+    def has_url( self, url ):
+        return url in self._url_set
+
+    def get_urls( self ):
+        '''
+        @return: A list with all the URLs, in the order they were found.
+        '''
+        return self._urls[:]
+
+    def get_requests( self ):
+        '''
+        @return: A list with all the fuzzable requests, in the order they
+        were found.
+        '''
+        return self._requests[:]
+
+    def __contains__( self, fuzzable_request ):
+        return request_digest( fuzzable_request ) in self._digests
+
+    def __iter__( self ):
+        return iter( self._requests )
+
+    def __len__( self ):
+        return len( self._requests )
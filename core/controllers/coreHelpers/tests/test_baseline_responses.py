@@ -0,0 +1,139 @@
+'''
+test_baseline_responses.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import threading
+import time
+import unittest
+
+from core.controllers.basePlugin.baseAuditPlugin import baseAuditPlugin
+from core.controllers.coreHelpers.baseline_responses import baseline_responses
+from core.data.fuzzer.fuzzer import createMutants
+from core.data.parsers.urlParser import url_object
+from core.data.request.httpQsRequest import httpQsRequest
+from core.data.url.httpResponse import httpResponse
+from core.data.url.xUrllib import xUrllib
+
+
+class fake_opener(object):
+
+    def __init__(self, delay=0):
+        self.baseline_responses = baseline_responses()
+        self.sent = []
+        self._delay = delay
+
+    def GET(self, uri, data=None, headers={}, grepResult=True, useCache=True):
+        self.sent.append( uri.url_string )
+        time.sleep( self._delay )
+        body = '<html>%s %s</html>' % (uri.url_string, len(self.sent))
+        return httpResponse(200, body, {'Content-Type': 'text/html'}, uri, uri)
+
+
+class original_plugin(baseAuditPlugin):
+
+    def audit(self, freq):
+        self.original = self._sendMutant( freq, analyze=False ).getBody()
+        for mutant in createMutants( freq, ['x'] ):
+            self._sendMutant( mutant, analyze=False )
+
+
+def create_freq(i=1):
+    freq = httpQsRequest()
+    freq.setURI( url_object('http://www.w3af.com/foo.php?id=%s' % i) )
+    return freq
+
+
+class test_baseline_responses(unittest.TestCase):
+
+    def test_shared_by_plugins(self):
+        opener = fake_opener()
+        plugins = [ original_plugin() for _ in xrange(20) ]
+        for plugin in plugins:
+            plugin.setUrlOpener( opener )
+            plugin.audit( create_freq().copy() )
+
+        # One original request, one mutant for each plugin
+        self.assertEqual( opener.sent.count('http://www.w3af.com/foo.php?id=1'), 1 )
+        self.assertEqual( len(opener.sent), 21 )
+        self.assertEqual( len(set( p.original for p in plugins )), 1 )
+
+        stats = opener.baseline_responses.get_stats()
+        self.assertEqual( stats['hits'], 19 )
+
+    def test_timing_requests_are_sent(self):
+        opener = fake_opener()
+        plugin = original_plugin()
+        plugin.setUrlOpener( opener )
+        for _ in xrange(3):
+            plugin._sendMutant( create_freq(), analyze=False, grepResult=False )
+        self.assertEqual( len(opener.sent), 3 )
+
+    def test_concurrent(self):
+        opener = fake_opener( delay=0.2 )
+        plugin = original_plugin()
+        plugin.setUrlOpener( opener )
+
+        bodies = []
+        def fetch():
+            bodies.append( plugin._sendMutant( create_freq(), analyze=False ).getBody() )
+        threads = [ threading.Thread( target=fetch ) for _ in xrange(10) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual( len(opener.sent), 1 )
+        self.assertEqual( len(set(bodies)), 1 )
+
+    def test_max_age_and_size(self):
+        opener = fake_opener()
+        opener.baseline_responses = baseline_responses( max_age=0.1 )
+        plugin = original_plugin()
+        plugin.setUrlOpener( opener )
+
+        plugin._sendMutant( create_freq(), analyze=False )
+        plugin._sendMutant( create_freq(), analyze=False )
+        time.sleep( 0.2 )
+        plugin._sendMutant( create_freq(), analyze=False )
+        self.assertEqual( len(opener.sent), 2 )
+
+        # Only a few of them fit
+        opener.baseline_responses = baseline_responses( max_size=8 * 1024 )
+        for i in xrange(100):
+            plugin._sendMutant( create_freq(i), analyze=False )
+        self.assertTrue( opener.baseline_responses.get_stats()['weight'] <= 8 * 1024 )
+
+    def test_max_age_setting(self):
+        opener = xUrllib()
+        self.assertEqual( opener.baseline_responses._max_age, None )
+        try:
+            opener.settings.setBaselineMaxAge( 60 )
+            opener._init()
+            self.assertEqual( opener.baseline_responses._max_age, 60 )
+
+            opener.settings.setBaselineMaxAge( 0 )
+            opener._init()
+            self.assertEqual( opener.baseline_responses._max_age, None )
+        finally:
+            opener.settings.setBaselineMaxAge( 0 )
+            opener.end()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+'''
+test_fingerprint_404.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import random
+import threading
+import unittest
+
+import core.data.kb.config as cf
+from core.controllers.coreHelpers.fingerprint_404 import fingerprint_404, \
+    signature_404, IS_EQUAL_RATIO
+from core.controllers.misc.levenshtein import relative_distance_ge
+from core.data.parsers.urlParser import url_object
+from core.data.url.httpResponse import httpResponse
+
+NOT_FOUND = '<html><head><title>Not found</title></head><body>' \
+            '<h1>Sorry!</h1>The page %s is not here, go back to the home page.' \
+            '</body></html>'
+CONTENT = '<html><head><title>Products</title></head><body>' \
+          '<table><tr><td>Product %s</td><td>$10</td></tr></table>' \
+          '</body></html>'
+
+
+class fake_opener(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def GET(self, url, **kwds):
+        self.sent.append( url )
+        return create_response( url, NOT_FOUND % url.getPath() )
+
+
+class slow_opener(fake_opener):
+    '''
+    Doesn't answer the requests for blocked_host until release is set.
+    '''
+
+    def __init__(self, blocked_host):
+        fake_opener.__init__(self)
+        self.blocked_host = blocked_host
+        self.release = threading.Event()
+
+    def GET(self, url, **kwds):
+        if url.getDomain() == self.blocked_host:
+            self.release.wait()
+        return fake_opener.GET(self, url, **kwds)
+
+
+def create_response(url, body, code=200, id=None):
+    url = url_object( url ) if isinstance(url, basestring) else url
+    return httpResponse(code, body, {'Content-Type': 'text/html'}, url, url, id=id)
+
+
+class test_fingerprint_404(unittest.TestCase):
+
+    def setUp(self):
+        cf.cf.save('never404', [])
+        cf.cf.save('always404', [])
+        cf.cf.save('404string', '')
+        self.opener = fake_opener()
+        self.fp = fingerprint_404()
+        self.fp.set_urlopener( self.opener )
+
+    def test_is_404(self):
+        self.assertTrue( self.fp.is_404( create_response('http://w3af.com/a/x.php',
+                                                         NOT_FOUND % '/a/x.php', id=1) ) )
+        generated = len( self.opener.sent )
+        self.assertTrue( generated > 10 )
+
+        self.assertFalse( self.fp.is_404( create_response('http://w3af.com/a/y.php',
+                                                          CONTENT % 'foo', id=2) ) )
+        self.assertEqual( len( self.opener.sent ), generated )
+
+    def test_learn_per_directory(self):
+        self.fp.is_404( create_response('http://w3af.com/x.php', CONTENT % 1, id=1) )
+        generated = len( self.opener.sent )
+
+        # This directory has its own 404 page
+        other_404 = '<html>Custom error for the shop section, nothing here at all ' \
+                    'please try again later. Error code 0x%s.</html>'
+        self.assertTrue( self.fp.is_404( create_response('http://w3af.com/shop/a.php',
+                                                         other_404 % 1, code=404, id=2) ) )
+        self.assertTrue( self.fp.is_404( create_response('http://w3af.com/shop/b.php',
+                                                         other_404 % 2, id=3) ) )
+        self.assertEqual( len( self.opener.sent ), generated )
+
+        # It isn't used for other directories
+        self.assertFalse( self.fp.is_404( create_response('http://w3af.com/c.php',
+                                                          other_404 % 3, id=4) ) )
+
+    def test_per_host(self):
+        self.fp.is_404( create_response('http://w3af.com/x.php', CONTENT % 1) )
+        self.assertFalse( self.fp.need_analysis( url_object('http://w3af.com/') ) )
+        self.assertTrue( self.fp.need_analysis( url_object('http://www.w3af.org/') ) )
+
+        self.assertTrue( self.fp.is_404( create_response('http://www.w3af.org/x.php',
+                                                         NOT_FOUND % '/x.php') ) )
+        hosts = set( url.getDomain() for url in self.opener.sent )
+        self.assertEqual( hosts, set(['w3af.com', 'www.w3af.org']) )
+        self.assertFalse( self.fp.need_analysis( url_object('http://www.w3af.org/') ) )
+
+    def test_only_wait_for_the_host(self):
+        self.opener = slow_opener('slow.w3af.com')
+        self.fp.set_urlopener( self.opener )
+
+        results = []
+        def slow():
+            results.append( self.fp.is_404( create_response('http://slow.w3af.com/a.php',
+                                                            NOT_FOUND % '/a.php') ) )
+        t = threading.Thread( target=slow )
+        t.start()
+
+        # The other host is analyzed while slow.w3af.com doesn't answer
+        self.assertFalse( self.fp.is_404( create_response('http://w3af.com/a.php',
+                                                          CONTENT % 1) ) )
+        self.assertEqual( results, [] )
+
+        self.opener.release.set()
+        t.join()
+        self.assertEqual( results, [True] )
+
+    def test_verdict_cache_by_content(self):
+        self.assertFalse( self.fp.is_404( create_response('http://w3af.com/a/x.php',
+                                                          CONTENT % 1, id=1) ) )
+        hits = self.fp.is_404_LRU.get_stats()['hits']
+
+        # Another response, with the same body, for the same directory
+        self.assertFalse( self.fp.is_404( create_response('http://w3af.com/a/y.php',
+                                                          CONTENT % 1, id=2) ) )
+        self.assertEqual( self.fp.is_404_LRU.get_stats()['hits'], hits + 1 )
+
+        # The same id with a different body is not taken from the cache
+        self.assertTrue( self.fp.is_404( create_response('http://w3af.com/a/x.php',
+                                                         NOT_FOUND % '/a/x.php', id=1) ) )
+
+    def test_same_result_as_relative_distance(self):
+        bodies = [ NOT_FOUND % i for i in ('/a', '/abcdef/ghijkl', '') ]
+        bodies += [ CONTENT % i for i in xrange(3) ]
+        bodies += [ '', 'a', 'ab' * 40 ]
+        rnd = random.Random(1)
+        for _ in xrange(20):
+            bodies.append( ''.join( rnd.choice('abc<>/ ') for _ in xrange(rnd.randint(1, 200)) ) )
+
+        for a in bodies:
+            for b in bodies:
+                self.assertEqual( signature_404(a).matches( signature_404(b) ),
+                                  relative_distance_ge(a, b, IS_EQUAL_RATIO), (a, b) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+'''
+test_grep_matcher.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import gc
+import os
+import random
+import time
+import unittest
+import weakref
+
+from core.controllers.coreHelpers.grep_matcher import grep_matcher, needle_set
+from core.controllers.misc.multi_in import multi_in
+from core.data.constants.common_directories import get_common_directories
+from core.data.parsers.urlParser import url_object
+from core.data.url.httpResponse import httpResponse
+
+
+class counting_response(httpResponse):
+    body_reads = 0
+
+    def getBody(self):
+        self.body_reads += 1
+        return httpResponse.getBody(self)
+
+
+def create_response(body):
+    url = url_object('http://www.w3af.com/')
+    return counting_response(200, body, {'Content-Type': 'text/html'}, url, url)
+
+
+class test_grep_matcher(unittest.TestCase):
+
+    def test_own_hits(self):
+        matcher = grep_matcher()
+        errors = needle_set( ['Stack trace:', 'Fatal error'], matcher )
+        java = needle_set( ['java.lang.', 'Stack trace:'], matcher )
+        oracle = needle_set( ['<!-- Created by Oracle '], matcher )
+
+        response = create_response('Fatal error ... Stack trace: java.lang.Foo')
+        self.assertEqual( errors.query(response), ['Stack trace:', 'Fatal error'] )
+        self.assertEqual( java.query(response), ['java.lang.', 'Stack trace:'] )
+        self.assertEqual( oracle.query(response), [] )
+
+    def test_one_scan_per_response(self):
+        matcher = grep_matcher()
+        sets = [ needle_set( ['foo%s' % i, 'bar'], matcher ) for i in xrange(10) ]
+        # Register all the needle sets
+        for ns in sets:
+            ns.query( create_response('') )
+
+        response = create_response('foo1 foo2 bar')
+        for ns in sets:
+            ns.query( response )
+        self.assertEqual( response.body_reads, 1 )
+
+        self.assertEqual( sets[1].query(response), ['foo1', 'bar'] )
+        self.assertEqual( sets[5].query(response), ['bar'] )
+        self.assertEqual( response.body_reads, 1 )
+
+    def test_response_not_kept(self):
+        matcher = grep_matcher()
+        errors = needle_set( ['Fatal error'], matcher )
+        response = create_response('Fatal error')
+        self.assertEqual( errors.query(response), ['Fatal error'] )
+
+        ref = weakref.ref( response )
+        del response
+        gc.collect()
+        self.assertTrue( ref() is None )
+        self.assertEqual( errors.query( create_response('') ), [] )
+
+    def test_unused_needle_sets(self):
+        matcher = grep_matcher()
+        used = needle_set( ['abc'], matcher )
+        unused = needle_set( ['def'], matcher )
+        used.query( create_response('') )
+        unused.query( create_response('') )
+        self.assertEqual( len(matcher._get_multi_in()[1].get_needles()), 2 )
+
+        del unused
+        gc.collect()
+        self.assertEqual( matcher._get_multi_in()[1].get_needles(), ['abc'] )
+        self.assertEqual( used.query( create_response('abc def') ), ['abc'] )
+
+    def test_multi_in_random(self):
+        rnd = random.Random(1)
+        alphabet = 'ab/.'
+        for _ in xrange(2000):
+            needles = [ ''.join( rnd.choice(alphabet) for _ in xrange(rnd.randint(1, 6)) )
+                        for _ in xrange(rnd.randint(0, 15)) ]
+            target = ''.join( rnd.choice(alphabet + 'xy') for _ in xrange(rnd.randint(0, 40)) )
+
+            expected = []
+            for needle in needles:
+                if needle in target and needle not in expected:
+                    expected.append( needle )
+
+            self.assertEqual( multi_in(needles).query(target), expected,
+                              (needles, target) )
+
+    def test_benchmark_corpus(self):
+        '''
+        Grep the recorded responses in plugins/grep/tests for the strings of
+        the errorPages and pathDisclosure plugins, one plugin after the other
+        (the old way) and with the shared matcher.
+        '''
+        from plugins.grep.errorPages import errorPages
+        needle_lists = [ errorPages()._get_error_strings(),
+                         get_common_directories(),
+                         ['10.', '172.', '192.168.', '169.254.'],
+                         ['<!-- Created by Oracle '],
+                         ['HTTP/1'] ]
+
+        responses = []
+        for counter in xrange(1, 6):
+            file_path = os.path.join('plugins', 'grep', 'tests',
+                                     'test-%s.html' % counter)
+            responses.append( create_response( file(file_path).read() ) )
+        # Make the body big enough to measure something
+        responses.append( create_response( ''.join( r.getBody() for r in responses ) * 5 ) )
+
+        matcher = grep_matcher()
+        sets = [ needle_set(needles, matcher) for needles in needle_lists ]
+
+        def old_way():
+            res = []
+            for response in responses:
+                for needles in needle_lists:
+                    res.append( [ n for n in needles if n in response ] )
+            return res
+
+        def shared():
+            res = []
+            for response in responses:
+                for ns in sets:
+                    res.append( ns.query(response) )
+            return res
+
+        self.assertEqual( old_way(), shared() )
+
+        def measure(func):
+            start = time.time()
+            for _ in xrange(20):
+                func()
+            return (time.time() - start) / (20 * len(responses))
+
+        old_cost = measure( old_way )
+        shared_cost = measure( shared )
+        print '\nCost of grepping per response: %.3fms (one pass per plugin)' \
+              ' vs. %.3fms (shared matcher)' % (old_cost * 1000, shared_cost * 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
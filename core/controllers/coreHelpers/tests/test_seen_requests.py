@@ -0,0 +1,148 @@
+'''
+test_seen_requests.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import time
+import unittest
+
+from core.controllers.coreHelpers.seen_requests import seen_requests
+from core.data.dc.dataContainer import dataContainer as dc
+from core.data.parsers.urlParser import url_object
+from core.data.request.httpPostDataRequest import httpPostDataRequest
+from core.data.request.httpQsRequest import httpQsRequest
+
+
+def create_requests(count):
+    res = []
+    for i in xrange(count):
+        fr = httpQsRequest()
+        fr.setURI( url_object('http://www.w3af.com/%s/foo.php?id=%s' % (i % 50, i)) )
+        res.append( fr )
+    return res
+
+
+class test_seen_requests(unittest.TestCase):
+
+    def test_add_contains(self):
+        sr = seen_requests()
+        fr_list = create_requests(10)
+
+        for fr in fr_list:
+            self.assertTrue( sr.add(fr) )
+
+        for fr in create_requests(10):
+            self.assertTrue( fr in sr )
+            self.assertFalse( sr.add(fr) )
+
+        self.assertEqual( len(sr), 10 )
+
+    def test_method_and_params(self):
+        get = httpQsRequest()
+        get.setURL( url_object('http://www.w3af.com/') )
+        get.setDc( dc( [('a', ['1']),] ) )
+
+        post = httpPostDataRequest()
+        post.setURL( url_object('http://www.w3af.com/') )
+        post.setDc( dc( [('a', ['1']),] ) )
+
+        post_other_value = httpPostDataRequest()
+        post_other_value.setURL( url_object('http://www.w3af.com/') )
+        post_other_value.setDc( dc( [('a', ['2']),] ) )
+
+        sr = seen_requests()
+        self.assertTrue( sr.add(get) )
+        self.assertTrue( sr.add(post) )
+        self.assertTrue( sr.add(post_other_value) )
+        self.assertFalse( sr.add(post.copy()) )
+
+    def test_same_as_eq(self):
+        first = httpPostDataRequest()
+        first.setURL( url_object('http://www.w3af.com/') )
+        first.setDc( dc( [('a', ['1']), ('b', ['x'])] ) )
+
+        unicode_values = httpPostDataRequest()
+        unicode_values.setURL( url_object('http://www.w3af.com/') )
+        unicode_values.setDc( dc( [(u'b', [u'x']), ('a', [u'1'])] ) )
+        self.assertEqual( first, unicode_values )
+
+        sr = seen_requests( [first] )
+        self.assertTrue( unicode_values in sr )
+        self.assertFalse( sr.add( unicode_values ) )
+
+    def test_copies_not_modified(self):
+        fr = create_requests(1)[0]
+        fr.setDc( dc( [('a', ['1'])] ) )
+        fr_copy = fr.copy()
+        sr = seen_requests( [fr] )
+        self.assertTrue( fr_copy in sr )
+        # The membership check doesn't copy the shared data container
+        self.assertTrue( fr_copy._dc is fr._dc )
+
+    def test_insertion_order(self):
+        fr_list = create_requests(100)
+        sr = seen_requests( fr_list )
+        for fr in fr_list:
+            sr.add_url( fr.getURL() )
+
+        self.assertEqual( sr.get_requests(), fr_list )
+
+        expected_urls = []
+        for fr in fr_list:
+            if fr.getURL() not in expected_urls:
+                expected_urls.append( fr.getURL() )
+        self.assertEqual( sr.get_urls(), expected_urls )
+        self.assertEqual( len(expected_urls), 50 )
+
+    def test_benchmark_linear(self):
+        '''
+        Adding N requests to the index and checking membership for them must
+        take O(N) time. The previous implementation (a list) took O(N^2) and
+        compared the requests with __eq__, the index never compares them.
+        '''
+        eq_calls = []
+        def counting_eq(self, other):
+            eq_calls.append( 1 )
+            return original_eq(self, other)
+        original_eq = httpQsRequest.__eq__
+        httpQsRequest.__eq__ = counting_eq
+
+        def measure(count):
+            fr_list = create_requests(count)
+            start = time.time()
+            sr = seen_requests()
+            for fr in fr_list:
+                sr.add( fr )
+                sr.add_url( fr.getURL() )
+            for fr in fr_list:
+                self.assertTrue( fr in sr )
+            self.assertEqual( len(sr), count )
+            return time.time() - start
+
+        try:
+            small = measure(5000)
+            big = measure(20000)
+        finally:
+            httpQsRequest.__eq__ = original_eq
+
+        self.assertEqual( eq_calls, [] )
+        print '\nseen_requests: 5000 requests %.3fs, 20000 requests %.3fs' % (small, big)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -74,6 +74,7 @@ class w3afLocalProxyHandler(w3afProxyHandler):
                 if head == body is None:
                     # The request was dropped!
                     # We close the connection to the browser and exit
+                    self.close_connection = 1
                     self.rfile.close()
                     self.wfile.close()
                     break
@@ -19,14 +19,15 @@ along with w3af; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 '''
+from __future__ import with_statement
 
-import cStringIO
 import traceback
 import time
 import socket
 import select
 import httplib
-import SocketServer
+import threading
+import Queue
 from OpenSSL import SSL
 from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 
@@ -37,6 +38,18 @@ import core.controllers.outputManager as om
 from core.data.parsers.urlParser import url_object
 from core.data.request.fuzzableRequest import fuzzableRequest
 
+# Threads that handle the browser connections, at most this amount of
+# connections are handled at the same time
+PROXY_WORKERS = 200
+# Seconds that an idle keep-alive connection from the browser is kept open
+KEEPALIVE_TIMEOUT = 10
+# Headers that are only meaningful for one connection, they aren't forwarded
+HOP_BY_HOP_HEADERS = ('connection', 'proxy-connection', 'keep-alive', 'te',
+                      'trailer', 'transfer-encoding', 'upgrade')
+
+_ssl_contexts = {}
+_ssl_contexts_lock = threading.Lock()
+
 
 class proxy(w3afThread):
     '''
@@ -171,6 +184,16 @@ class proxy(w3afThread):
 
 class w3afProxyHandler(BaseHTTPRequestHandler):
     
+    # Keep the connections with the browser open between requests, the
+    # browser closes them or they are closed after KEEPALIVE_TIMEOUT seconds
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # The status line and headers are sent together with the body instead of
+    # one send() for each of them. The buffer is flushed after each response.
+    wbufsize = 64 * 1024
+
+    _post_data = None
+    
     def handle_one_request(self):
         """Handle a single HTTP request.
 
@@ -180,18 +203,30 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
         
         I override this because I'm going to use ONE handler for all the methods (except CONNECT).
         """
-        self.raw_requestline = self.rfile.readline()
+        self._post_data = None
+        try:
+            self.raw_requestline = self.rfile.readline()
+        except socket.timeout:
+            # The browser didn't send another request in this connection
+            self.close_connection = 1
+            return
         if not self.raw_requestline:
             self.close_connection = 1
             return
         if not self.parse_request(): # An error code has been sent, just exit
             return
         
+        # parse_request() already decided if the connection is kept open
+        for header in HOP_BY_HOP_HEADERS:
+            del self.headers[header]
+        
         try:
             # Now I perform my specific tasks...
             if self.command == 'QUIT':
                 # Stop the server
+                self.close_connection = 1
                 self.send_response(200)
+                self.send_header('Content-Length', '0')
                 self.end_headers()
                 self.server.stop = True
                 om.out.debug('Handled QUIT request.')
@@ -199,24 +234,24 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
                 self.do_CONNECT()
             else:
                 self.doAll()
+                if not self.close_connection:
+                    # Read the post-data that the handler didn't use, the
+                    # next request starts after it
+                    self._getPostData()
+            self.wfile.flush()
         except Exception,  e:
             ### FIXME: Maybe I should perform some more detailed error handling...
+            self.close_connection = 1
             om.out.debug('An exception occurred in w3afProxyHandler.handle_one_request() :' + str(e) )
 
     def _getPostData(self):
         '''
-        @return: Post data preserving rfile
+        @return: The post-data of the request, it's read from rfile only once.
         '''
-        postData = None
-        if self.headers.dict.has_key('content-length'):
+        if self._post_data is None and self.headers.dict.has_key('content-length'):
             cl = int(self.headers['content-length'])
-            postData = self.rfile.read(cl)
-            # rfile is not seekable, so a little trick
-            if not hasattr(self.rfile, 'reset'):
-                rfile = cStringIO.StringIO(postData)
-                self.rfile = rfile
-            self.rfile.reset()
-        return postData
+            self._post_data = self.rfile.read(cl)
+        return self._post_data
 
     def _createFuzzableRequest(self):
         '''
@@ -270,8 +305,8 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
             - self.rfile : A file like object that stores the postdata
             - self.path : Stores the URL that was requested by the browser
         '''
-        self.headers['Connection'] = 'close'
-
+        # The hop-by-hop headers were removed in handle_one_request(), so the
+        # connections with the remote server are reused by the urlOpener
         path = self.path
         uri_instance = url_object(path)
 
@@ -321,6 +356,7 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
             - self.end_headers : Ends the headers section
             - self.wfile : A file like object that represents the body of the response
         '''
+        self.close_connection = 1
         try:
             self.send_response( 400 )
             self.send_header( 'Connection', 'close')
@@ -351,30 +387,26 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
 
             what_to_send = res.getBody()
             
-            for header in res.getHeaders():
-                if header == 'transfer-encoding' and res.getHeaders()[header] == 'chunked':
-                    # don't send this header, and send the content-length instead
-                    self.send_header( 'content-length', str(len(what_to_send)) )
-                else:    
-                    self.send_header( header, res.getHeaders()[header] )
+            headers = res.getHeaders()
+            for header in headers:
+                # The body was already read (and de-chunked) by the urlOpener,
+                # the browser gets it with the real content-length
+                if header.lower() in HOP_BY_HOP_HEADERS or \
+                header.lower() == 'content-length':
+                    continue
+                self.send_header( header, headers[header] )
             
-            self.send_header( 'Connection', 'close')
+            self.send_header( 'Content-Length', str(len(what_to_send)) )
+            if self.close_connection:
+                self.send_header( 'Connection', 'close')
             self.end_headers()
             
             self.wfile.write(what_to_send)
-            self.wfile.close()
+            self.wfile.flush()
         except Exception, e:
+            self.close_connection = 1
             om.out.debug('Failed to send the data to the browser: ' + str(e) )
 
-    def _verify_cb(self, conn, cert, errnum, depth, ok):
-        '''
-        Used by set_verify to check that the SSL certificate if valid.
-        In our case, we always return True.
-        '''
-        om.out.debug('Got this certificate from remote site: %s' % cert.get_subject() )
-        # I don't check for certificates, for me, they are always ok.
-        return True
-
     def do_CONNECT(self):
         '''
         Handle the CONNECT method.
@@ -383,42 +415,28 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
         '''
         # Log what we are doing.
         self.log_request(200)
+        # The tunnel uses the connection until the browser closes it
+        self.close_connection = 1
         soc = None
         
         try:
             try:
                 self.wfile.write(self.protocol_version + " 200 Connection established\r\n\r\n")
+                self.wfile.flush()
                 
                 # Now, transform the socket that connects the browser and the proxy to a SSL socket!
-                ctx = SSL.Context(SSL.SSLv23_METHOD)
-                ctx.set_timeout(5)
-                
-                try:
-                    ctx.use_privatekey_file ( self._urlOpener._proxyCert )
-                except:
-                    om.out.error( "[proxy error] Couldn't find certificate file %s"% self._urlOpener._proxyCert )
-                
-                ctx.use_certificate_file( self._urlOpener._proxyCert )
-                ctx.load_verify_locations( self._urlOpener._proxyCert )
+                ctx = get_ssl_context( self._urlOpener._proxyCert )
                 
                 # Save for later
                 browSoc = self.connection
                 
-                # Don't demand a certificate
-                #
-                #   IMPORTANT: This line HAS to be just before the SSL.Connection, it seems that 
-                #                         any other ctx method modifies the SSL.VERIFY_NONE setting!
-                #
-                ctx.set_verify(SSL.VERIFY_NONE, self._verify_cb)
-                
                 browCon = SSL.Connection(ctx, self.connection )
                 browCon.set_accept_state()
 
                 # see HTTPServerWrapper class below
                 httpsServer = HTTPServerWrapper(self.__class__, self)
                 httpsServer.w3afLayer = self.server.w3afLayer
-            
-                om.out.debug("SSL 'self.connection' connection state="+ browCon.state_string() )
+
                 
                 conWrap = SSLConnectionWrapper(browCon, browSoc)
                 try:
@@ -439,25 +457,81 @@ class w3afProxyHandler(BaseHTTPRequestHandler):
                 soc.close()
             self.connection.close()
 
+    def address_string(self):
+        '''
+        The IP address of the browser, without the reverse DNS lookup that
+        BaseHTTPRequestHandler does for every logged request.
+        '''
+        return self.client_address[0]
+
     def log_message( self, format, *args):
         '''
         I dont want messages written to stderr, please write them to the om.
         '''
-        message = "Local proxy daemon handling request: %s - %s" % (self.address_string(), format%args) 
-        om.out.debug( message )
+        om.out.debug( "Local proxy daemon handling request: %s - %s",
+                      self.address_string(), format % args )
+
+class ProxyServer(HTTPServer):
+    '''
+    The browser connections are handled by a pool of PROXY_WORKERS threads.
+    The connections that arrive when all the workers are busy wait in a
+    queue until one of them is free.
+    '''
+    # Seconds between the checks of self.stop
+    timeout = 0.5
+    # The browsers open many connections at the same time
+    request_queue_size = 128
+
+    def __init__(self, server_address, RequestHandlerClass, workers=PROXY_WORKERS):
+        HTTPServer.__init__(self, server_address, RequestHandlerClass)
+        self._workers = workers
+        self._worker_threads = []
+        self._requests = Queue.Queue()
 
-# I want to use threads to handle all requests.
-class ProxyServer(HTTPServer, SocketServer.ThreadingMixIn):
     def serve_forever(self):
-        """Handle one request at a time until stopped."""
+        """Accept connections until stopped, the workers handle them."""
         self.stop = False
-        while not self.stop:
-            try:
-                self.handle_request()
-            except KeyboardInterrupt:
-                self.stop = True
+        try:
+            while not self.stop:
+                try:
+                    self.handle_request()
+                except KeyboardInterrupt:
+                    self.stop = True
+        finally:
+            for _ in self._worker_threads:
+                self._requests.put( None )
+            self._worker_threads = []
+            self.server_close()
         om.out.debug('Exiting proxy server serve_forever(); stop() was successful.')
-                
+
+    def process_request(self, request, client_address):
+        if not self._worker_threads:
+            for i in xrange(self._workers):
+                worker = threading.Thread(target=self._work, name='ProxyWorker-%s' % i)
+                worker.setDaemon(True)
+                worker.start()
+                self._worker_threads.append( worker )
+        self._requests.put( (request, client_address) )
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception, e:
+                om.out.debug('Exception while handling a proxy connection: %s', e)
+
+            # close_request() because shutdown_request() is new in python 2.7,
+            # and an exception here would kill the worker
+            try:
+                self.close_request(request)
+            except Exception, e:
+                om.out.debug('Exception while closing a proxy connection: %s', e)
+
     def server_bind(self):
         om.out.debug('Changing socket options of ProxyServer to (socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)')
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -465,7 +539,7 @@ class ProxyServer(HTTPServer, SocketServer.ThreadingMixIn):
 
 # We make SSL Connection look almost exactly as a socket connection. 
 # Thus, we're able to use the SocketServer framework transparently.
-class HTTPServerWrapper(HTTPServer, SocketServer.ThreadingMixIn):
+class HTTPServerWrapper(HTTPServer):
     '''
     This is a dummy wrapper around HTTPServer.
     It is intended to be used only through process_request() method
@@ -492,20 +566,71 @@ class HTTPServerWrapper(HTTPServer, SocketServer.ThreadingMixIn):
         self.RequestHandlerClass = handler
         self.chainedHandler = chainedHandler
 
+    def shutdown_request(self, request):
+        # do_CONNECT() closes the connection
+        pass
+
         
 #### And now some helper functions ####        
+def _verify_cb(conn, cert, errnum, depth, ok):
+    '''
+    Used by set_verify to check that the SSL certificate if valid.
+    In our case, we always return True.
+    '''
+    om.out.debug('Got this certificate from remote site: %s', cert.get_subject() )
+    # I don't check for certificates, for me, they are always ok.
+    return True
+
+def get_ssl_context(proxy_cert):
+    '''
+    @parameter proxy_cert: The file with the certificate and private key.
+    @return: The SSL context for the connections with the browser. It's
+    created once for each certificate file and shared by all the CONNECT
+    tunnels, so the browser can also resume the SSL sessions.
+    '''
+    with _ssl_contexts_lock:
+        ctx = _ssl_contexts.get( proxy_cert )
+        if ctx is not None:
+            return ctx
+
+        ctx = SSL.Context(SSL.SSLv23_METHOD)
+        ctx.set_session_id('w3af-proxy')
+        ctx.set_timeout(300)
+        
+        try:
+            ctx.use_privatekey_file ( proxy_cert )
+        except:
+            om.out.error( "[proxy error] Couldn't find certificate file %s"% proxy_cert )
+        
+        ctx.use_certificate_file( proxy_cert )
+        ctx.load_verify_locations( proxy_cert )
+        
+        # Don't demand a certificate
+        #
+        #   IMPORTANT: This line HAS to be the last one, it seems that 
+        #                         any other ctx method modifies the SSL.VERIFY_NONE setting!
+        #
+        ctx.set_verify(SSL.VERIFY_NONE, _verify_cb)
+        
+        _ssl_contexts[ proxy_cert ] = ctx
+        return ctx
+
 def wrap(socket_obj, ssl_connection, fun, *params):
     '''
     A utility function that calls SSL read/write operation and handles errors.
+    If the socket has a timeout, socket.timeout is raised when it expires.
     '''
+    timeout = socket_obj.gettimeout()
     while True:
         try:
             result = fun(*params)
             break
         except SSL.WantReadError:
-            select.select([socket_obj], [], [], 3)
+            if not select.select([socket_obj], [], [], timeout or 3)[0] and timeout:
+                raise socket.timeout('timed out')
         except SSL.WantWriteError:
-            select.select([], [socket_obj], [], 3)
+            if not select.select([], [socket_obj], [], timeout or 3)[1] and timeout:
+                raise socket.timeout('timed out')
         except SSL.ZeroReturnError:
             # The remote end closed the connection
             ssl_connection.shutdown()
@@ -552,6 +677,12 @@ class SSLConnectionWrapper(object):
     def __repr__(self):
         return object.__repr__(self)
         
+    def settimeout( self, timeout ):
+        self._socket.settimeout( timeout )
+
+    def gettimeout( self ):
+        return self._socket.gettimeout()
+
     def recv( self, amount):
         return wrap(self._socket, self._connection, self._connection.recv, amount)
 
@@ -575,39 +706,60 @@ class SSLConnectionFile:
     Actually, it reads and writes data from and to SSL connection
     '''
     
+    # Written data is sent in SSL records of this size, at most
+    WRITE_BUFFER_SIZE = 16384
+
     def __init__(self, sslCon, socket):
         self.closed = False
         self._read_buffer = ''
+        self._write_buffer = []
+        self._write_buffer_len = 0
         self._sslCon = sslCon
         self._socket = socket
 
+    def _fill(self, amount):
+        '''
+        Read from the connection until the buffer has <amount> bytes.
+        @return: False if the connection was closed.
+        '''
+        #   We actually want to read ahead in order to have more data in the buffer.
+        data = self._sslCon.recv( max(4096, amount - len(self._read_buffer)) )
+        self._read_buffer += data
+        return bool(data)
+
     def read( self, amount ):
-        if len(self._read_buffer) < amount:
-            #   We actually want to read ahead in order to have more data in the buffer.
-            if amount <= 4096:
-                to_read = 4096
-            else:
-                to_read = amount
-            self._read_buffer = self._sslCon.recv( to_read )
+        while len(self._read_buffer) < amount:
+            if not self._fill( amount ):
+                break
 
         result, self._read_buffer = self._read_buffer[0:amount], self._read_buffer[amount:]
         return result
     
     def write( self, data ):
-        result =  self._sslCon.send(data)
-        return result
+        self._write_buffer.append( data )
+        self._write_buffer_len += len(data)
+        if self._write_buffer_len >= self.WRITE_BUFFER_SIZE:
+            self.flush()
+        return len(data)
 
     def readline(self):
-        result = ''
-        while True:
-            ch = self.read(1)
-            result += ch
-            if ch == '\n':
+        end = self._read_buffer.find('\n')
+        while end == -1:
+            start = len(self._read_buffer)
+            if not self._fill( start + 1 ):
+                end = len(self._read_buffer) - 1
                 break
+            end = self._read_buffer.find('\n', start)
+
+        result, self._read_buffer = self._read_buffer[:end + 1], self._read_buffer[end + 1:]
         return result
 
     def flush(self):
-        pass
+        if self._write_buffer:
+            data = ''.join( self._write_buffer )
+            self._write_buffer = []
+            self._write_buffer_len = 0
+            self._sslCon.send( data )
 
     def close(self):
-        pass
+        self.flush()
@@ -0,0 +1,195 @@
+import httplib
+import socket
+import ssl
+import threading
+import time
+import unittest
+
+from core.controllers.daemons.proxy import proxy, w3afProxyHandler
+from core.data.url.httpResponse import httpResponse
+
+
+class slow_opener(object):
+    '''
+    Answers all the requests after <delay> seconds, like a remote server.
+    '''
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def GET(self, uri, data=None, headers={}, grepResult=True, useCache=False):
+        self._lock.acquire()
+        self.requests.append( (uri, data, dict(headers)) )
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self._lock.release()
+
+        self.wait( uri )
+
+        self._lock.acquire()
+        self.running -= 1
+        self._lock.release()
+        body = '<html>%s %s</html>' % (uri, data)
+        return httpResponse(200, body, {'Content-Type': 'text/html',
+                                        'Transfer-Encoding': 'chunked'},
+                            uri, uri)
+
+    POST = GET
+
+    def wait(self, uri):
+        time.sleep( self.delay )
+
+
+class gated_opener(slow_opener):
+    '''
+    Answers the requests when <amount> of them are waiting for an answer at
+    the same time, or after the timeout.
+    '''
+    def __init__(self, amount, timeout=5):
+        slow_opener.__init__(self)
+        self.amount = amount
+        self.timeout = timeout
+        self.gate = threading.Event()
+
+    def wait(self, uri):
+        if self.running >= self.amount:
+            self.gate.set()
+        self.gate.wait( self.timeout )
+
+
+class TestProxyConcurrency(unittest.TestCase):
+
+    IP = '127.0.0.1'
+    PORT = 44446
+
+    def start_proxy(self, opener):
+        self._proxy = proxy(self.IP, self.PORT, opener, w3afProxyHandler)
+        self._proxy.start()
+        while not self._proxy.isRunning():
+            time.sleep(0.05)
+
+    def tearDown(self):
+        self._proxy.stop()
+        self._proxy.join()
+
+    def get_connection(self):
+        return httplib.HTTPConnection(self.IP, self.PORT)
+
+    def test_concurrent_requests(self):
+        opener = gated_opener(20)
+        self.start_proxy( opener )
+
+        def send(i):
+            conn = self.get_connection()
+            conn.request('GET', 'http://w3af.com/%s' % i)
+            bodies.append( conn.getresponse().read() )
+            conn.close()
+
+        bodies = []
+        threads = [ threading.Thread(target=send, args=(i,)) for i in xrange(20) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEquals(20, len(bodies))
+        # All the requests were sent to the remote server at the same time
+        self.assertEquals(20, opener.max_running)
+
+    def test_close_error(self):
+        self.start_proxy( slow_opener() )
+        server = self._proxy._server
+        # One worker, it handles all the connections
+        server._workers = 1
+
+        close_request = server.close_request
+        def failing_close_request(request):
+            close_request(request)
+            raise socket.error('Connection reset by peer')
+        server.close_request = failing_close_request
+
+        for i in xrange(3):
+            conn = httplib.HTTPConnection(self.IP, self.PORT, timeout=5)
+            conn.request('GET', 'http://w3af.com/%s' % i)
+            self.assertEquals('<html>http://w3af.com/%s None</html>' % i,
+                              conn.getresponse().read())
+            conn.close()
+
+    def test_keepalive(self):
+        opener = slow_opener()
+        self.start_proxy( opener )
+
+        conn = self.get_connection()
+        conn.request('POST', 'http://w3af.com/a', 'id=1',
+                     {'Content-Type': 'application/x-www-form-urlencoded',
+                      'Proxy-Connection': 'keep-alive'})
+        res = conn.getresponse()
+        self.assertEquals('<html>http://w3af.com/a id=1</html>', res.read())
+        self.assertEquals(None, res.getheader('transfer-encoding'))
+        sock = conn.sock
+
+        conn.request('GET', 'http://w3af.com/b')
+        self.assertEquals('<html>http://w3af.com/b None</html>', conn.getresponse().read())
+        # The same connection was used for both requests
+        self.assertTrue(sock is conn.sock)
+        conn.close()
+
+        # The hop-by-hop headers are not sent to the remote server
+        for _, _, headers in opener.requests:
+            self.assertFalse('proxy-connection' in headers)
+            self.assertFalse('connection' in headers)
+
+    def test_connect(self):
+        self.start_proxy( slow_opener() )
+
+        for i in xrange(2):
+            conn = httplib.HTTPSConnection(self.IP, self.PORT,
+                                           context=ssl._create_unverified_context())
+            conn.set_tunnel('w3af.com', 443)
+            conn.request('GET', '/%s' % i)
+            self.assertEquals('<html>https://w3af.com:443/%s None</html>' % i,
+                              conn.getresponse().read())
+            conn.request('GET', '/keep')
+            self.assertEquals('<html>https://w3af.com:443/keep None</html>',
+                              conn.getresponse().read())
+            conn.close()
+
+    def test_benchmark(self):
+        '''
+        Many browsers sending requests to a remote server that takes 10ms
+        to answer each of them.
+        '''
+        opener = slow_opener(0.01)
+        self.start_proxy( opener )
+        clients, requests = 50, 20
+        errors = []
+
+        def browser():
+            try:
+                conn = self.get_connection()
+                for i in xrange(requests):
+                    conn.request('GET', 'http://w3af.com/%s' % i)
+                    conn.getresponse().read()
+                conn.close()
+            except (socket.error, httplib.HTTPException), e:
+                errors.append( e )
+
+        threads = [ threading.Thread(target=browser) for _ in xrange(clients) ]
+        start = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+
+        self.assertEquals([], errors)
+        self.assertEquals(clients * requests, len(opener.requests))
+        self.assertTrue(opener.max_running > 1)
+        print '\n%s requests/second through the proxy' % (clients * requests / elapsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
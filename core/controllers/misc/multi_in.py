@@ -0,0 +1,121 @@
+'''
+multi_in.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+
+# Prefixes shorter than this are present in almost every response, testing
+# them before the needles that share them is a waste of time.
+MIN_GUARD_LEN = 3
+
+
+class multi_in(object):
+    '''
+    Find which of many strings (needles) are inside another one.
+
+    Python's "needle in target" is implemented in C and it's faster than a
+    regular expression with all the needles joined with "|" (and much faster
+    than an Aho-Corasick automaton written in Python), so this class still
+    uses "in", but it avoids the tests that are known to fail: the needles
+    are stored in a prefix tree, and when a prefix that is shared by many
+    needles is not in the target, none of those needles is tested.
+
+    >>> mi = multi_in( ['/var/', '/var/www/', '/var/lib/', 'abc'] )
+    >>> mi.query( 'the file /var/www/index.php was not found' )
+    ['/var/', '/var/www/']
+    >>> mi.query( 'nothing here' )
+    []
+    >>> mi.query( 'abc' )
+    ['abc']
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, needles):
+        self._needles = []
+        seen = set()
+        for needle in needles:
+            if needle and needle not in seen:
+                seen.add( needle )
+                self._needles.append( needle )
+
+        # The position of each needle, query() returns them in this order
+        self._order = dict( (n, i) for i, n in enumerate(self._needles) )
+        self._tree = self._build_tree( sorted(self._needles), 0 )
+
+    def get_needles(self):
+        return self._needles[:]
+
+    def query(self, target):
+        '''
+        @return: A list with the needles that are inside target, in the same
+        order they were given to __init__.
+        '''
+        result = []
+        self._query( self._tree, target, result )
+        if len( result ) > 1:
+            result.sort( key=self._order.__getitem__ )
+        return result
+
+    def _build_tree(self, needles, depth):
+        '''
+        @parameter needles: A sorted list of needles, all of them share the
+        first depth characters.
+        @return: A list of nodes. Each node is a tuple (guard, is_needle,
+        children): the children are only tested if guard is in the target.
+        '''
+        nodes = []
+        i = 0
+        while i < len( needles ):
+            # Group the needles that share the next character
+            j = i + 1
+            while j < len( needles ) and len( needles[j] ) > depth and \
+            len( needles[i] ) > depth and needles[j][depth] == needles[i][depth]:
+                j += 1
+
+            group = needles[i:j]
+            if len( group ) == 1:
+                nodes.append( (group[0], True, ()) )
+            else:
+                # The longest prefix shared by all the needles in the group
+                prefix = group[0][:depth + 1]
+                while all( len(n) > len(prefix) and n.startswith( group[0][:len(prefix) + 1] )
+                           for n in group ):
+                    prefix = group[0][:len(prefix) + 1]
+
+                is_needle = group[0] == prefix
+                rest = group[1:] if is_needle else group
+                children = self._build_tree( rest, len(prefix) )
+
+                if is_needle or len( prefix ) >= MIN_GUARD_LEN:
+                    nodes.append( (prefix, is_needle, children) )
+                else:
+                    # The prefix is too short to be a good guard, don't test
+                    # it and test the children directly
+                    nodes.extend( children )
+            i = j
+        return nodes
+
+    def _query(self, nodes, target, result):
+        for guard, is_needle, children in nodes:
+            if guard in target:
+                if is_needle:
+                    result.append( guard )
+                if children:
+                    self._query( children, target, result )
@@ -0,0 +1,225 @@
+'''
+sharded_lru.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import threading
+
+DEFAULT_SHARDS = 8
+
+# The fields of the linked list nodes, lists are used instead of objects
+# because they are faster to create and access
+PREV, NEXT, KEY, VALUE, WEIGHT = 0, 1, 2, 3, 4
+
+_MISSING = object()
+
+
+class _lru_shard(object):
+    '''
+    One LRU with its own lock. The entries are kept in a circular doubly
+    linked list, the least recently used one right after the root node.
+    '''
+
+    def __init__(self, capacity):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.map = {}
+        self.root = root = []
+        root[:] = [root, root, None, None, 0]
+        self.weight = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default):
+        with self.lock:
+            node = self.map.get( key )
+            if node is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            # Move to the most recently used end, in place
+            root = self.root
+            prev, next = node[PREV], node[NEXT]
+            prev[NEXT] = next
+            next[PREV] = prev
+            last = root[PREV]
+            last[NEXT] = root[PREV] = node
+            node[PREV] = last
+            node[NEXT] = root
+            return node[VALUE]
+
+    def set(self, key, value, weight):
+        with self.lock:
+            node = self.map.get( key )
+            if node is not None:
+                self._unlink( node )
+
+            if weight > self.capacity:
+                # It would evict everything else and still be too heavy
+                self.evictions += 1
+                return
+
+            root = self.root
+            last = root[PREV]
+            node = [last, root, key, value, weight]
+            last[NEXT] = root[PREV] = self.map[ key ] = node
+            self.weight += weight
+
+            while self.weight > self.capacity:
+                self._unlink( root[NEXT] )
+                self.evictions += 1
+
+    def pop(self, key, default):
+        with self.lock:
+            node = self.map.get( key )
+            if node is None:
+                return default
+            self._unlink( node )
+            return node[VALUE]
+
+    def clear(self):
+        with self.lock:
+            self.map.clear()
+            self.root[:] = [self.root, self.root, None, None, 0]
+            self.weight = 0
+
+    def _unlink(self, node):
+        prev, next = node[PREV], node[NEXT]
+        prev[NEXT] = next
+        next[PREV] = prev
+        del self.map[ node[KEY] ]
+        self.weight -= node[WEIGHT]
+
+
+class sharded_lru(object):
+    '''
+    A thread safe LRU cache. The keys are split in shards, each one with its
+    own lock and linked list, so threads that use different keys don't wait
+    for each other. The least recently used entries of a shard are removed
+    when the weight of its entries is more than capacity / shards, and the
+    entries that are heavier than that are not stored at all.
+
+    The weight of each entry is 1 by default (the capacity is the amount of
+    entries) but it can be set when the entry is added, for example to the
+    size of the cached value in bytes.
+
+    >>> lru = sharded_lru(4, shards=1)
+    >>> for i in xrange(4):
+    ...     lru[i] = str(i)
+    >>> lru[0]
+    '0'
+    >>> lru[4] = '4'
+    >>> 1 in lru, 0 in lru, len(lru)
+    (False, True, 4)
+    >>> lru.get(1, 'missing')
+    'missing'
+    >>> lru.set('big', 'x' * 10, weight=3)
+    >>> sorted(lru.keys(), key=str)
+    [4, 'big']
+    >>> stats = lru.get_stats()
+    >>> stats['hits'], stats['misses'], stats['evictions']
+    (1, 1, 4)
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, capacity, shards=DEFAULT_SHARDS):
+        '''
+        @parameter capacity: The maximum weight of all the entries.
+        @parameter shards: The amount of shards, each one holds at most
+        capacity / shards.
+        '''
+        self.capacity = max(capacity, 1)
+        shards = max(1, min(shards, self.capacity))
+        shard_capacity = self.capacity / shards
+        self._shards = [ _lru_shard( shard_capacity ) for _ in xrange(shards) ]
+
+    def _shard(self, key):
+        return self._shards[ hash(key) % len(self._shards) ]
+
+    def get(self, key, default=None):
+        return self._shard( key ).get( key, default )
+
+    def __getitem__(self, key):
+        value = self._shard( key ).get( key, _MISSING )
+        if value is _MISSING:
+            raise KeyError( key )
+        return value
+
+    def set(self, key, value, weight=1):
+        self._shard( key ).set( key, value, weight )
+
+    def __setitem__(self, key, value):
+        self._shard( key ).set( key, value, 1 )
+
+    def pop(self, key, default=_MISSING):
+        value = self._shard( key ).pop( key, default )
+        if value is _MISSING:
+            raise KeyError( key )
+        return value
+
+    def __delitem__(self, key):
+        self.pop( key )
+
+    def __contains__(self, key):
+        '''
+        @return: True if the key is in the cache, it doesn't change the order
+        of the entries nor the statistics.
+        '''
+        shard = self._shard( key )
+        with shard.lock:
+            return key in shard.map
+
+    def __len__(self):
+        return sum( len(shard.map) for shard in self._shards )
+
+    def keys(self):
+        keys = []
+        for shard in self._shards:
+            with shard.lock:
+                keys.extend( shard.map.keys() )
+        return keys
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+    def get_weight(self):
+        return sum( shard.weight for shard in self._shards )
+
+    def get_stats(self):
+        '''
+        @return: A dict with the hits, misses and evictions of all the shards,
+        the amount of entries and their weight.
+        '''
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0,
+                 'weight': 0}
+        for shard in self._shards:
+            with shard.lock:
+                stats['hits'] += shard.hits
+                stats['misses'] += shard.misses
+                stats['evictions'] += shard.evictions
+                stats['entries'] += len( shard.map )
+                stats['weight'] += shard.weight
+        return stats
@@ -0,0 +1,166 @@
+'''
+similarity.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from core.controllers.misc.levenshtein import char_histogram, \
+    histogram_distance, length_upper_bound
+
+
+class similarity_profile(object):
+    '''
+    The features of a string that relative_distance() uses: the length and
+    the amount of times that each character appears. They are calculated
+    once, so comparing a response with many others doesn't read the bodies
+    again.
+
+    >>> a = similarity_profile( '<html>The page you requested (/abc) was not found</html>' )
+    >>> b = similarity_profile( '<html>The page you requested (/def) was not found</html>' )
+    >>> a.ratio( b ) > 0.9, a.matches( b, 0.9 )
+    (True, True)
+    >>> a.may_match( 1000, 0.9 )
+    False
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    __slots__ = ('length', 'histogram')
+
+    def __init__(self, body):
+        self.length = len(body)
+        self.histogram = char_histogram( body )
+
+    def may_match(self, length, threshold):
+        '''
+        @return: False if a string with this length can't have a ratio of
+        threshold or more with this one, without looking at the string.
+        '''
+        return length_upper_bound( self.length, length ) >= threshold
+
+    def ratio(self, other):
+        '''
+        @return: The same as relative_distance() for the strings of both
+        profiles.
+        '''
+        return histogram_distance( self.histogram, self.length,
+                                   other.histogram, other.length )
+
+    def matches(self, other, threshold):
+        '''
+        @return: True if ratio( other ) >= threshold.
+        '''
+        if not self.may_match( other.length, threshold ):
+            return False
+        return self.ratio( other ) >= threshold
+
+
+def get_profile(obj):
+    '''
+    @parameter obj: A string, httpResponse or similarity_profile.
+    @return: The similarity_profile of obj, the one of a httpResponse is
+    calculated once and saved in the response.
+    '''
+    if isinstance(obj, similarity_profile):
+        return obj
+    if isinstance(obj, basestring):
+        return similarity_profile( obj )
+    return obj.getSimilarityProfile()
+
+
+def _get_length(obj):
+    if isinstance(obj, basestring):
+        return len(obj)
+    if isinstance(obj, similarity_profile):
+        return obj.length
+    return len( obj.getBody() )
+
+
+def similarity(a, b):
+    '''
+    Measures the "similarity" of a and b, which can be strings, httpResponses
+    or similarity_profiles. The result is the same as relative_distance() of
+    the strings (or bodies).
+
+    >>> from core.controllers.misc.levenshtein import relative_distance
+    >>> similarity('abcd' * 3, 'abxy' * 2) == relative_distance('abcd' * 3, 'abxy' * 2)
+    True
+    '''
+    return get_profile( a ).ratio( get_profile( b ) )
+
+
+def similarity_ge(a, b, threshold):
+    '''
+    Indicates if similarity(a, b) is *greater equal* than threshold. The
+    profiles are not calculated when the lengths are enough to know it.
+
+    >>> similarity_ge('a', 'a' * 100, 0.5)
+    False
+    '''
+    if threshold <= 0:
+        return True
+    if length_upper_bound( _get_length(a), _get_length(b) ) < threshold:
+        return False
+    return similarity( a, b ) >= threshold
+
+
+def similarity_lt(a, b, threshold):
+    '''
+    Indicates if similarity(a, b) is *less than* threshold.
+    '''
+    return not similarity_ge( a, b, threshold )
+
+
+def best_match(body, candidates, threshold=0.0):
+    '''
+    Compare body with all the candidates. The candidates are compared in
+    order of their length_upper_bound() with body, and the ones that can't
+    be better than the best one that was already found are not compared.
+
+    @parameter body: A string, httpResponse or similarity_profile.
+    @parameter candidates: A list of strings, httpResponses or
+    similarity_profiles.
+    @parameter threshold: The minimum similarity of the result.
+
+    @return: A tuple with the candidate that is more similar to body and the
+    similarity, or (None, 0.0) if no candidate reaches the threshold.
+
+    >>> best_match('<b>foo</b>', ['<i>foo</i>', 'bar', '<b>fooo</b>'])
+    ('<b>fooo</b>', 0.9523809523809523)
+    >>> best_match('abc', ['xyz'], 0.5)
+    (None, 0.0)
+    '''
+    profile = get_profile( body )
+
+    ordered = [ ( -length_upper_bound( profile.length, _get_length(c) ), i, c )
+                for i, c in enumerate(candidates) ]
+    ordered.sort()
+
+    best, best_ratio = None, 0.0
+    for bound, _, candidate in ordered:
+        if -bound < max(threshold, best_ratio):
+            # The bound of the rest is even lower
+            break
+
+        ratio = profile.ratio( get_profile( candidate ) )
+        if ratio >= threshold and (best is None or ratio > best_ratio):
+            best, best_ratio = candidate, ratio
+            if ratio == 1.0:
+                break
+
+    return best, best_ratio
@@ -0,0 +1,130 @@
+'''
+test_similarity.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import random
+import time
+import unittest
+
+from core.controllers.misc.levenshtein import relative_distance, \
+    char_histogram
+from core.controllers.misc.similarity import similarity, similarity_ge, \
+    best_match
+from core.data.parsers.urlParser import url_object
+from core.data.url.httpResponse import httpResponse
+
+ROW = '<tr><td class="name">Product %s</td><td class="price">$%s</td></tr>\n'
+
+
+def create_page(rnd, size):
+    rows = []
+    length = 0
+    while length < size:
+        row = ROW % (rnd.randint(0, 10 ** 6), rnd.randint(1, 999))
+        rows.append( row )
+        length += len(row)
+    return '<html><body><table>\n%s</table></body></html>' % ''.join(rows)
+
+
+def create_response(body):
+    url = url_object('http://www.w3af.com/')
+    return httpResponse(200, body, {'Content-Type': 'text/html'}, url, url)
+
+
+class test_similarity(unittest.TestCase):
+
+    def setUp(self):
+        self.rnd = random.Random(1)
+
+    def test_same_as_relative_distance(self):
+        strings = [ '', 'a', 'ab', 'abc' * 20, u'\xe1b\xe1', create_page(self.rnd, 500) ]
+        for _ in xrange(20):
+            strings.append( ''.join( self.rnd.choice('abc<>/ \x00\xff')
+                                     for _ in xrange(self.rnd.randint(1, 100)) ) )
+
+        for a in strings:
+            for b in strings:
+                self.assertEqual( similarity(a, b), relative_distance(a, b) )
+                self.assertEqual( similarity_ge(a, b, 0.6), relative_distance(a, b) >= 0.6 )
+
+    def test_response_profile(self):
+        response = create_response( 'abc' )
+        profile = response.getSimilarityProfile()
+        self.assertTrue( response.getSimilarityProfile() is profile )
+        self.assertEqual( similarity(response, 'abc'), 1.0 )
+
+        response.setBody( 'xyz' )
+        self.assertEqual( similarity(response, 'abc'), 0.0 )
+
+    def test_many_different_characters(self):
+        # CJK text, one count() for each character is quadratic
+        body = u''.join( unichr( self.rnd.randint(0x4e00, 0x4e00 + 5000) )
+                         for _ in xrange(300000) )
+        start = time.time()
+        histogram = char_histogram( body )
+        elapsed = time.time() - start
+
+        self.assertEqual( sum( histogram.values() ), len(body) )
+        self.assertEqual( len(histogram), len(set(body)) )
+        self.assertEqual( histogram[ body[0] ], body.count( body[0] ) )
+        print '\nchar_histogram() of %s CJK characters: %.3fs' % (len(body), elapsed)
+
+    def test_best_match(self):
+        body = create_page(self.rnd, 2000)
+        candidates = [ create_page(self.rnd, size) for size in (100, 1000, 2000, 4000) ]
+        candidates.append( body[:1500] )
+
+        ratios = [ relative_distance(body, c) for c in candidates ]
+        best, ratio = best_match( body, candidates )
+        self.assertEqual( ratio, max(ratios) )
+        self.assertTrue( best is candidates[ ratios.index(max(ratios)) ] )
+
+        self.assertEqual( best_match( body, candidates, 1.0 ), (None, 0.0) )
+        self.assertEqual( best_match( body, [] ), (None, 0.0) )
+
+    def test_benchmark(self):
+        '''
+        Compare one page with some others, like the 404 detection and the
+        plugins that compare a response with the original one. The profiles
+        are calculated once for each response.
+        '''
+        msg = []
+        for size, amount in ( (5 * 1024, 20), (100 * 1024, 5), (1024 * 1024, 3) ):
+            pages = [ create_page(self.rnd, size) for _ in xrange(amount + 1) ]
+
+            start = time.time()
+            expected = [ relative_distance( pages[0], page ) for page in pages[1:] ]
+            difflib_cost = time.time() - start
+
+            responses = [ create_response(page) for page in pages ]
+            start = time.time()
+            ratios = [ similarity( responses[0], response ) for response in responses[1:] ]
+            best, ratio = best_match( responses[0], responses[1:] )
+            profile_cost = time.time() - start
+
+            self.assertEqual( ratios, expected )
+            self.assertEqual( ratio, max(expected) )
+            msg.append( '%sKB: difflib %.3fs, profiles %.3fs' % (size / 1024,
+                                                                 difflib_cost,
+                                                                 profile_cost) )
+        print '\n' + '\n'.join( msg )
+
+
+if __name__ == '__main__':
+    unittest.main()
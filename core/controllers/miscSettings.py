@@ -82,6 +82,7 @@ class miscSettings(configurable):
             cf.cf.save('demo', False )
             cf.cf.save('nonTargets', [] )
             cf.cf.save('exportFuzzableRequests', '')
+            cf.cf.save('historyIndexBodies', False )
     
     def getOptions( self ):
         '''
@@ -154,6 +155,12 @@ class miscSettings(configurable):
         h12 = 'Sometimes it\'s a good idea to ignore some URLs and test them manually'
         o12 = option('nonTargets', cf.cf.getData('nonTargets'), d12, 'list', tabid='Misc settings')
         
+        d16 = 'Add the response bodies to the full-text index of the HTTP history'
+        h16 = 'The URLs, tags and headers are always indexed. Indexing the (text) bodies'
+        h16 += ' allows searching them from the GUI, but makes the session database larger.'
+        o16 = option('historyIndexBodies', cf.cf.getData('historyIndexBodies'), d16, 'boolean',
+                            help=h16, tabid='Misc settings')
+        
         d13 = 'Export all discovered fuzzable requests to the given file (CSV)'
         o13 = option('exportFuzzableRequests', cf.cf.getData('exportFuzzableRequests'), d13,
                             'string', tabid='Export fuzzable Requests')
@@ -178,6 +185,7 @@ class miscSettings(configurable):
         ol.add(o13)
         ol.add(o14)
         ol.add(o15)
+        ol.add(o16)
         return ol
     
     def getDesc( self ):
@@ -209,6 +217,7 @@ class miscSettings(configurable):
         cf.cf.save('interface', optionsMap['interface'].getValue() )
         cf.cf.save('localAddress', optionsMap['localAddress'].getValue() )
         cf.cf.save('demo', optionsMap['demo'].getValue()  )
+        cf.cf.save('historyIndexBodies', optionsMap['historyIndexBodies'].getValue() )
         
         url_list = []
         for url_str in optionsMap['nonTargets'].getValue():
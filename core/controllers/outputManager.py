@@ -20,18 +20,41 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 '''
 
+from __future__ import with_statement
+
+import atexit
 import os
+import sys
+import Queue
+import threading
+import traceback
 
 from core.controllers.misc.factory import factory
 # severity constants for vuln messages
 import core.data.constants.severity as severity
 
+# The maximum amount of messages that are waiting to be sent to the output
+# plugins, when it's reached the callers wait for the dispatcher thread.
+OUTPUT_QUEUE_SIZE = 5000
+
+# The message levels that can be checked with isEnabled()
+LEVELS = ('debug', 'information', 'error', 'vulnerability', 'console')
+
 
 class outputManager:
     '''
     This class manages output. 
     It has a list of output plugins and sends the events to every plugin on that list.
     
+    The messages are sent to the plugins by a dispatcher thread, the callers
+    only put them in a bounded queue. The messages can have arguments, which
+    are formatted by the dispatcher:
+    
+        om.out.debug('Sending %s to %s', method, url)
+    
+    and the levels that no plugin wants (debug, if no plugin is verbose) are
+    discarded before that, see isEnabled().
+    
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
     
@@ -40,7 +63,116 @@ class outputManager:
         self._outputPlugins = []
         self._pluginsOptions = {}
         self._echo = True
+        
+        # level -> True if at least one output plugin wants the messages
+        self._enabled = {}
+        
+        self._queue = Queue.Queue( OUTPUT_QUEUE_SIZE )
+        self._dispatcher = None
+        self._dispatcher_lock = threading.Lock()
 
+    def isEnabled(self, level):
+        '''
+        @parameter level: One of LEVELS.
+        @return: True if the messages with this level are sent to at least one
+        output plugin. Callers can use this to avoid building messages that
+        nobody will read:
+        
+            if om.out.isEnabled('debug'):
+                om.out.debug( expensive_dump() )
+        '''
+        enabled = self._enabled.get( level )
+        if enabled is None:
+            enabled = self._echo and \
+                      any( p.isEnabled( level ) for p in self._outputPluginList )
+            self._enabled[ level ] = enabled
+        return enabled
+    
+    def _levels_changed(self):
+        '''
+        Called when the plugins or their configuration changed.
+        '''
+        self._enabled = {}
+    
+    def _send(self, method_name, message, args, newLine, kwds=None):
+        '''
+        Put the message in the queue for the dispatcher thread, start it if
+        needed. The messages that are sent from the dispatcher thread (by an
+        output plugin) are sent right away, so it never waits for itself.
+        '''
+        item = (method_name, message, args, newLine, kwds)
+        
+        if threading.currentThread() is self._dispatcher:
+            self._dispatch( item )
+            return
+        
+        if self._dispatcher is None:
+            with self._dispatcher_lock:
+                if self._dispatcher is None:
+                    dispatcher = threading.Thread( target=self._dispatch_loop,
+                                                   name='outputManager' )
+                    dispatcher.setDaemon( True )
+                    dispatcher.start()
+                    self._dispatcher = dispatcher
+        
+        self._queue.put( item )
+    
+    def _dispatch_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item[0] is None:
+                    # flush() is waiting for the messages before this one
+                    item[1].set()
+                else:
+                    self._dispatch( item )
+            except:
+                # The output can't be sent to the output plugins, and this
+                # thread must keep running
+                traceback.print_exc( file=sys.stderr )
+    
+    def _dispatch(self, item):
+        method_name, message, args, newLine, kwds = item
+        
+        if args:
+            try:
+                message = message % args
+            except Exception:
+                message = '%s %r' % (message, args)
+        
+        if method_name != 'logHttp':
+            if isinstance( message, unicode ):
+                message = message.encode('utf-8')
+            else:
+                message = unicode( str(message), 'utf-8', errors='replace').encode('utf-8')
+        
+        for oPlugin in self._outputPluginList:
+            method = getattr( oPlugin, method_name )
+            try:
+                if method_name == 'logHttp':
+                    method( *message )
+                elif kwds:
+                    method( message, newLine, **kwds )
+                else:
+                    method( message, newLine )
+            except Exception:
+                traceback.print_exc( file=sys.stderr )
+    
+    def flush(self, timeout=None):
+        '''
+        Wait until the messages that were sent before this call are sent to
+        the output plugins.
+        
+        @parameter timeout: The maximum amount of seconds to wait.
+        '''
+        if self._dispatcher is None or \
+           threading.currentThread() is self._dispatcher:
+            return
+        
+        done = threading.Event()
+        self._queue.put( (None, done, None, None, None) )
+        done.wait( timeout )
+    
     def _addOutputPlugin(self, OutputPluginName ):
         '''
         Takes a string with the OutputPluginName, creates the object and adds it to the OutputPluginName
@@ -69,8 +201,11 @@ class outputManager:
 
                     # Append the plugin to the list
                 self._outputPluginList.append( plugin )
+        
+        self._levels_changed()
     
     def endOutputPlugins( self ):
+        self.flush()
         for oPlugin in self._outputPluginList:
             oPlugin.end()
             
@@ -87,53 +222,38 @@ class outputManager:
             self._pluginsOptions = {'audit':{},'grep':{},'bruteforce':{},'discovery':{},\
             'evasion':{}, 'mangle':{}, 'output':{}, 'attack':{}}
         '''
+        self.flush()
         for oPlugin in self._outputPluginList:
             oPlugin.logEnabledPlugins(enabledPluginsDict, pluginOptionsDict)
     
-    def debug(self, message, newLine = True ):
+    def debug(self, message, *args, **kwds ):
         '''
         Sends a debug message to every output plugin on the list.
         
-        @parameter message: Message that is sent.
+        @parameter message: Message that is sent, if there are args it's
+        formatted with message % args only if some plugin wants debug messages.
+        @parameter newLine: Keyword argument, defaults to True.
         '''
-        if self._echo:
-            try:
-                message = unicode( message, 'utf-8', errors='replace').encode('utf-8')
-            except:
-                pass
-            else:
-                for oPlugin in self._outputPluginList:
-                    oPlugin.debug( message, newLine )
+        if self.isEnabled('debug'):
+            self._send( 'debug', message, args, kwds.get('newLine', True) )
     
-    def information(self, message, newLine = True ):
+    def information(self, message, *args, **kwds ):
         '''
         Sends a informational message to every output plugin on the list.
         
-        @parameter message: Message that is sent.
+        @parameter message: Message that is sent, see debug().
         '''
-        if self._echo:
-            try:
-                message = unicode( message, 'utf-8', errors='replace').encode('utf-8')
-            except:
-                pass
-            else:
-                for oPlugin in self._outputPluginList:
-                    oPlugin.information( message, newLine )
+        if self.isEnabled('information'):
+            self._send( 'information', message, args, kwds.get('newLine', True) )
             
-    def error(self, message, newLine = True ):
+    def error(self, message, *args, **kwds ):
         '''
         Sends an error message to every output plugin on the list.
         
-        @parameter message: Message that is sent.
+        @parameter message: Message that is sent, see debug().
         '''
-        if self._echo:
-            try:
-                message = unicode( message, 'utf-8', errors='replace').encode('utf-8')
-            except:
-                pass
-            else:
-                for oPlugin in self._outputPluginList:
-                    oPlugin.error( message, newLine )
+        if self.isEnabled('error'):
+            self._send( 'error', message, args, kwds.get('newLine', True) )
 
     def logHttp( self, request, response ):
         '''
@@ -142,8 +262,8 @@ class outputManager:
         @parameter request: A fuzzable request object
         @parameter response: A httpResponse object
         '''
-        for oPlugin in self._outputPluginList:
-            oPlugin.logHttp( request, response )
+        if self._outputPluginList:
+            self._send( 'logHttp', (request, response), None, None )
             
     def vulnerability(self, message, newLine = True, severity=severity.MEDIUM ):
         '''
@@ -151,44 +271,40 @@ class outputManager:
         
         @parameter message: Message that is sent.
         '''
-        if self._echo:
-            try:
-                message = unicode( message, 'utf-8', errors='replace').encode('utf-8')
-            except:
-                pass
-            else:
-                for oPlugin in self._outputPluginList:
-                    oPlugin.vulnerability( message, newLine, severity=severity )
+        if self.isEnabled('vulnerability'):
+            self._send( 'vulnerability', message, None, newLine,
+                        {'severity': severity} )
 
     def console( self, message, newLine = True ):
         '''
         This method is used by the w3af console to print messages to the outside.
+        
+        The console messages are part of the user interaction, this method
+        returns after they (and all the previous messages) were printed.
         '''
-        if self._echo:
-            try:
-                message = unicode( message, 'utf-8', errors='replace').encode('utf-8')
-            except:
-                pass
-            else:
-                for oPlugin in self._outputPluginList:
-                    oPlugin.console( message, newLine )
+        if self.isEnabled('console'):
+            self._send( 'console', message, None, newLine )
+            self.flush()
     
     def echo( self, onOff ):
         '''
         This method is used to enable/disable the output.
         '''
         self._echo = onOff
+        self._levels_changed()
 
     def setOutputPlugins( self, outputPlugins ):
         '''
         @parameter outputPlugins: A list with the names of Output Plugins that will be used.
         @return: No value is returned.
         '''     
+        self.flush()
         self._outputPluginList = []
         self._outputPlugins = outputPlugins
         
         for pluginName in self._outputPlugins:
             out._addOutputPlugin( pluginName )  
+        self._levels_changed()
         
         out.debug('Exiting setOutputPlugins()' )
     
@@ -203,12 +319,14 @@ class outputManager:
         @return: No value is returned.
         '''
         self._pluginsOptions[pluginName] = PluginsOptions
+        self._levels_changed()
     
     def getMessageCache(self):
         '''
         Used for the webUI.
         @return: returns a list containing messages in plugins caches, only if defined.
         '''
+        self.flush()
         res = []
         for oPlugin in self._outputPluginList:
             plugCache = oPlugin.getMessageCache()
@@ -216,3 +334,7 @@ class outputManager:
         return res
         
 out = outputManager()
+
+# Send the messages that are still in the queue before exiting, the dispatcher
+# is a daemon thread
+atexit.register( out.flush, 5 )
@@ -0,0 +1,144 @@
+'''
+test_outputManager.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import sys
+import threading
+import unittest
+from cStringIO import StringIO
+
+from core.controllers.outputManager import outputManager
+
+
+class fake_output(object):
+
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.messages = []
+        self.threads = set()
+
+    def isEnabled(self, level):
+        return level != 'debug' or self.verbose
+
+    def _save(self, level, message):
+        self.threads.add( threading.currentThread() )
+        self.messages.append( (level, message) )
+
+    def debug(self, message, newLine=True):
+        self._save( 'debug', message )
+
+    def information(self, message, newLine=True):
+        self._save( 'information', message )
+
+    def error(self, message, newLine=True):
+        self._save( 'error', message )
+
+    def vulnerability(self, message, newLine=True, severity=None):
+        self._save( 'vulnerability', (message, severity) )
+
+    def console(self, message, newLine=True):
+        self._save( 'console', message )
+
+
+class counting_str(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'counted'
+
+
+class test_outputManager(unittest.TestCase):
+
+    def setUp(self):
+        self.om = outputManager()
+        self.plugin = fake_output()
+        self.om._outputPluginList.append( self.plugin )
+
+    def test_order_and_dispatcher(self):
+        for i in xrange(100):
+            self.om.debug('message %s', i)
+        self.om.vulnerability('vuln', severity='High')
+        self.om.flush()
+
+        expected = [ ('debug', 'message %s' % i) for i in xrange(100) ]
+        expected.append( ('vulnerability', ('vuln', 'High')) )
+        self.assertEqual( self.plugin.messages, expected )
+        self.assertEqual( self.plugin.threads, set([self.om._dispatcher]) )
+
+    def test_lazy_format(self):
+        arg = counting_str()
+        self.om.debug('%% is not formatted without arguments')
+        self.om.debug('Argument: %s', arg)
+        self.om.flush()
+        self.assertEqual( [ m for _, m in self.plugin.messages ],
+                          ['%% is not formatted without arguments', 'Argument: counted'] )
+        self.assertEqual( arg.calls, 1 )
+
+    def test_disabled_level(self):
+        self.plugin.verbose = False
+        self.om._levels_changed()
+        self.assertFalse( self.om.isEnabled('debug') )
+        self.assertTrue( self.om.isEnabled('information') )
+
+        arg = counting_str()
+        self.om.debug('Argument: %s', arg)
+        self.om.flush()
+        self.assertEqual( arg.calls, 0 )
+        self.assertEqual( self.plugin.messages, [] )
+        self.assertTrue( self.om._dispatcher is None )
+
+        self.om.echo( False )
+        self.assertFalse( self.om.isEnabled('information') )
+
+    def test_console_is_synchronous(self):
+        self.om.information('info')
+        self.om.console('prompt')
+        self.assertEqual( self.plugin.messages, [('information', 'info'), ('console', 'prompt')] )
+
+    def test_plugin_errors(self):
+        om = self.om
+        class broken_output(fake_output):
+            def debug(self, message, newLine=True):
+                # Output from the dispatcher thread is sent right away
+                om.information('from the plugin')
+                raise ValueError('broken')
+        self.om._outputPluginList.insert( 0, broken_output() )
+
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.om.debug('first')
+            self.om.debug('second')
+            self.om.flush()
+            errors = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+
+        self.assertEqual( errors.count('ValueError: broken'), 2 )
+        self.assertEqual( self.plugin.messages, [('information', 'from the plugin'),
+                                                 ('debug', 'first'),
+                                                 ('information', 'from the plugin'),
+                                                 ('debug', 'second')] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,306 @@
+'''
+task_scheduler.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import Queue
+import sys
+import threading
+import time
+
+from collections import deque
+
+from core.controllers.threads.threadManager import threadManagerObj as tm
+
+
+class task(object):
+    '''
+    A unit of work for the task_scheduler.
+    '''
+    __slots__ = ('func', 'args', 'tags', 'group')
+
+    def __init__(self, func, args, tags):
+        self.func = func
+        self.args = args
+        self.tags = tags
+        # All the tasks with the same tags are queued together
+        self.group = tuple( sorted( tags.items() ) )
+
+    def __repr__(self):
+        return '<task %s%s>' % (self.func.__name__, self.group)
+
+
+class task_scheduler(object):
+    '''
+    Runs tasks on the framework thread pool as soon as they are added, without
+    waiting for a whole "generation" of tasks to finish.
+
+    Each task is tagged (for example with the plugin name and the target
+    domain) and the scheduler makes sure that:
+        - No more than max_in_flight tasks are running at the same time.
+        - No more than limits[ tag_name ] tasks with the same tag value are
+          running at the same time.
+
+    Tasks with the same tags are started in FIFO order, and the different
+    groups of tags are served in a round robin fashion, so one slow plugin
+    doesn't stop the others from running.
+
+    When a task finishes, the worker thread that ran it starts the next
+    pending task right away; only the results are handed to the thread that
+    called join().
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, max_in_flight=None, limits=None):
+        '''
+        @parameter max_in_flight: The maximum amount of tasks to run at the
+        same time. None means "as many as the thread pool can handle".
+        @parameter limits: A dict with tag names as keys and the maximum
+        amount of running tasks with the same tag value as values.
+        '''
+        workers = 0
+        if tm.getMaxThreads():
+            workers = tm.getWorkerCount()
+
+        if workers < 2:
+            # Threading is disabled, run the tasks in the thread that calls
+            # join(), one at the time.
+            self._inline = True
+            self._max_in_flight = 1
+        else:
+            # Tasks usually start more work in the thread pool (HTTP requests
+            # for example) and wait for it with tm.join(), so I need to leave
+            # some workers free for that work; if I don't, dead-locks occur.
+            self._inline = False
+            self._max_in_flight = min( max_in_flight or workers, workers / 2 )
+
+        self._limits = limits or {}
+
+        # group -> deque with the pending tasks for that group
+        self._queues = {}
+        # The groups that have pending tasks, in round robin order
+        self._groups = deque()
+        # (tag_name, tag_value) -> amount of running tasks
+        self._running = {}
+        self._in_flight = 0
+        self._pending = 0
+        self._stopped = False
+        self._lock = threading.RLock()
+        # Notified when a task finishes
+        self._finished = threading.Condition( self._lock )
+
+        # The finished tasks are put here by the worker threads
+        self._done = Queue.Queue()
+
+    def add_task(self, func, args=(), **tags):
+        '''
+        Queue func(*args) to be run. The keyword arguments are the tags for
+        the task.
+
+        @return: True if the task was queued, False if the scheduler was
+        stopped.
+        '''
+        new_task = task( func, args, tags )
+
+        with self._lock:
+            if self._stopped:
+                return False
+
+            queue = self._queues.get( new_task.group )
+            if queue is None:
+                queue = self._queues[ new_task.group ] = deque()
+                self._groups.append( new_task.group )
+
+            queue.append( new_task )
+            self._pending += 1
+
+            if not self._inline:
+                self._start_tasks()
+
+        return True
+
+    def remove_tasks(self, tag_name, tag_value):
+        '''
+        Remove all the pending tasks that have tag_name == tag_value. Running
+        tasks are not affected.
+        '''
+        item = (tag_name, tag_value)
+        with self._lock:
+            for group in self._queues.keys():
+                if item in group:
+                    self._pending -= len( self._queues[ group ] )
+                    del self._queues[ group ]
+                    self._groups.remove( group )
+
+    def stop(self):
+        '''
+        Remove all pending tasks and don't accept new ones. The running tasks
+        will finish and are still reported to the join() callback.
+        '''
+        with self._lock:
+            self._stopped = True
+            self._queues.clear()
+            self._groups.clear()
+            self._pending = 0
+
+    def running(self, tag_name, tag_value):
+        '''
+        @return: The amount of running tasks with tag_name == tag_value
+        '''
+        with self._lock:
+            return self._running.get( (tag_name, tag_value), 0 )
+
+    def pending(self):
+        return self._pending
+
+    def wait_running(self, timeout=None):
+        '''
+        Wait for the running tasks to finish, without starting the pending
+        ones. Their results are not reported to the join() callback. It's
+        used after join() was interrupted, which stops the scheduler.
+
+        @parameter timeout: The maximum amount of seconds to wait, None to
+        wait until they finish.
+        @return: True if no task is running.
+        '''
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self._lock:
+            while self._in_flight:
+                if timeout is None:
+                    self._finished.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._finished.wait( remaining )
+            return not self._in_flight
+
+    def in_flight(self):
+        return self._in_flight
+
+    def join(self, callback=None):
+        '''
+        Start the queued tasks and wait for all of them to finish.
+
+        @parameter callback: A function that's called (in this thread) with
+        the finished task, its result and the sys.exc_info() tuple if the task
+        raised an exception (None if it didn't). The callback may add new
+        tasks to the scheduler.
+        '''
+        try:
+            while True:
+                with self._lock:
+                    self._start_tasks()
+
+                    if not self._in_flight and self._done.empty():
+                        break
+
+                try:
+                    # Don't block forever, we want to handle Ctrl+C
+                    finished, result, exc_info = self._done.get( timeout=0.5 )
+                except Queue.Empty:
+                    continue
+
+                if not self._inline:
+                    tm.poll( self )
+
+                if callback is not None:
+                    callback( finished, result, exc_info )
+        except:
+            # Don't wait for the running tasks, the caller wants to stop
+            self.stop()
+            raise
+        else:
+            if not self._inline:
+                tm.join( self )
+
+    def _start_tasks(self):
+        '''
+        Start as many tasks as the limits allow. Must be called with the lock
+        acquired.
+        '''
+        skipped = 0
+        while self._groups and self._in_flight < self._max_in_flight \
+        and skipped < len( self._groups ):
+
+            group = self._groups[0]
+            self._groups.rotate( -1 )
+
+            if not self._can_start( group ):
+                skipped += 1
+                continue
+
+            skipped = 0
+            queue = self._queues[ group ]
+            next_task = queue.popleft()
+            if not queue:
+                # After the rotate() the group is the last one
+                del self._queues[ group ]
+                self._groups.pop()
+            self._pending -= 1
+
+            self._task_started( next_task )
+            if self._inline:
+                self._execute( next_task )
+            else:
+                tm.startFunction( target=self._execute, args=(next_task,),
+                                  ownerObj=self, restrict=False )
+
+    def _can_start(self, group):
+        for item in group:
+            limit = self._limits.get( item[0] )
+            if limit is not None and self._running.get( item, 0 ) >= limit:
+                return False
+        return True
+
+    def _task_started(self, started):
+        self._in_flight += 1
+        for item in started.group:
+            self._running[ item ] = self._running.get( item, 0 ) + 1
+
+    def _task_finished(self, finished):
+        self._in_flight -= 1
+        for item in finished.group:
+            self._running[ item ] -= 1
+            if not self._running[ item ]:
+                del self._running[ item ]
+
+    def _execute(self, to_run):
+        '''
+        Run the task, let the thread that called join() know about it and
+        start the next pending tasks.
+        '''
+        try:
+            result = to_run.func( *to_run.args )
+        except Exception:
+            done = (to_run, None, sys.exc_info())
+        else:
+            done = (to_run, result, None)
+
+        with self._lock:
+            # The task isn't running anymore when the callback gets it
+            self._task_finished( to_run )
+            self._done.put( done )
+            self._finished.notifyAll()
+            if not self._inline:
+                self._start_tasks()
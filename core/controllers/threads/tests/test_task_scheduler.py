@@ -0,0 +1,205 @@
+'''
+test_task_scheduler.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+from __future__ import with_statement
+
+import threading
+import time
+import unittest
+
+from core.controllers.threads.task_scheduler import task_scheduler
+from core.controllers.threads.threadManager import threadManagerObj as tm
+import core.data.kb.config as cf
+
+
+class concurrency_counter(object):
+    '''
+    Keeps track of the maximum amount of concurrent calls to run(), per key.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = {}
+        self.maximum = {}
+        self.calls = []
+
+    def run(self, key, value, sleep=0.01):
+        with self.lock:
+            self.current[key] = self.current.get(key, 0) + 1
+            self.maximum[key] = max(self.maximum.get(key, 0), self.current[key])
+            self.calls.append( (key, value) )
+        time.sleep(sleep)
+        with self.lock:
+            self.current[key] -= 1
+        return value
+
+
+class test_task_scheduler(unittest.TestCase):
+
+    def setUp(self):
+        cf.cf.save('maxThreads', 10)
+        if not tm.getMaxThreads():
+            # Another test started the pool before maxThreads was set
+            tm.setMaxThreads( 10 )
+        self.assertTrue( tm.getMaxThreads() )
+        self.assertTrue( tm.getWorkerCount() >= 4 )
+
+    def test_all_tasks_run(self):
+        counter = concurrency_counter()
+        results = []
+        ts = task_scheduler()
+
+        for i in xrange(20):
+            ts.add_task( counter.run, ('a', i), plugin='a' )
+
+        ts.join( lambda t, res, exc: results.append(res) )
+
+        self.assertEqual( sorted(results), range(20) )
+        self.assertEqual( ts.in_flight(), 0 )
+        self.assertEqual( ts.pending(), 0 )
+
+    def test_limits(self):
+        counter = concurrency_counter()
+        ts = task_scheduler( limits={'plugin': 1} )
+
+        for i in xrange(10):
+            for key in ('a', 'b', 'c'):
+                ts.add_task( counter.run, (key, i), plugin=key )
+
+        ts.join()
+
+        self.assertEqual( len(counter.calls), 30 )
+        for key in ('a', 'b', 'c'):
+            self.assertEqual( counter.maximum[key], 1 )
+            # FIFO order for tasks with the same tags
+            values = [ v for k, v in counter.calls if k == key ]
+            self.assertEqual( values, range(10) )
+
+    def test_slow_plugin_does_not_block(self):
+        counter = concurrency_counter()
+        ts = task_scheduler( limits={'plugin': 1} )
+        finished = []
+
+        ts.add_task( counter.run, ('slow', 0, 0.5), plugin='slow' )
+        ts.add_task( counter.run, ('slow', 1, 0.5), plugin='slow' )
+        for i in xrange(5):
+            ts.add_task( counter.run, ('fast', i), plugin='fast' )
+
+        ts.join( lambda t, res, exc: finished.append(t.tags['plugin']) )
+
+        # All the fast tasks finished before the second slow one
+        self.assertEqual( finished[-1], 'slow' )
+        self.assertEqual( finished.count('fast'), 5 )
+        self.assertTrue( finished.index('slow') > finished.index('fast') )
+
+    def test_callback_adds_tasks(self):
+        ts = task_scheduler()
+        results = []
+
+        def callback(t, res, exc):
+            results.append(res)
+            if res < 10:
+                ts.add_task( lambda x: x + 1, (res,) )
+
+        ts.add_task( lambda x: x + 1, (0,) )
+        ts.join( callback )
+
+        self.assertEqual( results, range(1, 11) )
+
+    def test_finished_task_not_running(self):
+        running = []
+
+        for i in xrange(50):
+            ts = task_scheduler()
+            ts.add_task( lambda: None, plugin='a' )
+            ts.join( lambda t, res, exc: running.append( ts.running('plugin', 'a') ) )
+
+        # The callback never sees the task that finished as running
+        self.assertEqual( running, [0] * 50 )
+
+    def test_wait_running_after_interrupt(self):
+        ts = task_scheduler()
+        gate = threading.Event()
+        finished = []
+
+        def slow():
+            gate.wait()
+            finished.append( 'slow' )
+
+        def callback(t, res, exc):
+            raise KeyboardInterrupt()
+
+        ts.add_task( lambda: None, plugin='fast' )
+        ts.add_task( slow, plugin='slow' )
+        self.assertRaises( KeyboardInterrupt, ts.join, callback )
+
+        # The slow task is still running after join() was interrupted
+        self.assertFalse( ts.wait_running( 0.1 ) )
+        gate.set()
+        self.assertTrue( ts.wait_running( 5 ) )
+        self.assertEqual( finished, ['slow'] )
+        self.assertEqual( ts.in_flight(), 0 )
+
+    def test_exceptions(self):
+        ts = task_scheduler()
+        errors = []
+
+        def fails():
+            raise ValueError('foo')
+
+        ts.add_task( fails )
+        ts.join( lambda t, res, exc: errors.append(exc) )
+
+        self.assertEqual( len(errors), 1 )
+        self.assertEqual( errors[0][0], ValueError )
+
+    def test_stop_and_remove(self):
+        ts = task_scheduler( limits={'plugin': 1} )
+        results = []
+        gate = threading.Event()
+
+        def task(plugin, i):
+            gate.wait()
+            return (plugin, i)
+
+        def callback(t, res, exc):
+            results.append(res)
+            ts.stop()
+
+        for i in xrange(5):
+            ts.add_task( task, ('a', i), plugin='a' )
+            ts.add_task( task, ('b', i), plugin='b' )
+
+        # The first task of each plugin is already running
+        self.assertEqual( ts.in_flight(), 2 )
+        self.assertEqual( ts.pending(), 8 )
+        ts.remove_tasks( 'plugin', 'b' )
+        self.assertEqual( ts.pending(), 4 )
+
+        gate.set()
+        ts.join( callback )
+
+        self.assertTrue( ('a', 0) in results )
+        self.assertTrue( ('b', 0) in results )
+        self.assertFalse( [r for r in results if r[0] == 'b' and r[1]] )
+        self.assertEqual( ts.pending(), 0 )
+        self.assertFalse( ts.add_task( lambda: None ) )
+
+if __name__ == '__main__':
+    unittest.main()
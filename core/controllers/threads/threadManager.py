@@ -20,7 +20,8 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 '''
 import core.controllers.outputManager as om
-from core.controllers.threads.threadpool import ThreadPool, WorkRequest
+from core.controllers.threads.threadpool import ThreadPool, WorkRequest, \
+    NoResultsPending
 import core.data.kb.config as cf
 
 
@@ -76,9 +77,17 @@ class threadManager(object):
         if not self._initialized:
             self._initPool()
         return self._maxThreads
+    
+    def getWorkerCount(self):
+        '''
+        @return: The amount of worker threads in the thread pool. Please note
+        that the pool is shared, so this might be different from the value
+        returned by getMaxThreads().
+        '''
+        return len(self._threadPool.workers)
         
     def startDaemon(self, threadObj):
-        om.out.debug('Starting daemon thread: ' + str(threadObj) )
+        om.out.debug('Starting daemon thread: %s', threadObj )
         threadObj.setDaemon(1)
         threadObj.start()
         self._daemonThreads.append( threadObj )
@@ -112,11 +121,20 @@ class threadManager(object):
             # Assign a job to a thread in the thread pool
             wr = WorkRequest( target, args=args, kwds=kwds, ownerObj=ownerObj )
             self._threadPool.putRequest( wr )
-            msg = '[thread manager] Successfully added function to threadpool. Work queue size: '
-            msg += str(self._threadPool.requestsQueue.qsize())
-            om.out.debug( msg )
+            om.out.debug('[thread manager] Successfully added function to threadpool.'
+                         ' Work queue size: %s', self._threadPool.requestsQueue.qsize() )
             
     def join( self, ownerObj=None, joinAll=False ):
         self._threadPool.wait( ownerObj, joinAll )
+    
+    def poll( self, ownerObj=None ):
+        '''
+        Process the results of the work requests owned by ownerObj that are
+        ready, without waiting for the ones that are still running.
+        '''
+        try:
+            self._threadPool.poll( block=False, ownerObj=ownerObj )
+        except NoResultsPending:
+            pass
 
 threadManagerObj = threadManager()
@@ -35,6 +35,7 @@ __version__ = "1.1"
 __date__ = "2005-07-19"
 
 import threading, Queue
+from collections import deque
 import core.controllers.outputManager as om
 import sys
 import traceback
@@ -60,8 +61,9 @@ class WorkerThread(threading.Thread):
     def __init__(self, requestsQueue, resultsQueue, **kwds):
         """Set up thread in damonic mode and start it immediatedly.
 
-        requestsQueue and resultQueue are instances of Queue.Queue passed
-        by the ThreadPool class when it creates a new worker thread.
+        requestsQueue is an instance of Queue.Queue and resultsQueue is an
+        object with a put() method (the ThreadPool's results store), both are
+        passed by the ThreadPool class when it creates a new worker thread.
         """
         threading.Thread.__init__(self, **kwds)
         self.setDaemon(1)
@@ -108,9 +110,10 @@ class WorkerThread(threading.Thread):
                 self.resultQueue.put( (request, request.callable(*request.args, **request.kwds)) )
             except Exception, e:
                 om.out.debug('The thread: %s raised an exception while running'
-                             ' the request: %s' % (self, request.callable))
-                om.out.debug('Exception: %s' % e)
-                om.out.debug('Traceback: %s' % traceback.format_exc())
+                             ' the request: %s', self, request.callable)
+                om.out.debug('Exception: %s', e)
+                if om.out.isEnabled('debug'):
+                    om.out.debug('Traceback: %s', traceback.format_exc())
                 self.resultQueue.put((request, sys.exc_info()))
 
         
@@ -159,6 +162,84 @@ class WorkRequest(object):
         self.ownerObj = ownerObj
 
 
+class ResultsStore(object):
+    """Stores the results of the work requests, grouped by owner object.
+
+    Each thread that joins the work requests of an owner object only sees the
+    results for that owner, this avoids having many threads taking (and
+    putting back) results which they don't own from a shared Queue.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        # id(ownerObj) -> deque of (request, result) tuples
+        self._results = {}
+        # id(ownerObj) -> amount of work requests which weren't polled yet
+        self._pending = {}
+        self._total_pending = 0
+
+    def add_pending(self, request):
+        """Called when a new work request is put in the requests queue."""
+        owner_id = id(request.ownerObj)
+        self.cond.acquire()
+        try:
+            self._pending[owner_id] = self._pending.get(owner_id, 0) + 1
+            self._total_pending += 1
+        finally:
+            self.cond.release()
+
+    def remove_pending(self, request):
+        """Called when the result of a work request has been processed."""
+        owner_id = id(request.ownerObj)
+        self.cond.acquire()
+        try:
+            self._pending[owner_id] -= 1
+            if not self._pending[owner_id]:
+                del self._pending[owner_id]
+            self._total_pending -= 1
+        finally:
+            self.cond.release()
+
+    def pending(self, ownerObj=None, joinAll=False):
+        """@return: The amount of work requests which weren't polled yet."""
+        if joinAll:
+            return self._total_pending
+        return self._pending.get(id(ownerObj), 0)
+
+    def put(self, request_result):
+        """Called by the worker threads to store a result."""
+        owner_id = id(request_result[0].ownerObj)
+        self.cond.acquire()
+        try:
+            self._results.setdefault(owner_id, deque()).append(request_result)
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+
+    def pop(self, ownerObj=None, joinAll=False):
+        """@return: A (request, result) tuple, or None if there are no results
+        ready for ownerObj. Must be called with self.cond acquired."""
+        if joinAll:
+            for owner_id in self._results.keys():
+                return self._pop(owner_id)
+            return None
+
+        owner_id = id(ownerObj)
+        if owner_id in self._results:
+            return self._pop(owner_id)
+        return None
+
+    def _pop(self, owner_id):
+        results = self._results[owner_id]
+        request_result = results.popleft()
+        if not results:
+            del self._results[owner_id]
+        return request_result
+
+    def qsize(self):
+        return sum([len(r) for r in self._results.values()])
+
+
 class ThreadPoolImplementation(object):
     """A thread pool, distributing work requests and collecting results.
 
@@ -185,7 +266,7 @@ class ThreadPoolImplementation(object):
         #   In most cases, having a q_size of 150 is enough to avoid this situation, and at the same
         #   time save some memory. The q_size is set in threadManager.py.
         self.requestsQueue = Queue.Queue()
-        self.resultsQueue = Queue.Queue()
+        self.resultsQueue = ResultsStore()
         if DEBUG:
             print '[ThreadPool][',id(self),'] Init with queue',  id(self.requestsQueue)
         self.workers = []
@@ -208,20 +289,18 @@ class ThreadPoolImplementation(object):
     def putRequest(self, request):
         """Put work request into work queue and save for later."""
 
-        self.requestsQueue.put(request)
         self.workRequests[request.requestID] = request
+        self.resultsQueue.add_pending(request)
+        self.requestsQueue.put(request)
 
     def poll(self, block=False, ownerObj=None, joinAll=False):
         """Process any new results in the queue."""
+        results = self.resultsQueue
         while 1:
+            results.cond.acquire()
             try:
                 # still results pending?
-                if not joinAll:
-                    owned_work_reqs_len = \
-                            len([wr for wr in self.workRequests.values() \
-                                 if id(wr.ownerObj) == id(ownerObj)])
-                else:
-                    owned_work_reqs_len = len(self.workRequests)
+                owned_work_reqs_len = results.pending(ownerObj, joinAll)
 
                 if not owned_work_reqs_len:
                     raise NoResultsPending
@@ -232,37 +311,42 @@ class ThreadPoolImplementation(object):
                     om.out.debug(msg)
                 
                 # Are there still workers to process remaining requests?
-                elif block and not self.workers:
+                if block and not self.workers:
                     raise NoWorkersAvailable
-                                
-                # Get back a new result from the queue where the workers put
+                
+                # Get back a new result from the store where the workers put
                 # their result.
-                request, result = self.resultsQueue.get(block=block, timeout=1)
-
-                if id(request.ownerObj) == id(ownerObj) or joinAll:
-                    try:
-                        # and hand them to the callback, if any
-                        if request.callback:
-                            request.callback(request, result)
-                        
-                        # Probably a sys.exc_info tuple of the form 
-                        # (type, value, traceback) 
-                        if type(result) is tuple and len(result) == 3:
-                            exc_type, exc_val, tb = result
-                            if type(exc_type) == types.TypeType and \
-                                issubclass(exc_type, Exception):
-                                # Raise here and handle it in the main thread
-                                raise exc_type, exc_val, tb
-                    finally:
-                        del self.workRequests[request.requestID]
-                else:
-                    self.resultsQueue.put((request, result))
+                request_result = results.pop(ownerObj, joinAll)
+                if request_result is None:
+                    if not block:
+                        if DEBUG:
+                            msg = 'There are no results ready, breaking.'
+                            om.out.debug( msg )
+                        break
+                    
+                    # Wait for a worker to notify us about a new result
+                    results.cond.wait(1)
+                    continue
+            finally:
+                results.cond.release()
+
+            request, result = request_result
+            try:
+                # and hand them to the callback, if any
+                if request.callback:
+                    request.callback(request, result)
                 
-            except Queue.Empty:
-                if DEBUG:
-                    msg = 'The results Queue is empty, breaking.'
-                    om.out.debug( msg )
-                break
+                # Probably a sys.exc_info tuple of the form 
+                # (type, value, traceback) 
+                if type(result) is tuple and len(result) == 3:
+                    exc_type, exc_val, tb = result
+                    if type(exc_type) == types.TypeType and \
+                        issubclass(exc_type, Exception):
+                        # Raise here and handle it in the main thread
+                        raise exc_type, exc_val, tb
+            finally:
+                del self.workRequests[request.requestID]
+                results.remove_pending(request)
 
     def wait(self, ownerObj=None, joinAll=False ):
         """Wait for results, blocking until all have arrived."""
@@ -32,6 +32,7 @@ from core.controllers.coreHelpers.export import export
 from core.controllers.coreHelpers.fingerprint_404 import \
     fingerprint_404_singleton
 from core.controllers.coreHelpers.progress import progress
+from core.controllers.coreHelpers.seen_requests import seen_requests
 from core.controllers.misc.factory import factory
 from core.controllers.misc.get_local_ip import get_local_ip
 from core.controllers.misc.homeDir import (create_home_dir,
@@ -40,6 +41,7 @@ from core.controllers.misc.number_generator import consecutive_number_generator
 from core.controllers.misc.temp_dir import (create_temp_dir, remove_temp_dir,
     TEMP_DIR)
 from core.controllers.targetSettings import targetSettings as targetSettings
+from core.controllers.threads.task_scheduler import task_scheduler
 from core.controllers.threads.threadManager import threadManagerObj as tm
 from core.controllers.w3afException import (w3afException, w3afRunOnce,
     w3afFileException, w3afMustStopException, w3afMustStopByUnknownReasonExc,
@@ -53,6 +55,23 @@ import core.controllers.outputManager as om
 import core.data.kb.config as cf
 import core.data.kb.knowledgeBase as kb
 
+# Discovery plugins keep state between calls to discover(), so by default each
+# plugin analyzes only one fuzzable request at the time (but different plugins
+# run concurrently).
+DISCOVERY_PLUGIN_CONCURRENCY = 1
+# When the discovery phase is interrupted, wait this many seconds for the
+# plugins that are running before calling their end() method
+DISCOVERY_STOP_TIMEOUT = 30
+
+# Audit plugins also keep state (compiled regular expressions, the original
+# response time, etc.) so each one audits one fuzzable request at the time.
+# To be polite, no more than AUDIT_HOST_CONCURRENCY fuzzable requests for the
+# same host are audited at the same time, and no more than AUDIT_MAX_IN_FLIGHT
+# in total (None means as many as the thread pool can handle).
+AUDIT_PLUGIN_CONCURRENCY = 1
+AUDIT_HOST_CONCURRENCY = 4
+AUDIT_MAX_IN_FLIGHT = None
+
 
 class w3afCore(object):
     '''
@@ -318,7 +337,13 @@ class w3afCore(object):
         
         # Create the queue that will be used in gtkUi
         old_list = kb.kb.getData( 'urls', 'urlList')
-        new_list = [ fr.getURL() for fr in fuzzableRequestList if fr.getURL() not in old_list ]
+        known_urls = set( old_list )
+        new_list = []
+        for fr in fuzzableRequestList:
+            url = fr.getURL()
+            if url not in known_urls:
+                known_urls.add( url )
+                new_list.append( url )
         
         # Update the Queue
         urlQueue = kb.kb.getData( 'urls', 'urlQueue' )
@@ -343,7 +368,7 @@ class w3afCore(object):
         '''
         go = True
         tmp_list = copy.deepcopy( self._fuzzableRequestList )
-        res = []
+        res = seen_requests()
         discovered_fr_list = []
         
         self._time_limit_reported = False
@@ -355,15 +380,13 @@ class w3afCore(object):
                 # Haven't found new credentials
                 go = False
                 for fr in discovered_fr_list:
-                    if fr not in res:
-                        res.append( fr )
+                    res.add( fr )
             else:
                 tmp = []
                 tmp.extend( discovered_fr_list )
                 tmp.extend( successfully_bruteforced )
                 for fr in tmp:
-                    if fr not in res:
-                        res.append( fr )
+                    res.add( fr )
                 
                 # So in the next "while go:" loop I can do a discovery
                 # using the new credentials I found
@@ -372,6 +395,7 @@ class w3afCore(object):
                 # Now I reconfigure the urllib to use the newly found credentials
                 self._reconfigureUrllib()
         
+        res = res.get_requests()
         self._updateURLsInKb( res )
         
         return res
@@ -647,6 +671,10 @@ class w3afCore(object):
                     om.out.information('The list of fuzzable requests is:')
                     for i in tmp_fr_list:
                         om.out.information( i )
+                    
+                    # The audit plugins may use the information that the
+                    # grep plugins found during the discovery phase
+                    self.uriOpener.join_grep()
                 
                     self._audit()
                     
@@ -673,6 +701,12 @@ class w3afCore(object):
         
         @return: None
         '''
+        # The next scan creates a new session database, close this one (which
+        # also stops its history writer thread)
+        session_db = kb.kb.getData('gtkOutput', 'db')
+        if session_db != []:
+            session_db.close()
+        
         # Clean all data that is stored in the kb
         kb.kb.cleanup()
 
@@ -723,11 +757,6 @@ class w3afCore(object):
         This method is called when the process ends normally or by an error.
         '''
         try:
-            # End the xUrllib (clear the cache)
-            self.uriOpener.end()
-            # Create a new one, so it can be used by exploit plugins.
-            self.uriOpener = xUrllib()
-            
             # Silently ignore. w3af is stopped
             try:
                 # Let the progress module know our status.
@@ -738,7 +767,16 @@ class w3afCore(object):
             if exc_inst:
                 om.out.debug(str(exc_inst))
             
+            # Wait for the threads that are still sending requests, their
+            # responses are added to the grep queue
             tm.join(joinAll=True)
+            
+            # End the xUrllib (analyze the responses in the grep queue, clear
+            # the cache)
+            self.uriOpener.end()
+            # Create a new one, so it can be used by exploit plugins.
+            self.uriOpener = xUrllib()
+            
             tm.stopAllDaemons()
             
             for plugin in self._plugins['grep']:
@@ -765,8 +803,8 @@ class w3afCore(object):
     
     def _discover( self, toWalk ):
         # Init some internal variables
-        self._alreadyWalked = toWalk
-        self._urls = []
+        self._alreadyWalked = seen_requests( toWalk )
+        self._discovery_plugins_to_end = []
         self._set_phase('discovery')
         
         result = []
@@ -775,7 +813,7 @@ class w3afCore(object):
         except KeyboardInterrupt:
             om.out.information('The user interrupted the discovery phase, '
                                'continuing with audit.')
-            result = self._alreadyWalked
+            result = self._alreadyWalked.get_requests()
         
         # Let the plugins know that they won't be used anymore
         self._endDiscovery()
@@ -784,9 +822,14 @@ class w3afCore(object):
     
     def _endDiscovery( self ):
         '''
-        Let the discovery plugins know that they won't be used anymore.
+        Let the discovery plugins know that they won't be used anymore,
+        including the run-once plugins that are still waiting for their
+        tasks to finish (the user interrupted the discovery phase).
         '''
-        for p in self._plugins['discovery']:
+        to_end = self._plugins['discovery'] + self._discovery_plugins_to_end
+        self._discovery_plugins_to_end = []
+        
+        for p in to_end:
             try:
                 p.end()
             except Exception, e:
@@ -803,132 +846,226 @@ class w3afCore(object):
         return diff / 60
     
     def _discoverWorker(self, toWalk):
+        '''
+        Feeds the fuzzable requests to all the discovery plugins as soon as
+        they are found, instead of waiting for each plugin to analyze a whole
+        "generation" of requests. The (plugin, fuzzable request) pairs are run
+        in the thread pool by a task_scheduler which runs at most
+        DISCOVERY_PLUGIN_CONCURRENCY calls to the same plugin at the same time.
+        
+        A plugin that depends on other discovery plugins only analyzes a
+        fuzzable request after its dependencies have analyzed it.
+        
+        @return: A list with all the fuzzable requests that were found.
+        '''
         om.out.debug('Called _discoverWorker()' )
         
-        while len( toWalk ):
-            
-            # Progress stuff, do this inside the while loop, because the toWalk variable changes
-            # in each loop
-            amount_of_tests = len(self._plugins['discovery']) * len(toWalk)
-            self.progress.set_total_amount( amount_of_tests )
-            
-            plugins_to_remove_list = []
-            fuzzableRequestList = []
-            
-            for plugin in self._plugins['discovery']:
-                
-                #
-                #   I use the self._time_limit_reported variable to break out of two loops
-                #
-                if self._time_limit_reported:
-                    break
-                    
-                for fr in toWalk:
-
-                    #
-                    #   Time exceeded?
-                    #
-                    if self.get_discovery_time() > cf.cf.getData('maxDiscoveryTime'):
-                        if not self._time_limit_reported:
-                            #   I use the self._time_limit_reported variable to break out of two loops
-                            self._time_limit_reported = True
-                            om.out.information('Maximum discovery time limit hit.')
-                        
-                        #   Replaced the return [] with this break, so I don't loose all the
-                        #   gathered knowledge.
-                        break
-                        
-                    else:
-                        self._setRunningPlugin( plugin.getName() )
-                        self._setCurrentFuzzableRequest( fr )
-                        try:
-                            # Perform the actual work
-                            pluginResult = plugin.discover_wrapper( fr )
-                        except w3afException,e:
-                            om.out.error( str(e) )
-                            tm.join( plugin )
-                        except w3afRunOnce, rO:
-                            # Some plugins are ment to be run only once
-                            # that is implemented by raising a w3afRunOnce exception
-                            plugins_to_remove_list.append( plugin )
-                            tm.join( plugin )
-                        else:
-                            tm.join( plugin )
-                        
-                            # We don't trust plugins, i'll only work if this is a list
-                            # or something else that is iterable
-                            if hasattr(pluginResult,'__iter__'):
-                                for i in pluginResult:
-                                    fuzzableRequestList.append( (i, plugin.getName()) )
-                                    
-                        om.out.debug('Ending plugin: ' + plugin.getName() )
-                    
-                    # We finished one loop, inc!
-                    self.progress.inc()
-
-                #end-for
-            #end-for
-            
-            ##
-            ##  The search has finished, now i'll perform some mangling with the requests
-            ##
-            newFR = []
-            tmp_sort = []
-            for iFr, pluginWhoFoundIt in fuzzableRequestList:
-                # I dont care about fragments ( http://a.com/foo.php#frag ) and I dont really trust plugins
-                # so i'll remove fragments here
-                iFr.setURL( iFr.getURL().removeFragment() )
-                
-                if iFr not in self._alreadyWalked and iFr.getURL().baseUrl() in cf.cf.getData('baseURLs'):
-                    # Found a new fuzzable request
-                    newFR.append( iFr )
-                    self._alreadyWalked.append( iFr )
-                    if iFr.getURL() not in self._urls:
-                        tmp_sort.append(iFr.getURL())
-                        self._urls.append( iFr.getURL() )
-            
-            #   Print the new URLs in a sorted manner.
-            tmp_sort.sort()
-            for u in tmp_sort:
-                om.out.information('New URL found by ' + pluginWhoFoundIt +' plugin: ' +  u )
-                
-            # Update the list / queue that lives in the KB
-            self._updateURLsInKb( newFR )
-
+        self.progress.set_total_amount( 0 )
+        self._discovery_plugins_to_end = []
+        # id(fr) -> (fr, {plugin_name: (plugin, names of the deps to wait for)})
+        self._discovery_waiting = {}
+        
+        limits = {'plugin': DISCOVERY_PLUGIN_CONCURRENCY}
+        scheduler = task_scheduler( limits=limits )
+        
+        for fr in toWalk:
+            self._add_discovery_tasks( scheduler, fr )
+        
+        def task_done( finished_task, result, exc_info ):
+            self._discovery_task_done( scheduler, finished_task, result,
+                                       exc_info )
+        
+        try:
+            scheduler.join( task_done )
+        except:
+            # join() stopped the scheduler, wait for the plugins that are
+            # still running before they are ended and the audit starts
+            if not scheduler.wait_running( DISCOVERY_STOP_TIMEOUT ):
+                om.out.debug('Some discovery plugins are still running after'
+                             ' %s seconds.', DISCOVERY_STOP_TIMEOUT)
+            raise
+        
+        return self._alreadyWalked.get_requests()
+    
+    def _add_discovery_tasks( self, scheduler, fr ):
+        '''
+        Schedule the analysis of the fuzzable request by all the (enabled)
+        discovery plugins.
+        '''
+        if self._discovery_time_exceeded():
+            scheduler.stop()
+            return
+        
+        enabled = set( [ p.getName() for p in self._plugins['discovery'] ] )
+        waiting = {}
+        
+        for plugin in self._plugins['discovery']:
+            deps = self._get_discovery_deps( plugin ) & enabled
+            if deps:
+                waiting[ plugin.getName() ] = (plugin, deps)
+            else:
+                self._add_discovery_task( scheduler, plugin, fr )
+        
+        if waiting:
+            self._discovery_waiting[ id(fr) ] = (fr, waiting)
+    
+    def _add_discovery_task( self, scheduler, plugin, fr ):
+        if scheduler.add_task( self._discover_task, (plugin, fr),
+                               plugin=plugin.getName() ):
+            # Progress stuff, the total amount of tests grows with each new
+            # fuzzable request that is found
+            self.progress.add_total_amount( 1 )
+    
+    def _get_discovery_deps( self, plugin ):
+        '''
+        @return: A set with the names of the discovery plugins that plugin
+        depends on.
+        '''
+        deps = set()
+        for dep in plugin.getPluginDeps():
+            dep_type, dep_name = dep.split('.')
+            if dep_type == 'discovery':
+                deps.add( dep_name )
+        return deps
+    
+    def _discovery_dep_finished( self, scheduler, plugin_name, fr ):
+        '''
+        The plugin called plugin_name finished analyzing fr (or won't analyze
+        it), start the plugins that were waiting for it.
+        '''
+        entry = self._discovery_waiting.get( id(fr) )
+        if entry is None:
+            return
+        
+        waiting = entry[1]
+        for waiting_name, (plugin, deps) in waiting.items():
+            deps.discard( plugin_name )
+            if not deps:
+                del waiting[ waiting_name ]
+                if plugin in self._plugins['discovery']:
+                    self._add_discovery_task( scheduler, plugin, fr )
+        
+        if not waiting:
+            del self._discovery_waiting[ id(fr) ]
+    
+    def _discover_task( self, plugin, fr ):
+        '''
+        Run by the thread pool, performs the actual work.
+        '''
+        self._setRunningPlugin( plugin.getName() )
+        self._setCurrentFuzzableRequest( fr )
+        try:
+            return plugin.discover_wrapper( fr )
+        finally:
+            tm.join( plugin )
+    
+    def _discovery_task_done( self, scheduler, finished_task, result, exc_info ):
+        '''
+        Called by the task_scheduler, in this thread, each time a discovery
+        plugin finishes analyzing a fuzzable request. The new fuzzable
+        requests are scheduled for analysis right away.
+        '''
+        plugin, fr = finished_task.args
+        
+        # We finished one test, inc!
+        self.progress.inc()
+        om.out.debug('Ending plugin: ' + plugin.getName() )
+        
+        if self._discovery_time_exceeded():
+            #   Stop scheduling new tasks, but don't loose the knowledge
+            #   gathered by the ones that are still running.
+            scheduler.stop()
+        
+        if exc_info is not None:
+            exc_type, exc_value, exc_tb = exc_info
+            if issubclass( exc_type, w3afRunOnce ):
+                # Some plugins are ment to be run only once
+                # that is implemented by raising a w3afRunOnce exception
+                self._remove_discovery_plugin( scheduler, plugin )
+            elif issubclass( exc_type, w3afException ):
+                om.out.error( str(exc_value) )
+            else:
+                raise exc_type, exc_value, exc_tb
+        
+        # We don't trust plugins, i'll only work if this is a list
+        # or something else that is iterable
+        elif hasattr(result, '__iter__'):
+            self._handle_discovered( scheduler, plugin, result )
+        
+        self._discovery_dep_finished( scheduler, plugin.getName(), fr )
+        
+        # Run the end() method of the plugins that won't be run anymore, once
+        # all their tasks have finished
+        for plugin_to_end in self._discovery_plugins_to_end[:]:
+            if not scheduler.running( 'plugin', plugin_to_end.getName() ):
+                self._discovery_plugins_to_end.remove( plugin_to_end )
+                try:
+                    plugin_to_end.end()
+                except Exception, e:
+                    msg = 'The plugin "'+ plugin_to_end.getName() + '" raised an exception'
+                    msg += ' in the end() method: ' + str(e)
+                    om.out.error( msg )
+    
+    def _handle_discovered( self, scheduler, plugin, fuzzableRequestList ):
+        '''
+        Perform some mangling with the requests found by a plugin, save the
+        new ones and schedule them for analysis.
+        '''
+        newFR = []
+        tmp_sort = []
+        for iFr in fuzzableRequestList:
+            # I dont care about fragments ( http://a.com/foo.php#frag ) and I dont really trust plugins
+            # so i'll remove fragments here
+            iFr.setURL( iFr.getURL().removeFragment() )
             
-            ##
-            ##  Cleanup!
-            ##
+            if iFr.getURL().baseUrl() in cf.cf.getData('baseURLs') and \
+            self._alreadyWalked.add( iFr ):
+                # Found a new fuzzable request
+                newFR.append( iFr )
+                if self._alreadyWalked.add_url( iFr.getURL() ):
+                    tmp_sort.append(iFr.getURL())
+        
+        #   Print the new URLs in a sorted manner.
+        tmp_sort.sort()
+        for u in tmp_sort:
+            om.out.information('New URL found by ' + plugin.getName() +' plugin: ' +  u )
             
-            # This wont be used anymore, here i'm duplicating objects that are already saved
-            # in the self._alreadyWalked list.
-            del fuzzableRequestList
-            try:
-                del iFr
-            except:
-                pass
+        # Update the list / queue that lives in the KB
+        self._updateURLsInKb( newFR )
+        
+        # Feed the new requests to all the plugins
+        for fr in newFR:
+            self._add_discovery_tasks( scheduler, fr )
+    
+    def _remove_discovery_plugin( self, scheduler, plugin ):
+        '''
+        Remove a plugin that doesn't want to be run anymore.
+        '''
+        if plugin in self._plugins['discovery']:
+            self._plugins['discovery'].remove( plugin )
+            scheduler.remove_tasks( 'plugin', plugin.getName() )
+            om.out.debug('The discovery plugin: ' + plugin.getName() + ' wont be runned anymore.')
             
-            # Get ready for next while loop
-            toWalk = newFR
+            # The end() method is called as soon as the running tasks finish
+            self._discovery_plugins_to_end.append( plugin )
             
-            # Remove plugins that don't want to be runned anymore
-            for plugin_to_remove in plugins_to_remove_list:
-                if plugin_to_remove in self._plugins['discovery']:
-                    
-                    # Remove it from the plugin list, and run the end() method
-                    self._plugins['discovery'].remove( plugin_to_remove )
-                    om.out.debug('The discovery plugin: ' + plugin_to_remove.getName() + ' wont be runned anymore.')      
-                    try:
-                        plugin_to_remove.end()
-                    except Exception, e:
-                        msg = 'The plugin "'+ plugin_to_remove.getName() + '" raised an exception'
-                        msg += ' in the end() method: ' + str(e)
-                        om.out.error( msg )
-                    
-                    # Don't waste memory on plugins that won't be run
-                    del(plugin_to_remove)
-                
-        return self._alreadyWalked
+            # Don't let the plugins that depend on this one wait for it
+            for fr, waiting in self._discovery_waiting.values():
+                self._discovery_dep_finished( scheduler, plugin.getName(), fr )
+    
+    def _discovery_time_exceeded( self ):
+        '''
+        @return: True if the maxDiscoveryTime was reached.
+        '''
+        if self._time_limit_reported:
+            return True
+        
+        if self.get_discovery_time() > cf.cf.getData('maxDiscoveryTime'):
+            self._time_limit_reported = True
+            om.out.information('Maximum discovery time limit hit.')
+            return True
+        
+        return False
     
     ######## These methods are here to show a detailed information of what the core is doing ############
     
@@ -988,6 +1125,13 @@ class w3afCore(object):
     ######## end of: methods that are here to show a detailed information of what the core is doing ############
     
     def _audit(self):
+        '''
+        Run all the audit plugins against all the fuzzable requests. The
+        (plugin, fuzzable request) pairs are run in the thread pool by a
+        task_scheduler, so different plugins and different hosts are audited
+        at the same time. The limits are set by AUDIT_MAX_IN_FLIGHT,
+        AUDIT_PLUGIN_CONCURRENCY and AUDIT_HOST_CONCURRENCY.
+        '''
         om.out.debug('Called _audit()' )
         
         # For progress reporting
@@ -995,35 +1139,65 @@ class w3afCore(object):
         amount_of_tests = len(self._plugins['audit']) * len(self._fuzzableRequestList)
         self.progress.set_total_amount( amount_of_tests )
         
-        # This two for loops do all the audit magic [KISS]
+        limits = {'plugin': AUDIT_PLUGIN_CONCURRENCY,
+                  'host': AUDIT_HOST_CONCURRENCY}
+        scheduler = task_scheduler( AUDIT_MAX_IN_FLIGHT, limits )
+        
+        # plugin name -> amount of tasks that the plugin still has to finish
+        self._audit_remaining = {}
         for plugin in self._plugins['audit']:
-            
-            # For status
-            self._setRunningPlugin( plugin.getName() )
-
-            for fr in self._fuzzableRequestList:
-                # Sends each fuzzable request to the plugin
-                try:
-                    self._setCurrentFuzzableRequest( fr )
-                    plugin.audit_wrapper( fr )
-                except w3afException, e:
-                    om.out.error( str(e) )
-                    tm.join( plugin )
-                else:
-                    tm.join( plugin )
-                
-                # I performed one test
-                self.progress.inc()
-                    
-            # Let the plugin know that we are not going to use it anymore
-            try:
-                plugin.end()
-            except w3afException, e:
-                om.out.error( str(e) )
-            
-            # And now remove it to free some memory, the valuable information was
-            # saved to the kb, so this is clean and harmless
-            del(plugin)
+            self._audit_remaining[ plugin.getName() ] = len(self._fuzzableRequestList)
+            if not self._fuzzableRequestList:
+                self._end_audit_plugin( plugin )
+        
+        for fr in self._fuzzableRequestList:
+            host = fr.getURL().getNetLocation()
+            for plugin in self._plugins['audit']:
+                scheduler.add_task( self._audit_task, (plugin, fr),
+                                    plugin=plugin.getName(), host=host )
+        
+        scheduler.join( self._audit_task_done )
+    
+    def _audit_task( self, plugin, fr ):
+        '''
+        Run by the thread pool, sends the fuzzable request to the plugin.
+        '''
+        self._setRunningPlugin( plugin.getName() )
+        self._setCurrentFuzzableRequest( fr )
+        try:
+            plugin.audit_wrapper( fr )
+        finally:
+            tm.join( plugin )
+    
+    def _audit_task_done( self, finished_task, result, exc_info ):
+        '''
+        Called by the task_scheduler, in this thread, each time an audit plugin
+        finishes analyzing a fuzzable request.
+        '''
+        plugin, fr = finished_task.args
+        
+        # I performed one test
+        self.progress.inc()
+        
+        if exc_info is not None:
+            exc_type, exc_value, exc_tb = exc_info
+            if issubclass( exc_type, w3afException ):
+                om.out.error( str(exc_value) )
+            else:
+                raise exc_type, exc_value, exc_tb
+        
+        self._audit_remaining[ plugin.getName() ] -= 1
+        if not self._audit_remaining[ plugin.getName() ]:
+            self._end_audit_plugin( plugin )
+    
+    def _end_audit_plugin( self, plugin ):
+        '''
+        Let the plugin know that we are not going to use it anymore.
+        '''
+        try:
+            plugin.end()
+        except w3afException, e:
+            om.out.error( str(e) )
 
     def _bruteforce(self, fuzzableRequestList):
         '''
@@ -24,13 +24,15 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 # Generic imports,
 import os
 import string
+import struct
 from random import choice
 from core.controllers.misc.temp_dir import get_temp_dir
 
 #
-#    This import should never fail
+#    These imports should never fail
 #
 from core.data.bloomfilter.pybloom import BloomFilter as pure_python_filter
+from core.data.bloomfilter.bytearray_bloom import bytearray_bloomfilter
 
 #
 #    This might fail...
@@ -43,6 +45,12 @@ else:
     USE_PURE_PYTHON_FILTER = False
 
 
+def _normalize_key(key):
+    if isinstance(key, unicode):
+        return key.encode('utf-8')
+    return str(key)
+
+
 class generic_bloomfilter(object):
     '''
     A simple "interface like" class to define how a bloom filter should look
@@ -50,74 +58,128 @@ class generic_bloomfilter(object):
     
     The idea is to give a consistent API to all the other sections of the code
     and allow the use of different bloom filter implementations.
+
+    key_digest() transforms the key into what the *_digest() methods expect,
+    the scalable_bloomfilter calls it once and then queries all its filters.
     '''
     def __init__(self, capacity, error_rate=0.01):
         self.capacity = capacity
         self.error_rate = error_rate
     
+    key_digest = staticmethod( _normalize_key )
+
     def __contains__(self, key):
-        raise NotImplementedError()
+        return self.contains_digest( self.key_digest(key) )
         
     def __len__(self):
         raise NotImplementedError()
         
     def add(self, key):
+        return self.add_digest( self.key_digest(key) )
+
+    def contains_digest(self, digest):
+        raise NotImplementedError()
+
+    def add_digest(self, digest):
         raise NotImplementedError()
 
+    def add_many(self, keys):
+        return [ self.add(key) for key in keys ]
+
+    def contains_many(self, keys):
+        return [ key in self for key in keys ]
+
+    def tofile(self, f):
+        raise NotImplementedError()
+
+def _temp_filename():
+    tempdir = get_temp_dir()
+    if not os.path.exists( tempdir ):
+        os.makedirs( tempdir )
+    filename = ''.join([choice(string.letters) for i in range(12)]) + '.w3af.bloom'
+    return os.path.join(tempdir, filename)
+
 class mmap_filter_wrapper(generic_bloomfilter):
+    # count, length of the base64 encoded filter
+    FILE_HEADER = struct.Struct('<QQ')
+
     def __init__(self, capacity, error_rate=0.01):
         generic_bloomfilter.__init__(self, capacity, error_rate)
-        
-        #
-        #    Create the temp file
-        #
-        tempdir = get_temp_dir()
-        if not os.path.exists( tempdir ):
-            os.makedirs( tempdir )
-        filename = ''.join([choice(string.letters) for i in range(12)]) + '.w3af.bloom'
-        temp_file = os.path.join(tempdir, filename)
-        
-        self.bf = mmap_filter(capacity, error_rate, temp_file)
+        self.bf = mmap_filter(capacity, error_rate, _temp_filename())
+        # Kept here because pybloomfilter doesn't save it in to_base64()
+        self.count = 0
 
-    def __contains__(self, key):
-        return str(key) in self.bf
-        
     def __len__(self):
-        return len(self.bf)
+        return self.count
         
-    def add(self, key):
-        return self.bf.add( str(key) )
+    def contains_digest(self, digest):
+        return digest in self.bf
+
+    def add_digest(self, digest):
+        present = self.bf.add( digest )
+        if not present:
+            self.count += 1
+        return present
+
+    def tofile(self, f):
+        data = self.bf.to_base64()
+        f.write( self.FILE_HEADER.pack( self.count, len(data) ) )
+        f.write( data )
+
+    @classmethod
+    def fromfile(cls, f):
+        count, length = cls.FILE_HEADER.unpack( f.read( cls.FILE_HEADER.size ) )
+        bf = mmap_filter.from_base64( _temp_filename(), f.read( length ) )
+
+        wrapper = cls.__new__( cls )
+        generic_bloomfilter.__init__( wrapper, bf.capacity, bf.error_rate )
+        wrapper.bf = bf
+        wrapper.count = int(count)
+        return wrapper
         
 class pure_python_filter_wrapper(generic_bloomfilter):
     def __init__(self, capacity, error_rate=0.01):
         generic_bloomfilter.__init__(self, capacity, error_rate)
         self.bf = pure_python_filter(capacity, error_rate)
 
-    def __contains__(self, key):
-        return str(key) in self.bf
-        
     def __len__(self):
         return len(self.bf)
         
-    def add(self, key):
-        return self.bf.add( str(key) )
+    def contains_digest(self, digest):
+        return digest in self.bf
+
+    def add_digest(self, digest):
+        return self.bf.add( digest )
 
-if USE_PURE_PYTHON_FILTER:
+if not USE_PURE_PYTHON_FILTER:
     #
-    #    Easier to install (embedded in extlib) but slow and memory hungry. 
+    #    Faster!
     #
-    bloomfilter = pure_python_filter_wrapper
+    bloomfilter = mmap_filter_wrapper
 else:
     #
-    #    Faster!
+    #    Pure python, but doesn't use the slow BitVector and hashlib calls of
+    #    pybloom (the pure_python_filter_wrapper).
     #
-    bloomfilter = mmap_filter_wrapper
+    bloomfilter = bytearray_bloomfilter
     
 
+# The backends that can be written to a file, by name
+SERIALIZABLE_BACKENDS = {'bytearray': bytearray_bloomfilter}
+if not USE_PURE_PYTHON_FILTER:
+    SERIALIZABLE_BACKENDS['mmap'] = mmap_filter_wrapper
+
+
 class scalable_bloomfilter(object):
     SMALL_SET_GROWTH = 2 # slower, but takes up less memory
     LARGE_SET_GROWTH = 4 # faster, but takes up more memory faster
 
+    # magic, version, backend name, mode, ratio, initial capacity,
+    # error rate, number of filters
+    FILE_HEADER = struct.Struct('<4sB16sBdQdI')
+    FILE_MAGIC = 'W3SB'
+    FILE_VERSION = 1
+
     def __init__(self, initial_capacity=1000, error_rate=0.001,
                  mode=SMALL_SET_GROWTH):
         """Implements a space-efficient probabilistic data structure that
@@ -165,6 +227,7 @@ class scalable_bloomfilter(object):
             raise ValueError("Error_Rate must be a decimal less than 0.")
         self._setup(mode, 0.9, initial_capacity, error_rate)
         self.filters = []
+        self._backend = bloomfilter
 
     def _setup(self, mode, ratio, initial_capacity, error_rate):
         self.scale = mode
@@ -183,8 +246,11 @@ class scalable_bloomfilter(object):
         True
 
         """
+        return self._contains_digest( self._backend.key_digest(key) )
+
+    def _contains_digest(self, digest):
         for f in reversed(self.filters):
-            if key in f:
+            if f.contains_digest(digest):
                 return True
         return False
 
@@ -201,18 +267,106 @@ class scalable_bloomfilter(object):
         True
 
         """
-        if key in self:
+        return self._add_digest( self._backend.key_digest(key) )
+
+    def _add_digest(self, digest):
+        # The key is hashed only once, for all the filters
+        if self._contains_digest(digest):
             return True
         filter = self.filters[-1] if self.filters else None
         if filter is None or len(filter) >= filter.capacity:
             num_filters = len(self.filters)
-            filter = bloomfilter(
+            filter = self._backend(
                 capacity=self.initial_capacity * (self.scale ** num_filters),
                 error_rate=self.error_rate * (self.ratio ** num_filters))
             self.filters.append(filter)
-        filter.add(key)
+        filter.add_digest(digest)
         return False
 
+    def add_many(self, keys):
+        """Adds all the keys to this bloom filter.
+
+        @return: A list with the add() result for each key.
+
+        >>> b = scalable_bloomfilter(initial_capacity=10)
+        >>> b.add_many( xrange(5) )
+        [False, False, False, False, False]
+        >>> b.add_many( [3, 4, 5, 5] )
+        [True, True, False, True]
+
+        """
+        key_digest = self._backend.key_digest
+        add_digest = self._add_digest
+        return [add_digest(key_digest(key)) for key in keys]
+
+    def contains_many(self, keys):
+        """Tests the membership of all the keys.
+
+        @return: A list of booleans, True for the keys that are in the filter.
+
+        >>> b = scalable_bloomfilter(initial_capacity=10)
+        >>> _ = b.add_many( xrange(100) )
+        >>> b.contains_many( [1, 50, 99, 100, 'foo'] )
+        [True, True, True, False, False]
+
+        """
+        key_digest = self._backend.key_digest
+        contains_digest = self._contains_digest
+        return [contains_digest(key_digest(key)) for key in keys]
+
+    def tofile(self, f):
+        """Write the bloom filter to the file object f, use fromfile() to
+        read it (for example, to resume a scan).
+
+        >>> from cStringIO import StringIO
+        >>> b = scalable_bloomfilter(initial_capacity=10)
+        >>> _ = b.add_many( xrange(100) )
+        >>> f = StringIO()
+        >>> b.tofile(f)
+        >>> _ = f.seek(0)
+        >>> b2 = scalable_bloomfilter.fromfile(f)
+        >>> len(b2), len(b2.filters), 99 in b2, 100 in b2
+        (100, 4, True, False)
+
+        """
+        for name, backend in SERIALIZABLE_BACKENDS.items():
+            if backend is self._backend:
+                break
+        else:
+            raise NotImplementedError('The %s bloom filters can not be written'
+                                      ' to a file.' % self._backend.__name__)
+
+        f.write(self.FILE_HEADER.pack(self.FILE_MAGIC, self.FILE_VERSION,
+                                      name, self.scale, self.ratio,
+                                      self.initial_capacity, self.error_rate,
+                                      len(self.filters)))
+        for filter in self.filters:
+            filter.tofile(f)
+
+    @classmethod
+    def fromfile(cls, f):
+        """Read a bloom filter that was written with tofile() from the file
+        object f."""
+        header = f.read(cls.FILE_HEADER.size)
+        if len(header) != cls.FILE_HEADER.size:
+            raise ValueError('Truncated bloom filter file.')
+
+        magic, version, name, mode, ratio, initial_capacity, error_rate, \
+        num_filters = cls.FILE_HEADER.unpack(header)
+        if magic != cls.FILE_MAGIC or version != cls.FILE_VERSION:
+            raise ValueError('Invalid bloom filter file.')
+
+        backend = SERIALIZABLE_BACKENDS.get(name.rstrip('\x00'))
+        if backend is None:
+            raise ValueError('The bloom filter file was written with the "%s"'
+                             ' backend, which is not available.' % name)
+
+        sbf = cls(int(initial_capacity), error_rate, mode)
+        sbf.ratio = ratio
+        sbf._backend = backend
+        sbf.filters = [backend.fromfile(f) for _ in xrange(num_filters)]
+        return sbf
+
     @property
     def capacity(self):
         """Returns the total capacity for all filters in this SBF"""
@@ -0,0 +1,207 @@
+'''
+bytearray_bloom.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+import math
+import struct
+from hashlib import md5
+
+# magic, version, error_rate, capacity, num_bits, num_hashes, count
+FILE_HEADER = struct.Struct('<4sBdQQQQ')
+FILE_MAGIC = 'W3BF'
+FILE_VERSION = 1
+
+_unpack_digest = struct.Struct('<QQ').unpack
+
+
+def key_digest(key):
+    '''
+    @return: The two hashes that are used to calculate all the bit positions
+    for the key (double hashing), they only depend on the key so they can be
+    reused to query many filters.
+
+    >>> key_digest('a') == key_digest(u'a')
+    True
+    >>> h1, h2 = key_digest('a')
+    >>> h2 % 2
+    1
+    '''
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    elif not isinstance(key, str):
+        key = str(key)
+    h1, h2 = _unpack_digest( md5(key).digest() )
+    # num_bits is a multiple of 8, so an odd h2 is never 0 modulo num_bits
+    return h1, h2 | 1
+
+
+class bytearray_bloomfilter(object):
+    '''
+    A bloom filter that stores the bits in a bytearray and calculates the k
+    bit positions from a single md5 digest:
+
+        position_i = (h1 + i * h2) % num_bits
+
+    which has the same false positive rate than k independent hashes
+    (Kirsch and Mitzenmacher, "Less hashing, same performance"), but is much
+    faster in pure python than the salted hashlib calls and BitVector of
+    pybloom.
+
+    >>> bf = bytearray_bloomfilter(1000, 0.001)
+    >>> bf.add('abc')
+    False
+    >>> bf.add('abc')
+    True
+    >>> 'abc' in bf, 'def' in bf
+    (True, False)
+    >>> bf.add_many( ['abc', 'def', 'def'] )
+    [True, False, True]
+    >>> bf.contains_many( ['def', 'ghi'] )
+    [True, False]
+    >>> len(bf)
+    2
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    key_digest = staticmethod( key_digest )
+
+    def __init__(self, capacity, error_rate=0.01):
+        if not (0 < error_rate < 1):
+            raise ValueError("Error_Rate must be between 0 and 1.")
+        if not capacity > 0:
+            raise ValueError("Capacity must be > 0")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n * ln(p) / ln(2)^2 and k = m / n * ln(2)
+        num_bits = int(math.ceil( -capacity * math.log(error_rate) /
+                                  (math.log(2) ** 2) ))
+        self.num_bits = (num_bits + 7) & ~7
+        self.num_hashes = max(1, int(round( float(self.num_bits) / capacity *
+                                            math.log(2) )))
+        self.count = 0
+        self._bits = bytearray( self.num_bits >> 3 )
+
+    def __contains__(self, key):
+        return self.contains_digest( key_digest(key) )
+
+    def __len__(self):
+        '''Return the number of keys stored by this bloom filter.'''
+        return self.count
+
+    def add(self, key):
+        '''
+        Adds a key to this bloom filter.
+
+        @return: True if the key was already in the filter, False otherwise.
+        '''
+        return self.add_digest( key_digest(key) )
+
+    def contains_digest(self, digest):
+        bits = self._bits
+        num_bits = self.num_bits
+        # Reduce the hashes first, the 64 bit longs are slow, and let xrange
+        # calculate h1 + i * h2
+        h1 = digest[0] % num_bits
+        h2 = digest[1] % num_bits
+        for pos in xrange(h1, h1 + self.num_hashes * h2, h2):
+            pos %= num_bits
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add_digest(self, digest):
+        bits = self._bits
+        num_bits = self.num_bits
+        h1 = digest[0] % num_bits
+        h2 = digest[1] % num_bits
+        present = True
+        for pos in xrange(h1, h1 + self.num_hashes * h2, h2):
+            pos %= num_bits
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                present = False
+
+        if not present:
+            self.count += 1
+        return present
+
+    def add_many(self, keys):
+        '''
+        @return: A list with the add() result for each key.
+        '''
+        add_digest = self.add_digest
+        return [ add_digest( key_digest(key) ) for key in keys ]
+
+    def contains_many(self, keys):
+        '''
+        @return: A list of booleans, True for the keys that are in the filter.
+        '''
+        contains_digest = self.contains_digest
+        return [ contains_digest( key_digest(key) ) for key in keys ]
+
+    def tofile(self, f):
+        '''
+        Write the bloom filter to the file object f.
+
+        >>> from cStringIO import StringIO
+        >>> bf = bytearray_bloomfilter(100, 0.01)
+        >>> _ = bf.add_many( xrange(50) )
+        >>> f = StringIO()
+        >>> bf.tofile( f )
+        >>> _ = f.seek(0)
+        >>> bf2 = bytearray_bloomfilter.fromfile( f )
+        >>> len(bf2), all( bf2.contains_many( xrange(50) ) ), bf2.capacity
+        (50, True, 100)
+        '''
+        f.write( FILE_HEADER.pack( FILE_MAGIC, FILE_VERSION, self.error_rate,
+                                   self.capacity, self.num_bits,
+                                   self.num_hashes, self.count ) )
+        f.write( self._bits )
+
+    @classmethod
+    def fromfile(cls, f):
+        '''
+        Read a bloom filter that was written with tofile() from the file
+        object f.
+        '''
+        header = f.read( FILE_HEADER.size )
+        if len(header) != FILE_HEADER.size:
+            raise ValueError('Truncated bloom filter file.')
+
+        magic, version, error_rate, capacity, num_bits, num_hashes, count = \
+            FILE_HEADER.unpack( header )
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError('Invalid bloom filter file.')
+
+        bits = f.read( num_bits >> 3 )
+        if len(bits) != num_bits >> 3:
+            raise ValueError('Truncated bloom filter file.')
+
+        bf = cls.__new__( cls )
+        bf.capacity = int(capacity)
+        bf.error_rate = error_rate
+        bf.num_bits = int(num_bits)
+        bf.num_hashes = int(num_hashes)
+        bf.count = int(count)
+        bf._bits = bytearray( bits )
+        return bf
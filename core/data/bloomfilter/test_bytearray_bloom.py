@@ -0,0 +1,74 @@
+import os
+import time
+import unittest
+import tempfile
+
+from core.data.bloomfilter.bytearray_bloom import bytearray_bloomfilter
+from core.data.bloomfilter.bloomfilter import scalable_bloomfilter, \
+     pure_python_filter_wrapper, USE_PURE_PYTHON_FILTER
+
+
+class TestBytearrayBloomfilter(unittest.TestCase):
+
+    def test_error_rate(self):
+        f = bytearray_bloomfilter(capacity=10000, error_rate=0.001)
+        added = f.add_many( xrange(10000) )
+        self.assertEqual( added.count(False), len(f) )
+
+        self.assertTrue( all( f.contains_many( xrange(10000) ) ) )
+        false_positives = sum( f.contains_many( xrange(10000, 110000) ) )
+        # Expected: 100, give it some room
+        self.assertTrue( false_positives < 200, false_positives )
+
+    def test_unicode(self):
+        f = bytearray_bloomfilter(capacity=100)
+        f.add( u'\xa1' )
+        self.assertTrue( u'\xa1' in f )
+        self.assertTrue( u'\xa1'.encode('utf-8') in f )
+
+    def test_tofile(self):
+        sbf = scalable_bloomfilter(initial_capacity=100)
+        sbf._backend = bytearray_bloomfilter
+        sbf.add_many( 'http://www.w3af.com/%s' % i for i in xrange(1000) )
+
+        fd, filename = tempfile.mkstemp()
+        try:
+            f = os.fdopen(fd, 'wb')
+            sbf.tofile( f )
+            f.close()
+
+            sbf2 = scalable_bloomfilter.fromfile( open(filename, 'rb') )
+        finally:
+            os.remove( filename )
+
+        self.assertEqual( len(sbf2), len(sbf) )
+        self.assertEqual( sbf2.capacity, sbf.capacity )
+        self.assertTrue( 'http://www.w3af.com/999' in sbf2 )
+        self.assertFalse( sbf2.add( 'http://www.w3af.com/1000' ) )
+        self.assertTrue( sbf2.add( 'http://www.w3af.com/0' ) )
+
+    def test_benchmark(self):
+        '''
+        Compare the bytearray backend with the other ones.
+        '''
+        keys = [ 'http://www.w3af.com/foo/%s.php?id=%s' % (i, i) for i in xrange(5000) ]
+        backends = [ bytearray_bloomfilter, pure_python_filter_wrapper ]
+        if not USE_PURE_PYTHON_FILTER:
+            from core.data.bloomfilter.bloomfilter import mmap_filter_wrapper
+            backends.append( mmap_filter_wrapper )
+
+        costs = {}
+        for backend in backends:
+            f = backend(len(keys), 0.001)
+            start = time.time()
+            f.add_many( keys )
+            f.contains_many( keys )
+            costs[ backend ] = (time.time() - start) / (2 * len(keys))
+
+        msg = 'Cost of add/contains: ' + ', '.join( '%s %.1fus' % (b.__name__, c * 1e6)
+                                                    for b, c in costs.items() )
+        self.assertTrue( costs[bytearray_bloomfilter] < costs[pure_python_filter_wrapper], msg )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,6 +26,7 @@ import threading
 import sys
 
 from core.controllers.w3afException import w3afException
+from core.data.db.history_writer import remove_history_writer
 
 
 class DBClient(object):
@@ -83,6 +84,34 @@ class DBClient(object):
             except Exception, e:
                 raise
 
+    def executemany(self, sql, seq_of_parameters):
+        '''
+        Execute the SQL statement once for each item in seq_of_parameters,
+        in one transaction.
+        '''
+        self.executebatch( [(sql, seq_of_parameters)] )
+
+    def executebatch(self, statements):
+        '''
+        Like executemany() for many SQL statements, all of them are executed
+        in one transaction.
+
+        @parameter statements: A list of (sql, seq_of_parameters) tuples.
+        '''
+        c = self._db.cursor()
+        with self._dbLock:
+            # Commit what execute() left pending, the rollback below should
+            # only discard this batch
+            self._db.commit()
+            self._insertionCount = 0
+            try:
+                for sql, seq_of_parameters in statements:
+                    c.executemany(sql, seq_of_parameters)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
     def createTable(self, name, columns=(), primaryKeyColumns=[]):
         '''Create table in convenient way.'''
         #
@@ -118,6 +147,8 @@ class DBClient(object):
 
     def close(self):
         '''Commit changes and close the connection to the underlaying db.'''
+        # Write the HTTP history that is waiting in the history_writer
+        remove_history_writer( self )
         self._db.close()
         self._filename = None
 
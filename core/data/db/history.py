@@ -19,26 +19,92 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 '''
 from __future__ import with_statement
 import os
-import time
+import re
 from shutil import rmtree
 
 try:
-    from cPickle import Pickler, Unpickler
+    from cPickle import dumps, loads
 except ImportError:
-    from pickle import Pickler, Unpickler
-
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from StringIO import StringIO
+    from pickle import dumps, loads
 
 import core.data.kb.knowledgeBase as kb
 import core.controllers.outputManager as om
 import core.data.kb.config as cf
 from core.controllers.w3afException import w3afException
 from core.controllers.misc.homeDir import get_home_dir
-from core.controllers.misc.FileLock import FileLock, FileLockRead
 from core.data.db.db import DB, WhereHelper
+from core.data.db.history_writer import get_history_writer
+
+# The amount of items in each page of search() results
+SEARCH_PAGE_SIZE = 200
+# Only the first bytes of each response body are indexed
+INDEX_BODY_SIZE = 64 * 1024
+
+# The prefixes that the users can write in a search (url:admin) and the
+# columns of the full-text index they search in
+SEARCH_FIELDS = {'url': 'url_text', 'tag': 'tag_text', 'headers': 'headers',
+                 'body': 'body'}
+
+# The same characters the "simple" FTS tokenizer uses for the tokens
+TOKEN_RE = re.compile('[A-Za-z0-9\x80-\xff]+')
+TERM_RE = re.compile('(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+
+def fts_query(text):
+    '''
+    Translate the text that the user wants to find to a full-text MATCH
+    query. The punctuation is removed (it's not indexed), the values with
+    more than one word are phrases, "*" at the end of a word searches for
+    the words that start with it and "url:", "tag:", "headers:" or "body:"
+    search in one column only. The last word always matches the words that
+    start with it (unless it's quoted), so the results are updated while the
+    user types and "admin" finds "/administrator/".
+
+    >>> fts_query('admin')
+    'admin*'
+    >>> fts_query('admin login.php')
+    'admin "login php*"'
+    >>> fts_query('url:/cart/add.php body:passw* OR')
+    'url_text:cart url_text:add url_text:php body:passw* or*'
+    >>> fts_query('http://w3af.org tag:"sql injection"')
+    '"http w3af org" tag_text:sql tag_text:injection'
+    >>> fts_query('?=') is None
+    True
+
+    @return: The MATCH query, or None if there is nothing to search.
+    '''
+    terms = []
+    for prefix, quoted, word in TERM_RE.findall( text ):
+        value = quoted or word
+        column = SEARCH_FIELDS.get( prefix.lower() )
+        if prefix and column is None:
+            value = prefix + ':' + value
+
+        tokens = TOKEN_RE.findall( value.lower() )
+        if not tokens:
+            continue
+        last_quoted = bool( quoted )
+        star = '*' if value.endswith('*') else ''
+
+        if column is not None:
+            # Phrases can't be restricted to a column, match all the words
+            terms.extend( '%s:%s' % (column, t) for t in tokens[:-1] )
+            terms.append( '%s:%s%s' % (column, tokens[-1], star) )
+        elif len(tokens) > 1:
+            terms.append( '"%s%s"' % (' '.join(tokens), star) )
+        else:
+            terms.append( tokens[0] + star )
+
+    if not terms:
+        return None
+    
+    last = terms[-1]
+    if not last_quoted and not last.endswith('*"') and not last.endswith('*'):
+        if last.endswith('"'):
+            terms[-1] = last[:-1] + '*"'
+        else:
+            terms[-1] = last + '*'
+    return ' '.join( terms )
 
 
 class HistoryItem(object):
@@ -50,9 +116,14 @@ class HistoryItem(object):
         ('tag', 'text'), ('mark', 'integer'), ('info', 'text'),
         ('time', 'float'), ('msg', 'text'), ('content_type', 'text'),
         ('method', 'text'), ('response_size', 'integer'), ('codef', 'integer'),
-        ('alias', 'text'), ('has_qs', 'integer')]
+        ('alias', 'text'), ('has_qs', 'integer'), ('trace_offset', 'integer'),
+        ('trace_length', 'integer')]
     _primaryKeyColumns = ('id',)
     _indexColumns = ('alias',)
+    # The full-text index, its rows have the same docid as the id in
+    # data_table
+    _ftsTable = 'history_fts'
+    _ftsColumns = ('url_text', 'tag_text', 'headers', 'body')
     id = None
     _request = None
     _response = None
@@ -79,6 +150,16 @@ class HistoryItem(object):
             raise w3afException('The database is not initialized yet.')
         self._sessionDir = os.path.join(get_home_dir() , 'sessions',
                                         self._db.getFileName() + '_traces')
+        # The request/response pairs are written in batches by the writer,
+        # which is shared by all the items that use this DB
+        insert_sql = ('INSERT OR REPLACE INTO %s (%s) VALUES (%s)' %
+                      (self._dataTable,
+                       ', '.join([c[0] for c in self._columns]),
+                       ','.join(['?'] * len(self._columns))))
+        self._writer = get_history_writer(self._db, insert_sql, self._sessionDir)
+        self._indexSql = ('INSERT OR REPLACE INTO %s (docid, %s) VALUES (?,%s)' %
+                          (self._ftsTable, ', '.join(self._ftsColumns),
+                           ','.join(['?'] * len(self._ftsColumns))))
         
     @property
     def response(self):
@@ -116,6 +197,20 @@ class HistoryItem(object):
 
         self._db.createIndex(tablename, self.getIndexColumns())
 
+        # The full-text index, SQLite might be compiled without it
+        self._writer.set_index_sql(None)
+        for module in ('fts4', 'fts3'):
+            try:
+                self._db.execute('CREATE VIRTUAL TABLE %s USING %s(%s)' %
+                                 (self._ftsTable, module, ', '.join(self._ftsColumns)))
+            except Exception, e:
+                om.out.debug('Failed to create the %s HTTP history index: "%s".'
+                             % (module, e))
+            else:
+                self._db.commit()
+                self._writer.set_index_sql(self._indexSql)
+                break
+
         # Init dirs
         try:
             os.mkdir(self._sessionDir)
@@ -132,6 +227,7 @@ class HistoryItem(object):
         '''
         if not self._db:
             raise w3afException('The database is not initialized yet.')
+        self._writer.flush()
         result = []
         sql = 'SELECT * FROM ' + self._dataTable
         where = WhereHelper(searchData)
@@ -158,6 +254,99 @@ class HistoryItem(object):
             raise w3afException('You performed an invalid search. Please verify your syntax.')
         return result
 
+    def search(self, text, searchData=[], afterId=0, limit=SEARCH_PAGE_SIZE):
+        '''
+        Full-text search in the URLs, tags, headers and bodies (when they are
+        indexed, see the historyIndexBodies setting). The results are paged
+        by id: to get the next page call search() again with the id of the
+        last item as afterId.
+
+        @parameter text: The words to find, see fts_query() for the syntax.
+        @parameter searchData: Extra conditions, with the format of find().
+        @parameter afterId: Only the items with a greater id are returned.
+        @parameter limit: The maximum amount of items.
+        @return: A list of HistoryItems ordered by id.
+        '''
+        if not self._db:
+            raise w3afException('The database is not initialized yet.')
+        searchData = list(searchData) + [('id', afterId, '>')]
+
+        query = fts_query(text)
+        if query is None or not self._hasIndex():
+            if query is not None:
+                # Sessions created before the index, they can only search
+                # in the URLs and tags
+                likePieces = [('url', '%' + text + '%', 'like'),
+                              ('tag', '%' + text + '%', 'like')]
+                searchData.append((likePieces, 'OR'))
+            return self.find(searchData, resultLimit=limit, orderData=[('id', '')])
+
+        self._writer.flush()
+        where = WhereHelper(searchData)
+        sql = ('SELECT d.* FROM %s f JOIN %s d ON d.id = f.docid'
+               ' WHERE %s MATCH ? AND %s ORDER BY f.docid LIMIT %d' %
+               (self._ftsTable, self._dataTable, self._ftsTable,
+                where.sql(whereStr=False), int(limit)))
+        try:
+            rawResult = self._db.retrieve(sql, [query] + where.values(), all=True)
+        except Exception, e:
+            raise w3afException('You performed an invalid search. Please verify'
+                                ' your syntax. Exception: "%s".' % e)
+        result = []
+        for row in rawResult:
+            item = self.__class__(self._db)
+            item._loadFromRow(row, False)
+            result.append(item)
+        return result
+
+    def _hasIndex(self):
+        '''
+        @return: True if the database has the full-text index. Databases of
+        sessions saved with older versions don't have it.
+        '''
+        if not self._writer.index_checked:
+            sql = "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = ?"
+            try:
+                exists = self._db.retrieve(sql, (self._ftsTable,))[0]
+            except Exception:
+                exists = False
+            self._writer.set_index_sql(self._indexSql if exists else None)
+        return self._writer.index_sql is not None
+
+    def _checkColumns(self):
+        '''
+        Databases of sessions saved with older versions don't have the
+        trace_offset and trace_length columns, add them before writing.
+        '''
+        if self._writer.columns_checked:
+            return
+        
+        sql = 'PRAGMA table_info(%s)' % self._dataTable
+        existing = [ row[1] for row in self._db.retrieve(sql, all=True) ]
+        for name, sqltype in self._columns:
+            if name in existing:
+                continue
+            try:
+                self._db.execute('ALTER TABLE %s ADD COLUMN %s %s' %
+                                 (self._dataTable, name, sqltype))
+            except Exception:
+                # Another thread might have added it at the same time
+                existing = [ row[1] for row in self._db.retrieve(sql, all=True) ]
+                if name not in existing:
+                    raise
+        self._writer.columns_checked = True
+
+    def _getDocument(self, resp):
+        '''
+        @return: The values for the full-text index row of this item.
+        '''
+        headers = self.request.dumpHeaders() + resp.dumpHeaders()
+        body = ''
+        if cf.cf.getData('historyIndexBodies') and resp.is_text_or_html():
+            body = resp.getBody()[:INDEX_BODY_SIZE]
+        return (resp.getId(), self.request.getURI().url_string, self.tag,
+                headers, body)
+
     def _loadFromRow(self, row, full=True):
         '''Load data from row with all columns.'''
         self.id = row[0]
@@ -171,32 +360,43 @@ class HistoryItem(object):
         self.contentType = row[8]
         self.method = row[9]
         self.responseSize = int(row[10])
+        # Databases created before the traces were moved to the segment
+        # file don't have these columns
+        if len(row) > 15 and row[14] is not None:
+            self._writer.set_location(self.id, row[14], row[15])
 
     def _loadFromFile(self, id):
-        
-        fname = os.path.join(self._sessionDir, str(id) + self._ext)
-        #
-        #    Due to some concurrency issues, we need to perform this check
-        #    before we try to read the .trace file.
-        #
-        if not os.path.exists(fname):
-            
-            for _ in xrange( 1 / 0.05 ):
-                time.sleep(0.05)
-                if os.path.exists(fname):
-                    break
-            else:
-                msg = 'Timeout expecting trace file to be written "%s"' % fname
-                raise IOError(msg)
-
-        #
-        #    Ok... the file exists, but it might still be being written 
-        #
-        with FileLockRead(fname, timeout=1):
-            rrfile = open( fname, 'rb')
-            req, res = Unpickler(rrfile).load()
+        '''
+        @return: The (request, response) tuple with the given id, it's read
+        from the writer (which also has the pending ones) or the segment file.
+        '''
+        data = self._writer.get_trace(id)
+
+        if data is None:
+            # Written by another process (or before a restart), look for the
+            # location in the DB
+            sql = ('SELECT trace_offset, trace_length FROM %s WHERE id = ?'
+                   % self._dataTable)
+            try:
+                row = self._db.retrieve(sql, (id,))
+            except w3afException:
+                row = None
+            if row is not None and row[0] is not None:
+                self._writer.set_location(id, row[0], row[1])
+                data = self._writer.read_trace(row[0], row[1])
+
+        if data is None:
+            # Sessions saved with older versions have one file for each id
+            fname = os.path.join(self._sessionDir, str(id) + self._ext)
+            if not os.path.exists(fname):
+                msg = 'The request/response with id "%s" is not in the trace file.'
+                raise IOError(msg % id)
+            rrfile = open(fname, 'rb')
+            data = rrfile.read()
             rrfile.close()
-            return (req, res)
+
+        req, res = loads(data)
+        return (req, res)
 
     def delete(self, id=None):
         '''Delete data from DB by ID.'''
@@ -204,8 +404,12 @@ class HistoryItem(object):
             raise w3afException('The database is not initialized yet.')
         if not id:
             id = self.id
+        self._writer.flush()
         sql = 'DELETE FROM ' + self._dataTable + ' WHERE id = ? '
         self._db.execute(sql, (id,))
+        if self._hasIndex():
+            sql = 'DELETE FROM ' + self._ftsTable + ' WHERE docid = ? '
+            self._db.execute(sql, (id,))
         # FIXME 
         # don't forget about files!
 
@@ -217,6 +421,7 @@ class HistoryItem(object):
         if not id:
             id = self.id
 
+        self._writer.flush()
         sql = 'SELECT * FROM ' + self._dataTable + ' WHERE id = ? '
         try:
             row = self._db.retrieve(sql, (id,))
@@ -278,32 +483,31 @@ class HistoryItem(object):
         values.append(resp.getAlias())
         values.append(int(self.request.getURI().hasQueryString()))
 
+        self._checkColumns()
+        trace = dumps((self.request, resp), 2)
+        document = None
+        if self._hasIndex():
+            document = self._getDocument(resp)
+
         if not self.id:
-            sql = ('INSERT INTO %s '
-            '(id, url, code, tag, mark, info, time, msg, content_type, method, response_size, codef, alias, has_qs) '
-            'VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)' % self._dataTable)
-            self._db.execute(sql, values)
-            self.id = self.response.getId()
+            # The row and the trace are written in the background, in
+            # batches, _loadFromFile() and find() see them right away
+            self._writer.add(values, trace, document)
+            self.id = resp.getId()
         else:
-            values.append(self.id)
-            sql = ('UPDATE %s' 
+            # Write the pending rows first, they might include this one
+            self._writer.flush()
+            _, offset, length = self._writer.write_trace(resp.getId(), trace)
+            values.extend([offset, length, self.id])
+            sql = ('UPDATE %s'
             ' SET id = ?, url = ?, code = ?, tag = ?, mark = ?, info = ?, time = ?, msg = ? , content_type = ? '
             ', method = ?, response_size = ?, codef = ?, alias = ?, has_qs = ? '
+            ', trace_offset = ?, trace_length = ? '
             ' WHERE id = ?' % self._dataTable)
             self._db.execute(sql, values)
-        
-        # 
-        # Save raw data to file
-        #
-        fname = os.path.join(self._sessionDir, str(self.response.id) + self._ext)
-
-        with FileLock(fname, timeout=1):
-        
-            rrfile = open(fname, 'wb')
-            p = Pickler(rrfile)
-            p.dump((self.request, self.response))
-            rrfile.close()
-            return True
+            if document is not None:
+                self._db.execute(self._indexSql, document)
+        return True
 
     def getColumns(self):
         return self._columns
@@ -319,6 +523,7 @@ class HistoryItem(object):
 
     def _updateField(self, name, value):
         '''Update custom field in DB.'''
+        self._writer.flush()
         sql = 'UPDATE ' + self._dataTable
         sql += ' SET ' + name + ' = ? '
         sql += ' WHERE id = ?'
@@ -329,6 +534,9 @@ class HistoryItem(object):
         self.tag = value
         if forceDb:
             self._updateField('tag', value)
+            if self._hasIndex():
+                sql = 'UPDATE ' + self._ftsTable + ' SET tag_text = ? WHERE docid = ?'
+                self._db.execute(sql, (value, self.id))
 
     def toggleMark(self, forceDb=False):
         '''Toggle mark state.'''
@@ -340,8 +548,12 @@ class HistoryItem(object):
         '''Clear history and delete all trace files.'''
         if not self._db:
             raise w3afException('The database is not initialized yet.')
+        # Discard the rows that weren't written and close the trace file
+        self._writer.reset()
         # Clear DB
         sql = 'DELETE FROM ' + self._dataTable
         self._db.execute(sql)
+        if self._hasIndex():
+            self._db.execute('DELETE FROM ' + self._ftsTable)
         # Delete files
         rmtree(self._sessionDir)
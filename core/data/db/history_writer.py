@@ -0,0 +1,340 @@
+'''
+history_writer.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import atexit
+import os
+import threading
+
+import core.controllers.outputManager as om
+
+# The pending rows are written in one transaction when there are this many
+# of them, or when the oldest one has been waiting for this many seconds.
+HISTORY_BATCH_SIZE = 200
+HISTORY_BATCH_TIME = 0.5
+
+SEGMENT_FILENAME = 'traces.seg'
+
+
+class trace_segment(object):
+    '''
+    An append-only file with the pickled request/response pairs, one after
+    the other. The position of each one is kept in an index (and returned
+    by append(), so it can also be saved to the database).
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._path = os.path.join( directory, SEGMENT_FILENAME )
+        self._lock = threading.RLock()
+        self._writer = None
+        self._reader = None
+        # id -> (offset, length)
+        self._index = {}
+
+    def append(self, records):
+        '''
+        @parameter records: A list of (id, data) tuples.
+        @return: A list of (id, offset, length) tuples.
+        '''
+        with self._lock:
+            if self._writer is None:
+                if not os.path.exists( self._directory ):
+                    os.makedirs( self._directory )
+                self._writer = open( self._path, 'ab' )
+
+            self._writer.seek( 0, 2 )
+            offset = self._writer.tell()
+
+            locations = []
+            for id, data in records:
+                self._writer.write( data )
+                locations.append( (id, offset, len(data)) )
+                self._index[ id ] = (offset, len(data))
+                offset += len(data)
+
+            self._writer.flush()
+            return locations
+
+    def get_location(self, id):
+        return self._index.get( id )
+
+    def set_location(self, id, offset, length):
+        self._index[ id ] = (offset, length)
+
+    def read(self, offset, length):
+        with self._lock:
+            if self._reader is None:
+                self._reader = open( self._path, 'rb' )
+            self._reader.seek( offset )
+            return self._reader.read( length )
+
+    def close(self):
+        with self._lock:
+            for f in (self._writer, self._reader):
+                if f is not None:
+                    f.close()
+            self._writer = None
+            self._reader = None
+            self._index.clear()
+
+
+class history_writer(object):
+    '''
+    Write-behind queue for the history items.
+
+    add() only keeps the row and the pickled request/response in memory, a
+    background thread appends the pickles to the trace_segment and INSERTs
+    the rows in one transaction for each batch. The pending rows are
+    available through get_trace(), and flush() writes them right away (it
+    must be called before querying the database).
+
+    When the database has a full-text index (see set_index_sql()) the index
+    documents are written in the same transaction as their rows.
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, db, insert_sql, directory,
+                 batch_size=HISTORY_BATCH_SIZE, batch_time=HISTORY_BATCH_TIME):
+        '''
+        @parameter insert_sql: The INSERT statement, it receives the row
+        values followed by the offset and length of the trace.
+        '''
+        self._db = db
+        self._insert_sql = insert_sql
+        # The INSERT for the index documents, set by the HistoryItems once
+        # they know if the database has the index
+        self.index_sql = None
+        self.index_checked = False
+        # The HistoryItems add the columns that are missing in the databases
+        # of older sessions before writing to them
+        self.columns_checked = False
+        self._segment = trace_segment( directory )
+        self._batch_size = batch_size
+        self._batch_time = batch_time
+
+        self._cond = threading.Condition()
+        # Only one thread writes to the segment and the DB at the time
+        self._flush_lock = threading.Lock()
+        # id -> (row values, trace data, index document) for the rows that
+        # weren't written
+        self._pending = {}
+        self._queue = []
+        self._thread = None
+        self._closed = False
+
+    def set_index_sql(self, index_sql):
+        '''
+        @parameter index_sql: The INSERT statement for the full-text index
+        documents, or None if the database doesn't have the index.
+        '''
+        self.index_sql = index_sql
+        self.index_checked = True
+
+    def add(self, values, trace, document=None):
+        '''
+        @parameter values: The values for the row, the first one is the id.
+        @parameter trace: The pickled request/response pair.
+        @parameter document: The values for index_sql, or None.
+        '''
+        with self._cond:
+            id = values[0]
+            self._pending[ id ] = (values, trace, document)
+            self._queue.append( id )
+
+            if self._thread is None:
+                self._thread = threading.Thread( target=self._run,
+                                                 name='HistoryWriter' )
+                self._thread.setDaemon( True )
+                self._thread.start()
+
+            if len( self._queue ) >= self._batch_size:
+                self._cond.notify()
+
+    def get_trace(self, id):
+        '''
+        @return: The pickled request/response pair with the given id, or None
+        if it's not in the segment (or wasn't written by this writer).
+        '''
+        with self._cond:
+            pending = self._pending.get( id )
+            if pending is not None:
+                return pending[1]
+
+        location = self._segment.get_location( id )
+        if location is None:
+            return None
+        return self._segment.read( *location )
+
+    def write_trace(self, id, trace):
+        '''
+        Write the trace right away.
+
+        @return: The (id, offset, length) tuple for the trace.
+        '''
+        with self._flush_lock:
+            return self._segment.append( [(id, trace)] )[0]
+
+    def set_location(self, id, offset, length):
+        '''
+        Let the writer know about a trace that was written before, for
+        example, the location was read from the database.
+        '''
+        self._segment.set_location( id, offset, length )
+
+    def read_trace(self, offset, length):
+        return self._segment.read( offset, length )
+
+    def flush(self):
+        '''
+        Write all the pending rows and traces.
+        '''
+        with self._flush_lock:
+            with self._cond:
+                if not self._queue:
+                    return
+                ids = self._queue
+                self._queue = []
+                batch = [ (id, self._pending[ id ]) for id in ids ]
+
+            # The same id might have been added more than once
+            last = {}
+            for id, pending in batch:
+                last[ id ] = pending
+            batch = [ (id, pending) for id, pending in batch if last[ id ] is pending ]
+
+            try:
+                locations = self._segment.append( [ (id, pending[1]) for id, pending in batch ] )
+                rows = []
+                documents = []
+                for (id, pending), (_, offset, length) in zip( batch, locations ):
+                    rows.append( list(pending[0]) + [offset, length] )
+                    if pending[2] is not None:
+                        documents.append( pending[2] )
+
+                statements = [ (self._insert_sql, rows) ]
+                if documents and self.index_sql is not None:
+                    statements.append( (self.index_sql, documents) )
+                self._db.executebatch( statements )
+            except:
+                # Nothing was saved (the batch is one transaction), the rows
+                # are written again by the next flush(). The traces that were
+                # appended to the segment are appended again, the index
+                # keeps the last location
+                with self._cond:
+                    retry = [ id for id, pending in batch
+                              if self._pending.get( id ) is pending ]
+                    self._queue = retry + self._queue
+                raise
+            else:
+                with self._cond:
+                    for id, pending in batch:
+                        if self._pending.get( id ) is pending:
+                            del self._pending[ id ]
+
+    def pending(self):
+        with self._cond:
+            return len( self._queue )
+
+    def reset(self):
+        '''
+        Forget about everything, the pending rows are discarded.
+        '''
+        with self._flush_lock:
+            with self._cond:
+                self._pending.clear()
+                self._queue = []
+            self._segment.close()
+
+    def close(self):
+        '''
+        Write the pending rows and stop the thread.
+        '''
+        try:
+            self.flush()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify()
+                thread = self._thread
+            if thread is not None and thread is not threading.currentThread():
+                thread.join()
+            self._segment.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    break
+                if len( self._queue ) < self._batch_size:
+                    self._cond.wait( self._batch_time )
+                if self._closed:
+                    break
+
+            try:
+                self.flush()
+            except Exception, e:
+                om.out.error('Failed to save the HTTP history to the database.'
+                             ' Exception: "%s".' % e)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_history_writer(db, insert_sql, directory):
+    '''
+    @return: The history_writer for the database, all the HistoryItems that
+    use the same database share it.
+    '''
+    with _writers_lock:
+        writer = _writers.get( db.getFileName() )
+        if writer is None:
+            writer = history_writer( db, insert_sql, directory )
+            _writers[ db.getFileName() ] = writer
+        return writer
+
+
+def remove_history_writer(db):
+    '''
+    Write the pending rows of the database and stop its history_writer, it's
+    called when the database is closed.
+    '''
+    with _writers_lock:
+        writer = _writers.pop( db.getFileName(), None )
+    if writer is not None:
+        writer.close()
+
+
+@atexit.register
+def _close_all():
+    with _writers_lock:
+        writers = _writers.values()
+        _writers.clear()
+    for writer in writers:
+        try:
+            writer.close()
+        except Exception:
+            pass
@@ -22,6 +22,7 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from __future__ import with_statement
 from random import choice
+from hashlib import md5
 import os
 import sqlite3
 import string
@@ -30,6 +31,12 @@ import threading
 import cPickle
 
 from core.controllers.misc.temp_dir import get_temp_dir
+from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
+
+# Rows read from the database at the time while iterating
+ITER_CHUNK_SIZE = 200
+# append() commits after this many values, extend() always commits
+COMMIT_EVERY = 500
 
 
 class disk_list(object):
@@ -39,6 +46,9 @@ class disk_list(object):
         - Is thread safe
         - **NEW** Allows the usage of "for ... in" by the means of an iterator object.
         - Deletes the file when the temp_shelve object is deleted
+        - The values are indexed by the md5 of their pickle, and an in memory
+          bloom filter answers most of the "value in disk_list" queries for
+          values that were never added, without touching the disk
     
     I had to replace the old disk_list because the old one did not support iteration, and the
     only way of adding iteration to that object was doing something like this:
@@ -54,16 +64,21 @@ class disk_list(object):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
     
-    def __init__(self, text_factory=sqlite3.OptimizedUnicode):
+    def __init__(self, text_factory=sqlite3.OptimizedUnicode, use_bloom=True):
         '''
         Create the sqlite3 database and the thread lock.
         
         @param text_factory: A callable object to handle strings.
+        @param use_bloom: Keep a bloom filter with the digests of the values
+        in memory, to avoid querying the database for most of the values that
+        are not in the list.
         '''
         # Init some attributes
         self._conn = None
         self._filename = None
         self._current_index = 0
+        self._uncommitted = 0
+        self._bloom = scalable_bloomfilter() if use_bloom else None
         
         # text factory for the connection
         self._text_factory = text_factory
@@ -88,13 +103,20 @@ class disk_list(object):
                 # Set up the text_factory to the connection
                 self._conn.text_factory = self._text_factory
 
+                # This is a temp file, if we crash we don't care about it.
+                # WAL makes the commit after each extend() cheap
+                self._conn.execute('PRAGMA journal_mode = WAL')
+                self._conn.execute('PRAGMA synchronous = OFF')
+
                 # Create table
                 self._conn.execute(
-                    '''CREATE TABLE data (index_ real, information text)''')
+                    '''CREATE TABLE data (index_ INTEGER PRIMARY KEY,
+                                          digest BLOB, information BLOB)''')
 
-                # Create index
+                # Create index, over the fixed size digest and not over the
+                # (maybe huge) pickled value
                 self._conn.execute(
-                    '''CREATE INDEX data_index ON data(information)''')
+                    '''CREATE INDEX data_index ON data(digest)''')
 
             except Exception,  e:
                 
@@ -124,58 +146,112 @@ class disk_list(object):
             try:
                 self._conn.close()
                 os.remove(self._filename)
+                for suffix in ('-wal', '-shm'):
+                    if os.path.exists(self._filename + suffix):
+                        os.remove(self._filename + suffix)
             except:
                 pass
     
+    def _serialize(self, value):
+        '''
+        @return: The (digest, pickle) tuple for the value.
+        '''
+        pickled = cPickle.dumps(value)
+        return sqlite3.Binary(md5(pickled).digest()), sqlite3.Binary(pickled)
+
     def __contains__(self, value):
         '''
-        @return: True if the str(value) is in our list.
+        @return: True if the value is in our list.
         '''
+        digest, pickled = self._serialize(value)
+
         with self._db_lock:
-            t = ( cPickle.dumps(value) , )
+            if self._bloom is not None and str(digest) not in self._bloom:
+                return False
+
             # Adding the "limit 1" to the query makes it faster, as it won't 
             # have to scan through all the table/index, it just stops on the
-            # first match.
+            # first match. The pickle is compared to be safe against md5
+            # collisions, this is cheap since the index already found the row.
             cursor = self._conn.execute(
-                    'SELECT count(*) FROM data WHERE information=? limit 1', t)
-            return cursor.fetchone()[0]
+                    'SELECT count(*) FROM data WHERE digest=? AND information=?'
+                    ' limit 1', (digest, pickled))
+            return bool(cursor.fetchone()[0])
     
     def append(self, value):
         '''
         Append a value to the disk_list.
         
-        @param value: The value to append. In all cases we're going to store the str()
-        representation of the value. In order to be consistent, in __contains__ we also
-        perform a str(). 
+        @param value: The value to append. In all cases we're going to store the
+        pickled representation of the value. In order to be consistent, in
+        __contains__ we also pickle the value.
         '''
+        self._insert( [self._serialize(value)], commit=False )
+
+    def extend(self, values):
+        '''
+        Append all the values to the disk_list, in one transaction.
+        '''
+        self._insert( [ self._serialize(value) for value in values ], commit=True )
+
+    def _insert(self, rows, commit):
         # thread safe here!
         with self._db_lock:
-            value = cPickle.dumps(value)
-            t = (self._current_index, value)
-            self._conn.execute("INSERT INTO data VALUES (?, ?)", t)
-            self._current_index += 1
+            start = self._current_index
+            if commit and self._uncommitted:
+                # The rollback below should only discard these rows
+                self._conn.commit()
+                self._uncommitted = 0
+            try:
+                self._conn.executemany("INSERT INTO data VALUES (?, ?, ?)",
+                    [ (start + i, digest, pickled) for i, (digest, pickled)
+                      in enumerate(rows) ])
+            except:
+                if commit:
+                    self._conn.rollback()
+                raise
+
+            self._current_index += len(rows)
+            self._uncommitted += len(rows)
+            if commit or self._uncommitted >= COMMIT_EVERY:
+                self._conn.commit()
+                self._uncommitted = 0
+
+            if self._bloom is not None:
+                self._bloom.add_many( str(digest) for digest, _ in rows )
     
     def __iter__(self):
-        #   TODO: How do I make the __iter__ thread safe?
-        class my_cursor:
-            def __init__(self, cursor):
-                self._cursor = cursor
-            
-            def next(self):
-                r = self._cursor.next()
-                obj = cPickle.loads( r[0] )
-                return obj
-        
-        cursor = self._conn.execute('SELECT information FROM data')
-        mc = my_cursor(cursor)
-        return mc
+        '''
+        Iterate over the values that were in the list when the iteration
+        started, the values are read in chunks and the lock is only held
+        while a chunk is read, so other threads can append values meanwhile.
+        '''
+        with self._db_lock:
+            end = self._current_index
+
+        last = -1
+        while last < end - 1:
+            with self._db_lock:
+                cursor = self._conn.execute(
+                    'SELECT index_, information FROM data WHERE index_ > ?'
+                    ' AND index_ < ? ORDER BY index_ LIMIT ?',
+                    (last, end, ITER_CHUNK_SIZE))
+                rows = cursor.fetchall()
+
+            if not rows:
+                break
+
+            for index, pickled in rows:
+                yield cPickle.loads( str(pickled) )
+            last = rows[-1][0]
 
     def __getitem__(self, key):
         try:
-            query = 'SELECT information FROM data WHERE index_ = %s' % key
-            cursor = self._conn.execute( query )
-            r = cursor.next()
-            obj = cPickle.loads( r[0] )
+            with self._db_lock:
+                cursor = self._conn.execute(
+                    'SELECT information FROM data WHERE index_ = ?', (int(key),))
+                r = cursor.next()
+            obj = cPickle.loads( str(r[0]) )
         except:
             raise IndexError('list index out of range')
         else:
@@ -183,6 +259,4 @@ class disk_list(object):
         
     def __len__(self):
         with self._db_lock:
-            cursor = self._conn.execute('SELECT count(*) FROM data')
-            return cursor.fetchone()[0]
-
+            return self._current_index
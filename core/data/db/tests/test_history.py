@@ -0,0 +1,266 @@
+'''
+test_history.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import core.data.kb.config as cf
+from core.data.db.db import DB
+from core.data.db.history import HistoryItem
+from core.data.db.history_writer import remove_history_writer
+from core.data.parsers.urlParser import url_object
+from core.data.request.frFactory import createFuzzableRequestRaw
+from core.data.url.httpResponse import httpResponse
+
+
+class test_history(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DB()
+        self.db.connect( os.path.join(self.temp_dir, 'db_test') )
+        self.executemany_calls = 0
+
+        executebatch = self.db.executebatch
+        def counting_executebatch(*args):
+            self.executemany_calls += 1
+            return executebatch(*args)
+        self.db.executebatch = counting_executebatch
+
+        HistoryItem(self.db).initStructure()
+
+    def tearDown(self):
+        remove_history_writer( self.db )
+        self.db.close()
+        shutil.rmtree( self.temp_dir )
+
+    def save(self, id, body='<html>body</html>', path='a', headers={}):
+        url = url_object('http://www.w3af.com/%s/%s.php?id=1' % (path, id))
+        hi = HistoryItem(self.db)
+        hi.request = createFuzzableRequestRaw('GET', url, '', headers)
+        hi.response = httpResponse(200, body, {'Content-Type': 'text/html'},
+                                   url, url, id=id)
+        hi.save()
+        return hi
+
+    def test_read_pending_and_flushed(self):
+        hi = self.save(1, 'first')
+        self.assertEqual( hi._writer.pending(), 1 )
+
+        # Read while the row is still in the writer queue
+        self.assertEqual( HistoryItem(self.db)._loadFromFile(1)[1].getBody(), 'first' )
+
+        read = HistoryItem(self.db).read(1)
+        self.assertEqual( hi._writer.pending(), 0 )
+        self.assertEqual( read.url, 'http://www.w3af.com/a/1.php?id=1' )
+        self.assertEqual( read.response.getBody(), 'first' )
+        self.assertEqual( read.request.getURI().url_string, read.url )
+
+    def test_find_sees_pending_rows(self):
+        for i in xrange(1, 11):
+            self.save(i)
+        found = HistoryItem(self.db).find( [('code', 200, '=')] )
+        self.assertEqual( sorted(h.id for h in found), range(1, 11) )
+
+    def test_batches(self):
+        for i in xrange(1, 301):
+            self.save(i, 'body %s' % i)
+        HistoryItem(self.db)._writer.flush()
+
+        self.assertTrue( self.executemany_calls <= 3, self.executemany_calls )
+        row = self.db.retrieve('SELECT count(*) FROM data_table')
+        self.assertEqual( row[0], 300 )
+
+        # One segment file, no .trace files
+        trace_dir = os.path.join(self.temp_dir, 'db_test_traces')
+        self.assertEqual( os.listdir(trace_dir), ['traces.seg'] )
+
+        # Read from the DB locations, as if the session was opened again
+        HistoryItem(self.db)._writer._segment._index.clear()
+        self.assertEqual( HistoryItem(self.db).read(150).response.getBody(), 'body 150' )
+        self.assertEqual( HistoryItem(self.db)._loadFromFile(299)[1].getBody(), 'body 299' )
+
+    def test_close(self):
+        self.save(1, 'pending')
+        writer = HistoryItem(self.db)._writer
+        self.db.close()
+
+        # The thread was stopped after writing the pending row
+        self.assertFalse( writer._thread.isAlive() )
+        self.db.connect( os.path.join(self.temp_dir, 'db_test') )
+        self.assertEqual( HistoryItem(self.db).read(1).response.getBody(), 'pending' )
+        self.assertFalse( HistoryItem(self.db)._writer is writer )
+
+    def test_flush_failure(self):
+        executebatch = self.db.executebatch
+        def locked(*args):
+            raise Exception('database is locked')
+        self.db.executebatch = locked
+
+        hi = self.save(1, 'first')
+        self.save(2, 'second')
+        self.assertRaises( Exception, hi._writer.flush )
+
+        # The rows are still pending, and written by the next flush()
+        self.assertEqual( hi._writer.pending(), 2 )
+        self.assertEqual( HistoryItem(self.db)._loadFromFile(2)[1].getBody(), 'second' )
+        self.db.executebatch = executebatch
+        hi._writer.flush()
+        row = self.db.retrieve('SELECT count(*) FROM data_table')
+        self.assertEqual( row[0], 2 )
+        self.assertEqual( HistoryItem(self.db).read(1).response.getBody(), 'first' )
+
+    def test_old_session_columns(self):
+        # Sessions saved before the segment file don't have the trace columns
+        remove_history_writer( self.db )
+        hi = HistoryItem(self.db)
+        self.db.execute('DROP TABLE data_table')
+        self.db.createTable( hi.getTableName(), hi.getColumns()[:-2],
+                             hi.getPrimaryKeyColumns() )
+
+        saved = self.save(1, 'old session')
+        saved.tag = 'tagged'
+        saved.save()
+        HistoryItem(self.db)._writer._segment._index.clear()
+        read = HistoryItem(self.db).read(1)
+        self.assertEqual( read.tag, 'tagged' )
+        self.assertEqual( read.response.getBody(), 'old session' )
+
+    def test_update(self):
+        hi = self.save(1, 'old')
+        hi.response = httpResponse(200, 'new', {}, hi.response.getURL(),
+                                   hi.response.getURL(), id=1)
+        hi.tag = 'tagged'
+        hi.save()
+
+        read = HistoryItem(self.db).read(1)
+        self.assertEqual( read.tag, 'tagged' )
+        self.assertEqual( read.response.getBody(), 'new' )
+
+    def test_clear(self):
+        self.save(1)
+        self.save(2)
+        HistoryItem(self.db).clear()
+        self.assertEqual( HistoryItem(self.db).find( [] ), [] )
+        self.assertRaises( IOError, HistoryItem(self.db)._loadFromFile, 1 )
+
+    def search_ids(self, text, searchData=[], afterId=0, limit=200):
+        found = HistoryItem(self.db).search(text, searchData, afterId, limit)
+        return [ h.id for h in found ]
+
+    def test_search(self):
+        cf.cf.save('historyIndexBodies', True)
+        try:
+            self.save(1, '<html>Welcome admin</html>', path='admin')
+            self.save(2, '<html>Your cart</html>', path='shop',
+                      headers={'X-Token': 'abc123'})
+        finally:
+            cf.cf.save('historyIndexBodies', False)
+        self.save(4, '<html>admin</html>', path='shop')
+
+        # The body of 4 wasn't indexed, it was saved with the setting disabled
+        self.assertEqual( self.search_ids('admin'), [1] )
+        self.assertEqual( self.search_ids('url:admin'), [1] )
+        self.assertEqual( self.search_ids('body:welcome'), [1] )
+        self.assertEqual( self.search_ids('headers:abc123'), [2] )
+        self.assertEqual( self.search_ids('abc*'), [2] )
+        # The last word matches the words that start with it, like LIKE did
+        self.assertEqual( self.search_ids('adm'), [1] )
+        self.assertEqual( self.search_ids('url:ad'), [1] )
+        self.assertEqual( self.search_ids('"adm"'), [] )
+        self.assertEqual( self.search_ids('www.w3af.com/shop'), [2, 4] )
+        self.assertEqual( self.search_ids('shop', [('id', 2, '>')]), [4] )
+        self.assertEqual( self.search_ids('nothere'), [] )
+        # No words, all the items
+        self.assertEqual( self.search_ids('/'), [1, 2, 4] )
+
+    def test_search_pages(self):
+        for i in xrange(1, 451):
+            self.save(i)
+
+        pages = []
+        last_id = 0
+        while True:
+            page = self.search_ids('w3af', afterId=last_id)
+            if not page:
+                break
+            pages.append( page )
+            last_id = page[-1]
+
+        self.assertEqual( [ len(p) for p in pages ], [200, 200, 50] )
+        self.assertEqual( sum(pages, []), range(1, 451) )
+
+    def test_search_tag_update_delete(self):
+        self.save(1)
+        hi = self.save(2)
+        hi.updateTag('Interesting', True)
+        self.assertEqual( self.search_ids('tag:interesting'), [2] )
+
+        # Saving it again keeps one index row
+        hi.save()
+        self.assertEqual( self.search_ids('w3af'), [1, 2] )
+
+        HistoryItem(self.db).delete(2)
+        self.assertEqual( self.search_ids('interesting'), [] )
+        HistoryItem(self.db).clear()
+        self.assertEqual( self.search_ids('w3af'), [] )
+
+    def test_search_without_index(self):
+        self.save(1, path='admin')
+        self.save(2)
+        HistoryItem(self.db)._writer.flush()
+
+        # Like the sessions created before the index
+        remove_history_writer( self.db )
+        self.db.execute('DROP TABLE history_fts')
+        self.assertEqual( self.search_ids('admin'), [1] )
+        self.assertEqual( self.search_ids('w3af', afterId=1), [2] )
+
+    def test_search_benchmark(self):
+        rows = 20000
+        hi = HistoryItem(self.db)
+        self.db.executebatch( [(hi._indexSql,
+                                [ (i, 'http://w3af.com/p%s/x%s.php' % (i % 1000, i), '',
+                                   'Content-Type: text/html', '') for i in xrange(1, rows + 1) ]),
+                               ('INSERT INTO data_table (id, url, code, tag, mark,'
+                                ' time, response_size, codef) VALUES (?,?,200,"",0,0.1,1,2)',
+                                [ (i, 'http://w3af.com/p%s/x%s.php' % (i % 1000, i))
+                                  for i in xrange(1, rows + 1) ])] )
+
+        start = time.time()
+        self.assertEqual( len(self.search_ids('"p7"')), 20 )
+        self.assertEqual( self.search_ids('x12345'), [12345] )
+        self.assertEqual( len(self.search_ids('html', [('codef', 2, '=')])), 200 )
+        elapsed = time.time() - start
+
+        like = [('url', '%x12345%', 'like')]
+        start = time.time()
+        self.assertEqual( len(hi.find(like)), 1 )
+        like_elapsed = time.time() - start
+
+        print '\nHistory search over %s rows: %.3fs (index) vs. %.3fs (LIKE)' \
+              % (rows, elapsed, like_elapsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import random
 from random import choice
+import threading
 import unittest
 import string
 
@@ -76,6 +77,51 @@ class test_disk_list(unittest.TestCase):
         self.assertEqual( dl[1] == 1  , True)
         self.assertEqual( dl[2] == [3,2,1], True)
 
+    def test_getitem_out_of_range(self):
+        dl = disk_list()
+        dl.append( 'a' )
+        self.assertRaises( IndexError, dl.__getitem__, 1 )
+        self.assertRaises( IndexError, dl.__getitem__, '0 OR 1=1' )
+
+    def test_extend(self):
+        dl = disk_list()
+        dl.append( 'a' )
+        dl.extend( xrange(100) )
+        dl.extend( [] )
+        dl.append( 'b' )
+
+        self.assertEqual( len(dl), 102 )
+        self.assertEqual( list(dl), ['a'] + range(100) + ['b'] )
+        self.assertEqual( dl[50], 49 )
+        self.assertEqual( 99 in dl, True )
+        self.assertEqual( 100 in dl, False )
+
+    def test_no_bloom(self):
+        dl = disk_list( use_bloom=False )
+        dl.extend( ['a', u'\xe1', (1, 2)] )
+
+        self.assertEqual( 'a' in dl, True )
+        self.assertEqual( u'\xe1' in dl, True )
+        self.assertEqual( (1, 2) in dl, True )
+        self.assertEqual( 'b' in dl, False )
+
+    def test_iter_snapshot(self):
+        dl = disk_list()
+        dl.extend( xrange(1000) )
+
+        values = []
+        for i in dl:
+            values.append( i )
+            if i % 100 == 0:
+                # Values added while iterating are not returned
+                t = threading.Thread( target=dl.append, args=(-i,) )
+                t.start()
+                t.join()
+
+        self.assertEqual( values, range(1000) )
+        self.assertEqual( len(dl), 1010 )
+        self.assertEqual( -900 in dl, True )
+
 if __name__ == '__main__':
     unittest.main()
 
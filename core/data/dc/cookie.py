@@ -22,7 +22,6 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import re
 from core.data.dc.dataContainer import dataContainer
-import copy
 
 
 class cookie(dataContainer):
@@ -61,11 +60,3 @@ class cookie(dataContainer):
                 vs = self._sanitize( self[parameter_name][element_index] )
                 res += ks + '=' + vs + '; '
         return res[:-1]
-        
-    def copy(self):
-        '''
-        This method returns a copy of the cookie Object.
-        
-        @return: A copy of myself.
-        '''
-        return copy.deepcopy( self )
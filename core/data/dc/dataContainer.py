@@ -70,9 +70,21 @@ class dataContainer(dict):
         
     def copy(self):
         '''
-        This method returns a copy of the dataContainer Object.
+        This method returns a copy of the dataContainer Object. The lists
+        with the values are copied, so they can be modified, but the values
+        (strings) are shared.
+        
+        >>> dc = dataContainer( [('a', ['1'])] )
+        >>> dc_copy = dc.copy()
+        >>> dc_copy['a'][0] = '2'
+        >>> dc, dc_copy, type(dc_copy) is dataContainer
+        ({'a': ['1']}, {'a': ['2']}, True)
         
         @return: A copy of myself.
         '''
-        return copy.deepcopy(self)
+        new_dc = copy.copy(self)
+        for key, value in self.iteritems():
+            if isinstance(value, list):
+                dict.__setitem__(new_dc, key, value[:])
+        return new_dc
         
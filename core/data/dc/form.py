@@ -55,6 +55,18 @@ class form(dataContainer):
         # This is used for processing checkboxes
         self._secret_value = "3_!21#47w@"
         
+    def copy(self):
+        '''
+        @return: A copy of the form, see dataContainer.copy(). The types,
+        files, options and submit values are also copied.
+        '''
+        new_form = dataContainer.copy(self)
+        new_form._types = self._types.copy()
+        new_form._files = self._files[:]
+        new_form._selects = dict( [ (k, v[:]) for k, v in self._selects.iteritems() ] )
+        new_form._submitMap = self._submitMap.copy()
+        return new_form
+        
     def getAction(self):
         '''
         @return: The form action.
@@ -75,51 +75,93 @@ def createMutants( freq, mutant_str_list, append=False, fuzzableParamList = [] ,
     @parameter fuzzableParamList: If [] then all params are fuzzed. If ['a'] , then only 'a' is fuzzed.
     @return: A Mutant object List.
     '''
-    result = []
+    return list( iterMutants( freq, mutant_str_list, append, fuzzableParamList, oResponse ) )
+
+def iterMutants( freq, mutant_str_list, append=False, fuzzableParamList = [] , oResponse = None ):
+    '''
+    The same as createMutants(), but the mutants are created one at the time,
+    when the caller asks for them. The plugins that send each mutant as soon
+    as they get it don't need to keep all of them in memory.
     
+    @parameter mutant_str_list: a list with mutant strings to use, it is
+    iterated more than once so it can't be a generator.
+    @return: A generator that yields the mutant objects.
+
+    >>> from core.data.parsers.urlParser import url_object
+    >>> from core.data.request.httpQsRequest import httpQsRequest
+    >>> freq = httpQsRequest()
+    >>> freq.setURI( url_object('http://www.w3af.com/?a=1&b=2') )
+    >>> mutants = iterMutants( freq, ['abc', 'def'], oResponse='body' )
+    >>> m = mutants.next()
+    >>> m.getURI().url_string, m.getOriginalResponseBody()
+    ('http://www.w3af.com/?a=abc&b=2', 'body')
+    >>> [ m.getURI().url_string for m in mutants ]
+    ['http://www.w3af.com/?a=def&b=2', 'http://www.w3af.com/?a=1&b=abc', 'http://www.w3af.com/?a=1&b=def']
+    '''
     _fuzzable = _createFuzzable( freq )
+    generators = []
+    
     # Query string parameters
     if isinstance( freq, httpQsRequest ):
         om.out.debug('Fuzzing query string')
-        result.extend( _createMutantsWorker( freq, mutantQs, mutant_str_list, fuzzableParamList , append ) )
+        generators.append( _iterMutantsWorker( freq, mutantQs, mutant_str_list, fuzzableParamList , append ) )
     
     # POST-data parameters
     if isinstance( freq, httpPostDataRequest ):
         # If this is a POST request, it could be a JSON request, and I want to fuzz it !
         om.out.debug('Fuzzing POST data')
         if isJSON( freq ):
-            result.extend( _createJSONMutants( freq, mutantJSON, mutant_str_list, fuzzableParamList , append ) )
+            generators.append( _createJSONMutants( freq, mutantJSON, mutant_str_list, fuzzableParamList , append ) )
         else:
-            result.extend( _createMutantsWorker( freq, mutantPostData, mutant_str_list, fuzzableParamList , append ) )
+            generators.append( _iterMutantsWorker( freq, mutantPostData, mutant_str_list, fuzzableParamList , append ) )
     
     # File name
     if 'fuzzedFname' in _fuzzable and isinstance( freq, httpQsRequest ):
         om.out.debug('Fuzzing file name')
-        result.extend( _createFileNameMutants( freq, mutantFileName, mutant_str_list, fuzzableParamList , append ) )
+        generators.append( _iterFileNameMutants( freq, mutantFileName, mutant_str_list, fuzzableParamList , append ) )
     
     # Headers
     if 'headers' in _fuzzable:
         om.out.debug('Fuzzing headers')
-        result.extend( _createMutantsWorker( freq, mutantHeaders, mutant_str_list, fuzzableParamList , append, dataContainer=_fuzzable['headers'] ) )
+        generators.append( _iterMutantsWorker( freq, mutantHeaders, mutant_str_list, fuzzableParamList , append, dataContainer=_fuzzable['headers'] ) )
         
     # Cookie values
     if 'cookie' in _fuzzable and freq.getCookie():
         om.out.debug('Fuzzing cookie')
-        result.extend( _createMutantsWorker( freq, mutantCookie, mutant_str_list, fuzzableParamList , append, dataContainer=freq.getCookie() ) )
+        generators.append( _iterMutantsWorker( freq, mutantCookie, mutant_str_list, fuzzableParamList , append, dataContainer=freq.getCookie() ) )
         
     # File content of multipart forms
     if 'fuzzFileContent' in _fuzzable and isinstance( freq, httpPostDataRequest ):
         om.out.debug('Fuzzing file content')
-        result.extend( _createFileContentMutants( freq, mutantFileContent, mutant_str_list, fuzzableParamList , append ) )
+        generators.append( _createFileContentMutants( freq, mutantFileContent, mutant_str_list, fuzzableParamList , append ) )
     
-    #
-    # Get the original response, and apply it to all mutants
-    #
-    if oResponse is not None:
-        for m in result:
-            m.setOriginalResponseBody( oResponse )
-        
-    return result
+    for generator in generators:
+        for m in generator:
+            #
+            # Get the original response, and apply it to all mutants
+            #
+            if oResponse is not None:
+                m.setOriginalResponseBody( oResponse )
+            yield m
+
+def _copy_on_write( freq ):
+    '''
+    @return: A function that returns copies of freq. The copies share the
+    URL and cookie objects, and the data container and headers until they
+    are requested with getDc() / getHeaders() (see fuzzableRequest.copy()),
+    so the mutants that replace the data container with setDc() never copy
+    it.
+    
+    >>> from core.data.parsers.urlParser import url_object
+    >>> from core.data.request.fuzzableRequest import fuzzableRequest
+    >>> fr = fuzzableRequest()
+    >>> fr.setURL( url_object('http://www.w3af.com/') )
+    >>> new_copy = _copy_on_write( fr )
+    >>> c1, c2 = new_copy(), new_copy()
+    >>> c1.getURL() is c2.getURL(), c1.getHeaders() is c2.getHeaders()
+    (True, False)
+    '''
+    return freq.copy().copy
 
 def _createJSONMutants( freq, mutantClass, mutant_str_list, fuzzableParamList , append ):
     '''
@@ -128,23 +170,20 @@ def _createJSONMutants( freq, mutantClass, mutant_str_list, fuzzableParamList ,
     @parameter fuzzableParamList: What parameters should be fuzzed
     @parameter append: True/False, if we should append the value or replace it.
     @parameter mutant_str_list: a list with mutant strings to use
-    @return: Mutants that have the JSON postdata changed with the strings at mutant_str_list
+    @return: A generator for the mutants that have the JSON postdata changed with the strings at mutant_str_list
     '''
     # We define a function that creates the mutants...
     def _makeMutants( freq, mutantClass, mutant_str_list, fuzzableParamList , append, jsonPostData):
-        res = []
+        new_copy = _copy_on_write( freq )
         
         for fuzzed_json, original_value in _fuzzJSON( mutant_str_list, jsonPostData, append ):
         
             # Create the mutants
-            freq_copy = freq.copy()
-            m = mutantClass( freq_copy ) 
+            m = mutantClass( new_copy() ) 
             m.setOriginalValue( original_value )
             m.setVar( 'JSON data' )
             m.setDc( fuzzed_json )
-            res.append( m )
-            
-        return res
+            yield m
         
     # Now we define a function that does the work...
     def _fuzzJSON( mutant_str_list, jsonPostData, append ):
@@ -239,9 +278,8 @@ def _createFileContentMutants( freq, mutantClass, mutant_str_list, fuzzableParam
     @parameter fuzzableParamList: What parameters should be fuzzed
     @parameter append: True/False, if we should append the value or replace it.
     @parameter mutant_str_list: a list with mutant strings to use
-    @return: Mutants that have the file content changed with the strings at mutant_str_list
+    @return: A generator for the mutants that have the file content changed with the strings at mutant_str_list
     '''
-    res = []
     tmp = []
     if freq.getFileVariables():
         for mutant_str in mutant_str_list:
@@ -251,8 +289,8 @@ def _createFileContentMutants( freq, mutantClass, mutant_str_list, fuzzableParam
                 extension = cf.cf.getData('fuzzFCExt' ) or 'txt'
                 str_file_instance.name = createRandAlpha( 7 ) + '.' + extension
                 tmp.append( str_file_instance )
-        res = _createMutantsWorker( freq, mutantClass, tmp, freq.getFileVariables() , append )
-    return res
+        for m in _iterMutantsWorker( freq, mutantClass, tmp, freq.getFileVariables() , append ):
+            yield m
     
 def _createFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamList , append ):
     '''
@@ -262,7 +300,8 @@ def _createFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamLis
     @parameter append: True/False, if we should append the value or replace it.
     @parameter mutant_str_list: a list with mutant strings to use
     
-    @return: Mutants that have the filename URL changed with the strings at mutant_str_list
+    @return: Mutants that have the filename URL changed with the strings at mutant_str_list, see
+    _iterFileNameMutants()
     
     >>> from core.data.parsers.urlParser import url_object
     >>> from core.data.request.fuzzableRequest import fuzzableRequest
@@ -279,7 +318,13 @@ def _createFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamLis
     ['http://www.w3af.com/abc/%2Fetc%2Fpasswd.html', 'http://www.w3af.com/abc//etc/passwd.html', 'http://www.w3af.com/abc/def.%2Fetc%2Fpasswd', 'http://www.w3af.com/abc/def./etc/passwd']
 
     '''
-    res = []
+    return list( _iterFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamList , append ) )
+
+def _iterFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamList , append ):
+    '''
+    A generator for the mutants of _createFileNameMutants()
+    '''
+    new_copy = _copy_on_write( freq )
     fileName = freq.getURL().getFileName()
     splittedFileName = [ x for x in re.split( r'([a-zA-Z0-9]+)', fileName ) if x != '' ] 
     for i in xrange( len( splittedFileName ) ):
@@ -293,7 +338,7 @@ def _createFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamLis
                     divided_file_name['fuzzedFname'] = urllib.quote_plus( mutant_str )
                 divided_file_name['end'] = ''.join( splittedFileName[i+1:] )
                 
-                freq_copy = freq.copy()
+                freq_copy = new_copy()
                 freq_copy.setURL( freq.getURL() )
                 
                 # Create the mutant
@@ -304,15 +349,14 @@ def _createFileNameMutants( freq, mutantClass, mutant_str_list, fuzzableParamLis
                 m.setModValue( mutant_str )
                 # Special for filename fuzzing and some configurations of mod_rewrite
                 m.setDoubleEncoding( False )
-                res.append( m )
+                yield m
                 
                 # The same but with a different type of encoding! (mod_rewrite)
                 m2 = m.copy()
                 m2.setSafeEncodeChars('/')
                 
                 if m2.getURL() != m.getURL():
-                    res.append( m2 )
-    return res
+                    yield m2
     
 def _createMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList,append, dataContainer=None):
     '''
@@ -362,10 +406,20 @@ def _createMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList,
     [{'foo': ['abc'], 'address': ['Bonsai Street 123']}, {'foo': ['def'], 'address': ['Bonsai Street 123']}, {'foo': ['56'], 'address': ['abc']}, {'foo': ['56'], 'address': ['def']}]
 
     '''
-    result = []
+    return list( _iterMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList, append, dataContainer ) )
+
+def _iterMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList,append, dataContainer=None):
+    '''
+    A generator for the mutants of _createMutantsWorker(). The fuzzable
+    request is copied once and shared by the mutants (see _copy_on_write), and
+    the empty form fields are filled once for all of them.
+    '''
     if not dataContainer:
         dataContainer = freq.getDc()
 
+    new_copy = _copy_on_write( freq )
+    filledContainer = _fillForm( dataContainer )
+
     for parameter_name in dataContainer:
         
         #
@@ -398,39 +452,15 @@ def _createMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList,
                 # or fuzz all of them (the fuzzableParamList == [] case)
                 if parameter_name in fuzzableParamList or fuzzableParamList == []:
                     
-                    dataContainerCopy = dataContainer.copy()
+                    # The filled container has the other fields of the form filled in
+                    dataContainerCopy = filledContainer.copy()
                     original_value = element_value
                     
                     if append :
-                        dataContainerCopy[parameter_name][element_index] += mutant_str
+                        dataContainerCopy[parameter_name][element_index] = original_value + mutant_str
                     else:
                         dataContainerCopy[parameter_name][element_index] = mutant_str
 
-                    # Ok, now we have a data container with the mutant string, but it's possible that
-                    # all the other fields of the data container are empty (think about a form)
-                    # We need to fill those in, with something *useful* to get around the easiest
-                    # developer checks like: "parameter A was filled".
-                    
-                    # But I only perform this task in HTML forms, everything else is left as it is:
-                    if isinstance( dataContainerCopy, form ):
-                        for var_name_dc in dataContainerCopy:
-                            for element_index_dc, element_value_dc in enumerate(dataContainerCopy[var_name_dc]):
-                                if (var_name_dc, element_index_dc) != (parameter_name, element_index) and\
-                                dataContainerCopy.getType(var_name_dc) not in ['checkbox', 'radio', 'select', 'file' ]:
-                                    
-                                    #   Fill only if the parameter does NOT have a value set.
-                                    #
-                                    #   The reason of having this already set would be that the form
-                                    #   has something like this:
-                                    #
-                                    #   <input type="text" name="p" value="foobar">
-                                    #
-                                    if dataContainerCopy[var_name_dc][element_index_dc] == '':
-                                        #
-                                        #   Fill it smartly
-                                        #
-                                        dataContainerCopy[var_name_dc][element_index_dc] = smartFill(var_name_dc)
-
                     # __HERE__
                     # Please see the comment above for an explanation of what we are doing here:
                     for var_name in freq.getFileVariables():
@@ -442,18 +472,57 @@ def _createMutantsWorker( freq, mutantClass, mutant_str_list, fuzzableParamList,
                         dataContainerCopy[var_name][0] = str_file_instance
                     
                     # Create the mutant
-                    freq_copy = freq.copy()
-                    m = mutantClass( freq_copy )
+                    m = mutantClass( new_copy() )
                     m.setVar( parameter_name, index=element_index )
                     m.setDc( dataContainerCopy )
                     m.setOriginalValue( original_value )
                     m.setModValue( mutant_str )
                     
-                    # Done, add it to the result
-                    result.append( m )
+                    yield m
+    
+def _fillForm( dataContainer ):
+    '''
+    It's possible that all the fields of the data container that we fuzz are
+    empty (think about a form). We need to fill those in, with something
+    *useful* to get around the easiest developer checks like: "parameter A was
+    filled". The fuzzed field is overwritten by each mutant.
+    
+    @return: A copy of the data container with the empty fields filled. But I
+    only perform this task in HTML forms, everything else is left as it is.
 
-    return result
+    >>> from core.data.dc.form import form
+    >>> f = form()
+    >>> _ = f.addInput( [("name", "address") , ("type", "text")] )
+    >>> _ = f.addInput( [("name", "p") , ("type", "text"), ("value", "foobar")] )
+    >>> _ = f.addInput( [("name", "c") , ("type", "checkbox")] )
+    >>> _fillForm( f )
+    {'p': ['foobar'], 'c': [''], 'address': ['Bonsai Street 123']}
+    '''
+    filledContainer = dataContainer.copy()
+    if not isinstance( filledContainer, form ):
+        return filledContainer
     
+    for var_name_dc in filledContainer:
+        if filledContainer.getType(var_name_dc) in ['checkbox', 'radio', 'select', 'file' ]:
+            continue
+        
+        values = filledContainer[var_name_dc]
+        for element_index_dc, element_value_dc in enumerate(values):
+            #   Fill only if the parameter does NOT have a value set.
+            #
+            #   The reason of having this already set would be that the form
+            #   has something like this:
+            #
+            #   <input type="text" name="p" value="foobar">
+            #
+            if element_value_dc == '':
+                #
+                #   Fill it smartly
+                #
+                values[element_index_dc] = smartFill(var_name_dc)
+    
+    return filledContainer
+
 def createRandAlpha( length=0 ):
     '''
     Create a random string ONLY with letters
@@ -90,7 +90,7 @@ class mutant(object):
         Set the value of the variable that this mutant modifies.
         '''
         try:
-            self._freq._dc[ self.getVar() ][ self._index ] = val
+            self._freq.getDc()[ self.getVar() ][ self._index ] = val
         except Exception:
             msg = 'The mutant object wasn\'t correctly initialized. Either the variable to be'
             msg += ' modified, or the index of that variable are incorrect. This error was'
@@ -124,7 +124,13 @@ class mutant(object):
         return False
     
     def copy( self ):
-        return copy.deepcopy( self )
+        '''
+        @return: A copy of the mutant, the fuzzable request is copied with
+        its (cheap) copy() method.
+        '''
+        newMutant = copy.copy( self )
+        newMutant._freq = self._freq.copy()
+        return newMutant
     
     def getOriginalResponseBody( self ):
         '''
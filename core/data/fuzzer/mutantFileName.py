@@ -98,6 +98,11 @@ class mutantFileName(mutant):
     def getModValue(self):
         return self._mutant_dc['fuzzedFname']
     
+    def copy( self ):
+        newMutant = mutant.copy( self )
+        newMutant._mutant_dc = self._mutant_dc.copy()
+        return newMutant
+    
     def setURL( self, u ):
         raise w3afException('You can\'t change the value of the URL in a mutantFileName instance.')
 
@@ -0,0 +1,84 @@
+'''
+test_fuzzer.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import unittest
+
+import core.data.fuzzer.fuzzer as fuzzer
+from core.data.dc.form import form
+from core.data.fuzzer.fuzzer import createMutants, iterMutants
+from core.data.parsers.urlParser import url_object
+from core.data.request.httpPostDataRequest import httpPostDataRequest
+
+
+def create_form_request(fields):
+    f = form()
+    for i in xrange(fields):
+        f.addInput( [("name", "field%s" % i), ("type", "text")] )
+    freq = httpPostDataRequest()
+    freq.setURL( url_object('http://www.w3af.com/post.php') )
+    freq.setDc( f )
+    return freq
+
+
+class test_fuzzer(unittest.TestCase):
+
+    def setUp(self):
+        self.smart_fill_calls = 0
+        self._smartFill = fuzzer.smartFill
+        def counting_smartFill(name):
+            self.smart_fill_calls += 1
+            return self._smartFill( name )
+        fuzzer.smartFill = counting_smartFill
+
+    def tearDown(self):
+        fuzzer.smartFill = self._smartFill
+
+    def test_lazy(self):
+        freq = create_form_request(20)
+        mutants = iterMutants( freq, [ str(i) for i in xrange(100) ] )
+        first = mutants.next()
+        self.assertEqual( first.getVar(), first.getDc().keys()[0] )
+        # The form is filled once, not once for each mutant
+        self.assertEqual( self.smart_fill_calls, 20 )
+
+        self.assertEqual( len(list(mutants)), 20 * 100 - 1 )
+        self.assertEqual( self.smart_fill_calls, 20 )
+
+    def test_independent_mutants(self):
+        freq = create_form_request(3)
+        freq.setHeaders( {'Referer': 'http://www.w3af.com/'} )
+        mutants = createMutants( freq, ['abc', 'def'], append=True )
+        self.assertEqual( len(mutants), 6 )
+
+        # Changing one mutant doesn't change its siblings nor the original
+        mutants[0].setModValue( 'changed' )
+        mutants[0].getHeaders()['Cookie'] = 'a=b'
+        self.assertEqual( mutants[1].getModValue(), 'def' )
+        self.assertFalse( 'Cookie' in mutants[1].getHeaders() )
+        self.assertFalse( 'Cookie' in freq.getHeaders() )
+        self.assertEqual( freq.getDc()[ mutants[0].getVar() ], [''] )
+
+        for m in mutants:
+            filled = [ v for name, v in m.getDc().items() if name != m.getVar() ]
+            self.assertTrue( all( v != [''] for v in filled ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
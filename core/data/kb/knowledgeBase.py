@@ -39,6 +39,11 @@ class knowledgeBase:
     def __init__(self):
         self._kb = {}
         self._kb_lock = threading.RLock()
+        # (plugin name, variable name) -> { (url, variable): info object }
+        self._vuln_index = {}
+        # plugin name -> the info objects that were appended, in order. The
+        # other values (urls, strings, etc.) are not needed by audit_wrapper()
+        self._appended = {}
 
     def save( self, callingInstance, variableName, value ):
         '''
@@ -54,6 +59,12 @@ class knowledgeBase:
                 self._kb[ name ] = {variableName: value}
             else:
                 self._kb[ name ][ variableName ] = value
+            
+            # The saved value replaces the whole list
+            self._vuln_index.pop( (name, variableName), None )
+            if isinstance( value, list ):
+                for item in value:
+                    self._index( name, variableName, item )
         
     def append( self, callingInstance, variableName, value ):
         '''
@@ -72,6 +83,97 @@ class knowledgeBase:
                     self._kb[ name ][ variableName ].extend( [value,] )
                 else:
                     self._kb[ name ][ variableName ] = [value,]
+            
+            self._index( name, variableName, value )
+            if isinstance( value, info.info ):
+                self._appended.setdefault( name, [] ).append( value )
+    
+    def _index( self, name, variableName, value ):
+        '''
+        Add the info object to the (url, variable) index, the first one that
+        was reported for each (url, variable) is kept. Must be called with the
+        lock held.
+        '''
+        if not isinstance( value, info.info ):
+            return
+        
+        url = value.getURL()
+        if url is not None:
+            url = url.url_string
+        
+        index = self._vuln_index.setdefault( (name, variableName), {} )
+        index.setdefault( (url, value.getVar()), value )
+    
+    def isReported( self, callingInstance, variableName, url, variable ):
+        '''
+        @parameter url: The URL (or URI, the query string is ignored) to query.
+        @parameter variable: The name of the vulnerable parameter.
+        
+        @return: True if an info/vuln object with the same URL and variable
+        was saved by the plugin under variableName. The query is a dict lookup,
+        no matter how many objects were saved.
+        
+        >>> from core.data.parsers.urlParser import url_object
+        >>> knowb = knowledgeBase()
+        >>> v = vuln.vuln()
+        >>> v.setURI( url_object('http://www.w3af.com/a.php?id=1') )
+        >>> v.setVar( 'id' )
+        >>> knowb.append( 'sqli', 'sqli', v )
+        >>> knowb.isReported( 'sqli', 'sqli', url_object('http://www.w3af.com/a.php?id=2'), 'id' )
+        True
+        >>> knowb.isReported( 'sqli', 'sqli', url_object('http://www.w3af.com/a.php'), 'x' )
+        False
+        >>> knowb.save( 'sqli', 'sqli', [] )
+        >>> knowb.isReported( 'sqli', 'sqli', url_object('http://www.w3af.com/a.php'), 'id' )
+        False
+        '''
+        if isinstance( callingInstance, basestring ):
+            name = callingInstance
+        else:
+            name = callingInstance.getName()
+        
+        key = ( url.uri2url().url_string, variable )
+        with self._kb_lock:
+            index = self._vuln_index.get( (name, variableName) )
+            return index is not None and key in index
+    
+    def getAppendCount( self, callingInstance ):
+        '''
+        @return: The amount of info objects that were appended by the plugin,
+        to be used with getAppendedSince().
+        '''
+        if isinstance( callingInstance, basestring ):
+            name = callingInstance
+        else:
+            name = callingInstance.getName()
+        
+        with self._kb_lock:
+            return len( self._appended.get( name, [] ) )
+    
+    def getAppendedSince( self, callingInstance, count ):
+        '''
+        @parameter count: The value returned by getAppendCount()
+        @return: The info objects that were appended by the plugin after the
+        call to getAppendCount().
+        
+        >>> knowb = knowledgeBase()
+        >>> v1, v2, i3 = vuln.vuln(), vuln.vuln(), info.info()
+        >>> knowb.append( 'xss', 'xss', v1 )
+        >>> count = knowb.getAppendCount( 'xss' )
+        >>> knowb.append( 'xss', 'xss', v2 )
+        >>> knowb.append( 'xss', 'urls', 'http://www.w3af.com/' )
+        >>> knowb.append( 'xss', 'other', i3 )
+        >>> new = knowb.getAppendedSince( 'xss', count )
+        >>> len( new ), new[0] is v2, new[1] is i3
+        (2, True, True)
+        '''
+        if isinstance( callingInstance, basestring ):
+            name = callingInstance
+        else:
+            name = callingInstance.getName()
+        
+        with self._kb_lock:
+            return self._appended.get( name, [] )[ count: ]
         
     def getData( self, pluginWhoSavedTheData, variableName=None ):
         '''
@@ -148,5 +250,7 @@ class knowledgeBase:
         '''
         with self._kb_lock:
             self._kb.clear()
+            self._vuln_index.clear()
+            self._appended.clear()
         
 kb = knowledgeBase()
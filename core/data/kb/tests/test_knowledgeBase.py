@@ -0,0 +1,102 @@
+'''
+test_knowledgeBase.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import time
+import unittest
+
+from core.controllers.basePlugin.baseAuditPlugin import baseAuditPlugin
+from core.data.kb.knowledgeBase import kb
+from core.data.parsers.urlParser import url_object
+from core.data.request.httpQsRequest import httpQsRequest
+import core.data.kb.vuln as vuln
+
+
+def create_vuln(i, variable='id'):
+    v = vuln.vuln()
+    v.setURI( url_object('http://www.w3af.com/%s.php?%s=1' % (i, variable)) )
+    v.setVar( variable )
+    return v
+
+
+class reporting_plugin(baseAuditPlugin):
+
+    def audit(self, freq):
+        for i in xrange(3):
+            kb.append( self, 'reporting_plugin', create_vuln(i) )
+        kb.append( self, 'other', create_vuln(0, 'x') )
+        # Not returned by audit_wrapper()
+        kb.append( self, 'urls', freq.getURL() )
+
+
+class test_knowledgeBase(unittest.TestCase):
+
+    def tearDown(self):
+        kb.cleanup()
+
+    def test_has_no_bug(self):
+        plugin = reporting_plugin()
+        for i in xrange(10000):
+            kb.append( 'sqli', 'sqli', create_vuln(i) )
+
+        uri = url_object('http://www.w3af.com/5000.php?id=3')
+        self.assertFalse( plugin._hasNoBug( 'sqli', 'sqli', uri, 'id' ) )
+        self.assertTrue( plugin._hasNoBug( 'sqli', 'sqli', uri, 'other' ) )
+        self.assertTrue( plugin._hasNoBug( 'sqli', 'blind_sqli', uri, 'id' ) )
+        self.assertTrue( plugin._hasNoBug( 'xss', 'xss', uri, 'id' ) )
+
+        # The saved vulns aren't read, the linear scan called getVar() on
+        # each one of them
+        calls = []
+        getVar = vuln.vuln.getVar
+        def counting_getVar(self):
+            calls.append( self )
+            return getVar(self)
+        vuln.vuln.getVar = counting_getVar
+        try:
+            start = time.time()
+            for _ in xrange(1000):
+                plugin._hasNoBug( 'sqli', 'sqli', uri, 'id' )
+            elapsed = time.time() - start
+        finally:
+            vuln.vuln.getVar = getVar
+
+        self.assertEqual( calls, [] )
+        print '\n_hasNoBug() with 10000 saved vulns: %.3fms per call' % elapsed
+
+    def test_save_replaces_index(self):
+        kb.append( 'sqli', 'sqli', create_vuln(1) )
+        kb.save( 'sqli', 'sqli', [ create_vuln(2) ] )
+        self.assertFalse( kb.isReported( 'sqli', 'sqli', url_object('http://www.w3af.com/1.php'), 'id' ) )
+        self.assertTrue( kb.isReported( 'sqli', 'sqli', url_object('http://www.w3af.com/2.php'), 'id' ) )
+
+    def test_audit_wrapper(self):
+        plugin = reporting_plugin()
+        kb.append( plugin, 'reporting_plugin', create_vuln(100) )
+
+        freq = httpQsRequest()
+        freq.setURI( url_object('http://www.w3af.com/') )
+        new_ones = plugin.audit_wrapper( freq )
+
+        self.assertEqual( len(new_ones), 4 )
+        self.assertEqual( [ v.getVar() for v in new_ones ], ['id', 'id', 'id', 'x'] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,24 +23,76 @@ from __future__ import with_statement
 
 from core.controllers.w3afException import w3afException
 import core.data.parsers.documentParser as documentParser
-from core.controllers.misc.lru import LRU
+from core.controllers.misc.sharded_lru import sharded_lru, DEFAULT_SHARDS
 
+import sys
 import threading
 
+# The cache holds parsers for documents that add up to this amount of bytes.
+# The parsed documents use more memory than the raw ones, but the proportion
+# is similar for all of them, so this is a good approximation.
+DP_CACHE_MAX_SIZE = 10 * 1024 * 1024
+# Even an empty document uses some memory
+DP_CACHE_ENTRY_OVERHEAD = 1024
+# The cache uses less shards when it's needed to store documents of this size,
+# the bigger ones are parsed each time they are needed
+DP_CACHE_MAX_DOCUMENT_SIZE = 2560 * 1024
+
+
+class _parse_in_progress(object):
+    '''
+    Lets the threads that need a document which is being parsed by other
+    thread wait for the result, instead of parsing it again.
+    '''
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
 
 class dpCache:
     '''
     This class is a document parser cache.
     
+    The documents are parsed outside the lock, so many threads can parse
+    different documents at the same time; and if a thread needs a document
+    that another thread is parsing, it waits for that parser instead of
+    creating a new one. The least recently used parsers are removed when
+    the documents in the cache add up to more than max_size bytes (the limit
+    is enforced for each shard of the sharded_lru, max_size / shards). The
+    amount of shards is chosen so that documents of max_document_size bytes
+    fit in one of them, the bigger ones are not cached.
+    
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
-    def __init__(self):
-        self._cache = LRU(30)
+    def __init__(self, max_size=DP_CACHE_MAX_SIZE,
+                 max_document_size=DP_CACHE_MAX_DOCUMENT_SIZE):
+        self._max_size = max_size
+        shards = max_size / (max_document_size + DP_CACHE_ENTRY_OVERHEAD)
+        shards = max(1, min(shards, DEFAULT_SHARDS))
+        # The weight of each entry is the document size
+        self._cache = sharded_lru( max_size, shards=shards )
+        self._in_progress = {}
         self._LRULock = threading.RLock()
         
-    def getDocumentParserFor( self, httpResponse, normalizeMarkup=True ):
-        res = None
+        self._misses = 0
+        self._waits = 0
         
+    def getDocumentParserFor( self, httpResponse, normalizeMarkup=True ):
         #   Before I used md5, but I realized that it was unnecessary. I experimented a little bit with
         #   python's hash functions and this is what I got:
         #
@@ -56,19 +108,67 @@ class dpCache:
         #   100000 loops, best of 3: 0.117 usec per loop
         #
         #   At first I thought that the built-in hash wasn't good enough, as it could create collisions... but...
-        #   given that the LRU has only 30 positions, the real probability of a colission is too low.
+        #   given the size of the LRU, the real probability of a colission is too low.
         #
 
-        hash_string = hash( httpResponse.getBody() )
+        body = httpResponse.getBody()
+        key = (hash( body ), normalizeMarkup)
+        
+        # Most of the times the document is in the cache, the sharded_lru has
+        # its own locks so there is no need to take self._LRULock
+        res = self._cache.get( key )
+        if res is not None:
+            return res
         
         with self._LRULock:
-            if hash_string in self._cache:
-                res = self._cache[ hash_string ]
-            else:
-                # Create a new instance of dp, add it to the cache
-                res = documentParser.documentParser( httpResponse, normalizeMarkup )
-                self._cache[ hash_string ] = res
+            # It might have been added while I was waiting for the lock
+            res = self._cache.get( key )
+            if res is not None:
+                return res
             
-            return res
+            in_progress = self._in_progress.get( key )
+            if in_progress is not None:
+                # Some other thread is parsing the same document
+                self._waits += 1
+                parse_it = False
+            else:
+                self._misses += 1
+                in_progress = self._in_progress[ key ] = _parse_in_progress()
+                parse_it = True
+        
+        if not parse_it:
+            return in_progress.wait()
+        
+        try:
+            # Create a new instance of dp, without holding the lock
+            res = documentParser.documentParser( httpResponse, normalizeMarkup )
+        except:
+            with self._LRULock:
+                del self._in_progress[ key ]
+            in_progress.set_exc_info( sys.exc_info() )
+            raise
+        
+        with self._LRULock:
+            # Added to the cache before removing it from self._in_progress,
+            # so other threads find it in one of them
+            self._cache.set( key, res, len( body ) + DP_CACHE_ENTRY_OVERHEAD )
+            del self._in_progress[ key ]
+        
+        in_progress.set_result( res )
+        return res
+    
+    def get_stats( self ):
+        '''
+        @return: A dict with the cache statistics. "waits" is the amount of
+        times a thread waited for other one to parse the same document.
+        '''
+        cache_stats = self._cache.get_stats()
+        with self._LRULock:
+            return {'hits': cache_stats['hits'],
+                    'misses': self._misses,
+                    'waits': self._waits,
+                    'evictions': cache_stats['evictions'],
+                    'entries': cache_stats['entries'],
+                    'size': cache_stats['weight']}
     
 dpc = dpCache()
@@ -0,0 +1,189 @@
+'''
+test_dpCache.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import threading
+import time
+import unittest
+
+from core.controllers.w3afException import w3afException
+from core.data.parsers.urlParser import url_object
+from core.data.url.httpResponse import httpResponse
+import core.data.parsers.dpCache as dpCache
+
+
+def create_response(body, content_type='text/html'):
+    url = url_object('http://www.w3af.com/')
+    return httpResponse(200, body, {'Content-Type': content_type}, url, url)
+
+
+class fake_document_parser_module(object):
+    '''
+    Replaces the documentParser module, the parsers it creates wait until
+    the gate is open.
+    '''
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.parsed = []
+        self._lock = threading.Lock()
+
+    def documentParser(self, http_response, normalizeMarkup=True):
+        self._lock.acquire()
+        self.parsed.append( http_response.getBody() )
+        self._lock.release()
+
+        self.gate.wait()
+        if 'fail' in http_response.getBody():
+            raise w3afException('There is no parser for this document.')
+        return object()
+
+
+class test_dpCache(unittest.TestCase):
+
+    def setUp(self):
+        self._original = dpCache.documentParser
+        self.fake = fake_document_parser_module()
+        dpCache.documentParser = self.fake
+
+    def tearDown(self):
+        dpCache.documentParser = self._original
+
+    def test_hit_miss(self):
+        dpc = dpCache.dpCache()
+        dp = dpc.getDocumentParserFor( create_response('<html>1</html>') )
+        self.assertTrue( dp is dpc.getDocumentParserFor( create_response('<html>1</html>') ) )
+        dpc.getDocumentParserFor( create_response('<html>2</html>') )
+
+        stats = dpc.get_stats()
+        self.assertEqual( stats['hits'], 1 )
+        self.assertEqual( stats['misses'], 2 )
+        self.assertEqual( stats['entries'], 2 )
+
+    def test_same_document_parsed_once(self):
+        dpc = dpCache.dpCache()
+        self.fake.gate.clear()
+        results = []
+
+        def get_parser():
+            results.append( dpc.getDocumentParserFor( create_response('<html>x</html>') ) )
+
+        threads = [ threading.Thread( target=get_parser ) for _ in xrange(10) ]
+        for t in threads:
+            t.start()
+        time.sleep(0.2)
+        self.fake.gate.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual( len(self.fake.parsed), 1 )
+        self.assertEqual( len(results), 10 )
+        self.assertEqual( len(set([id(r) for r in results])), 1 )
+
+        stats = dpc.get_stats()
+        self.assertEqual( stats['misses'], 1 )
+        self.assertEqual( stats['hits'] + stats['waits'], 9 )
+
+    def test_parse_outside_lock(self):
+        dpc = dpCache.dpCache()
+
+        slow_gate = threading.Event()
+        original_documentParser = self.fake.documentParser
+        def documentParser(http_response, normalizeMarkup=True):
+            if 'slow' in http_response.getBody():
+                slow_gate.wait()
+            return original_documentParser(http_response, normalizeMarkup)
+        self.fake.documentParser = documentParser
+
+        slow = threading.Thread( target=dpc.getDocumentParserFor,
+                                 args=(create_response('<html>slow</html>'),) )
+        slow.start()
+        time.sleep(0.1)
+
+        # The slow document doesn't block the parsing of other documents, the
+        # timeout only avoids hanging the test run if it does
+        fast = threading.Thread( target=dpc.getDocumentParserFor,
+                                 args=(create_response('<html>fast</html>'),) )
+        fast.start()
+        fast.join(10)
+        self.assertFalse( fast.isAlive() )
+        self.assertTrue( slow.isAlive() )
+        self.assertEqual( self.fake.parsed, ['<html>fast</html>'] )
+
+        slow_gate.set()
+        slow.join()
+        self.assertEqual( dpc.get_stats()['entries'], 2 )
+
+    def test_errors(self):
+        dpc = dpCache.dpCache()
+        self.fake.gate.clear()
+        errors = []
+
+        def get_parser():
+            try:
+                dpc.getDocumentParserFor( create_response('<html>fail</html>') )
+            except w3afException, e:
+                errors.append( e )
+
+        threads = [ threading.Thread( target=get_parser ) for _ in xrange(5) ]
+        for t in threads:
+            t.start()
+        time.sleep(0.2)
+        self.fake.gate.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual( len(errors), 5 )
+        # Errors are not cached
+        self.assertEqual( dpc.get_stats()['entries'], 0 )
+        self.assertRaises( w3afException, dpc.getDocumentParserFor,
+                           create_response('<html>fail</html>') )
+
+    def test_size_eviction(self):
+        dpc = dpCache.dpCache( max_size=80 * 1024, max_document_size=10 * 1024 )
+        small = 'a' * 1000
+
+        for i in xrange(100):
+            dpc.getDocumentParserFor( create_response('%s %s' % (small, i)) )
+        stats = dpc.get_stats()
+        self.assertTrue( stats['size'] <= 80 * 1024 )
+        self.assertTrue( stats['evictions'] > 0 )
+        self.assertEqual( stats['entries'] + stats['evictions'], 100 )
+
+        # The most recently used ones are kept
+        dpc.getDocumentParserFor( create_response('%s %s' % (small, 99)) )
+        self.assertEqual( dpc.get_stats()['hits'], 1 )
+
+        # A document that is bigger than a shard is not stored
+        entries = dpc.get_stats()['entries']
+        dpc.getDocumentParserFor( create_response('b' * 20 * 1024) )
+        self.assertEqual( dpc.get_stats()['entries'], entries )
+        self.assertTrue( dpc.get_stats()['size'] <= 80 * 1024 )
+
+    def test_big_document(self):
+        # With the default sizes there is room for 2MB documents
+        dpc = dpCache.dpCache()
+        big = create_response( '<html>%s</html>' % ('a' * 2 * 1024 * 1024) )
+        dpc.getDocumentParserFor( big )
+        dpc.getDocumentParserFor( big )
+        stats = dpc.get_stats()
+        self.assertEqual( (stats['entries'], stats['hits']), (1, 1) )
+
+if __name__ == '__main__':
+    unittest.main()
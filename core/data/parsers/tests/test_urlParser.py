@@ -0,0 +1,129 @@
+'''
+test_urlParser.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import copy
+import cPickle
+import time
+import unittest
+import urlparse
+
+from core.data.parsers.urlParser import url_object
+
+
+class test_urlParser(unittest.TestCase):
+
+    def test_cached_values_change(self):
+        u = url_object('http://www.w3af.com:8080/a/b.php?id=1')
+        self.assertEqual( u.getDomain(), 'www.w3af.com' )
+        old_hash = hash(u)
+
+        u.setDomain( 'w3af.org' )
+        self.assertEqual( u.getDomain(), 'w3af.org' )
+        self.assertEqual( u.url_string, 'http://w3af.org:8080/a/b.php?id=1' )
+        self.assertNotEqual( hash(u), old_hash )
+
+        u.path = '/c.php'
+        self.assertEqual( u.url_string, 'http://w3af.org:8080/c.php?id=1' )
+        self.assertEqual( hash(u), hash( url_object(u.url_string) ) )
+
+        u.setQueryString( '' )
+        u.netloc = 'w3af.com'
+        self.assertEqual( u.url_string, 'http://w3af.com/c.php' )
+        self.assertEqual( u.getDomain(), 'w3af.com' )
+
+    def test_url_string(self):
+        for url in ('http://w3af.com/?', 'http://w3af.com/a;#',
+                    'HTTP://w3af.com/a', 'https://w3af.com/a;b?c=d#e',
+                    'www.w3af.com', u'http://w3af.com/\xe1'):
+            u = url_object(url)
+            parts = (u.scheme, u.netloc, u.path, u.params, u.qs, u.fragment)
+            self.assertEqual( u.url_string, urlparse.urlunparse( parts ) )
+        self.assertTrue( isinstance( url_object(u'http://w3af.com/').path, unicode ) )
+
+    def test_copy(self):
+        u = url_object('http://www.w3af.com/a.php?id=1')
+        u_copy = u.copy()
+        self.assertEqual( u, u_copy )
+        self.assertEqual( hash(u), hash(u_copy) )
+
+        u_copy.setFileName( 'b.php' )
+        self.assertEqual( u.url_string, 'http://www.w3af.com/a.php?id=1' )
+        self.assertEqual( u_copy.url_string, 'http://www.w3af.com/b.php?id=1' )
+        self.assertEqual( copy.deepcopy(u), u )
+
+    def test_slots_and_pickle(self):
+        u = url_object('http://www.w3af.com/a.php?id=1#x')
+        self.assertFalse( hasattr(u, '__dict__') )
+
+        for protocol in (0, 2):
+            loaded = cPickle.loads( cPickle.dumps(u, protocol) )
+            self.assertEqual( loaded, u )
+            self.assertEqual( loaded.getDomain(), 'www.w3af.com' )
+
+        # Objects that were pickled before the __slots__
+        old = url_object.__new__( url_object )
+        old.__setstate__( {'scheme': 'http', 'netloc': 'www.w3af.com',
+                           'path': '/a.php', 'params': '', 'qs': 'id=1',
+                           'fragment': 'x', '_changed': True,
+                           '_already_calculated_url': None} )
+        self.assertEqual( old, u )
+
+    def test_benchmark(self):
+        strings = [ 'http://www.w3af.com/dir%s/page%s.php?id=%s' % (i % 10, i, i)
+                    for i in xrange(1000) ] * 20
+
+        # What url_string and hash() did for each call
+        start = time.time()
+        seen = set()
+        for s in strings:
+            parts = urlparse.urlparse( s )
+            seen.add( hash( urlparse.urlunparse( parts ) ) )
+            hash( urlparse.urlunparse( parts ) )
+        time_before = time.time() - start
+
+        # The http:// strings are split without urlparse() and url_string
+        # is the original string, so none of them is called
+        calls = []
+        original = urlparse.urlparse, urlparse.urlunparse
+        def counting(function):
+            def wrapper(*args):
+                calls.append( function.__name__ )
+                return function(*args)
+            return wrapper
+        urlparse.urlparse, urlparse.urlunparse = map( counting, original )
+        try:
+            start = time.time()
+            seen = set()
+            for s in strings:
+                u = url_object( s )
+                seen.add( u )
+                hash( u )
+            time_after = time.time() - start
+        finally:
+            urlparse.urlparse, urlparse.urlunparse = original
+
+        self.assertEqual( len(seen), 1000 )
+        self.assertEqual( calls, [] )
+        print '\nurl_object() and hash() for %s strings: %.3fs (urlparse) vs.' \
+              ' %.3fs (url_object)' % (len(strings), time_before, time_after)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,20 +31,143 @@ import cgi
 import re
 import string
 import copy
+from operator import attrgetter
+
+# url_object( string ) parses each string only once, the parts are saved in
+# this cache which is cleared when it's full (like the one in urlparse)
+PARSE_CACHE_SIZE = 10000
+_parse_cache = {}
 
 
 def set_changed(meth):
     '''
-    Function to decorate methods in order to set the "self._changed" attribute
-    of the object to True.
+    Function to decorate methods that modify the URL, the cached url_string,
+    hash and domain are calculated again after calling them.
     '''
     def wrapper(self, *args, **kwargs):
-        self._changed = True
-        return meth(self, *args, **kwargs)
+        try:
+            return meth(self, *args, **kwargs)
+        finally:
+            self._invalidate()
 
     return wrapper
 
 
+def _intern( string ):
+    if type( string ) is str:
+        return intern( string )
+    return string
+
+
+def _split_http( url_string ):
+    '''
+    The same as urlparse.urlparse() for the http:// and https:// strings,
+    without creating the intermediate ParseResult objects.
+
+    >>> _split_http('https://w3af.com:8080/a/b;c?d=1#e')
+    ('https', 'w3af.com:8080', '/a/b', 'c', 'd=1', 'e')
+    >>> _split_http('mailto:a@b.com') is None
+    True
+    '''
+    if url_string.startswith('http://'):
+        scheme, start = 'http', 7
+    elif url_string.startswith('https://'):
+        scheme, start = 'https', 8
+    else:
+        return None
+
+    end = len(url_string)
+    for c in '/?#':
+        i = url_string.find(c, start)
+        if i >= 0 and i < end:
+            end = i
+    netloc = url_string[start:end]
+    if ('[' in netloc) != (']' in netloc):
+        # Invalid IPv6 URL, urlparse raises the exception
+        return None
+
+    path = url_string[end:]
+    qs = fragment = params = ''
+    if '#' in path:
+        path, fragment = path.split('#', 1)
+    if '?' in path:
+        path, qs = path.split('?', 1)
+    if ';' in path:
+        path, params = urlparse._splitparams(path)
+    return scheme, netloc, path, params, qs, fragment
+
+
+def _parse( url_string ):
+    '''
+    @return: The (scheme, netloc, path, params, qs, fragment, url_string)
+    tuple for the string. The scheme and netloc are interned, most URLs share
+    them. The last item is the string itself when urlunparse() of the parts
+    returns the same string, None if we don't know.
+
+    >>> _parse('www.w3af.com')
+    ('http', 'www.w3af.com', '', '', '', '', None)
+    >>> _parse('http://w3af.com/?a=1')[-1]
+    'http://w3af.com/?a=1'
+    >>> _parse('http://w3af.com/?')[-1] is None
+    True
+    '''
+    unparsed = None
+    if type( url_string ) is not str:
+        parts = None
+    else:
+        parts = _parse_cache.get( url_string )
+        if parts is not None:
+            return parts
+        parts = _split_http( url_string )
+        if parts is not None:
+            # The parts are in the same order as in the string, if there are
+            # no delimiters without a value ("?", "#", ";") the string is the
+            # same
+            scheme, netloc, path, params, qs, fragment = parts
+            length = len(scheme) + 3 + len(netloc) + len(path)
+            for part in (params, qs, fragment):
+                if part:
+                    length += len(part) + 1
+            if length == len( url_string ):
+                unparsed = url_string
+
+    if parts is None:
+        parts = urlparse.urlparse( url_string )
+
+    scheme, netloc, path, params, qs, fragment = parts
+    #
+    # This is the case when someone creates a url_object like
+    # this: url_object('www.w3af.com')
+    #
+    if scheme == netloc == '' and path:
+        # By default we set the protocol to "http"
+        scheme = 'http'
+        netloc = path
+        path = ''
+
+    parts = ( _intern(scheme), _intern(netloc), path, params, qs, fragment,
+              unparsed )
+    if type( url_string ) is str:
+        if len( _parse_cache ) >= PARSE_CACHE_SIZE:
+            _parse_cache.clear()
+        _parse_cache[ url_string ] = parts
+    return parts
+
+
+def _url_part( name ):
+    '''
+    @return: A property for one of the parts of the URL, the cached values
+    are calculated again when it's changed.
+    '''
+    attr = '_' + name
+
+    def fset(self, value):
+        setattr( self, attr, value )
+        self._invalidate()
+
+    return property( attrgetter( attr ), fset )
+
+
 def parse_qs( url_encoded_string, ignoreExceptions=True ):
     '''
     Parse a url encoded string (a=b&c=d) into a queryString object.
@@ -94,9 +217,22 @@ class url_object(object):
     This class represents a URL and gives access to all its parts
     with several "getter" methods.
     
+    The URL is parsed once and the url_string, hash and domain are calculated
+    the first time they are needed, and again after the URL is modified.
+    
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
     
+    __slots__ = ('_scheme', '_netloc', '_path', '_params', '_qs', '_fragment',
+                 '_url_string', '_hash', '_domain')
+    
+    scheme = _url_part('scheme')
+    netloc = _url_part('netloc')
+    path = _url_part('path')
+    params = _url_part('params')
+    qs = _url_part('qs')
+    fragment = _url_part('fragment')
+    
     def __init__(self, data):
         '''
         @param data: Either a string representing a URL or a 6-elems tuple
@@ -134,32 +270,26 @@ class url_object(object):
         TypeError: Invalid URL "http://"
         
         '''
-        self._already_calculated_url = None
-        self._changed = True
-
         if type(data) is tuple:
             scheme, netloc, path, params, qs, fragment = data
+            scheme = _intern( scheme )
+            netloc = _intern( netloc )
+            url_string = None
         else:
-            scheme, netloc, path, params, qs, fragment = \
-                                        urlparse.urlparse(data)
-            #
-            # This is the case when someone creates a url_object like
-            # this: url_object('www.w3af.com')
-            #
-            if scheme == netloc == '' and path:
-                # By default we set the protocol to "http"
-                scheme = 'http'
-                netloc = path
-                path = ''
+            scheme, netloc, path, params, qs, fragment, url_string = \
+                                                            _parse( data )
             
-        self.scheme = scheme or ''
-        self.netloc = netloc or ''
-        self.path = path or ''
-        self.params = params or ''
-        self.qs = qs or ''
-        self.fragment = fragment or ''
+        self._scheme = scheme or ''
+        self._netloc = netloc or ''
+        self._path = path or ''
+        self._params = params or ''
+        self._qs = qs or ''
+        self._fragment = fragment or ''
+        self._url_string = url_string
+        self._hash = None
+        self._domain = None
         
-        if self.netloc == '':
+        if self._netloc == '':
             msg = 'Invalid URL "%s"' % data
             raise TypeError( msg )
 
@@ -243,13 +373,20 @@ class url_object(object):
         >>> u.url_string
         'http://www.google.com/foo%20bar/bar.txt?id=1'
         '''
-        if self._changed or self._already_calculated_url is None:
-            self._already_calculated_url = urlparse.urlunparse( (self.scheme, self.netloc, self.path, self.params, self.qs, self.fragment) )
-            self._changed = False
-            return self._already_calculated_url
-        else:
-            return self._already_calculated_url
+        url_string = self._url_string
+        if url_string is None:
+            url_string = self._url_string = urlparse.urlunparse(
+                    (self._scheme, self._netloc, self._path, self._params,
+                     self._qs, self._fragment) )
+        return url_string
 
+    def _invalidate(self):
+        '''
+        Forget the values that were calculated for the previous URL.
+        '''
+        self._url_string = None
+        self._hash = None
+        self._domain = None
        
     def hasQueryString( self ):
         '''
@@ -547,7 +684,9 @@ class url_object(object):
     
         @return: Returns the domain name for the url.
         '''
-        domain = self.netloc.split(':')[0]
+        domain = self._domain
+        if domain is None:
+            domain = self._domain = self._netloc.split(':')[0]
         return domain
 
     @set_changed
@@ -791,10 +930,10 @@ class url_object(object):
         'https://abc:443/xyz/'
         '''
         if self.path:
-            res = self.scheme + '://' +self.netloc+ self.path[:self.path.rfind('/')+1]
+            path = self.path[:self.path.rfind('/')+1]
         else:
-            res = self.scheme + '://' +self.netloc+ '/'
-        return url_object(res)
+            path = '/'
+        return url_object.from_parts( self.scheme, self.netloc, path, None, None, None )
     
     def getFileName( self ):
         '''
@@ -1138,6 +1277,8 @@ class url_object(object):
         @return: True if the url_strings are equal
 
         '''
+        if self is other:
+            return True
         return isinstance(other, url_object) and \
                 self.url_string == other.url_string
     
@@ -1157,7 +1298,10 @@ class url_object(object):
         >>> len( list( set( test ) ) )
         1
         '''
-        return hash(self.url_string)
+        url_hash = self._hash
+        if url_hash is None:
+            url_hash = self._hash = hash(self.url_string)
+        return url_hash
 
     def __str__(self):
         '''
@@ -1266,7 +1410,40 @@ class url_object(object):
         return other + self.url_string 
 
     def copy(self):
-        return copy.deepcopy( self )
+        '''
+        @return: A copy of the URL, the parts (strings) and the cached values
+        are shared.
+
+        >>> u = url_object('http://www.w3af.com/a.php')
+        >>> u2 = u.copy()
+        >>> u2.setFileName('b.php')
+        >>> u.url_string, u2.url_string, u == u.copy()
+        ('http://www.w3af.com/a.php', 'http://www.w3af.com/b.php', True)
+        '''
+        new_url = url_object.__new__( self.__class__ )
+        new_url._scheme = self._scheme
+        new_url._netloc = self._netloc
+        new_url._path = self._path
+        new_url._params = self._params
+        new_url._qs = self._qs
+        new_url._fragment = self._fragment
+        new_url._url_string = self._url_string
+        new_url._hash = self._hash
+        new_url._domain = self._domain
+        return new_url
+
+    def __getstate__(self):
+        return (self._scheme, self._netloc, self._path, self._params,
+                self._qs, self._fragment)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Pickled by older versions, with the parts in the __dict__
+            state = tuple( [ state.get(name) or '' for name in
+                             ('scheme', 'netloc', 'path', 'params', 'qs', 'fragment') ] )
+        (self._scheme, self._netloc, self._path, self._params, self._qs,
+         self._fragment) = state
+        self._invalidate()
 
 if __name__ == "__main__":
     import doctest
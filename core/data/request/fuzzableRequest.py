@@ -19,6 +19,7 @@ along with w3af; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 '''
+from __future__ import with_statement
 
 from core.controllers.w3afException import w3afException
 import core.controllers.outputManager as om
@@ -26,7 +27,7 @@ from core.data.dc.dataContainer import dataContainer as dc
 from core.data.dc.cookie import cookie as cookie
 from core.data.parsers.urlParser import url_object
 
-import copy
+import threading
 import urllib
 
 #CR = '\r'
@@ -35,6 +36,46 @@ LF = '\n'
 CRLF = CR + LF
 SP = ' '
 
+# class -> the names of the slots of the class and its parents
+_slot_names = {}
+
+# Makes the copy-on-write swap in getDc() / getHeaders() atomic with copy(),
+# which marks the original as shared. Without it a copy made by another
+# thread while the original is swapping its dc ends up sharing the new one
+_shared_lock = threading.Lock()
+
+
+def get_slot_names( cls ):
+    '''
+    @return: A tuple with the names of all the slots of cls and its parents.
+    '''
+    names = _slot_names.get( cls )
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in names and name not in ('__dict__', '__weakref__'):
+                    names.append( name )
+        names = _slot_names[ cls ] = tuple( names )
+    return names
+
+
+def _intern( string ):
+    if type( string ) is str:
+        return intern( string )
+    return string
+
+
+def _quoted_copy( url ):
+    '''
+    @return: A copy of url with the spaces encoded as %20, the URL is only
+    parsed again when it has spaces.
+    '''
+    url_string = url.url_string
+    if ' ' in url_string:
+        return url_object( url_string.replace(' ', '%20') )
+    return url.copy()
+
 
 class fuzzableRequest(object):
     '''
@@ -46,9 +87,19 @@ class fuzzableRequest(object):
     example: the class httpQsRequest should return the _dc in the querystring ( getURL ) and httpPostDataRequest
     should return the _dc in the POSTDATA ( getData() ).
     
+    The requests are copied for each plugin and each mutant, so copy() is
+    cheap: the copy shares the data container and the headers with the
+    original, and each one makes its own copy of them the first time they
+    are requested with getDc() or getHeaders() (which return objects that
+    the callers can modify).
+    
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ('_url', '_uri', '_method', '_data', '_headers', '_cookie',
+                 '_dc', '_sent_information_comparable', '_shared_dc',
+                 '_shared_headers')
+
     def __init__(self):
         
         # Internal variables
@@ -62,6 +113,9 @@ class fuzzableRequest(object):
 
         # Set the internal variables
         self._sent_information_comparable = None
+        # True when the dc / headers are shared with a copy
+        self._shared_dc = False
+        self._shared_headers = False
     
     def dump( self ):
         '''
@@ -360,13 +414,29 @@ class fuzzableRequest(object):
     def __ne__( self,other):
         return not self.__eq__( other )
     
+    def __hash__( self ):
+        '''
+        The hash is calculated with the URI and the method, the parameters
+        are not used because the plugins change them (getDc() returns a
+        mutable object) while the request is in a set or dict.
+
+        >>> u = url_object('http://www.w3af.com/')
+        >>> fr1 = fuzzableRequest()
+        >>> fr1.setURL( u )
+        >>> fr2 = fr1.copy()
+        >>> fr2.getDc()['a'] = ['1']
+        >>> len( set( [fr1, fr1.copy(), fr2] ) )
+        2
+        '''
+        return hash( (self._uri, self._method) )
+    
     def setURL( self , url ):
         if not isinstance(url, url_object):
             msg = 'The "url" parameter of setURL @ fuzzableRequest'
             msg += ' must be of urlParser.url_object type.'
             raise ValueError( msg )
 
-        self._url = url_object( url.url_string.replace(' ', '%20') )
+        self._url = _quoted_copy( url )
         self._uri = self._url
     
     def setURI( self, uri ):
@@ -375,25 +445,30 @@ class fuzzableRequest(object):
             msg += ' must be of urlParser.url_object type.'
             raise ValueError( msg )
 
-        self._uri = url_object( uri.url_string.replace(' ', '%20') )
+        self._uri = _quoted_copy( uri )
         self._url = self._uri.uri2url()
         
     def setMethod( self , method ):
-        self._method = method
+        self._method = _intern( method )
         
     def setDc( self , dataCont ):
         if isinstance(dataCont, dc):
             self._dc = dataCont
+            self._shared_dc = False
         else:
             msg = 'Invalid call to fuzzableRequest.setDc(), the argument must be a'
             msg += ' dataContainer instance.'
             raise w3afException( msg )
         
     def setHeaders( self , headers ):
+        if type( headers ) is dict:
+            # The same header names are used by most of the requests
+            headers = dict( [ (_intern(k), v) for k, v in headers.iteritems() ] )
         self._headers = headers
+        self._shared_headers = False
     
     def setReferer( self, referer ):
-        self._headers[ 'Referer' ] = referer
+        self.getHeaders()[ 'Referer' ] = referer
     
     def setCookie( self , c ):
         '''
@@ -432,9 +507,19 @@ class fuzzableRequest(object):
         return self._method
         
     def getDc( self ):
+        if self._shared_dc:
+            with _shared_lock:
+                if self._shared_dc:
+                    self._dc = self._dc.copy()
+                    self._shared_dc = False
         return self._dc
         
     def getHeaders( self ):
+        if self._shared_headers:
+            with _shared_lock:
+                if self._shared_headers:
+                    self._headers = self._headers.copy()
+                    self._shared_headers = False
         return self._headers
     
     def getReferer( self ):
@@ -453,8 +538,48 @@ class fuzzableRequest(object):
         return []
     
     def copy( self ):
-        newFr = copy.deepcopy( self )
+        '''
+        @return: A copy of this request, see the class docstring.
+
+        >>> fr = fuzzableRequest()
+        >>> fr.setURL( url_object('http://www.w3af.com/') )
+        >>> fr.getDc()['a'] = ['1']
+        >>> fr_copy = fr.copy()
+        >>> fr_copy.getDc()['a'][0] = '2'
+        >>> fr.getDc(), fr_copy.getDc()
+        ({'a': ['1']}, {'a': ['2']})
+        >>> fr == fr.copy(), hash(fr) == hash(fr.copy())
+        (True, True)
+        '''
+        cls = self.__class__
+        newFr = cls.__new__( cls )
+        with _shared_lock:
+            for name in get_slot_names( cls ):
+                try:
+                    setattr( newFr, name, getattr(self, name) )
+                except AttributeError:
+                    pass
+            if hasattr( self._dc, 'copy' ):
+                self._shared_dc = newFr._shared_dc = True
+            self._shared_headers = newFr._shared_headers = True
         return newFr
 
+    def __getstate__( self ):
+        state = {}
+        for name in get_slot_names( self.__class__ ):
+            if hasattr( self, name ):
+                state[ name ] = getattr( self, name )
+        return state
+
+    def __setstate__( self, state ):
+        # The requests pickled by older versions don't have these
+        self._shared_dc = False
+        self._shared_headers = False
+        for name, value in state.iteritems():
+            try:
+                setattr( self, name, value )
+            except AttributeError:
+                pass
+
     def __repr__( self ):
         return '<fuzzable request | '+ self.getMethod() +' | '+ self.getURI() +' >'
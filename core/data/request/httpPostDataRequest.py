@@ -33,6 +33,8 @@ class httpPostDataRequest(fuzzableRequest):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ('_files',)
+
     def __init__(self):
         fuzzableRequest.__init__(self)
         self._method = 'POST'
@@ -34,6 +34,8 @@ class httpQsRequest(fuzzableRequest):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ()
+
     def __init__(self):
         fuzzableRequest.__init__(self)
         self._method = 'GET'
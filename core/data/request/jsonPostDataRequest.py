@@ -36,6 +36,8 @@ class jsonPostDataRequest(httpPostDataRequest):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ()
+
     def __init__(self):
         httpPostDataRequest.__init__(self)
 
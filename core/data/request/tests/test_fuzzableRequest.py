@@ -0,0 +1,145 @@
+'''
+test_fuzzableRequest.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import copy
+import cPickle
+import gc
+import time
+import unittest
+
+from core.data.dc.form import form
+from core.data.parsers.urlParser import url_object
+from core.data.request.fuzzableRequest import fuzzableRequest
+from core.data.request.httpPostDataRequest import httpPostDataRequest
+
+
+def create_request(fields=3):
+    f = form()
+    for i in xrange(fields):
+        f.addInput( [("name", "field%s" % i), ("type", "text"), ("value", str(i))] )
+    freq = httpPostDataRequest()
+    freq.setURL( url_object('http://www.w3af.com/post.php') )
+    freq.setDc( f )
+    freq.setHeaders( {'Referer': 'http://www.w3af.com/'} )
+    freq.setFileVariables( ['field0'] )
+    return freq
+
+
+def objects_per_call(function, calls=1000):
+    '''
+    @return: The amount of objects (tracked by the garbage collector) that
+    are kept for each call to function.
+    '''
+    gc.collect()
+    gc.disable()
+    try:
+        before = len( gc.get_objects() )
+        results = [ function() for _ in xrange(calls) ]
+        after = len( gc.get_objects() )
+    finally:
+        gc.enable()
+    del results
+    return (after - before) / float(calls)
+
+
+class test_fuzzableRequest(unittest.TestCase):
+
+    def test_copy_on_write(self):
+        freq = create_request()
+        freq_copy = freq.copy()
+        self.assertTrue( freq_copy.getFileVariables() == ['field0'] )
+
+        freq_copy.getDc()['field1'][0] = 'changed'
+        freq_copy.getHeaders()['Cookie'] = 'a=b'
+        freq_copy.setMethod( 'PUT' )
+
+        self.assertEqual( freq.getDc()['field1'], ['1'] )
+        self.assertFalse( 'Cookie' in freq.getHeaders() )
+        self.assertEqual( freq.getMethod(), 'POST' )
+        self.assertTrue( isinstance(freq_copy.getDc(), form) )
+
+        # And the other way around
+        other_copy = freq.copy()
+        freq.getDc()['field2'][0] = 'changed'
+        self.assertEqual( other_copy.getDc()['field2'], ['2'] )
+
+    def test_hash(self):
+        freq = create_request()
+        same = create_request()
+        different = create_request()
+        different.getDc()['field1'][0] = 'x'
+
+        self.assertEqual( freq, same )
+        self.assertEqual( hash(freq), hash(same) )
+        self.assertEqual( hash(freq), hash(freq.copy()) )
+        self.assertEqual( len( set([freq, same, freq.copy(), different]) ), 2 )
+
+        qs = fuzzableRequest()
+        qs.setURL( url_object('http://www.w3af.com/post.php') )
+        self.assertEqual( len( set([freq, qs]) ), 2 )
+
+        # The plugins add parameters to the requests that are in a set
+        requests = set([freq])
+        freq.getDc()['new'] = ['1']
+        self.assertTrue( freq in requests )
+
+    def test_slots_and_pickle(self):
+        freq = create_request()
+        self.assertFalse( hasattr(freq, '__dict__') )
+
+        for protocol in (0, 2):
+            loaded = cPickle.loads( cPickle.dumps(freq.copy(), protocol) )
+            self.assertEqual( loaded, freq )
+            self.assertEqual( loaded.getFileVariables(), ['field0'] )
+            self.assertEqual( loaded.getHeaders(), freq.getHeaders() )
+
+        deep = copy.deepcopy( freq )
+        deep.getDc()['field1'][0] = 'changed'
+        self.assertEqual( freq.getDc()['field1'], ['1'] )
+
+    def test_copy_benchmark(self):
+        freq = create_request(20)
+
+        deepcopy = lambda: copy.deepcopy( freq )
+        objects_before = objects_per_call( deepcopy )
+        objects_after = objects_per_call( freq.copy )
+
+        start = time.time()
+        for _ in xrange(1000):
+            deepcopy()
+        time_before = time.time() - start
+
+        start = time.time()
+        for _ in xrange(1000):
+            freq.copy()
+        time_after = time.time() - start
+
+        msg = 'objects per copy: %s -> %s, time: %s -> %s' % (objects_before,
+                                                               objects_after,
+                                                               time_before,
+                                                               time_after)
+        print '\n' + msg
+        # The copy is one object, the rest is shared
+        self.assertTrue( objects_after < 1.5, msg )
+        self.assertTrue( objects_before > 20, msg )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+'''
+test_variant_identification.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import random
+import time
+import unittest
+
+from core.data.parsers.urlParser import url_object
+import core.data.request.variant_identification as variant_identification
+from core.data.request.variant_identification import are_variants, \
+     variant_signature, variant_index
+
+
+def synthetic_links(count, seed=1):
+    '''
+    @return: count URLs of a site with many scripts, each one with a few
+    variants.
+    '''
+    rnd = random.Random(seed)
+    links = []
+    for i in xrange(count):
+        script = rnd.randint(0, count / 10)
+        if rnd.random() < 0.5:
+            qs = 'id=%s&page=%s' % (rnd.randint(0, 1000), rnd.randint(0, 10))
+        else:
+            qs = 'name=%s' % rnd.choice(['abc', 'def', '12'])
+        links.append( url_object('http://www.w3af.com/dir%s/script%s.php?%s' %
+                                 (script % 7, script, qs)) )
+    return links
+
+
+class test_variant_identification(unittest.TestCase):
+
+    def test_same_as_are_variants(self):
+        links = synthetic_links(300)
+        for a in links[:100]:
+            for b in links:
+                self.assertEqual( variant_signature(a) == variant_signature(b),
+                                  are_variants(a, b), (a, b) )
+
+    def test_flat_cost(self):
+        '''
+        The crawl of a synthetic 100k links site, the time to check and add a
+        link doesn't grow with the amount of links that were already added.
+        '''
+        links = synthetic_links(100000)
+        vi = variant_index()
+
+        # One signature for each call, the links that were added before
+        # aren't compared with the new one
+        signatures = []
+        def counting_signature(url):
+            signatures.append( 1 )
+            return signature(url)
+        signature = variant_identification.variant_signature
+        variant_identification.variant_signature = counting_signature
+
+        calls = 0
+        chunk_costs = []
+        try:
+            for start in xrange(0, len(links), 10000):
+                t = time.time()
+                for link in links[start:start + 10000]:
+                    calls += 1
+                    if vi.count( link ) <= 5:
+                        calls += 1
+                        vi.add( link )
+                chunk_costs.append( (time.time() - t) / 10000 )
+        finally:
+            variant_identification.variant_signature = signature
+
+        self.assertEqual( len(signatures), calls )
+        self.assertEqual( len(vi), len(set( variant_signature(l) for l in links )) )
+        print '\nCost per link for each 10k links: ' + \
+              ', '.join( '%.1fus' % (c * 1e6) for c in chunk_costs )
+
+
+if __name__ == '__main__':
+    unittest.main()
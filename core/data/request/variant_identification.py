@@ -20,6 +20,10 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 '''
 
+from __future__ import with_statement
+
+import threading
+
 import core.data.request.httpQsRequest as httpQsRequest
 from core.data.parsers.urlParser import url_object
 
@@ -89,5 +93,82 @@ def are_variants( url_a ,  url_b ):
     qsr_b.setDc( qs_b )
     return qsr_a.is_variant_of( qsr_b )
 
-    
 
+def variant_signature( url ):
+    '''
+    Two URLs with the same signature are variants: they have the same
+    scheme, domain, path and parameter names, and the values for each
+    parameter have the same type (int / string). Unlike are_variants(), the
+    order of the parameters doesn't matter.
+
+    @parameter url: The URL we want to analyze
+    @return: A hashable object.
+
+    >>> from core.data.parsers.urlParser import url_object
+    >>> a = url_object('http://www.w3af.com/foo.php?id=1&name=x')
+    >>> b = url_object('http://www.w3af.com/foo.php?name=y&id=22')
+    >>> variant_signature( a ) == variant_signature( b )
+    True
+
+    >>> c = url_object('http://www.w3af.com/foo.php?id=x&name=y')
+    >>> variant_signature( a ) == variant_signature( c )
+    False
+
+    >>> variant_signature( url_object('http://www.w3af.com/foo.php') )
+    ('http', 'www.w3af.com', '/foo.php', ())
+    '''
+    if not isinstance(url, url_object):
+        msg = 'The "url" parameter in "variant_signature" '
+        msg += ' must be of urlParser.url_object type.'
+        raise ValueError( msg )
+
+    params = ()
+    if url.hasQueryString():
+        qs = url.getQueryString()
+        params = tuple( sorted( (name, tuple( [ v.isdigit() for v in qs[name] ] ))
+                                for name in qs ) )
+    return (url.scheme, url.netloc, url.path, params)
+
+
+class variant_index(object):
+    '''
+    Counts how many URLs of each variant (see variant_signature) were added.
+
+    >>> from core.data.parsers.urlParser import url_object
+    >>> vi = variant_index()
+    >>> vi.add( url_object('http://www.w3af.com/watch?v=abc') )
+    1
+    >>> vi.add( url_object('http://www.w3af.com/watch?v=def') )
+    2
+    >>> vi.count( url_object('http://www.w3af.com/watch?v=ghi') )
+    2
+    >>> vi.count( url_object('http://www.w3af.com/watch?v=1') )
+    0
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+    def __init__( self ):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add( self, url ):
+        '''
+        @return: The amount of variants of url, including this one.
+        '''
+        signature = variant_signature( url )
+        with self._lock:
+            count = self._counts.get( signature, 0 ) + 1
+            self._counts[ signature ] = count
+            return count
+
+    def count( self, url ):
+        '''
+        @return: The amount of variants of url that were added.
+        '''
+        return self._counts.get( variant_signature( url ), 0 )
+
+    def __len__( self ):
+        '''
+        @return: The amount of different variants.
+        '''
+        return len( self._counts )
@@ -34,6 +34,8 @@ class wsPostDataRequest(httpPostDataRequest):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ('_NS', '_name', '_parameters', '_action')
+
     def __init__(self):
         httpPostDataRequest.__init__(self)
         self._NS = None
@@ -82,10 +84,11 @@ class wsPostDataRequest(httpPostDataRequest):
         web service calls MUST send a header with the action:
             -   SOAPAction: "urn:xmethodsBabelFish#BabelFish"
         '''
-        self._headers[ 'SOAPAction' ] = '"' + self.getAction() + '"'
-        self._headers['Content-Type'] = 'text/xml'
+        headers = httpPostDataRequest.getHeaders( self )
+        headers[ 'SOAPAction' ] = '"' + self.getAction() + '"'
+        headers['Content-Type'] = 'text/xml'
         
-        return self._headers
+        return headers
         
     def getNS( self ): return self._NS
     def setNS( self , ns ): self._NS = ns
@@ -102,7 +105,7 @@ class wsPostDataRequest(httpPostDataRequest):
         self._parameters = par
         # And now save it so we can fuzz it.
         for param in par:
-            self._dc[ param.getName() ] = ''
+            self.getDc()[ param.getName() ] = ''
 
     def __str__( self ):
         '''
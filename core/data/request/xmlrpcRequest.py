@@ -33,6 +33,8 @@ class xmlrpcRequest(httpPostDataRequest):
     @author: Andres Riancho ( andres.riancho@gmail.com )
     '''
 
+    __slots__ = ('_original_xmlrpc',)
+
     def __init__(self, original_xmlrpc):
         '''
         @parameter original_xmlrpc: The original XML string that represents the call to the RPC
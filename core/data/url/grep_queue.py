@@ -0,0 +1,246 @@
+'''
+grep_queue.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''
+from __future__ import with_statement
+
+import Queue
+import threading
+import time
+import traceback
+
+import core.controllers.outputManager as om
+
+# The maximum amount of request/response pairs waiting to be analyzed, when
+# the queue is full the threads that send HTTP requests wait (backpressure).
+GREP_QUEUE_SIZE = 200
+# Threads that run the grep plugins
+GREP_WORKERS = 3
+# A grep plugin that takes more than this to analyze a response is reported
+GREP_SLOW_SECONDS = 5
+
+# Tells the worker threads to exit
+_STOP = object()
+
+
+class grep_stats(object):
+    '''
+    Timing statistics for one grep plugin.
+    '''
+    __slots__ = ('calls', 'errors', 'total_time', 'max_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, spent, error=False):
+        self.calls += 1
+        self.total_time += spent
+        if spent > self.max_time:
+            self.max_time = spent
+        if error:
+            self.errors += 1
+
+    def __repr__(self):
+        avg = self.calls and self.total_time / self.calls
+        return '<grep_stats calls=%s errors=%s total=%.3fs avg=%.4fs max=%.3fs>' % \
+               (self.calls, self.errors, self.total_time, avg, self.max_time)
+
+
+class grep_queue(object):
+    '''
+    Runs the grep plugins in background threads, so the threads that send
+    the HTTP requests don't wait for the grep plugins to analyze the
+    responses.
+
+    The queue is bounded: when it's full, put() blocks until there is room
+    again. Call join() to wait for all the queued responses to be analyzed
+    and stop() once the queue is not going to be used anymore.
+
+    >>> class grep_plugin(object):
+    ...     def __init__(self): self.seen = []
+    ...     def getName(self): return 'test'
+    ...     def grep_wrapper(self, request, response): self.seen.append(response)
+    >>> gp = grep_plugin()
+    >>> gq = grep_queue( [gp,] )
+    >>> gq.put( 'request', 'response' )
+    >>> gq.stop()
+    >>> gp.seen
+    ['response']
+    >>> gq.get_stats()['test'].calls
+    1
+
+    @author: Andres Riancho ( andres.riancho@gmail.com )
+    '''
+
+    def __init__(self, grep_plugins=(), max_size=GREP_QUEUE_SIZE,
+                 workers=GREP_WORKERS):
+        self._grep_plugins = list(grep_plugins)
+        self._queue = Queue.Queue( max_size )
+        self._worker_count = workers
+        self._workers = []
+        self._lock = threading.RLock()
+
+        # plugin name -> grep_stats
+        self._stats = {}
+        self._reported_slow = set()
+
+    def set_grep_plugins(self, grep_plugins):
+        self._grep_plugins = list(grep_plugins)
+
+    def get_grep_plugins(self):
+        return self._grep_plugins
+
+    def put(self, request, response):
+        '''
+        Queue the request/response pair to be analyzed by all the grep
+        plugins. Blocks while the queue is full.
+        '''
+        if not self._grep_plugins:
+            return
+
+        if threading.currentThread() in self._workers:
+            # A grep plugin sent an HTTP request, if I block here and the
+            # queue is full this worker will never get the item out of it.
+            self._grep( request, response )
+            return
+
+        self._start_workers()
+        while True:
+            try:
+                # Don't block forever, we want to handle Ctrl+C
+                self._queue.put( (request, response), timeout=0.5 )
+            except Queue.Full:
+                continue
+            else:
+                break
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def join(self):
+        '''
+        Wait until all the queued request/response pairs are analyzed.
+        '''
+        done = self._queue.all_tasks_done
+        done.acquire()
+        try:
+            while self._queue.unfinished_tasks:
+                done.wait( 0.5 )
+        finally:
+            done.release()
+
+    def stop(self):
+        '''
+        Analyze all the queued request/response pairs and stop the worker
+        threads. No findings are lost.
+        '''
+        self.join()
+
+        with self._lock:
+            workers = self._workers
+            self._workers = []
+
+        for _ in workers:
+            self._queue.put( _STOP )
+        for worker in workers:
+            worker.join()
+
+    def get_stats(self):
+        '''
+        @return: A dict with plugin names as keys and grep_stats objects as
+        values.
+        '''
+        with self._lock:
+            return dict( self._stats )
+
+    def print_stats(self):
+        stats = self.get_stats()
+        for name in sorted( stats, key=lambda n: -stats[n].total_time ):
+            om.out.debug('Grep plugin "%s" timing: %r' % (name, stats[name]))
+
+    def _start_workers(self):
+        if len( self._workers ) == self._worker_count:
+            return
+
+        with self._lock:
+            while len( self._workers ) < self._worker_count:
+                worker = threading.Thread( target=self._work,
+                                           name='GrepWorker' )
+                worker.setDaemon( True )
+                self._workers.append( worker )
+                worker.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    break
+                self._grep( *item )
+            finally:
+                self._queue.task_done()
+
+    def _grep(self, request, response):
+        for grep_plugin in self._grep_plugins:
+            self._grep_worker( grep_plugin, request, response )
+
+    def _grep_worker(self, grep_plugin, request, response):
+        '''
+        This method applies the grep_plugin to a request / response pair.
+
+        @parameter grep_plugin: The grep plugin to run.
+        @parameter request: The request which generated the response. A request object.
+        @parameter response: The response which was generated by the request (first parameter). A httpResponse object.
+        '''
+        name = grep_plugin.getName()
+        error = False
+        start = time.time()
+        try:
+            grep_plugin.grep_wrapper( request, response )
+        except Exception, e:
+            error = True
+            msg = 'Error in grep plugin, "%s" raised the exception: %s. ' \
+            'Please report this bug to the w3af sourceforge project page ' \
+            '[ https://sourceforge.net/apps/trac/w3af/newticket ] ' \
+            '\nException: %s' % (name, str(e), traceback.format_exc(1))
+            om.out.error(msg)
+            om.out.error(traceback.format_exc())
+        spent = time.time() - start
+
+        with self._lock:
+            stats = self._stats.get( name )
+            if stats is None:
+                stats = self._stats[ name ] = grep_stats()
+            stats.add( spent, error )
+
+            report_slow = spent > GREP_SLOW_SECONDS and \
+                          name not in self._reported_slow
+            if report_slow:
+                self._reported_slow.add( name )
+
+        if report_slow:
+            msg = 'The "%s" plugin took %.1f seconds to analyze %r. ' \
+            'For a plugin that should only perform pattern matching, ' \
+            'this is too much, please review its source code.' % \
+            (name, spent, response)
+            om.out.error(msg)
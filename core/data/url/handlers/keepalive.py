@@ -112,7 +112,6 @@ EXTRA ATTRIBUTES AND METHODS
 from collections import deque
 import urllib2
 import httplib
-import operator
 import socket
 import threading
 import urllib
@@ -130,8 +129,16 @@ DEBUG = None
 
 # Global connection timeout. In seconds.
 TIMEOUT = 25
-# Max connections allowed per host.
+# Max connections allowed per host, the default for the maxConnections setting.
 MAXCONNECTIONS = 50
+# Seconds that a connection can be idle in the pool before it's closed, the
+# default for the idleTimeout setting. The servers close them after a while
+# (5 seconds in the default Apache configuration), and a request that is sent
+# to a closed connection has to be sent again with a new one.
+IDLE_TIMEOUT = 4
+# Seconds to wait for a free connection when all the connections to the host
+# are being used.
+POOL_WAIT_TIMEOUT = 3
 # If found this number of timeouts in-a-row per target host then we may either:
 #    1) Shrink the pool size (we might be stressing the remote host) and retry;
 #        or:
@@ -331,6 +338,58 @@ class HTTPResponse(httplib.HTTPResponse):
         self._multiread = data
 
 
+class HostConnectionPool(object):
+    '''
+    The connections to one host. The free connections are kept in a deque,
+    the last one that was returned is the first one to be reused (it's the
+    one that the server most likely kept open) and the idle ones are closed
+    from the other end.
+    '''
+
+    def __init__(self, host, lock):
+        self.host = host
+        # (connection, the time when it was returned)
+        self.free = deque()
+        self.used = set()
+        # Notified when a connection is returned or removed
+        self.available = threading.Condition( lock )
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.created = 0
+        self.reused = 0
+        self.resets = 0
+        self.removed = 0
+        self.evicted = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.wait_timeouts = 0
+
+    def __len__(self):
+        return len(self.free) + len(self.used)
+
+    def connections(self):
+        return list(self.used) + [ conn for conn, _ in self.free ]
+
+    def remove_free(self, conn):
+        '''
+        @return: True if conn was a free connection.
+        '''
+        for item in self.free:
+            if item[0] is conn:
+                self.free.remove( item )
+                return True
+        return False
+
+    def get_stats(self):
+        return {'connections': len(self), 'used': len(self.used),
+                'created': self.created, 'reused': self.reused,
+                'resets': self.resets, 'removed': self.removed,
+                'evicted': self.evicted, 'waits': self.waits,
+                'wait_time': self.wait_time,
+                'wait_timeouts': self.wait_timeouts}
+
+
 class ConnectionManager:
     '''
     The connection manager must be able to:
@@ -338,67 +397,65 @@ class ConnectionManager:
         * kill the connections that we're not going to use anymore
         * Create/reuse connections when needed.
         * Control the size of the pool.
+    
+    There is one HostConnectionPool for each host, the connections are taken
+    from it and returned to it in constant time.
     '''
 
-    def __init__(self):
+    def __init__(self, pool_size=MAXCONNECTIONS, idle_timeout=IDLE_TIMEOUT):
         self._lock = threading.RLock()
-        self._host_pool_size = MAXCONNECTIONS
-        self._hostmap = {} # map hosts to a list of connections
-        self._used_cons = [] # connections being used per host
-        self._free_conns = [] # available connections
+        self._host_pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._hostmap = {} # map hosts to a HostConnectionPool
+        self._conn_host = {} # map connections to their host
+
+    def _get_pool(self, host):
+        pool = self._hostmap.get(host)
+        if pool is None:
+            pool = self._hostmap[host] = HostConnectionPool(host, self._lock)
+        return pool
 
     def remove_connection(self, conn, host=None):
         '''
         Remove a connection, it was closed by the server.
         
         @param conn: Connection to remove
-        @param host: The host for to the connection. If passed, the connection
-        will be removed faster.
+        @param host: The host for to the connection.
         '''
         with self._lock:
+            if host is not None and host not in self._hostmap:
+                raise ValueError, 'Host "%s" not present in pool.' % host
 
-            if host:
-                if host not in self._hostmap:
-                    raise ValueError, 'Host "%s" not present in pool.' % host
-                self._hostmap[host].remove(conn)
-
-            else: # We don't know the host. Need to find it by looping
-                for _host, conns in self._hostmap.items():
-                    if conn in conns:
-                        host = _host
-                        conns.remove(conn)
-                        break
-
-            removed = False
-            try:
-                self._used_cons.remove(conn)
-                removed = True
-            except ValueError:
-                try:
-                    self._free_conns.remove(conn)
-                    removed = True
-                except ValueError:
-                    pass
-            if not removed:
+            if self._conn_host.get(conn) is None or \
+               (host is not None and self._conn_host[conn] != host):
                 raise ValueError, "Connection obj <%s> not present in pool" % \
                 conn
 
-            conn_total = self.get_connections_total(host)
-            msg = 'keepalive: removed one connection, len(self._hostmap' \
-            '["%s"]): %s' % (host, conn_total)
-            om.out.debug(msg)
+            host = self._conn_host.pop(conn)
+            pool = self._hostmap[host]
+            if conn in pool.used:
+                pool.used.remove(conn)
+            else:
+                pool.remove_free(conn)
+            pool.removed += 1
+            pool.available.notify()
 
-            # No more conns for 'host', remove it from mapping
-            if host and not conn_total:
-                del self._hostmap[host]
+            om.out.debug('keepalive: removed one connection, len(self._hostmap'
+                         '["%s"]): %s', host, len(pool))
 
     def free_connection(self, conn):
         '''
         Recycle a connection. Mark it as available for being reused.
         '''
-        if conn in self._used_cons:
-            self._used_cons.remove(conn)
-            self._free_conns.append(conn)
+        with self._lock:
+            host = self._conn_host.get(conn)
+            if host is None:
+                return
+            pool = self._hostmap[host]
+            if conn in pool.used:
+                pool.used.remove(conn)
+                pool.free.append( (conn, time.time()) )
+                pool.available.notify()
 
     def replace_connection(self, bad_conn, host, conn_factory):
         '''
@@ -410,13 +467,29 @@ class ConnectionManager:
         '''
         with self._lock:
             self.remove_connection(bad_conn, host)
-            msg = 'keepalive: replacing bad connection with a new one'
-            om.out.debug(msg)
-            new_conn = conn_factory(host)
-            conns = self._hostmap.setdefault(host, [])
-            conns.append(new_conn)
-            self._used_cons.append(new_conn)
-            return new_conn
+            om.out.debug('keepalive: replacing bad connection with a new one')
+            pool = self._hostmap[host]
+            pool.resets += 1
+            return self._create_connection(pool, conn_factory)
+
+    def _create_connection(self, pool, conn_factory):
+        conn = conn_factory(pool.host)
+        pool.used.add(conn)
+        pool.created += 1
+        self._conn_host[conn] = pool.host
+        return conn
+
+    def _evict_idle(self, pool, now):
+        '''
+        Close the free connections of pool that were idle for more than
+        idle_timeout seconds.
+        '''
+        free = pool.free
+        while free and now - free[0][1] > self._idle_timeout:
+            conn = free.popleft()[0]
+            del self._conn_host[conn]
+            pool.evicted += 1
+            conn.close()
 
     def get_available_connection(self, host, conn_factory):
         '''
@@ -427,38 +500,40 @@ class ConnectionManager:
             <host> as parameter.
         '''
         with self._lock:
-            retry_count = 10
-
-            while retry_count > 0:
-                ret_conn = None
-
-                # First check if we can reuse an existing free conn.
-                for conn in self._hostmap.setdefault(host, []):
-                    try:
-                        self._free_conns.remove(conn)
-                    except ValueError:
-                        continue
-                    else:
-                        self._used_cons.append(conn)
-                        ret_conn = conn
-                        break
+            pool = self._get_pool(host)
+            wait_start = None
 
-                # No?... well, let's try to create a new one.
-                conn_total = self.get_connections_total(host)
-                if not ret_conn and conn_total < self._host_pool_size:
-                    msg = 'keepalive: added one connection, len(self._hostmap'\
-                    '["%s"]): %s' % (host, conn_total + 1)
-                    om.out.debug(msg)
-                    ret_conn = conn_factory(host)
-                    self._used_cons.append(ret_conn)
-                    self._hostmap[host].append(ret_conn)
-
-                if ret_conn is not None: # Good! We have one!
-                    return ret_conn
-                else: # Maybe we should wait a little and try again 8^)
-                    retry_count -= 1
-                    time.sleep(0.3)
+            try:
+                while True:
+                    now = time.time()
+                    self._evict_idle(pool, now)
+
+                    # First check if we can reuse an existing free conn.
+                    if pool.free:
+                        conn = pool.free.pop()[0]
+                        pool.used.add(conn)
+                        pool.reused += 1
+                        return conn
+
+                    # No?... well, let's try to create a new one.
+                    if len(pool) < self._host_pool_size:
+                        om.out.debug('keepalive: added one connection, len(self._hostmap'
+                                     '["%s"]): %s', host, len(pool) + 1)
+                        return self._create_connection(pool, conn_factory)
+
+                    # Wait for a connection to be returned
+                    if wait_start is None:
+                        wait_start = now
+                        pool.waits += 1
+                    remaining = wait_start + POOL_WAIT_TIMEOUT - now
+                    if remaining <= 0:
+                        break
+                    pool.available.wait(remaining)
+            finally:
+                if wait_start is not None:
+                    pool.wait_time += time.time() - wait_start
 
+            pool.wait_timeouts += 1
             msg = 'keepalive: been waiting too long for a pool connection.' \
             ' I\'m giving up. Seems like the pool is full.'
             om.out.debug(msg)
@@ -466,10 +541,25 @@ class ConnectionManager:
 
     def resize_pool(self, new_size):
         '''
-        Set a new pool size.
+        Set a new pool size, the maximum amount of connections for each host.
+        The free connections above the new size are closed.
         '''
-        pass
+        with self._lock:
+            self._host_pool_size = new_size
+            for pool in self._hostmap.itervalues():
+                while pool.free and len(pool) > new_size:
+                    conn = pool.free.popleft()[0]
+                    del self._conn_host[conn]
+                    conn.close()
+                pool.available.notifyAll()
 
+    def set_idle_timeout(self, idle_timeout):
+        '''
+        @param idle_timeout: Seconds that a connection can be unused before
+        it's closed.
+        '''
+        with self._lock:
+            self._idle_timeout = idle_timeout
 
     def get_all(self, host=None):
         '''
@@ -479,19 +569,53 @@ class ConnectionManager:
         
         @param host: Host
         '''
-        if host:
-            return list(self._hostmap.get(host, []))
-        else:
-            return dict(self._hostmap)
+        with self._lock:
+            if host:
+                pool = self._hostmap.get(host)
+                return pool.connections() if pool else []
+            else:
+                return dict( (h, p.connections()) for h, p in
+                             self._hostmap.iteritems() if len(p) )
 
     def get_connections_total(self, host=None):
         '''
         If <host> is None return the grand total of created connections; 
         otherwise return the total of created conns. for <host>.
         '''
-        values = self._hostmap.values() if (host is None) \
-                                            else [self._hostmap[host]]
-        return reduce(operator.add, map(len, values or [[]]))
+        with self._lock:
+            if host is None:
+                return len(self._conn_host)
+            pool = self._hostmap.get(host)
+            return len(pool) if pool else 0
+
+    def get_stats(self, host=None):
+        '''
+        @return: A dict with the counters of the pool for <host>, or the sum
+        for all the hosts: the amount of connections (and in use), the
+        connections that were created, reused, replaced because the server
+        closed them (resets), removed and closed because they were idle
+        (evicted), the times that a thread had to wait for a connection, the
+        seconds it waited and the times it gave up.
+        '''
+        with self._lock:
+            if host is not None:
+                pool = self._hostmap.get(host) or HostConnectionPool(host, None)
+                return pool.get_stats()
+            
+            total = HostConnectionPool(None, None).get_stats()
+            for pool in self._hostmap.itervalues():
+                for key, value in pool.get_stats().iteritems():
+                    total[key] += value
+            return total
+
+    def reset_stats(self):
+        '''
+        Set the counters of get_stats() to zero, the pool is shared by all
+        the scans and the statistics are logged for each one of them.
+        '''
+        with self._lock:
+            for pool in self._hostmap.itervalues():
+                pool.reset_stats()
 
 # Create the pool instance to be used. Intended to be shared by handlers.
 # See our HTTPHandler and HTTPSHandler class definitions below.
@@ -522,6 +646,12 @@ class KeepAliveHandler:
         to each.  [('foo.com:80', 2), ('bar.org', 1)]
         '''
         return [(host, len(li)) for (host, li) in self._cm.get_all().items()]
+    
+    def get_stats(self, host=None):
+        '''
+        @return: The connection pool statistics, see ConnectionManager.get_stats
+        '''
+        return self._cm.get_stats(host)
 
     def close_connection(self, host):
         '''
@@ -0,0 +1,67 @@
+'''
+test_connection_stats.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+from time import sleep
+import unittest
+
+from core.data.url.handlers.keepalive import ConnectionManager
+
+
+class dummy: pass
+
+class dummy_conn:
+    def close(self): pass
+
+
+class test_connection_stats(unittest.TestCase):
+
+    def setUp(self):
+        self.cm = ConnectionManager()
+        self.host = dummy()
+
+    def test_stats_and_idle(self):
+        cf = lambda h: dummy_conn()
+        self.cm.set_idle_timeout(0.1)
+        conn = self.cm.get_available_connection(self.host, cf)
+        self.cm.free_connection(conn)
+        # Reused while it's not idle
+        self.assertTrue(conn is self.cm.get_available_connection(self.host, cf))
+        self.cm.free_connection(conn)
+        sleep(0.2)
+        # Closed because it was idle
+        self.assertFalse(conn is self.cm.get_available_connection(self.host, cf))
+        stats = self.cm.get_stats(self.host)
+        self.assertEquals(2, stats['created'])
+        self.assertEquals(1, stats['reused'])
+        self.assertEquals(1, stats['evicted'])
+        self.assertEquals(1, stats['connections'])
+        self.assertEquals(stats, self.cm.get_stats())
+        self.assertEquals(0, self.cm.get_stats('non_host')['created'])
+
+        # The connections are kept for the next scan
+        self.cm.reset_stats()
+        stats = self.cm.get_stats()
+        self.assertEquals(0, stats['created'])
+        self.assertEquals(0, stats['evicted'])
+        self.assertEquals(1, stats['connections'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -130,19 +130,18 @@ class test_connection_mgr(PyMockTestCase):
         '''
         self.cm._host_pool_size = 1 # Only a single connection
         self.assertEquals(0, len(self.cm._hostmap))
-        self.assertEquals(0, len(self.cm._used_cons))
-        self.assertEquals(0, len(self.cm._free_conns))
         # Get connection
         cf = lambda h: dummy()
         conn = self.cm.get_available_connection(self.host, cf)
+        pool = self.cm._hostmap[self.host]
         self.assertEquals(1, len(self.cm._hostmap))
-        self.assertEquals(1, len(self.cm._used_cons))
-        self.assertEquals(0, len(self.cm._free_conns))
+        self.assertEquals(1, len(pool.used))
+        self.assertEquals(0, len(pool.free))
         # Return it to the pool
         self.cm.free_connection(conn)
         self.assertEquals(1, len(self.cm._hostmap))
-        self.assertEquals(0, len(self.cm._used_cons))
-        self.assertEquals(1, len(self.cm._free_conns))
+        self.assertEquals(0, len(pool.used))
+        self.assertEquals(1, len(pool.free))
         # Ask for a conn again
         conn = self.cm.get_available_connection(self.host, cf)
         t0 = time()
@@ -174,11 +173,7 @@ class test_connection_mgr(PyMockTestCase):
         self.cm.remove_connection(conn, self.host)
         # curr_len = old_len - 1
         self.assertTrue(old_len-1 == self.cm.get_connections_total() == 0)
-        
-        
-        
 
-        
 
 if __name__=="__main__":
     import unittest
@@ -27,6 +27,7 @@ import httplib
 from lxml import etree
 
 import core.controllers.outputManager as om
+from core.controllers.misc.similarity import similarity_profile
 from core.data.parsers.urlParser import url_object
 
 # Handle codecs
@@ -62,6 +63,7 @@ class httpResponse(object):
         self._content_type = ''
         self._dom = None
         self._clear_text_body = None
+        self._similarity_profile = None
         
         # Set the URL variables
         # The URL that we really GET'ed
@@ -158,6 +160,18 @@ class httpResponse(object):
                 om.out.debug(msg)
         return self._dom
     
+    def getSimilarityProfile(self):
+        '''
+        The profile is calculated the first time that the response is compared
+        with another one, and saved for upcoming calls.
+        
+        @return: The similarity_profile of the body.
+        '''
+        # The responses that were pickled before don't have the attribute
+        if getattr(self, '_similarity_profile', None) is None:
+            self._similarity_profile = similarity_profile( self._body )
+        return self._similarity_profile
+    
     def getNormalizedBody(self):
         '''
         @return: A normalized body
@@ -202,6 +216,7 @@ class httpResponse(object):
         '''
         #   Sets the self._body attribute
         self._charset_handling(body)
+        self._similarity_profile = None
         
     def __contains__(self, string_to_test):
         '''
@@ -0,0 +1,130 @@
+'''
+test_grep_queue.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+from __future__ import with_statement
+
+import threading
+import time
+import unittest
+
+from core.data.url.grep_queue import grep_queue
+
+
+class fake_grep_plugin(object):
+
+    def __init__(self, name, sleep=0, fail=False):
+        self._name = name
+        self._sleep = sleep
+        self._fail = fail
+        self._lock = threading.Lock()
+        self.seen = []
+
+    def getName(self):
+        return self._name
+
+    def grep_wrapper(self, request, response):
+        if self._sleep:
+            time.sleep(self._sleep)
+        if self._fail:
+            raise ValueError('grep failed')
+        with self._lock:
+            self.seen.append( (request, response) )
+
+
+class test_grep_queue(unittest.TestCase):
+
+    def test_no_findings_lost(self):
+        plugins = [ fake_grep_plugin('p%s' % i, sleep=0.001) for i in xrange(5) ]
+        gq = grep_queue( plugins, max_size=10 )
+
+        for i in xrange(100):
+            gq.put( 'req%s' % i, 'res%s' % i )
+        gq.stop()
+
+        for plugin in plugins:
+            self.assertEqual( len(plugin.seen), 100 )
+            self.assertEqual( set(plugin.seen),
+                              set([('req%s' % i, 'res%s' % i) for i in xrange(100)]) )
+
+    def test_backpressure(self):
+        gate = threading.Event()
+
+        class blocking_plugin(fake_grep_plugin):
+            def grep_wrapper(self, request, response):
+                gate.wait()
+
+        gq = grep_queue( [blocking_plugin('block')], max_size=2, workers=1 )
+        # One is taken by the worker and two fill the queue
+        for i in xrange(3):
+            gq.put( i, i )
+
+        put_done = threading.Event()
+        def put():
+            gq.put( 'x', 'x' )
+            put_done.set()
+        threading.Thread( target=put ).start()
+
+        time.sleep(0.3)
+        self.assertFalse( put_done.isSet() )
+
+        gate.set()
+        put_done.wait(5)
+        self.assertTrue( put_done.isSet() )
+        gq.stop()
+
+    def test_stats(self):
+        ok = fake_grep_plugin('ok')
+        fails = fake_grep_plugin('fails', fail=True)
+        gq = grep_queue( [ok, fails] )
+
+        for i in xrange(10):
+            gq.put( i, i )
+        gq.stop()
+
+        stats = gq.get_stats()
+        self.assertEqual( stats['ok'].calls, 10 )
+        self.assertEqual( stats['ok'].errors, 0 )
+        self.assertEqual( stats['fails'].calls, 10 )
+        self.assertEqual( stats['fails'].errors, 10 )
+        self.assertTrue( stats['ok'].max_time <= stats['ok'].total_time )
+
+    def test_put_does_not_wait_for_plugins(self):
+        '''
+        The time it takes to put a response in the queue doesn't depend on
+        the amount of grep plugins.
+        '''
+        plugins = [ fake_grep_plugin('p%s' % i, sleep=0.01) for i in xrange(40) ]
+        gq = grep_queue( plugins )
+
+        start = time.time()
+        for i in xrange(20):
+            gq.put( i, i )
+        spent = time.time() - start
+
+        # Running the plugins in this thread takes 20 * 40 * 0.01 = 8 seconds
+        self.assertTrue( spent < 1, spent )
+        gq.stop()
+
+        for plugin in plugins:
+            self.assertEqual( len(plugin.seen), 20 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,8 @@ from core.data.parsers.urlParser import url_object
 import core.data.url.handlers.localCache as localCache
 from core.data.url.handlers.keepalive import HTTPHandler as kAHTTP
 from core.data.url.handlers.keepalive import HTTPSHandler as kAHTTPS
+from core.data.url.handlers.keepalive import connMgr, MAXCONNECTIONS, \
+    IDLE_TIMEOUT
 import core.data.url.handlers.MultipartPostHandler as MultipartPostHandler
 from core.data.url.handlers.gzip_handler import HTTPGzipProcessor
 from core.data.url.handlers.FastHTTPBasicAuthHandler import FastHTTPBasicAuthHandler
@@ -118,6 +120,13 @@ class urlOpenerSettings( configurable ):
             cf.cf.save('maxFileSize', 400000 )
             cf.cf.save('maxRetrys', 2 )
             
+            # Keep-alive connection pool settings
+            cf.cf.save('maxConnections', MAXCONNECTIONS )
+            cf.cf.save('idleTimeout', IDLE_TIMEOUT )
+            
+            # The original responses are kept for the whole scan
+            cf.cf.save('baselineMaxAge', 0 )
+            
             cf.cf.save('urlParameter', '' )
             
             # 404 settings
@@ -360,6 +369,46 @@ class urlOpenerSettings( configurable ):
     def getMaxRetrys( self ):
         return cf.cf.getData('maxRetrys')
     
+    def setMaxConnections( self, max_connections ):
+        '''
+        @parameter max_connections: The maximum amount of keep-alive connections
+        to each host.
+        '''
+        if max_connections < 1:
+            raise w3afException('The maxConnections parameter should be at least 1.')
+        cf.cf.save('maxConnections', max_connections)
+        connMgr.resize_pool( max_connections )
+    
+    def getMaxConnections( self ):
+        return cf.cf.getData('maxConnections')
+    
+    def setIdleTimeout( self, idle_timeout ):
+        '''
+        @parameter idle_timeout: Seconds that a keep-alive connection can be unused
+        before it's closed.
+        '''
+        if idle_timeout < 0:
+            raise w3afException('The idleTimeout parameter can\'t be negative.')
+        cf.cf.save('idleTimeout', idle_timeout)
+        connMgr.set_idle_timeout( idle_timeout )
+    
+    def getIdleTimeout( self ):
+        return cf.cf.getData('idleTimeout')
+    
+    def setBaselineMaxAge( self, max_age ):
+        '''
+        @parameter max_age: Seconds after which the original response that the
+        audit plugins share is fetched again, 0 to keep it for the whole scan.
+        '''
+        if max_age < 0:
+            raise w3afException('The baselineMaxAge parameter can\'t be negative.')
+        cf.cf.save('baselineMaxAge', max_age)
+        # xUrllib passes it to its baseline_responses
+        self.needUpdate = True
+    
+    def getBaselineMaxAge( self ):
+        return cf.cf.getData('baselineMaxAge')
+    
     def setUrlParameter ( self, urlParam ):
         # Do some input cleanup/validation
         urlParam = urlParam.replace("'", "")
@@ -441,6 +490,26 @@ class urlOpenerSettings( configurable ):
         h14 = 'Indicates the maximum number of retries when requesting an URL.'
         o14 = option('maxRetrys', cf.cf.getData('maxRetrys'), d14, 'integer', help=h14, tabid='Misc')
 
+        d14b = 'Maximum number of connections to each host'
+        h14b = 'The keep-alive connections to each host are reused by all the threads,'
+        h14b += ' and a thread waits for a free connection when there are this many.'
+        h14b += ' Use the keep-alive statistics that are logged at the end of the scan'
+        h14b += ' to tune it with the maximum number of threads.'
+        o14b = option('maxConnections', cf.cf.getData('maxConnections'), d14b, 'integer', help=h14b, tabid='Misc')
+
+        d14c = 'Seconds that a keep-alive connection can be idle before it is closed'
+        h14c = 'Set it lower than the keep-alive timeout of the target web server,'
+        h14c += ' the requests that are sent to connections that the server already'
+        h14c += ' closed have to be sent again.'
+        o14c = option('idleTimeout', cf.cf.getData('idleTimeout'), d14c, 'integer', help=h14c, tabid='Misc')
+
+        d14d = 'Seconds after which the original responses are requested again'
+        h14d = 'Most audit plugins request the original response of each fuzzable request,'
+        h14d += ' the first one requests it and the rest use a stored copy. For targets'
+        h14d += ' with dynamic content set the seconds after which it is requested again,'
+        h14d += ' 0 keeps it for the whole scan.'
+        o14d = option('baselineMaxAge', cf.cf.getData('baselineMaxAge'), d14d, 'integer', help=h14d, tabid='Misc')
+
         d15 = 'A comma separated list that determines what URLs will ALWAYS be detected as 404 pages.'
         o15 = option('always404', cf.cf.getData('always404'), d15, 'list', tabid='404 settings')
 
@@ -470,6 +539,9 @@ class urlOpenerSettings( configurable ):
         ol.add(o12)
         ol.add(o13)
         ol.add(o14)
+        ol.add(o14b)
+        ol.add(o14c)
+        ol.add(o14d)
         ol.add(o15)
         ol.add(o16)
         ol.add(o17)
@@ -513,6 +585,9 @@ class urlOpenerSettings( configurable ):
         
         self.setMaxFileSize( optionsMap['maxFileSize'].getValue() )
         self.setMaxRetrys( optionsMap['maxRetrys'].getValue() )
+        self.setMaxConnections( optionsMap['maxConnections'].getValue() )
+        self.setIdleTimeout( optionsMap['idleTimeout'].getValue() )
+        self.setBaselineMaxAge( optionsMap['baselineMaxAge'].getValue() )
         
         self.setUrlParameter( optionsMap['urlParameter'].getValue() )
         
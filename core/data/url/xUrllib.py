@@ -32,9 +32,10 @@ import urllib, urllib2
 import sqlite3
 
 
+from core.controllers.coreHelpers.baseline_responses import \
+    baseline_responses
 from core.controllers.misc.homeDir import get_home_dir
-from core.controllers.misc.timeout_function import TimeLimited, TimeLimitExpired
-from core.controllers.misc.lru import LRU
+from core.controllers.misc.sharded_lru import sharded_lru
 from core.controllers.misc.memoryUsage import dumpMemoryUsage
 from core.controllers.misc.number_generator import \
     consecutive_number_generator as seq_gen
@@ -47,11 +48,12 @@ from core.data.constants.httpConstants import NO_CONTENT
 from core.data.parsers.httpRequestParser import httpRequestParser
 from core.data.parsers.urlParser import url_object
 from core.data.request.frFactory import createFuzzableRequestRaw
-from core.data.url.handlers.keepalive import URLTimeoutError
+from core.data.url.handlers.keepalive import URLTimeoutError, connMgr
 from core.data.url.handlers import logHandler
 from core.data.url.httpResponse import httpResponse as httpResponse
 from core.data.url.HTTPRequest import HTTPRequest as HTTPRequest
 from core.data.url.handlers.localCache import CachedResponse
+from core.data.url.grep_queue import grep_queue
 import core.controllers.outputManager as om
 import core.data.kb.config as cf
 import core.data.kb.knowledgeBase as kb
@@ -78,10 +80,14 @@ class xUrllib(object):
         
         self._dnsCache()
         self._tm = thread_manager
-        self._sizeLRU = LRU(200)
+        self._sizeLRU = sharded_lru(200)
+        
+        # The original responses that the audit plugins share, a new xUrllib
+        # is created for each scan so they aren't kept between scans
+        self.baseline_responses = baseline_responses()
         
         # User configured options (in an indirect way)
-        self._grepPlugins = []
+        self._grep_queue = grep_queue()
         self._evasionPlugins = []
         self._paused = False
         self._mustStop = False
@@ -142,6 +148,26 @@ class xUrllib(object):
         '''
         This method is called when the xUrllib is not going to be used anymore.
         '''
+        # Analyze the responses that are still in the queue, the grep plugins
+        # are ended right after this
+        self._grep_queue.stop()
+        self._grep_queue.print_stats()
+        
+        stats = self.baseline_responses.get_stats()
+        om.out.debug('Original response store: %s hits, %s misses, %s evictions,'
+                     ' %s expired.', stats['hits'], stats['misses'],
+                     stats['evictions'], stats['expired'])
+        self.baseline_responses.clear()
+        
+        # The connection manager is shared by all the scans
+        stats = connMgr.get_stats()
+        connMgr.reset_stats()
+        om.out.debug('Keep-alive connections: %s created, %s reused, %s resets,'
+                     ' %s idle evicted, %s checkout waits (%.2fs, %s timeouts).',
+                     stats['created'], stats['reused'], stats['resets'],
+                     stats['evicted'], stats['waits'], stats['wait_time'],
+                     stats['wait_timeouts'])
+        
         path_join = os.path.join
         try:
             cacheLocation = path_join(get_home_dir(), 'urllib2cache',
@@ -178,18 +204,18 @@ class xUrllib(object):
         if not hasattr( socket, 'already_configured' ):
             socket._getaddrinfo = socket.getaddrinfo
         
-        _dns_cache = LRU(200)
+        _dns_cache = sharded_lru(200)
         def _caching_getaddrinfo(*args, **kwargs):
             try:
                 query = (args)
                 res = _dns_cache[query]
                 #This was too noisy and not so usefull
-                om.out.debug('Cached DNS response for domain: ' + query[0] )
+                om.out.debug('Cached DNS response for domain: %s', query[0] )
                 return res
             except KeyError:
                 res = socket._getaddrinfo(*args, **kwargs)
                 _dns_cache[args] = res
-                om.out.debug('DNS response from DNS server for domain: ' + query[0] )
+                om.out.debug('DNS response from DNS server for domain: %s', query[0] )
                 return res
         
         if not hasattr( socket, 'already_configured' ):      
@@ -202,6 +228,7 @@ class xUrllib(object):
             self.settings.needUpdate = False
             self.settings.buildOpeners()
             self._opener = self.settings.getCustomUrlopen()
+            self.baseline_responses.set_max_age( self.settings.getBaselineMaxAge() )
 
     def getHeaders(self, uri):
         '''
@@ -500,11 +527,9 @@ class xUrllib(object):
             res = self._opener.open(req)
         except urllib2.HTTPError, e:
             # We usually get here when response codes in [404, 403, 401,...]
-            msg = '%s %s returned HTTP code "%s" - id: %s' % \
-                            (req.get_method(), original_url, e.code, e.id)
-            if hasattr(e, 'from_cache'):
-                msg += ' - from cache.'
-            om.out.debug(msg)
+            om.out.debug('%s %s returned HTTP code "%s" - id: %s%s', req.get_method(),
+                         original_url, e.code, e.id,
+                         ' - from cache.' if hasattr(e, 'from_cache') else '')
             
             # Return this info to the caller
             code = int(e.code)
@@ -526,8 +551,8 @@ class xUrllib(object):
             if grepResult:
                 self._grepResult(req, httpResObj)
             else:
-                om.out.debug('No grep for: "%s", the plugin sent ' \
-                             'grepResult=False.' % geturl_instance)
+                om.out.debug('No grep for: "%s", the plugin sent '
+                             'grepResult=False.', geturl_instance)
 
             return httpResObj
         except urllib2.URLError, e:
@@ -598,19 +623,20 @@ class xUrllib(object):
 
         else:
             # Everything went well!
-            rdata = req.get_data()
-            if not rdata:
-                msg = ('%s %s returned HTTP code "%s" - id: %s' % 
-                (req.get_method(), urllib.unquote_plus(original_url), res.code,
-                 res.id))
-            else:                
-                msg = ('%s %s with data: "%s" returned HTTP code "%s" - id: %s'
-                % (req.get_method(), original_url, urllib.unquote_plus(rdata),
-                   res.code, res.id))
-
-            if hasattr(res, 'from_cache'):
-                msg += ' - from cache.'
-            om.out.debug(msg)
+            if om.out.isEnabled('debug'):
+                rdata = req.get_data()
+                if not rdata:
+                    msg = ('%s %s returned HTTP code "%s" - id: %s' % 
+                    (req.get_method(), urllib.unquote_plus(original_url), res.code,
+                     res.id))
+                else:                
+                    msg = ('%s %s with data: "%s" returned HTTP code "%s" - id: %s'
+                    % (req.get_method(), original_url, urllib.unquote_plus(rdata),
+                       res.code, res.id))
+    
+                if hasattr(res, 'from_cache'):
+                    msg += ' - from cache.'
+                om.out.debug(msg)
 
             code = int(res.code)
             info = res.info()
@@ -635,7 +661,7 @@ class xUrllib(object):
                 self._grepResult(req, httpResObj)
             else:
                 om.out.debug('No grep for: %s, the plugin sent grepResult='
-                             'False.' % geturl)
+                             'False.', geturl)
             return httpResObj
 
     def _readRespose( self, res ):
@@ -691,7 +717,7 @@ class xUrllib(object):
         
         errtotal = len(last_errors)
         
-        om.out.debug('Incrementing global error count. GEC: %s' % errtotal)
+        om.out.debug('Incrementing global error count. GEC: %s', errtotal)
         
         with self._countLock:
             if errtotal >= 10 and not self._mustStop:
@@ -759,7 +785,21 @@ class xUrllib(object):
             om.out.debug('Resetting global error count. GEC: 0')
     
     def setGrepPlugins(self, grepPlugins ):
-        self._grepPlugins = grepPlugins
+        self._grep_queue.set_grep_plugins( grepPlugins )
+    
+    def join_grep(self):
+        '''
+        Wait for the grep plugins to analyze all the responses that were
+        received until now.
+        '''
+        self._grep_queue.join()
+    
+    def get_grep_stats(self):
+        '''
+        @return: A dict with the grep plugin names as keys and grep_stats
+        objects (calls, errors and time spent) as values.
+        '''
+        return self._grep_queue.get_stats()
     
     def setEvasionPlugins( self, evasionPlugins ):
         # I'm sorting evasion plugins based on priority
@@ -785,69 +825,21 @@ class xUrllib(object):
         return request
         
     def _grepResult(self, request, response):
-        # The grep process is all done in another thread. This improves the
-        # speed of all w3af.
+        # The grep process is all done in other threads, the request is
+        # queued and analyzed by the grep plugins in the background. This
+        # improves the speed of all w3af.
+        if not self._grep_queue.get_grep_plugins():
+            return
+        
         url_instance = url_object( request.get_full_url() )
         domain = url_instance.getDomain()
         
-        if len( self._grepPlugins ) and domain in cf.cf.getData('targetDomains'):
+        if domain in cf.cf.getData('targetDomains'):
             
             # I'll create a fuzzable request based on the urllib2 request object
             fuzzReq = createFuzzableRequestRaw( request.get_method(), url_instance, request.get_data(), request.headers )
             
-            for grep_plugin in self._grepPlugins:
-                #
-                #   For debugging, do not remove, only comment out if needed.
-                #
-                self._grep_worker( grep_plugin, fuzzReq, response )
-                
-                # TODO: Analyze if creating a different threadpool for grep workers speeds up the whole process
-                #targs = (grep_plugin, fuzzReq, response)
-                #self._tm.startFunction( target=self._grep_worker, args=targs, ownerObj=self, restrict=False )
-            
-            self._tm.join( self )
-    
-    def _grep_worker( self , grep_plugin, request, response):
-        '''
-        This method applies the grep_plugin to a request / response pair.
-
-        @parameter grep_plugin: The grep plugin to run.
-        @parameter request: The request which generated the response. A request object.
-        @parameter response: The response which was generated by the request (first parameter). A httpResponse object.
-        '''
-        msg = 'Starting "'+ grep_plugin.getName() +'" grep_worker for response: ' + repr(response)
-        om.out.debug( msg )
-        
-        # Create a wrapper that will timeout in "timeout_seconds" seconds.
-        #
-        # TODO:
-        # For now I leave it at 5, but I have to debug grep plugins and I will lower this eventually
-        #
-        timeout_seconds = 5
-        timedout_grep_wrapper = TimeLimited( grep_plugin.grep_wrapper, timeout_seconds)
-        try:
-            timedout_grep_wrapper(request, response)
-        except KeyboardInterrupt:
-            # Correct control+c handling...
-            raise
-        except TimeLimitExpired:
-            msg = 'The "%s" plugin took more than %s seconds to run. ' \
-            'For a plugin that should only perform pattern matching, ' \
-            'this is too much, please review its source code.' % \
-            (grep_plugin.getName(), timeout_seconds)
-            om.out.error(msg)
-        except Exception, e:
-            msg = 'Error in grep plugin, "%s" raised the exception: %s. ' \
-            'Please report this bug to the w3af sourceforge project page ' \
-            '[ https://sourceforge.net/apps/trac/w3af/newticket ] ' \
-            '\nException: %s' % (grep_plugin.getName(), str(e), 
-                                 traceback.format_exc(1))
-            om.out.error(msg)
-            om.out.error(getattr(e, 'orig_traceback_str', '') or \
-                            traceback.format_exc())
-
-        
-        om.out.debug('Finished grep_worker for response: ' + repr(response))
+            self._grep_queue.put( fuzzReq, response )
 
 _abbrevs = [
     (1<<50L, 'P'),
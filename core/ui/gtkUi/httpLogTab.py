@@ -28,7 +28,7 @@ import pango
 from . import reqResViewer, entries
 from core.ui.gtkUi.entries import EasyTable
 from core.ui.gtkUi.entries import wrapperWidgets
-from core.data.db.history import HistoryItem
+from core.data.db.history import HistoryItem, SEARCH_PAGE_SIZE
 from core.controllers.w3afException import w3afException
 import core.controllers.outputManager as om
 from core.data.options.preferences import Preferences
@@ -47,6 +47,9 @@ class httpLogTab(entries.RememberingHPaned):
         self.w3af = w3af
         self._padding = padding
         self._lastId = 0
+        # The search that is shown, and if it has more pages
+        self._searchQuery = ('', [])
+        self._morePages = False
         self._historyItem = HistoryItem()
         if time_refresh:
             gobject.timeout_add(1000, self.refreshResults)
@@ -72,6 +75,8 @@ class httpLogTab(entries.RememberingHPaned):
         self._sw = gtk.ScrolledWindow()
         self._sw.set_shadow_type(gtk.SHADOW_ETCHED_IN)
         self._sw.set_policy(gtk.POLICY_AUTOMATIC, gtk.POLICY_AUTOMATIC)
+        # The results are loaded one page at the time, when scrolling down
+        self._sw.get_vadjustment().connect('value-changed', self._scrolled)
         self._lstore = gtk.ListStore(gobject.TYPE_UINT,gobject.TYPE_BOOLEAN,
                 gobject.TYPE_STRING,gobject.TYPE_STRING,gobject.TYPE_STRING,
                 gobject.TYPE_UINT, gobject.TYPE_STRING,
@@ -314,14 +319,6 @@ class httpLogTab(entries.RememberingHPaned):
         searchText = self._searchText.get_text()
         searchText = searchText.strip()
         searchData = []
-        #  
-        #  Search part
-        #
-        if searchText:
-            likePieces = []
-            likePieces.append(('url', "%"+searchText+"%", 'like'))
-            likePieces.append(('tag', "%"+searchText+"%", 'like'))
-            searchData.append((likePieces, 'OR'))
         # 
         # Filter part
         #
@@ -346,8 +343,6 @@ class httpLogTab(entries.RememberingHPaned):
             searchData.append(('id', maxId, "<"))
         if minId > 0:
             searchData.append(('id', minId, ">"))
-        if refresh:
-            searchData.append(('id', self._lastId, ">"))
         # Sizes
         if self.pref.getValue('sizes', 'resp_size'):
             searchData.append(('response_size', 0, ">"))
@@ -369,37 +364,44 @@ class httpLogTab(entries.RememberingHPaned):
             if self.pref.getValue('methods', method[0]):
                 filterTypes.append(('method', method[0], '='))
         searchData.append((filterMethods, 'OR'))
-
+        if refresh and self._morePages:
+            # The new items are shown after scrolling through the pages
+            return
+        if not refresh:
+            self._lastId = 0
+        self._searchQuery = (searchText, searchData)
+        self._loadPage(appendMode=refresh)
+
+    def _loadPage(self, appendMode=False):
+        """Show the next page of results of the current search."""
+        searchText, searchData = self._searchQuery
         try:
-            # Please see the 5000 below
-            searchResultObjects = self._historyItem.find(searchData,
-                    resultLimit=5001, orderData=[("id","")])
+            searchResultObjects = self._historyItem.search(searchText,
+                    searchData, afterId=self._lastId)
         except w3afException, w3:
             self._emptyResults()
             return
+        self._morePages = len(searchResultObjects) == SEARCH_PAGE_SIZE
         if len(searchResultObjects) == 0:
-            if not refresh:
+            if not appendMode:
                 self._emptyResults()
             return
-        # Please see the 5001 above
-        elif len(searchResultObjects) > 5000:
-            self._emptyResults()
-            msg = _('The search you performed returned too many results (') +\
-                    str(len(searchResultObjects)) + ').\n'
-            msg += _('Please refine your search and try again.')
-            self._showMessage('Too many results', msg)
-            return
-        else:
-            # show the results in the list view (when first row is selected 
-            # that just triggers the req/resp filling.
-            lastItem = searchResultObjects[-1]
-            self._lastId = int(lastItem.id)
-            self._showListView(searchResultObjects, appendMode=refresh)
-            if not refresh:
-                self._sw.set_sensitive(True)
-                self._reqResViewer.set_sensitive(True)
-                self._lstoreTreeview.set_cursor((0,))
+        # show the results in the list view (when first row is selected 
+        # that just triggers the req/resp filling.
+        lastItem = searchResultObjects[-1]
+        self._lastId = int(lastItem.id)
+        self._showListView(searchResultObjects, appendMode=appendMode)
+        if not appendMode:
+            self._sw.set_sensitive(True)
+            self._reqResViewer.set_sensitive(True)
+            self._lstoreTreeview.set_cursor((0,))
+
+    def _scrolled(self, adjustment):
+        """Load the next page when the last rows are visible."""
+        if not self._morePages:
             return
+        if adjustment.value + 2 * adjustment.page_size >= adjustment.upper:
+            self._loadPage(appendMode=True)
 
     def _emptyResults(self):
         """Empty all panes."""
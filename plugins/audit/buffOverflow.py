@@ -24,7 +24,7 @@ import core.controllers.outputManager as om
 
 from core.controllers.basePlugin.baseAuditPlugin import baseAuditPlugin
 from core.controllers.w3afException import w3afException, w3afMustStopException
-from core.data.fuzzer.fuzzer import createMutants, createRandAlpha
+from core.data.fuzzer.fuzzer import iterMutants, createRandAlpha
 
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.vuln as vuln
@@ -88,7 +88,7 @@ class buffOverflow(baseAuditPlugin):
             msg += ' overflow testing'
             om.out.debug( msg )
         else:
-            mutants = createMutants( freq , str_list, oResponse=oResponse )
+            mutants = iterMutants( freq , str_list, oResponse=oResponse )
                 
             for mutant in mutants:
                 targs = (mutant,)
@@ -35,7 +35,7 @@ import core.data.constants.severity as severity
 
 from core.controllers.w3afException import w3afException
 from core.data.fuzzer.fuzzer import createMutants, createRandNum, createRandAlNum
-from core.controllers.misc.levenshtein import relative_distance
+from core.controllers.misc.similarity import similarity
 
 import copy
 
@@ -107,9 +107,9 @@ class generic(baseAuditPlugin):
         
         @return: None
         '''
-        original_to_error = relative_distance(oResponse.getBody(), error_response.getBody() )
-        limit_to_error = relative_distance( limit_response.getBody(), error_response.getBody() )
-        original_to_limit = relative_distance( limit_response.getBody(), oResponse.getBody() )
+        original_to_error = similarity( oResponse, error_response )
+        limit_to_error = similarity( limit_response, error_response )
+        original_to_limit = similarity( limit_response, oResponse )
         
         ratio = self._diff_ratio + ( 1 - original_to_limit )
         
@@ -125,7 +125,7 @@ class generic(baseAuditPlugin):
             # in order to remove some false positives
             limit_response2 = self._get_limit_response( mutant )
             
-            if relative_distance( limit_response2.getBody(), limit_response.getBody() ) > \
+            if similarity( limit_response2, limit_response ) > \
             1 - self._diff_ratio:
                 # The two limits are "equal"; It's safe to suppose that we have found the
                 # limit here and that the error string really produced an error
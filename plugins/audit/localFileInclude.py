@@ -37,7 +37,7 @@ import core.data.kb.info as info
 import core.data.constants.severity as severity
 import core.data.kb.config as cf
 
-from core.data.fuzzer.fuzzer import createMutants
+from core.data.fuzzer.fuzzer import iterMutants
 
 import re
 
@@ -72,7 +72,7 @@ class localFileInclude(baseAuditPlugin):
         if not self._open_basedir:
             local_files.extend( self._get_local_file_list(freq.getURL()) )
         
-        mutants = createMutants( freq , local_files, oResponse=oResponse )
+        mutants = iterMutants( freq , local_files, oResponse=oResponse )
             
         for mutant in mutants:
             
@@ -61,7 +61,8 @@ class unSSL(baseAuditPlugin):
         else:            
             # Define some variables
             secure = freq.getURL()
-            insecure = secure.setProtocol('http')
+            insecure = secure.copy()
+            insecure.setProtocol('http')
             
             if self._first_run:
                 try:
@@ -26,7 +26,7 @@ import core.controllers.outputManager as om
 from core.controllers.basePlugin.baseBruteforcePlugin import baseBruteforcePlugin
 from core.controllers.w3afException import w3afException, w3afMustStopOnUrlError
 from core.data.dc import form
-from core.controllers.misc.levenshtein import relative_distance_ge
+from core.controllers.misc.similarity import best_match, similarity_profile
 from core.data.fuzzer.fuzzer import createRandAlNum
 from core.data.url.xUrllib import xUrllib
 
@@ -156,8 +156,8 @@ class formAuthBrute(baseBruteforcePlugin):
             body = body.replace(user, '')
             body = body.replace(passwd, '')
             
-            # Save it
-            self._login_failed_result_list.append(body)
+            # Save it, it's compared with the response for each password
+            self._login_failed_result_list.append( similarity_profile(body) )
         
         # Now I perform a self test, before starting with the actual bruteforcing
         # The first tuple is an invalid username and a password
@@ -187,10 +187,9 @@ class formAuthBrute(baseBruteforcePlugin):
         @return: True if the resp_body matches the previously created 
         responses that are stored in self._login_failed_result_list.
         '''
-        lfrl = self._login_failed_result_list
         # 0.65 gives a good measure of similarity
-        if relative_distance_ge(resp_body, lfrl[0], 0.65) or \
-                relative_distance_ge(resp_body, lfrl[1], 0.65):
+        match, _ = best_match(resp_body, self._login_failed_result_list, 0.65)
+        if match is not None:
             return True
         else:
             # I'm happy! The response_body *IS NOT* a failed login page.
@@ -34,7 +34,7 @@ from core.data.parsers.urlParser import url_object
 
 from core.controllers.w3afException import w3afRunOnce, w3afException
 from core.data.fuzzer.fuzzer import createRandAlNum
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt, similarity_profile
 
 import urllib
 
@@ -97,6 +97,8 @@ class afd(baseDiscoveryPlugin):
         else:
             original_response_body = original_response_body.replace( rnd_param, '' )
             original_response_body = original_response_body.replace( rnd_value, '' )
+            # It's compared with all the responses
+            original_response_body = similarity_profile( original_response_body )
             
             for offending_string in self._get_offending_strings():
                 offending_URL = fuzzableRequest.getURL() + '?' + rnd_param + '=' + offending_string
@@ -128,7 +130,7 @@ class afd(baseDiscoveryPlugin):
             # So I must analyze the response body
             resp_body = resp_body.replace(offending_string, '')
             resp_body = resp_body.replace(rnd_param, '')
-            if relative_distance_lt(resp_body, original_resp_body, 0.15):
+            if similarity_lt(resp_body, original_resp_body, 0.15):
                 self._filtered.append(offending_URL)
             else:
                 self._not_filtered.append(offending_URL)
@@ -28,7 +28,7 @@ from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseDiscoveryPlugin import baseDiscoveryPlugin
 from core.controllers.w3afException import w3afException
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt
 
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
 
@@ -111,7 +111,7 @@ class digitSum(baseDiscoveryPlugin):
                 is_new = False
                 if response.getURL() != original_resp.getURL():
                     is_new = True
-                elif relative_distance_lt(response.getBody(), original_resp.getBody(), 0.7):
+                elif similarity_lt(response, original_resp, 0.7):
                     is_new = True
                 
                 # Add it to the result.
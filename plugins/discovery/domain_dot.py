@@ -33,7 +33,7 @@ import core.data.kb.info as info
 import core.data.constants.severity as severity
 
 from core.controllers.w3afException import w3afException
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt
 
 
 class domain_dot(baseDiscoveryPlugin):
@@ -86,7 +86,7 @@ class domain_dot(baseDiscoveryPlugin):
         @parameter original_resp: The httpResponse object that holds the ORIGINAL response.
         @parameter resp: The httpResponse object that holds the content of the response to analyze.
         '''
-        if relative_distance_lt(original_resp.getBody(), resp.getBody(), 0.7):
+        if similarity_lt(original_resp, resp, 0.7):
             i = info.info(resp)
             i.setPluginName(self.getName())
             i.setId([original_resp.id, resp.id])
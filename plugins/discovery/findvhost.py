@@ -28,7 +28,7 @@ from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseDiscoveryPlugin import baseDiscoveryPlugin
 import core.data.parsers.dpCache as dpCache
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt
 from core.data.fuzzer.fuzzer import createRandAlNum
 from core.controllers.w3afException import w3afException
 
@@ -114,7 +114,6 @@ class findvhost(baseDiscoveryPlugin):
         base_url = fuzzableRequest.getURL().baseUrl()
         original_response = self._urlOpener.GET(fuzzableRequest.getURI(), useCache=True)
         base_response = self._urlOpener.GET(base_url, useCache=True)
-        base_resp_body = base_response.getBody()
         
         try:
             dp = dpCache.dpc.getDocumentParserFor(original_response)
@@ -126,7 +125,6 @@ class findvhost(baseDiscoveryPlugin):
         non_existant = 'iDoNotExistPleaseGoAwayNowOrDie' + createRandAlNum(4) 
         self._non_existant_response = self._urlOpener.GET(base_url, 
                                                 useCache=False, headers={'Host': non_existant})
-        nonexist_resp_body = self._non_existant_response.getBody()
         
         # Note:
         # - With parsed_references I'm 100% that it's really something in the HTML
@@ -158,11 +156,10 @@ class findvhost(baseDiscoveryPlugin):
                     pass
                 else:
                     self._already_queried.add(domain)
-                    vhost_resp_body = vhost_response.getBody()
                     
                     # If they are *really* different (not just different by some chars)
-                    if relative_distance_lt(vhost_resp_body, base_resp_body, 0.35) and \
-                        relative_distance_lt(vhost_resp_body, nonexist_resp_body, 0.35):
+                    if similarity_lt(vhost_response, base_response, 0.35) and \
+                        similarity_lt(vhost_response, self._non_existant_response, 0.35):
                         # and the domain can't just be resolved using a DNS query to
                         # our regular DNS server
                         report = True
@@ -233,11 +230,9 @@ class findvhost(baseDiscoveryPlugin):
         
         # Get some responses to compare later
         original_response = self._urlOpener.GET(base_url, useCache=True)
-        orig_resp_body = original_response.getBody()
         non_existant = 'iDoNotExistPleaseGoAwayNowOrDie' + createRandAlNum(4)
         self._non_existant_response = self._urlOpener.GET(base_url, useCache=False, \
                                                         headers={'Host': non_existant })
-        nonexist_resp_body = self._non_existant_response.getBody()
         
         for common_vhost in common_vhost_list:
             try:
@@ -246,11 +241,9 @@ class findvhost(baseDiscoveryPlugin):
             except w3afException:
                 pass
             else:
-                vhost_resp_body = vhost_response.getBody()
-
                 # If they are *really* different (not just different by some chars)
-                if relative_distance_lt(vhost_resp_body, orig_resp_body, 0.35) and \
-                    relative_distance_lt(vhost_resp_body, nonexist_resp_body, 0.35):
+                if similarity_lt(vhost_response, original_response, 0.35) and \
+                    similarity_lt(vhost_response, self._non_existant_response, 0.35):
                     res.append((common_vhost, vhost_response.id))
         
         return res
@@ -32,7 +32,7 @@ import core.data.kb.info as info
 from core.data.parsers.urlParser import url_object
 
 from core.controllers.w3afException import w3afRunOnce,  w3afException
-from core.controllers.misc.levenshtein import relative_distance_ge
+from core.controllers.misc.similarity import similarity_ge
 
 
 class fingerprint_os(baseDiscoveryPlugin):
@@ -86,8 +86,7 @@ class fingerprint_os(baseDiscoveryPlugin):
             original_response = self._urlOpener.GET( fuzzableRequest.getURL() )
             self._found_OS = True
 
-            if relative_distance_ge(original_response.getBody(),
-                                    windows_response.getBody(), 0.98):
+            if similarity_ge(original_response, windows_response, 0.98):
                 i = info.info()
                 i.setPluginName(self.getName())
                 i.setName('Operating system')
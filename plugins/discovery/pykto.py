@@ -42,6 +42,8 @@ from core.controllers.coreHelpers.fingerprint_404 import is_404
 import os.path
 import re
 
+JUNK_RE = re.compile( 'JUNK\((.*?)\)' )
+
 
 class pykto(baseDiscoveryPlugin):
     '''
@@ -77,6 +79,10 @@ class pykto(baseDiscoveryPlugin):
         self._update_scandb = False
         self._source = ''
         
+        # The parsed scan databases, see _get_signatures()
+        self._signatures = None
+        self._signatures_key = None
+        
     def discover(self, fuzzableRequest ):
         '''
         Runs pykto to the site.
@@ -123,6 +129,36 @@ class pykto(baseDiscoveryPlugin):
         
         @parameter url: The URL object I have to test.
         '''
+        signatures = self._get_signatures()
+        
+        if not self._generic_scan:
+            # The server type doesn't change during the scan, so the tests for
+            # other servers are removed here and not for each request
+            kb_server = self._get_server_type()
+            signatures = [ s for s in signatures if self._server_match( s[0], kb_server ) ]
+        
+        # pykto that site !
+        self._pykto( url , signatures )
+    
+    def _get_signatures( self ):
+        '''
+        Parse the scan databases, the result is kept until the files or the
+        user configured directories change.
+        
+        @return: A list of (server, query, expected_response, method, desc)
+        tuples, one for each request that pykto sends.
+        '''
+        try:
+            mtimes = ( os.path.getmtime( self._db_file ),
+                       os.path.getmtime( self._extra_db_file ) )
+        except OSError:
+            mtimes = None
+        
+        key = ( self._db_file, self._extra_db_file, mtimes, tuple(self._cgi_dirs),
+                tuple(self._admin_dirs), tuple(self._nuke), tuple(self._users) )
+        if self._signatures is not None and self._signatures_key == key:
+            return self._signatures
+        
         try:
             # read the nikto database.
             db_file_1 = open(self._db_file, "r")
@@ -130,17 +166,29 @@ class pykto(baseDiscoveryPlugin):
             db_file_2 = open(self._extra_db_file, "r")
         except Exception, e:
             raise w3afException('Failed to open the scan databases. Exception: "' + str(e) + '".')
-        else:
-
-            # Put all the tests in a list
-            test_list = db_file_1.readlines()
-            test_list.extend(db_file_2.readlines())
-            # Close the files
-            db_file_1.close()
-            db_file_2.close()
-
-            # pykto that site !
-            self._pykto( url , test_list )
+        
+        # Put all the tests in a list
+        test_list = db_file_1.readlines()
+        test_list.extend(db_file_2.readlines())
+        # Close the files
+        db_file_1.close()
+        db_file_2.close()
+        
+        signatures = []
+        lines = 0
+        for line in test_list:
+            if not self._is_comment( line ):
+                # This is a sample scan_database.db line :
+                # "apache","/docs/","200","GET","May give list of installed software"
+                lines += 1
+                # A line could generate more than one request... 
+                # (think about @CGIDIRS)
+                signatures.extend( self._parse( line ) )
+        
+        om.out.debug('Read ' + str(lines) + ' tests from the scan databases.' )
+        self._signatures = signatures
+        self._signatures_key = key
+        return signatures
         
     def _update_db( self ):
         '''
@@ -226,89 +274,66 @@ class pykto(baseDiscoveryPlugin):
                     raise w3afException( msg )
                 
     
-    def _pykto(self, url , test_list ):
+    def _pykto(self, url , signatures ):
         '''
         This method does all the real work and writes vulns to the KB.
 
         @parameter url: The base URL
-        @parameter test_list: The list of all the tests that have to be performed        
-        @return: A list with new url's found.
+        @parameter signatures: The tests that have to be performed, as returned
+        by _get_signatures()
         '''
-        lines = 0
+        #
+        # Avoid some special cases
+        #
+        if url.getPath().endswith('/./') or url.getPath().endswith('/%2e/'):
+            # avoid directory self references
+            return
+        
         lines_sent = 0
-        for line in test_list:
-            #om.out.debug( 'Read scan_database: '+ line[:len(line)-1] )
-            if not self._is_comment( line ):
-                # This is a sample scan_database.db line :
-                # "apache","/docs/","200","GET","May give list of installed software"
-                to_send = self._parse( line )
-                
-                lines += 1
-                
-                # A line could generate more than one request... 
-                # (think about @CGIDIRS)
-                for parameters in to_send:
-                    
-                    modified_url = url.copy()
-                    
-                    (server, query , expected_response, method , desc) = parameters
-                    
-                    if self._generic_scan or self._server_match( server ):
-                        #
-                        # Avoid some special cases
-                        #
-                        if url.getPath().endswith('/./') or url.getPath().endswith('/%2e/'):
-                            # avoid directory self references
-                            continue
-                        #
-                        # End of special cases
-                        #
-                        
-                        om.out.debug('Testing pykto signature: "' + query + '".')
-
-                        # I don't use urlJoin here because in some cases pykto needs to
-                        # send something like http://abc/../../../../etc/passwd
-                        # and after urlJoin the URL would be just http://abc/etc/passwd
-                        
-                        # But I do want is to avoid URLs like this one being generated:
-                        # http://localhost//f00
-                        # (please note the double //)
-                        if len( query ) != 0 and len( url.getPath() ) != 0:
-                            if query[0] == '/' == url.getPath()[-1]:
-                                query = query[1:]
-                            
-                        modified_url.setPath( modified_url.getPath() + query )
-                        
-                        lines_sent += len( to_send )
-                        
-                        # Send the request to the remote server and check the response.
-                        targs = (modified_url, parameters)
-                        try:
-                            # Performing this with different threads adds overhead, but works better now.
-                            #   WithOUT threads:
-                            #self._send_and_check(modified_url, parameters)
-                            
-                            #   With threads:
-                            #           Performed 3630 requests in 13 seconds (279.230769 req/sec)
-                            self._tm.startFunction( target=self._send_and_check, args=targs , ownerObj=self )
-                            
-                        except w3afException, e:
-                            om.out.information( str(e) )
-                            return
-                        except KeyboardInterrupt,e:
-                            raise e
+        for parameters in signatures:
+            
+            (server, query , expected_response, method , desc) = parameters
+            
+            om.out.debug('Testing pykto signature: "' + query + '".')
+
+            # I don't use urlJoin here because in some cases pykto needs to
+            # send something like http://abc/../../../../etc/passwd
+            # and after urlJoin the URL would be just http://abc/etc/passwd
+            
+            # But I do want is to avoid URLs like this one being generated:
+            # http://localhost//f00
+            # (please note the double //)
+            if len( query ) != 0 and len( url.getPath() ) != 0:
+                if query[0] == '/' == url.getPath()[-1]:
+                    query = query[1:]
+            
+            modified_url = url.copy()
+            modified_url.setPath( modified_url.getPath() + query )
+            
+            lines_sent += 1
+            
+            # Send the request to the remote server and check the response.
+            targs = (modified_url, parameters)
+            try:
+                # All the tests are queued without waiting for the previous
+                # ones, the join below waits for all of them.
+                self._tm.startFunction( target=self._send_and_check, args=targs , ownerObj=self )
                 
-                self._tm.join( self )
+            except w3afException, e:
+                om.out.information( str(e) )
+                break
+            except KeyboardInterrupt,e:
+                raise e
         
-        om.out.debug('Read ' + str(lines) + ' from file.' )
-        om.out.debug('Sent ' + str(lines_sent) + ' requests to remote webserver.' )
+        self._tm.join( self )
         
-    def _server_match( self, server ):
+        om.out.debug('Sent ' + str(lines_sent) + ' requests to remote webserver.' )
+    
+    def _get_server_type( self ):
         '''
-        Reads the kb and compares the server parameter with the kb value.
-        If they match true is returned.
+        Reads the remote server type from the kb.
         
-        @parameter server: A server name like "apache"
+        @return: A server name like "Apache/2.2.3", or "not available".
         '''
         # Try to get the server type from hmap
         # it is the most accurate way to do it but hmap plugin
@@ -331,7 +356,23 @@ class pykto(baseDiscoveryPlugin):
             msg += ' This information was obtained by ' + self._source + ' plugin.'
             om.out.information( msg )
             self._show_remote_server = False
-            
+        
+        return kb_server
+        
+    def _server_match( self, server, kb_server ):
+        '''
+        Compares the server parameter with the remote server type.
+        If they match true is returned.
+        
+        @parameter server: A server name like "apache"
+        @parameter kb_server: The value returned by _get_server_type()
+        
+        >>> p = pykto()
+        >>> p._server_match( 'apache', 'Apache/2.2.3 (Debian)' ), p._server_match( 'iis', 'Apache' )
+        (True, False)
+        >>> p._server_match( 'generic', 'Apache' )
+        True
+        '''
         if kb_server.upper().count( server.upper() ) or server.upper() == 'GENERIC':
             return True
         else:
@@ -389,9 +430,9 @@ class pykto(baseDiscoveryPlugin):
             
             to_mutate2 = []
             for query in to_mutate:
-                res = re.findall( 'JUNK\((.*?)\)', query )
+                res = JUNK_RE.findall( query )
                 if res:
-                    query2 = re.sub( 'JUNK\((.*?)\)', createRandAlNum( int(res[0]) ), query )
+                    query2 = JUNK_RE.sub( createRandAlNum( int(res[0]) ), query )
                     to_send.append ( (server, query2, expected_response, method , desc) )
                     to_mutate2.append( query2 )
                     to_send.remove ( (server, query, expected_response, method , desc) )
@@ -479,19 +520,21 @@ class pykto(baseDiscoveryPlugin):
         '''
         Analyzes the result of a _send()
         
+        The cheap checks (status code, then the body) are performed first, the
+        is_404 call is only made for the responses that match the test.
+        
         @return: True if vuln is found
         '''
         if expected_response.isdigit():
-            int_er = int( expected_response )
             # This is used when expected_response is 200 , 401, 403, etc.
-            if response.getCode() == int_er and not is_404( response ):
-                return True
+            if response.getCode() != int( expected_response ):
+                return False
         
-        elif expected_response in response and not is_404( response ):
-            # If the content is found, and it's not in a 404 page, then we have a vuln.
-            return True
+        elif expected_response not in response:
+            return False
         
-        return False    
+        # If the content is found, and it's not in a 404 page, then we have a vuln.
+        return not is_404( response )
 
     def getOptions( self ):
         '''
@@ -31,7 +31,7 @@ from core.data.parsers.urlParser import url_object
 
 from core.controllers.basePlugin.baseDiscoveryPlugin import baseDiscoveryPlugin
 from core.controllers.w3afException import w3afException
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt
 
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
 from core.controllers.coreHelpers.fingerprint_404 import is_404
@@ -102,9 +102,7 @@ class slash( baseDiscoveryPlugin ):
         except KeyboardInterrupt, e:
             raise e
         else:
-            resp_body = resp.getBody()
-            orig_resp = orig_resp.getBody()
-            if relative_distance_lt(resp_body, orig_resp, 0.7) and \
+            if similarity_lt(resp, orig_resp, 0.7) and \
                 not is_404(resp):
                 self._fuzzableRequests.extend(self._createFuzzableRequests(resp))
                 om.out.debug('slash plugin found new URI: "' + fuzzableRequest.getURI() + '".')
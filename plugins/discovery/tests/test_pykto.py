@@ -0,0 +1,93 @@
+'''
+test_pykto.py
+
+Copyright 2011 Andres Riancho
+
+This file is part of w3af, w3af.sourceforge.net .
+
+w3af is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation version 2 of the License.
+
+w3af is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with w3af; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+'''
+import unittest
+
+from core.data.parsers.urlParser import url_object
+from core.data.url.httpResponse import httpResponse
+import plugins.discovery.pykto as pykto_module
+
+
+class fake_tm(object):
+
+    def __init__(self):
+        self.started = 0
+        self.joins = 0
+
+    def startFunction(self, target, args=(), kwds={}, ownerObj=None):
+        self.started += 1
+        target( *args, **kwds )
+
+    def join(self, ownerObj=None):
+        self.joins += 1
+
+
+class fake_opener(object):
+
+    def __getattr__(self, method):
+        # Like xUrllib, any HTTP method can be used
+        return lambda url, **kwds: httpResponse(404, 'Not found', {}, url, url)
+
+
+class test_pykto(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = pykto_module.pykto()
+        self.plugin._tm = fake_tm()
+        self.plugin.setUrlOpener( fake_opener() )
+        self.plugin._generic_scan = True
+        self.plugin._new_fuzzable_requests = []
+
+    def test_signatures_parsed_once(self):
+        signatures = self.plugin._get_signatures()
+        self.assertTrue( len(signatures) > 3000 )
+        self.assertTrue( self.plugin._get_signatures() is signatures )
+        self.assertFalse( [ s for s in signatures if '@CGIDIRS' in s[1] ] )
+
+        # The user configured directories are part of the signatures
+        self.plugin._cgi_dirs = ['/cgi/', '/bin/']
+        self.assertFalse( self.plugin._get_signatures() is signatures )
+
+    def test_no_join_per_line(self):
+        url = url_object('http://www.w3af.com/')
+        self.plugin._pykto( url, self.plugin._get_signatures() )
+        self.assertEqual( self.plugin._tm.joins, 1 )
+        self.assertEqual( self.plugin._tm.started, len(self.plugin._get_signatures()) )
+
+    def test_analyze_status_first(self):
+        calls = []
+        is_404 = pykto_module.is_404
+        pykto_module.is_404 = lambda response: calls.append(response) or False
+        try:
+            url = url_object('http://www.w3af.com/a.php')
+            response = httpResponse(403, 'forbidden', {}, url, url)
+            self.assertFalse( self.plugin._analyzeResult( response, '200', None, url ) )
+            self.assertFalse( self.plugin._analyzeResult( response, 'secret', None, url ) )
+            self.assertEqual( calls, [] )
+
+            self.assertTrue( self.plugin._analyzeResult( response, '403', None, url ) )
+            self.assertTrue( self.plugin._analyzeResult( response, 'forb', None, url ) )
+            self.assertEqual( len(calls), 2 )
+        finally:
+            pykto_module.is_404 = is_404
+
+
+if __name__ == '__main__':
+    unittest.main()
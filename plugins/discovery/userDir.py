@@ -33,7 +33,7 @@ from core.controllers.w3afException import w3afRunOnce
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.info as info
 
-from core.controllers.misc.levenshtein import relative_distance_lt
+from core.controllers.misc.similarity import similarity_lt, similarity_profile
 
 
 class userDir(baseDiscoveryPlugin):
@@ -84,7 +84,8 @@ class userDir(baseDiscoveryPlugin):
             except:
                 raise w3afException('userDir failed to create a non existant signature.')
                 
-            self._non_existant = response_body.replace( non_existant_user, '')
+            # It's compared with the response for each user
+            self._non_existant = similarity_profile( response_body.replace( non_existant_user, '') )
             
             # Check the users to see if they exist
             url_user_list = self._create_dirs( base_url )
@@ -128,7 +129,7 @@ class userDir(baseDiscoveryPlugin):
             path = mutant.getPath()
             response_body = response.getBody().replace( path, '')
             
-            if relative_distance_lt(response_body, self._non_existant, 0.7):
+            if similarity_lt(response_body, self._non_existant, 0.7):
                 
                 # Avoid duplicates
                 if user not in [ u['user'] for u in kb.kb.getData( 'userDir', 'users') ]:
@@ -26,9 +26,8 @@ from core.controllers.basePlugin.baseDiscoveryPlugin import baseDiscoveryPlugin
 from core.controllers.w3afException import w3afException, w3afMustStopOnUrlError
 
 import core.data.parsers.dpCache as dpCache
-from core.data.parsers.urlParser import url_object
 
-from core.controllers.misc.levenshtein import relative_distance_ge
+from core.controllers.misc.similarity import similarity_ge
 
 from core.controllers.coreHelpers.fingerprint_404 import is_404
 import core.data.kb.config as cf
@@ -36,10 +35,9 @@ from core.data.fuzzer.formFiller import smartFill
 from core.data.fuzzer.fuzzer import createRandAlpha
 import core.data.dc.form as form
 import core.data.request.httpPostDataRequest as httpPostDataRequest
-from core.data.request.variant_identification import are_variants
+from core.data.request.variant_identification import variant_index
 
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
-from core.data.db.temp_persist import disk_list
 
 # options
 from core.data.options.option import option
@@ -67,9 +65,8 @@ class webSpider(baseDiscoveryPlugin):
         self._brokenLinks = []
         self._fuzzableRequests = []
         self._first_run = True
-        # TODO: param 'text_factory' *MUST* be removed when the toolkit fully
-        # supports unicode
-        self._already_crawled = disk_list(text_factory=str)
+        # Counts the crawled references by variant
+        self._already_crawled = variant_index()
         self._already_filled_form = scalable_bloomfilter()
 
         # User configured variables
@@ -192,7 +189,7 @@ class webSpider(baseDiscoveryPlugin):
                         
                         if self._need_more_variants(ref):
                             
-                            self._already_crawled.append(ref)
+                            self._already_crawled.add(ref)
                             
                             possibly_broken = ref in re_references and not ref in parsed_references
                             targs = (ref, fuzzableRequest, originalURL, possibly_broken)
@@ -223,18 +220,10 @@ class webSpider(baseDiscoveryPlugin):
         find something interesting in those links, but after a fixed number of variants, we will
         start ignoring all those variants.
         '''
-        number_of_variants = 0
-        #    TODO: The self._already_crawled should be an ORM instead of a simple
-        #    disk_list, so I could iterate through all the results and avoid having
-        #    to create the url_object() using parsing again.
-        for reference in self._already_crawled:
-            if are_variants( reference , new_reference):
-                number_of_variants += 1
-                
-            if number_of_variants > MAX_VARIANTS:
-                msg = 'Ignoring new reference "' + new_reference + '" (it is simply a variant).'
-                om.out.debug( msg )
-                return False
+        if self._already_crawled.count( new_reference ) > MAX_VARIANTS:
+            msg = 'Ignoring new reference "' + new_reference + '" (it is simply a variant).'
+            om.out.debug( msg )
+            return False
             
         return True
     
@@ -311,11 +300,7 @@ class webSpider(baseDiscoveryPlugin):
                             
                             check_response = self._urlOpener.GET( new_reference, useCache=True,
                                                                   headers= headers)
-                            resp_body = resp.getBody()
-                            check_resp_body = check_response.getBody()
-
-                            if relative_distance_ge(resp_body,
-                                                    check_resp_body, IS_EQUAL_RATIO):
+                            if similarity_ge(resp, check_response, IS_EQUAL_RATIO):
                                 # If they are equal, then they are both a 404 (or something invalid)
                                 #om.out.debug( reference + ' was broken!')
                                 return
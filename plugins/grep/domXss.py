@@ -26,6 +26,7 @@ import core.controllers.outputManager as om
 from core.data.options.option import option
 from core.data.options.optionList import optionList
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.vuln as vuln
@@ -47,6 +48,7 @@ class domXss(baseGrepPlugin):
         self._scriptRe = re.compile('< *script *>(.*?)</ *script *>', re.IGNORECASE | re.DOTALL)
         # Function regular expressions
         self._functionNamesRe = [ re.compile(i, re.IGNORECASE) for i in self._getFunctionNames(True) ]
+        self._riskyCodes = needle_set( self._getDomUserControlled() + self._getFunctionNames() )
         
     def _getFunctionNames(self, re=False):
         '''
@@ -116,16 +118,7 @@ class domXss(baseGrepPlugin):
         @parameter response: The HTTP response object
         @return: list of risky code items
         '''
-        res = []
-        riskyCodes = []
-        riskyCodes.extend(self._getDomUserControlled())
-        riskyCodes.extend(self._getFunctionNames())
-        body = response.getBody()
-
-        for riskyCode in riskyCodes:
-            if riskyCode in body:
-                res.append(riskyCode)
-        return res
+        return self._riskyCodes.query(response)
 
     def _smartGrep(self, response):
         '''
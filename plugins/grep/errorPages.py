@@ -26,6 +26,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.info as info
@@ -45,6 +46,7 @@ class errorPages(baseGrepPlugin):
         
         self._already_reported_versions = []
         self._compiled_regex = []
+        self._error_strings = needle_set( self._get_error_strings() )
 
     def _get_error_strings( self ):
         '''
@@ -152,33 +154,31 @@ class errorPages(baseGrepPlugin):
         @return: None
         '''
         if response.is_text_or_html():
-            for msg in self._get_error_strings():
-                # Remember that httpResponse objects have a faster "__in__" than
-                # the one in strings; so string in response.getBody() is slower than
-                # string in response
-                if msg in response:
-                    
-                    i = info.info()
-                    i.setPluginName(self.getName())
-                    
-                    # Set a nicer name for the vulnerability
-                    name = 'Descriptive error page - "'
-                    if len(msg) > 12:
-                        name += msg[:12] + '..."'
-                    else:
-                        name += msg + '"'
-                    i.setName( name )
-                    
-                    i.setURL( response.getURL() )
-                    i.setId( response.id )
-                    i.setDesc( 'The URL: "' + response.getURL() + '" contains the descriptive error: "' + msg + '"' )
-                    i.addToHighlight( msg ) 
-                    kb.kb.append( self , 'errorPage' , i )
-                    
-                    # There is no need to report more than one info for the same result,
-                    # the user will read the info object and analyze it even if we report it
-                    # only once. If we report it twice, he'll get mad ;)
-                    break
+            # The strings are searched together with the ones of the other
+            # grep plugins, in one pass over the response body
+            for msg in self._error_strings.query( response ):
+                
+                i = info.info()
+                i.setPluginName(self.getName())
+                
+                # Set a nicer name for the vulnerability
+                name = 'Descriptive error page - "'
+                if len(msg) > 12:
+                    name += msg[:12] + '..."'
+                else:
+                    name += msg + '"'
+                i.setName( name )
+                
+                i.setURL( response.getURL() )
+                i.setId( response.id )
+                i.setDesc( 'The URL: "' + response.getURL() + '" contains the descriptive error: "' + msg + '"' )
+                i.addToHighlight( msg ) 
+                kb.kb.append( self , 'errorPage' , i )
+                
+                # There is no need to report more than one info for the same result,
+                # the user will read the info object and analyze it even if we report it
+                # only once. If we report it twice, he'll get mad ;)
+                break
                     
             # Now i'll check if I can get a version number from the error page
             # This is common in apache, tomcat, etc...
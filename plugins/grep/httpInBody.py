@@ -26,6 +26,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
 
 import core.data.kb.knowledgeBase as kb
@@ -51,6 +52,7 @@ class httpInBody (baseGrepPlugin):
         # re that searches for
         #HTTP/1.1 200 OK
         self._re_response = re.compile('HTTP/1.[01] [0-9][0-9][0-9] [a-zA-Z]*')
+        self._http_strings = needle_set( ['HTTP/1'] )
                 
     def grep(self, request, response):
         '''
@@ -70,10 +72,7 @@ class httpInBody (baseGrepPlugin):
             self._already_inspected.add(uri)
 
             # First if, mostly for performance.
-            # Remember that httpResponse objects have a faster "__in__" than
-            # the one in strings; so string in response.getBody() is slower than
-            # string in response
-            if 'HTTP/1' in response and response.getClearTextBody() is not None:
+            if self._http_strings.query( response ) and response.getClearTextBody() is not None:
 
                 # Now, remove tags
                 body_without_tags = response.getClearTextBody()
@@ -85,6 +85,7 @@ class lang(baseGrepPlugin):
                 kb.kb.save( self, 'lang', 'unknown' )
                 
                 number_of_matches = {}
+                body = response.getBody().lower()
                 
                 for lang_string in self._prepositions:
                     # Init the count map
@@ -96,7 +97,7 @@ class lang(baseGrepPlugin):
                     preposition_regex = '(' + '|'.join(prepositions) + ')'
                     
                     # Find all the matches for this regular expression
-                    matches = re.findall(preposition_regex, response.getBody().lower())
+                    matches = re.findall(preposition_regex, body)
                     number_of_matches[ lang_string ] = len(matches)
                             
                 # Determine who is the winner
@@ -27,6 +27,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
 
 import core.data.kb.knowledgeBase as kb
@@ -43,6 +44,7 @@ class oracle(baseGrepPlugin):
     def __init__(self):
         baseGrepPlugin.__init__(self)
         self._already_analyzed = scalable_bloomfilter()
+        self._oracle_strings = needle_set( self._getDescriptiveMessages() )
         
     def grep(self, request, response):
         '''
@@ -104,22 +106,17 @@ class oracle(baseGrepPlugin):
         if response.is_text_or_html() and url not in self._already_analyzed:
             self._already_analyzed.add(url)
 
-            for msg in self._getDescriptiveMessages():
-                # Remember that httpResponse objects have a faster "__in__" than
-                # the one in strings; so string in response.getBody() is slower than
-                # string in response
-                if msg in response:
-                    
-                    i = info.info()
-                    i.setPluginName(self.getName())
-                    i.setName('Oracle application')
-                    i.setURL(url)
-                    i.setId( response.id )
-                    i.addToHighlight( msg )
-                    msg = 'The URL: "' + url + '" was created using Oracle'
-                    msg += ' Application server.'
-                    i.setDesc( msg )
-                    kb.kb.append( self , 'oracle' , i )
+            for msg in self._oracle_strings.query( response ):
+                i = info.info()
+                i.setPluginName(self.getName())
+                i.setName('Oracle application')
+                i.setURL(url)
+                i.setId( response.id )
+                i.addToHighlight( msg )
+                msg = 'The URL: "' + url + '" was created using Oracle'
+                msg += ' Application server.'
+                i.setDesc( msg )
+                kb.kb.append( self , 'oracle' , i )
 
     def _getDescriptiveMessages( self ):
         res = []
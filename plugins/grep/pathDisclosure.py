@@ -27,6 +27,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.vuln as vuln
@@ -52,6 +53,7 @@ class pathDisclosure(baseGrepPlugin):
         # Compile all regular expressions now
         self._compiled_regexes = {}
         self._compile_regex()
+        self._path_disclosure_strings = needle_set( self._get_path_disclosure_strings() )
         
     def _compile_regex(self):
         '''
@@ -67,7 +69,7 @@ class pathDisclosure(baseGrepPlugin):
             regex = re.compile( regex_string,  re.IGNORECASE)
             self._compiled_regexes[ path_disclosure_string ] = regex
             
-    def _potential_disclosures(self, html_string ):
+    def _potential_disclosures(self, response ):
         '''
         Taking into account that regular expressions are slow, we first
         apply this function to check if the HTML string has potential
@@ -79,13 +81,7 @@ class pathDisclosure(baseGrepPlugin):
         
         @return: A list of the potential path disclosures
         '''
-        potential_disclosures = []
-        
-        for path_disclosure_string in self._get_path_disclosure_strings():
-            if path_disclosure_string in html_string:
-                potential_disclosures.append( path_disclosure_string )
-            
-        return potential_disclosures
+        return self._path_disclosure_strings.query( response )
 
     def grep(self, request, response):
         '''
@@ -117,7 +113,7 @@ class pathDisclosure(baseGrepPlugin):
             
             html_string = response.getBody()
             
-            for potential_disclosure in self._potential_disclosures( html_string ):
+            for potential_disclosure in self._potential_disclosures( response ):
                 
                 path_disc_regex = self._compiled_regexes[ potential_disclosure ]
                 match_list = path_disc_regex.findall( html_string  )
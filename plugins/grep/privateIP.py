@@ -27,6 +27,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 
 import core.data.kb.knowledgeBase as kb
 import core.data.kb.vuln as vuln
@@ -55,6 +56,7 @@ class privateIP(baseGrepPlugin):
         regex_str += '9]?)){2}(?!\d)(?!\.)'
         self._private_ip_address = re.compile(regex_str)
         self._regex_list = [self._private_ip_address ]
+        self._ip_prefixes = needle_set( ['10.', '172.', '192.168.', '169.254.'] )
 
         self._already_inspected = scalable_bloomfilter()
         
@@ -104,11 +106,9 @@ class privateIP(baseGrepPlugin):
             if response.is_text_or_html():
                 
                 # Performance improvement!
-                # Remember that httpResponse objects have a faster "__in__" than
-                # the one in strings; so string in response.getBody() is slower than
-                # string in response; and regular expression matching is way slower!
-                if not (('10.' in response) or ('172.' in response) or \
-                    ('192.168.' in response) or ('169.254.' in response)):
+                # Regular expression matching is way slower than searching
+                # for these strings (together with the other grep plugins)
+                if not self._ip_prefixes.query( response ):
                     return
                 
                 for regex in self._regex_list:
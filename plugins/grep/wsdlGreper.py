@@ -27,6 +27,7 @@ from core.data.options.option import option
 from core.data.options.optionList import optionList
 
 from core.controllers.basePlugin.baseGrepPlugin import baseGrepPlugin
+from core.controllers.coreHelpers.grep_matcher import needle_set
 from core.data.bloomfilter.bloomfilter import scalable_bloomfilter
 
 import core.data.kb.knowledgeBase as kb
@@ -46,8 +47,8 @@ class wsdlGreper(baseGrepPlugin):
         # Only generate the lists once.
         # Adding 0,001% performance ;)
         self._already_inspected = scalable_bloomfilter()
-        self._wsdl_strings = self._get_WSDL_strings()
-        self._disco_strings = ['disco:discovery ']
+        self._wsdl_strings = needle_set( self._get_WSDL_strings() )
+        self._disco_strings = needle_set( ['disco:discovery '] )
 
     def grep(self, request, response):
         '''
@@ -126,13 +127,9 @@ class wsdlGreper(baseGrepPlugin):
             url not in self._already_inspected:
             # Don't repeat URLs
             self._already_inspected.add(url)
-            is_WSDL = False
-            for wsdl_string in self._wsdl_strings:
-                if wsdl_string in response:
-                    is_WSDL = True
-                    break
-                
-            if is_WSDL:
+            wsdl_found = self._wsdl_strings.query( response )
+            if wsdl_found:
+                wsdl_string = wsdl_found[0]
                 i = info.info()
                 i.setPluginName(self.getName())
                 i.setName('WSDL file')
@@ -144,13 +141,9 @@ class wsdlGreper(baseGrepPlugin):
                 i.setDesc( msg )
                 kb.kb.append( self , 'wsdl' , i )
             
-            is_Disco = False
-            for disco_string in self._disco_strings:
-                if disco_string in response:
-                    is_Disco = True
-                    break
-                
-            if is_Disco:
+            disco_found = self._disco_strings.query( response )
+            if disco_found:
+                disco_string = disco_found[0]
                 i = info.info()
                 i.setPluginName(self.getName())
                 i.setURL( response.getURL() )
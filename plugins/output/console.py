@@ -68,6 +68,12 @@ class console(baseOutputPlugin):
                 result += char
         return result
 
+    def isEnabled(self, level):
+        '''
+        @return: False for the debug messages, unless verbose is enabled.
+        '''
+        return level != 'debug' or self.verbose
+
     @catch_ioerror
     def debug(self, message, newLine = True ):
         '''
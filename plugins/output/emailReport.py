@@ -111,6 +111,10 @@ class emailReport(baseOutputPlugin):
             - fromAddr
             '''
 
+    def isEnabled(self, level):
+        # The report is created from the knowledge base
+        return False
+
     def debug(self, message, newLine = True):
         pass
 
@@ -106,6 +106,12 @@ class htmlFile(baseOutputPlugin):
             print 'An exception was raised while trying to write to the output file:', e
             sys.exit(1)
         
+    def isEnabled(self, level):
+        '''
+        @return: False for the debug messages, unless verbose is enabled.
+        '''
+        return level != 'debug' or self._verbose
+        
     def debug(self, message, newLine = True ):
         '''
         This method is called from the output object. The output object was called from a plugin
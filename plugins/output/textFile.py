@@ -119,6 +119,12 @@ class textFile(baseOutputPlugin):
             print 'An exception was raised while trying to write to the HTTP log output file:', e
             sys.exit(1)
             
+    def isEnabled(self, level):
+        '''
+        @return: False for the debug messages, unless verbose is enabled.
+        '''
+        return level != 'debug' or self.verbose
+        
     def debug(self, message, newLine = True ):
         '''
         This method is called from the output object. The output object was called from a plugin
@@ -304,14 +310,11 @@ class textFile(baseOutputPlugin):
         textfile.flush is called every time a message is sent to this plugin.
         self._file.flush() is called every self._flush_number
         '''
+        #   The output manager calls this plugin from its own thread, so the
+        #   flushing doesn't take time from the scan.
+        self._flush_counter += 1
         if self._flush_counter % self._flush_number == 0:
-            #   TODO: Remove this if I discover that it wasn't really needed.
-            #   I just commented this because after some profiling I found that
-            #   the file flushing takes some considerable time that I want to use for
-            #   some other more interesting things :)
-            #
-            #self._file.flush()
-            pass
+            self._file.flush()
             
     def setOptions( self, OptionList ):
         '''
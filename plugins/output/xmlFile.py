@@ -86,6 +86,12 @@ class xmlFile(baseOutputPlugin):
             msg += ' Exception: "' + str(e) + '".'
             raise w3afException( msg )
 
+    def isEnabled(self, level):
+        '''
+        @return: True for the error messages, the only ones that are saved.
+        '''
+        return level == 'error'
+
     def debug(self, message, newLine = True ):
         '''
         This method is called from the output object. The output object was called from a plugin